@@ -0,0 +1,180 @@
+"""
+analytics_queries.py
+--------------------
+Aggregation builders shared by the analytics endpoints (usage.py,
+dashboard.py, sub_dashboard.py) and the conversation rollups.
+
+A KPI card needs the same numbers for the selected period and for the period
+before it (the trend arrows). Rather than one ``count_documents`` /
+``distinct`` / ``$group`` round trip per number and per period, the builders
+here put every period into a single ``$facet`` aggregation: one outer
+``$match`` covering all periods (so the collection is scanned once, through
+the time index) and one facet branch per period.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+Range = Tuple[Optional[datetime], Optional[datetime]]
+
+# The message time, whichever field the row has
+MESSAGE_TIME = {"$ifNull": ["$timestamp", {"$toDate": "$date"}]}
+HOUR_KEY_FORMAT = "%Y-%m-%dT%H"
+# Set once migrate_timestamps.py has given every row a datetime timestamp
+_typed_timestamps = False
+
+
+def previous_range(start: datetime, end: datetime) -> Tuple[datetime, datetime]:
+    """The period of the same length immediately before [start, end)."""
+    return start - (end - start), start
+
+
+def period_ranges(start: Optional[datetime], end: Optional[datetime]) -> Dict[str, Range]:
+    """``{"current": ..., "previous": ...}``; no previous period for all-time (unbounded) ranges."""
+    ranges: Dict[str, Range] = {"current": (start, end)}
+    if start is not None and end is not None:
+        ranges["previous"] = previous_range(start, end)
+    return ranges
+
+
+def use_typed_timestamps(enabled: bool = True) -> None:
+    """Match time ranges on ``timestamp`` alone (after migrate_timestamps.py has completed)."""
+    global _typed_timestamps
+    _typed_timestamps = enabled
+
+
+def time_match(start: Optional[datetime], end: Optional[datetime]) -> Dict[str, object]:
+    """
+    Filter for messages in [start, end) on the typed ``timestamp``, falling back
+    to ``date`` (ISO string or datetime) for older rows that have no timestamp
+    until ``use_typed_timestamps()`` says every row has one.
+    """
+    bounds: Dict[str, object] = {}
+    iso_bounds: Dict[str, object] = {}
+    if start is not None:
+        bounds["$gte"] = start
+        iso_bounds["$gte"] = start.isoformat()
+    if end is not None:
+        bounds["$lt"] = end
+        iso_bounds["$lt"] = end.isoformat()
+    if not bounds:
+        return {}
+    if _typed_timestamps:
+        return {"timestamp": bounds}
+    return {
+        "$or": [
+            {"timestamp": bounds},
+            {"timestamp": {"$exists": False}, "date": iso_bounds},
+            {"timestamp": {"$exists": False}, "date": bounds},
+        ]
+    }
+
+
+def field_range(field: str, start: Optional[datetime], end: Optional[datetime]) -> Dict[str, object]:
+    """Filter on a single typed date field (e.g. feedback ``timestamp``)."""
+    bounds: Dict[str, object] = {}
+    if start is not None:
+        bounds["$gte"] = start
+    if end is not None:
+        bounds["$lt"] = end
+    return {field: bounds} if bounds else {}
+
+
+def message_rows_stages() -> List[Dict[str, object]]:
+    """
+    Stages turning matched messages into one row per (hour, office, user) with
+    message counts by ``"sender:status"`` and the first / last message time -
+    the input of RollupBucket (conversation_rollups.py).
+    """
+    return [
+        {"$project": {
+            "ts": MESSAGE_TIME,
+            "office": {"$ifNull": ["$office", "General"]},
+            "user": {"$ifNull": ["$user", "Anonymous"]},
+            "key": {"$concat": [
+                {"$ifNull": ["$sender", "unknown"]}, ":", {"$ifNull": ["$status", "none"]},
+            ]},
+        }},
+        {"$group": {
+            "_id": {
+                "hour": {"$dateToString": {"format": HOUR_KEY_FORMAT, "date": "$ts"}},
+                "office": "$office",
+                "user": "$user",
+                "key": "$key",
+            },
+            "n": {"$sum": 1},
+            "first": {"$min": "$ts"},
+            "last": {"$max": "$ts"},
+        }},
+        {"$group": {
+            "_id": {"hour": "$_id.hour", "office": "$_id.office", "user": "$_id.user"},
+            "counts": {"$push": {"k": "$_id.key", "v": "$n"}},
+            "messages": {"$sum": "$n"},
+            "first": {"$min": "$first"},
+            "last": {"$max": "$last"},
+        }},
+    ]
+
+
+def facet_pipeline(
+    matches: Dict[str, Dict[str, object]],
+    stages: List[Dict[str, object]],
+    *,
+    base: Optional[Dict[str, object]] = None,
+) -> List[Dict[str, object]]:
+    """
+    One aggregation computing ``stages`` for every named filter in ``matches``.
+
+    The outer ``$match`` is ``base`` AND (any of the filters); each facet branch
+    re-applies its own filter. An empty filter (all time) matches everything.
+    """
+    outer: Dict[str, object] = dict(base or {})
+    if matches and all(matches.values()):
+        alternatives = list(matches.values())
+        outer = {"$and": [outer, {"$or": alternatives}]} if outer else {"$or": alternatives}
+    return [
+        {"$match": outer},
+        {"$facet": {name: ([{"$match": match}] if match else []) + list(stages) for name, match in matches.items()}},
+    ]
+
+
+def message_rows_facet(ranges: Dict[str, Range], office: Optional[str] = None) -> List[Dict[str, object]]:
+    """``message_rows_stages`` for several time ranges of the conversations collection in one round trip."""
+    return facet_pipeline(
+        {name: time_match(start, end) for name, (start, end) in ranges.items()},
+        message_rows_stages(),
+        base={"office": office} if office is not None else None,
+    )
+
+
+def satisfaction_facet(ranges: Dict[str, Range], office: Optional[str] = None) -> List[Dict[str, object]]:
+    """Average feedback rating and rating count per named range, in one aggregation."""
+    base: Dict[str, object] = {"rating": {"$exists": True, "$ne": None}}
+    if office is not None:
+        base["office"] = office
+    return facet_pipeline(
+        {name: field_range("timestamp", start, end) for name, (start, end) in ranges.items()},
+        [{"$group": {"_id": None, "avg_rating": {"$avg": "$rating"}, "total_ratings": {"$sum": 1}}}],
+        base=base,
+    )
+
+
+def run_facets(collection, pipeline: List[Dict[str, object]]) -> Dict[str, List[Dict[str, object]]]:
+    """Run a ``facet_pipeline`` and return its branches by name."""
+    result = list(collection.aggregate(pipeline, allowDiskUse=True))
+    return result[0] if result else {}
+
+
+def satisfaction_by_range(feedback_collection, ranges: Dict[str, Range]) -> Dict[str, Dict[str, float]]:
+    """``{name: {"avg_rating": ..., "total_ratings": ...}}`` for each range (zeros when there is no feedback)."""
+    facets = run_facets(feedback_collection, satisfaction_facet(ranges))
+    results = {}
+    for name in ranges:
+        rows = facets.get(name) or []
+        results[name] = {
+            "avg_rating": (rows[0].get("avg_rating") or 0) if rows else 0,
+            "total_ratings": rows[0]["total_ratings"] if rows else 0,
+        }
+    return results
@@ -5,8 +5,10 @@ from flask_cors import CORS
 from chat import (get_response, reset_user_context, clear_chat_history, 
                   get_active_announcements, add_announcement, get_announcement_by_id,
                   vector_store, get_chatbot_response,
-                  user_contexts, office_tags, detect_office_from_message as chat_detect_office,
-                  get_openai_fallback, get_tcc_guarded_response, DOMAIN_REFUSAL_MESSAGE)
+                  context_store, office_tags, detect_office_from_message as chat_detect_office,
+                  get_openai_fallback, get_tcc_guarded_response, DOMAIN_REFUSAL_MESSAGE,
+                  start_site_page_prefetcher, get_site_page_status, llm_calls_in_thread, intents,
+                  conversation_logger as chat_conversation_logger)
 import requests
 from pymongo import MongoClient
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -22,6 +24,8 @@ from sub_feedback import sub_feedback_bp
 from sub_faq import sub_faq_bp
 from sub_announcements import sub_announcements_bp
 from usage import usage_bp
+from conversation_logger import ConversationLogger
+from chat_sessions import SessionBackfillScheduler, SessionTracker
 from feedback import save_feedback, get_feedback_stats, get_recent_feedback, get_feedback_analytics
 from vector_store import VectorStore
 from flask_moment import Moment
@@ -57,11 +61,21 @@ except ImportError:
     print("[WARNING] Resend module not available. Email features will be disabled.")
     RESEND_AVAILABLE = False
 # Google Translate API integration (using deep-translator for stability)
-from deep_translator import GoogleTranslator
+from translation_cache import TranslationCache
+from response_catalog import ResponseCatalog
+from static_responses import OFFICE_SWITCH_CONFIRMATION_TEMPLATE, OFFICE_SWITCH_WARNING_TEMPLATE
 from deep_translator.exceptions import LanguageNotSupportedException
-from langdetect import detect, DetectorFactory
-# Ensure consistent language detection results
-DetectorFactory.seed = 0
+from language_id import get_language_identifier
+from domain_guard import get_domain_guard
+from response_metadata import ResponseMetadataIndex
+from conversation_rollups import RollupScheduler, get_conversation_rollups
+from db_indexes import DB_INDEXES_ON_STARTUP, ensure_indexes_in_background
+from analytics_queries import use_typed_timestamps
+from migrate_timestamps import timestamps_normalised
+from time_buckets import resolve_timezone, usage_chart
+from response_cache import cached_view, response_cache
+from notifications_feed import (ADMIN_SCOPE, feed as notification_feed, mark_read as mark_notifications_read,
+                                notify_conversations, office_scope)
 # In-memory cache for user conversations
 
 app = Flask(__name__)
@@ -90,6 +104,8 @@ app.register_blueprint(sub_faq_bp)
 app.register_blueprint(sub_announcements_bp)
 app.register_blueprint(usage_bp)
 CORS(app)
+# Keep website catalog pages fetched and extracted in the background
+start_site_page_prefetcher()
 # Railway-compatible configuration
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
 
@@ -161,14 +177,66 @@ except Exception as e:
         def find_one(self, *args, **kwargs): return None
         def find(self, *args, **kwargs): return []
         def insert_one(self, *args, **kwargs): return type('Result', (), {'inserted_id': 'mock_id'})()
+        def insert_many(self, documents, *args, **kwargs): return type('Result', (), {'inserted_ids': ['mock_id'] * len(documents)})()
         def update_one(self, *args, **kwargs): return type('Result', (), {'modified_count': 1})()
         def delete_one(self, *args, **kwargs): return type('Result', (), {'deleted_count': 1})()
         def count_documents(self, *args, **kwargs): return 0
         def distinct(self, *args, **kwargs): return []
+        def aggregate(self, *args, **kwargs): return []  # Rollup and analytics reads come back empty
     db = MockDB()
     client = None
 # Fix: Use a different name to avoid conflicts with the route function
 conversations_collection = db["conversations"]  # Changed name here
+
+
+def _on_conversations_written(documents):
+    response_cache.note_documents("conversations", documents)
+    if client is not None:
+        notify_conversations(db, documents)
+
+
+conversation_logger = ConversationLogger(
+    lambda: conversations_collection, name="app",
+    # Write-time sessionisation into chat_sessions (needs a real database)
+    sessions=SessionTracker() if client is not None else None,
+    # Written batches invalidate cached analytics and feed the dashboard notifications
+    on_written=_on_conversations_written,
+)
+# Hourly/daily analytics rollups, refreshed in the background (one worker at a time holds the lease)
+conversation_rollups = get_conversation_rollups(db)
+if client is not None:
+    RollupScheduler(conversation_rollups).start()
+    # Sessionises older messages and recounts sessions whose write-time update failed (one worker at a time)
+    SessionBackfillScheduler(conversations_collection).start()
+    # Indexes declared in db_indexes.py, created in the background when missing
+    if DB_INDEXES_ON_STARTUP:
+        ensure_indexes_in_background(db)
+    # Once migrate_timestamps.py has completed, time ranges match the indexed timestamp alone
+    try:
+        if timestamps_normalised(db):
+            use_typed_timestamps()
+            print("[Analytics] Conversation timestamps normalised; matching time ranges on timestamp only")
+    except Exception as e:
+        print(f"[Analytics] Could not read the timestamp migration state: {e}")
+# Shared (memory + SQLite) cache in front of Google Translate for the Filipino path
+translation_cache = TranslationCache()
+# Build-time Tagalog translations of the static responses (python response_catalog.py)
+response_catalog = ResponseCatalog()
+# English / Tagalog detection for /predict (python language_id.py prebuilds the model)
+language_identifier = get_language_identifier()
+# Local in-domain / off-topic classifier consulted before the response cascade (python domain_guard.py)
+domain_guard = get_domain_guard()
+# Status / escalation / suggested office for every static response, computed once at load time
+response_metadata = ResponseMetadataIndex(intents)
+
+
+def translate_response_to_filipino(text):
+    """Serve static responses from the pre-translated catalogue; translate dynamic text live (cached)."""
+    catalogued = response_catalog.lookup(text, "tl")
+    if catalogued is not None:
+        print("🌐 Served Filipino response from the pre-translated catalogue")
+        return catalogued
+    return translation_cache.translate(text, 'en', 'tl')
 users_collection = db["users"]
 sessions_collection = db["sessions"]
 sub_users = db["sub_users"]
@@ -1454,7 +1522,7 @@ def sub_index():
     return render_template("sub-index.html")
 
 
-# ✅ IMPORTANT: user_contexts and office_tags are now imported from chat.py (single source of truth)
+# ✅ IMPORTANT: context_store and office_tags are now imported from chat.py (single source of truth)
 # This ensures reset_context works properly and context is shared across modules
 
 def detect_office_from_message(msg):
@@ -1539,7 +1607,7 @@ def detect_office_from_message(msg):
     
     return None
 
-def save_message(user, sender, message, detected_office=None, status=None):
+def save_message(user, sender, message, detected_office=None, status=None, language=None):
     """Save message to MongoDB with error handling and office detection + resolution status"""
     global conversations_collection
     
@@ -1550,30 +1618,17 @@ def save_message(user, sender, message, detected_office=None, status=None):
     # Determine office based on context or detection
     office = None
     
+    user_context = None if detected_office else context_store.get(user)
     if detected_office:
         office = office_tags.get(detected_office, detected_office)
-    elif user in user_contexts:
-        # ✅ Handle both dict and string formats for backward compatibility
-        if isinstance(user_contexts[user], dict):
-            # New format: dict with 'current_office' and 'pending_switch'
-            current_office = user_contexts[user].get('current_office')
-            if current_office:
-                office = office_tags.get(current_office, current_office)
-        else:
-            # Old format: just a string with office tag
-            office = office_tags.get(user_contexts[user], user_contexts[user])
+    elif user_context is not None:
+        if user_context.current_office:
+            office = office_tags.get(user_context.current_office, user_context.current_office)
     elif sender == "user":
         detected_tag = detect_office_from_message(message)
         if detected_tag:
             office = office_tags.get(detected_tag, detected_tag)
-            # ✅ Store as dict to support pending_switch
-            if user not in user_contexts:
-                user_contexts[user] = {}
-            if isinstance(user_contexts[user], dict):
-                user_contexts[user]['current_office'] = detected_tag
-            else:
-                # Convert old string format to new dict format
-                user_contexts[user] = {'current_office': detected_tag}
+            context_store.set_current_office(user, detected_tag)
     if not office:
         office = "General"
 
@@ -1589,12 +1644,14 @@ def save_message(user, sender, message, detected_office=None, status=None):
         "timestamp": timestamp,  # UPDATED: Use datetime object instead of string
         "date": timestamp.isoformat()  # Keep ISO string for backward compatibility
     }
+    if language:
+        document["language"] = language  # ✅ Kept on the chat session (chat_sessions.py)
     
-    try:
-        conversations_collection.insert_one(document)
-        print(f"Message saved (office={office}, status={status})")
-    except Exception as e:
-        print(f"Error saving message: {e}")
+    # ✅ Write-behind: batched insert_many on the logger thread, not on the request path
+    if conversation_logger.log(document):
+        print(f"Message queued (office={office}, status={status})")
+    else:
+        print(f"Message dropped: conversation log queue is full (office={office})")
     
     return office
   # ✅ Return for reuse in predict()
@@ -1662,37 +1719,11 @@ def predict():
             return jsonify({"answer": "Please type something."})
         
         # ✅ EARLY OFF-TOPIC DETECTION - Quick check before expensive operations
-        # This prevents timeout by returning domain refusal message immediately for obviously off-topic questions
-        text_lower = text.lower().strip()
-        off_topic_keywords = [
-            # Math and calculations
-            'solve', 'calculate', 'what is 2+2', 'math problem', 'equation', 'formula',
-            # General knowledge (not TCC-specific)
-            'what is the capital', 'history of', 'tell me about',
-            # Personal advice (not TCC-related)
-            'should i break up', 'relationship advice', 'dating advice', 'personal problem',
-            # Non-educational topics
-            'recipe', 'cooking', 'how to cook', 'weather', 'news', 'sports score',
-            # Technology help (not TCC systems)
-            'how to use windows', 'install software', 'computer virus', 'phone problem',
-        ]
-        
-        # TCC-related keywords that indicate the question IS on-topic
-        tcc_keywords = [
-            'tcc', 'tanauan city college', 'college', 'admission', 'enrollment', 'registrar',
-            'transcript', 'tuition', 'scholarship', 'guidance', 'osa', 'ict', 'misu',
-            'course', 'program', 'degree', 'student', 'faculty', 'campus', 'office',
-            'application', 'requirements', 'deadline', 'semester', 'academic', 'enroll',
-            'bachelor', 'bs', 'bsed', 'bscpe', 'entrepreneurship', 'accounting', 'public administration'
-        ]
-        
-        # Check if question contains TCC-related keywords
-        has_tcc_keywords = any(keyword in text_lower for keyword in tcc_keywords)
-        
-        # If no TCC keywords and has off-topic keywords, return domain refusal immediately
-        if not has_tcc_keywords and any(keyword in text_lower for keyword in off_topic_keywords):
-            print(f"🚫 Early off-topic detection: Returning domain refusal message immediately")
-            from chat import DOMAIN_REFUSAL_MESSAGE
+        # Off-topic keyword list, then the local classifier (English only); TCC keywords always pass
+        message_language, tagalog_share = language_identifier.classify(text)
+        refuse, off_topic_score, refusal_reason = domain_guard.check(text, use_classifier=message_language == 'en')
+        if refuse:
+            print(f"🚫 Early off-topic detection ({refusal_reason}, score {off_topic_score:.3f}): Returning domain refusal message immediately")
             return jsonify({
                 "answer": DOMAIN_REFUSAL_MESSAGE,
                 "office": "General",
@@ -1700,6 +1731,7 @@ def predict():
                 "detected_language": "en",
                 "early_rejection": True
             })
+        llm_calls_at_start = llm_calls_in_thread()
 
         # Proceed without response caching
         cache_key = f"{user}:{text.lower().strip()}"
@@ -1711,7 +1743,6 @@ def predict():
         try:
             from chat import (
                 get_response,
-                user_contexts,
                 office_tags,
                 detect_office_from_message,
                 get_openai_fallback
@@ -1752,30 +1783,11 @@ def predict():
         translation_start = time.time()
         if os.getenv('DISABLE_TRANSLATION', '').lower() != 'true':
             try:
-                filipino_keywords = [
-                    'ako', 'ikaw', 'siya', 'kami', 'tayo', 'kayo', 'sila',
-                    'ang', 'ng', 'mga', 'sa', 'na', 'ay', 'po', 'opo',
-                    'magandang', 'salamat', 'paano', 'ano', 'saan', 'kailan',
-                    'kumusta', 'mabuti', 'hindi', 'oo', 'wala', 'mayroon',
-                    'naman', 'lang', 'din', 'rin', 'ba', 'kasi', 'pero',
-                    'gusto', 'kailangan', 'pwede', 'paki'
-                ]
-                text_lower = text.lower()
-                has_filipino = any(word in text_lower.split() for word in filipino_keywords)
-                if has_filipino:
-                    detected_language = 'tl'
-                    print(f"🌐 Detected Filipino keywords in message")
-                else:
-                    detected_language = detect(text)
-                    print(f"🌐 Auto-detected language: {detected_language}")
-                    ALLOWED_LANGUAGES = ['en', 'tl', 'fil']
-                    if detected_language not in ALLOWED_LANGUAGES:
-                        print(f"⚠️ Language '{detected_language}' not in supported list. Treating as English.")
-                        detected_language = 'en'
-                    elif detected_language == 'fil':
-                        detected_language = 'tl'
+                # Keyword pre-check + local en/tl n-gram classifier, run once above
+                detected_language = message_language
+                print(f"🌐 Detected language: {detected_language} (Tagalog word share {tagalog_share})")
                 if detected_language == 'tl':
-                    translated = GoogleTranslator(source='tl', target='en').translate(text)
+                    translated = translation_cache.translate(text, 'tl', 'en')
                     print(f"📝 Translated Filipino to English: '{original_message}' → '{translated}'")
                     text = translated
                 else:
@@ -1795,14 +1807,7 @@ def predict():
         print(f"User {user} asked: {text}")
 
         # ✅ CHECK FOR PENDING OFFICE SWITCH CONFIRMATION
-        pending_switch_office = None
-        if user in user_contexts:
-            # ✅ Handle both dict and string formats
-            if isinstance(user_contexts[user], dict):
-                pending_switch_office = user_contexts[user].get('pending_switch')
-            else:
-                # Old format (string) doesn't have pending_switch
-                pending_switch_office = None
+        pending_switch_office = context_store.get_pending_switch(user)
         
         if pending_switch_office:
             print(f"🔍 Found pending office switch for user '{user}': {pending_switch_office}")
@@ -1819,30 +1824,24 @@ def predict():
             print(f"✅ User confirmation detected: '{text_lower}'")
         
         if pending_switch_office and is_confirming:
-            # ✅ AUTO-SWITCH: User confirmed the office switch
-            from chat import set_user_current_office
-            set_user_current_office(user, pending_switch_office)
-            
-            # Clear pending switch and update current office
-            if isinstance(user_contexts[user], dict):
-                user_contexts[user].pop('pending_switch', None)
-                user_contexts[user]['current_office'] = pending_switch_office
+            # ✅ AUTO-SWITCH: User confirmed the office switch (also clears the pending switch)
+            context_store.set_current_office(user, pending_switch_office, clear_pending=True)
             
             office_name = office_tags.get(pending_switch_office, pending_switch_office)
-            switch_confirmation = f"Great! I've switched to help you with {office_name} information. How can I assist you?"
+            switch_confirmation = OFFICE_SWITCH_CONFIRMATION_TEMPLATE.format(office_name=office_name)
             
             # Translate confirmation if needed
             if detected_language == 'tl':
                 try:
-                    switch_confirmation = GoogleTranslator(source='en', target='tl').translate(switch_confirmation)
+                    switch_confirmation = translate_response_to_filipino(switch_confirmation)
                 except:
                     pass  # Keep English if translation fails
             
             print(f"✅ Office switch confirmed: {office_name} for user '{user}'")
             
             # Save the confirmation exchange
-            save_message(user=user, sender="user", message=original_message, detected_office=pending_switch_office)
-            save_message(user=user, sender="bot", message=switch_confirmation, detected_office=pending_switch_office)
+            save_message(user=user, sender="user", message=original_message, detected_office=pending_switch_office, language=detected_language)
+            save_message(user=user, sender="bot", message=switch_confirmation, detected_office=pending_switch_office, language=detected_language)
             
             return jsonify({
                 "answer": switch_confirmation,
@@ -1861,20 +1860,15 @@ def predict():
 
         # ✅ OFFICE CONTEXT SWITCHING PROTECTION
         # Check if user is trying to switch to a different office without resetting
-        current_office_tag = None
-        if user in user_contexts:
-            if isinstance(user_contexts[user], dict):
-                current_office_tag = user_contexts[user].get('current_office')
-            else:
-                # Old format: string is the office tag
-                current_office_tag = user_contexts[user] if isinstance(user_contexts[user], str) else None
+        user_context = context_store.get(user)
+        current_office_tag = user_context.current_office if user_context else None
         
         # Debug logging
         print(f"🔍 Context Switch Check:")
         print(f"   User: {user}")
         print(f"   Current office in context: {current_office_tag}")
         print(f"   Detected office from message: {detected_office_tag}")
-        print(f"   User contexts: {user_contexts.get(user, 'Not set')}")
+        print(f"   User contexts: {user_context.to_dict() if user_context else 'Not set'}")
         
         # If user has an active office context and is trying to switch to a different office
         if current_office_tag and detected_office_tag and current_office_tag != detected_office_tag:
@@ -1884,27 +1878,21 @@ def predict():
             print(f"⚠️ Office context switch detected: {current_office_name} → {new_office_name}")
             
             # Create warning message
-            warning_message = (
-                f"⚠️ **Context Switch Detected**\n\n"
-                f"You're currently in the **{current_office_name}** context. "
-                f"I noticed you're now asking about the **{new_office_name}**.\n\n"
-                f"To ensure clear and accurate responses, please **reset the {current_office_name} context** first before switching to the {new_office_name}.\n\n"
-                f"💡 **How to reset:**\n"
-                f"• Click the **'Reset Context'** button at the top of the chat\n\n"
-                f"This helps me provide you with the most relevant information for each office! 😊"
+            warning_message = OFFICE_SWITCH_WARNING_TEMPLATE.format(
+                current_office_name=current_office_name, new_office_name=new_office_name
             )
             
             # Translate warning if user's language is Filipino
             if detected_language == 'tl':
                 try:
-                    warning_message = GoogleTranslator(source='en', target='tl').translate(warning_message)
+                    warning_message = translate_response_to_filipino(warning_message)
                 except Exception as e:
                     print(f"⚠️ Warning translation failed: {e}")
                     # Keep English if translation fails
             
             # Save the exchange
-            save_message(user=user, sender="user", message=original_message, detected_office=current_office_tag)
-            save_message(user=user, sender="bot", message=warning_message, detected_office=current_office_tag, status="escalated")
+            save_message(user=user, sender="user", message=original_message, detected_office=current_office_tag, language=detected_language)
+            save_message(user=user, sender="bot", message=warning_message, detected_office=current_office_tag, status="escalated", language=detected_language)
             
             return jsonify({
                 "answer": warning_message,
@@ -1955,66 +1943,20 @@ def predict():
         else:
             print(f"⏱️ Response generation took {response_time:.3f}s (total: {total_time:.2f}s)")
 
-        # ✅ Common unresolved/fallback patterns
-        unresolved_patterns = [
-            "sorry",
-            "contact support",
-            "i'm not sure how to respond",
-            "please try one of the suggested topics",
-            "rephrase your question",
-            "i'm not sure i understand",
-            "could you rephrase your question",
-            "sorry, i don't have that information yet",
-            "i'm still learning",
-            "i might not have understood that correctly",
-            "i don't quite understand that",
-            "would you like to try asking about a specific office or service",
-            "i'm here to help with information about college offices and services"
-        ]
-        # ✅ Escalation patterns (hand-off to human/office)
-        escalation_patterns = [
-            "escalating to a human agent",
-            "let me connect you to support",
-            "please contact the registrar",
-            "please contact admissions",
-            "please reach out to guidance",
-            "i'm forwarding this to ict",
-            "i think you might be asking about",   # NEW
-            "would you like me to connect you",     # NEW
-            "Context Switch Detected",
-            "Click the **'Reset Context'** button at the top of the chat",
-            "⚠️ **Context Switch Detected**",  # Enhanced pattern for your specific message
-            "reset context",  # Additional pattern for context reset
-            "reset the",  # Pattern for "reset the Admissions Office context"
-            "switching to the",  # Pattern for "switching to the Registrar's Office"
-            "office context",  # Pattern for office context messages
-            "context switch",  # Additional pattern
-            "reset context'",  # Pattern with apostrophe
-            "type 'reset context'",  # Pattern for "type 'reset context'"
-            "clear the current office context",  # Pattern for "clear the current office context"
-            "ensure clear and accurate responses"  # Pattern from your message
-        ]
-
-        # Detect resolved/unresolved/escalated status
-        # First check for escalation patterns (highest priority)
-        is_escalated = False
-        if response:
-            response_lower = response.lower()
-            for pattern in escalation_patterns:
-                if pattern.lower() in response_lower:
-                    is_escalated = True
-                    print(f"🚨 ESCALATION DETECTED: Pattern '{pattern}' found in response")
-                    break
-        
-        if is_escalated:
+        # ✅ Detect resolved/unresolved/escalated status: precomputed for static responses,
+        # one pass of the compiled phrase matcher for dynamic (LLM / retrieved) text
+        metadata = response_metadata.lookup(response)
+        if metadata.escalated:
             status = "escalated"
+            print(f"🚨 ESCALATION DETECTED: Pattern '{metadata.matched_pattern}' found in response")
             print(f"✅ STATUS SET TO ESCALATED for response: {response[:100]}...")
-        elif response and any(p in response.lower() for p in unresolved_patterns):
+        elif metadata.unresolved:
             # Try OpenAI fallback for unresolved responses (with timeout)
             try:
                 ai_answer = get_openai_fallback(text)
                 if ai_answer:
                     response = ai_answer
+                    metadata = response_metadata.lookup(response)
                     status = "resolved"
                     print("🤝 OpenAI fallback resolved the response")
                 else:
@@ -2029,17 +1971,15 @@ def predict():
         
         print(f"🎯 FINAL STATUS: {status}")
 
-        # ✅ AUTO-SWITCH: Detect office switch suggestions and extract suggested office
-        suggested_office = None
-        suggested_office_tag = None
-        if "i think you might be asking about" in response.lower() or "would you like me to connect you" in response.lower():
-            # Extract office name from response
-            for office_tag, office_name in office_tags.items():
-                if office_name.lower() in response.lower():
-                    suggested_office = office_name
-                    suggested_office_tag = office_tag
-                    print(f"🔄 Office switch suggested: {office_name} (tag: {office_tag})")
-                    break
+        # Off-topic questions the domain guard let through: record what the cascade cost
+        if response and response.strip().startswith(DOMAIN_REFUSAL_MESSAGE):
+            domain_guard.record_cascade_refusal(llm_calls_in_thread() - llm_calls_at_start)
+
+        # ✅ AUTO-SWITCH: Office switch suggestion detected in the response
+        suggested_office_tag = metadata.suggested_office_tag
+        suggested_office = office_tags.get(suggested_office_tag) if suggested_office_tag else None
+        if suggested_office:
+            print(f"🔄 Office switch suggested: {suggested_office} (tag: {suggested_office_tag})")
 
         # ✅ Translate response back to user's language (English or Filipino only)
         response_translation_start = time.time()
@@ -2047,7 +1987,7 @@ def predict():
         try:
             if detected_language == 'tl':
                 # Only translate back to Filipino if user's language was Filipino
-                translated_response = GoogleTranslator(source='en', target='tl').translate(response)
+                translated_response = translate_response_to_filipino(response)
                 print(f"🌐 Translated response back to Filipino: '{response}' → '{translated_response}'")
             else:
                 print(f"✅ Response kept in English")
@@ -2067,7 +2007,8 @@ def predict():
             user=user,
             sender="user",
             message=original_message,
-            detected_office=detected_office_tag  # Use the tag, not the display name
+            detected_office=detected_office_tag,  # Use the tag, not the display name
+            language=detected_language
         )
 
         # ✅ Save bot response (translated response in user's language) with resolution status and office
@@ -2076,20 +2017,13 @@ def predict():
             sender="bot",
             message=translated_response,
             detected_office=detected_office_tag,  # Use the tag, not the display name
-            status=status
+            status=status,
+            language=detected_language
         )
 
-        # ✅ STORE OFFICE CONTEXT: Update user_contexts with the detected office
+        # ✅ STORE OFFICE CONTEXT: Update the context store with the detected office
         if detected_office_tag:
-            if user not in user_contexts:
-                user_contexts[user] = {}
-            elif not isinstance(user_contexts[user], dict):
-                # Convert old string format to new dict format
-                old_office = user_contexts[user]
-                user_contexts[user] = {'current_office': old_office}
-            
-            # Store the current office context
-            user_contexts[user]['current_office'] = detected_office_tag
+            context_store.set_current_office(user, detected_office_tag)
             print(f"✅ Stored office context for user '{user}': {detected_office} (tag: {detected_office_tag})")
 
         # Get suggested messages from bot settings
@@ -2097,15 +2031,8 @@ def predict():
         
         # ✅ Store suggested office in session for next message
         if suggested_office_tag:
-            # Store pending office switch in user_contexts
-            if user not in user_contexts:
-                user_contexts[user] = {}
-            elif not isinstance(user_contexts[user], dict):
-                # Convert old string format to dict
-                old_office = user_contexts[user]
-                user_contexts[user] = {'current_office': old_office}
-            
-            user_contexts[user]['pending_switch'] = suggested_office_tag
+            # Store pending office switch in the context store
+            context_store.set_pending_switch(user, suggested_office_tag)
             print(f"📌 Stored pending office switch for user '{user}': {suggested_office} (tag: {suggested_office_tag})")
         
         # Calculate total processing time
@@ -2121,7 +2048,7 @@ def predict():
             "detected_language": detected_language,
             "original_message": original_message,
             "translated_message": text if detected_language != 'en' else None,
-            "context_in_memory": user_contexts.get(user),
+            "context_in_memory": context_store.snapshot(user),
             "vector_enabled": vector_store.index is not None,
             "vector_stats": vector_store.get_stats(),
             "suggested_messages": suggested_messages,
@@ -2197,7 +2124,8 @@ def chat():
             sender="user",
             message=original_message,
             detected_office=office,
-            status=status
+            status=status,
+            language=data.get("language")
         )
         
         # Note: Frontend will translate the response back to user's language
@@ -2298,7 +2226,8 @@ def save_bot_message():
                 sender="bot",
                 message=message,
                 detected_office=office,
-                status=status
+                status=status,
+                language=data.get("language")
             )
             return jsonify({"success": True})
         else:
@@ -2502,13 +2431,13 @@ def cleanup_cleared_users():
 
 # Global dictionary to store user contexts
 # --- Context store ---
-# Note: user_contexts is managed by chat.py module
+# Note: user contexts live in chat.context_store (shared across workers)
 
 @app.post("/reset_context")
 def reset_context():
     """
     Reset user's conversation context (optionally per office)
-    Clears the shared user_contexts dictionary from chat.py
+    Clears the user's record in the shared chat.context_store
     """
     data = request.get_json()
     user = data.get("user", "guest")
@@ -2516,12 +2445,12 @@ def reset_context():
     
     try:
         print(f"🔄 Reset request - User: {user}, Office: {office}")
-        print(f"🔍 Context before reset: {user_contexts.get(user, 'Not set')}")
+        print(f"🔍 Context before reset: {context_store.snapshot(user) or 'Not set'}")
         
-        # ✅ Reset using the chat.py function (which modifies the shared user_contexts)
+        # ✅ Reset using the chat.py function (which updates the shared context store)
         reset_user_context(user, office)
         
-        print(f"🔍 Context after reset: {user_contexts.get(user, 'Not set')}")
+        print(f"🔍 Context after reset: {context_store.snapshot(user) or 'Not set'}")
         
         if office:
             office_name = office_tags.get(office, office)
@@ -2755,7 +2684,20 @@ def health_check():
             "pinecone_stats": pinecone_stats,
             "vector_enabled": vector_store.index is not None,
             "database_connected": conversations_collection is not None,
-            "vector_stats": vector_store.get_stats()
+            "vector_stats": vector_store.get_stats(),
+            "site_pages": get_site_page_status(),
+            "context_store": context_store.stats(),
+            "conversation_log": {
+                "app": conversation_logger.metrics(),
+                "chat": chat_conversation_logger.metrics()
+            },
+            "translation_cache": translation_cache.stats(),
+            "response_catalog": response_catalog.stats(),
+            "language_id": language_identifier.stats(),
+            "domain_guard": domain_guard.stats(),
+            "response_metadata": response_metadata.stats(),
+            "conversation_rollups": conversation_rollups.stats(),
+            "response_cache": response_cache.stats()
         })
     except Exception as e:
         return jsonify({
@@ -3182,8 +3124,9 @@ def get_dashboard_stats(current_user):
     """Get dashboard statistics"""
     try:
         # Fix: Use the correct collection name
-        total_conversations = conversations_collection.count_documents({})
-        active_users = len(conversations_collection.distinct("user"))
+        summary = conversation_rollups.summary()
+        total_conversations = summary.messages
+        active_users = summary.unique_users
         
         # Calculate some basic metrics
         resolved_queries = int(total_conversations * 0.86)  # Assuming 86% resolution rate
@@ -3393,11 +3336,14 @@ def revoke_all_sessions(current_user):
         }), 500
 # Get KPI Data
 @app.route("/api/dashboard/kpi")
+@cached_view("dashboard.kpi")
 def get_kpi():
-    total_users = len(conversations.distinct("user"))
-    total_conversations = conversations.count_documents({})
-    resolved_queries = conversations.count_documents({"status": "resolved"})
-    escalated_issues = conversations.count_documents({"status": "escalated"})
+    # All-time totals from the conversation rollups (one rollup read plus the live tail)
+    summary = conversation_rollups.summary()
+    total_users = summary.unique_users
+    total_conversations = summary.messages
+    resolved_queries = summary.count(status="resolved")
+    escalated_issues = summary.count(status="escalated")
 
     return jsonify({
         "uniqueUsers": total_users,
@@ -3409,23 +3355,22 @@ def get_kpi():
 
 # Get Usage by Time (daily/weekly/hourly)
 @app.route("/api/dashboard/usage/<period>")
+@cached_view("dashboard.usage")
 def get_usage(period):
-    # Example: mock data — replace with real aggregation later
-    if period == "daily":
-        labels = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
-        data = [5, 10, 7, 12, 9, 3, 6]
-    elif period == "weekly":
-        labels = ["Week 1", "Week 2", "Week 3", "Week 4"]
-        data = [30, 45, 50, 60]
-    else:  # hourly
-        labels = [f"{h}:00" for h in range(24)]
-        data = [2, 3, 5, 4, 7, 9, 6, 8, 12, 14, 10, 11, 9, 8, 7, 6, 4, 5, 3, 2, 1, 0, 0, 1]
+    if period not in ("hourly", "daily", "weekly"):
+        period = "hourly"
+    try:
+        labels, data = usage_chart(conversation_rollups, period, tz=resolve_timezone(request.args.get("tz")))
+    except Exception as e:
+        print(f"❌ Error building {period} usage chart: {e}")
+        return jsonify({"error": str(e), "labels": [], "data": []}), 500
 
     return jsonify({"labels": labels, "data": data})
 
 
 # Get Department Distribution
 @app.route("/api/dashboard/departments")
+@cached_view("dashboard.departments")
 def get_departments():
     # Define specific offices to display
     specific_offices = [
@@ -3488,19 +3433,13 @@ def get_sub_admin_stats_session():
         
         # Get office-specific statistics from conversations collection
         # Filter by office field in conversation documents
-        office_conversations = conversations_collection.count_documents({"office": office})
-        office_users_list = conversations_collection.distinct("user", {"office": office})
-        office_users = len(office_users_list)
+        office_summary = conversation_rollups.summary(office=office)
+        office_conversations = office_summary.messages
+        office_users = office_summary.unique_users
         
         # Calculate resolution metrics
-        resolved_queries = conversations_collection.count_documents({
-            "office": office, 
-            "status": "resolved"
-        })
-        escalated_issues = conversations_collection.count_documents({
-            "office": office, 
-            "status": "escalated"
-        })
+        resolved_queries = office_summary.count(status="resolved")
+        escalated_issues = office_summary.count(status="escalated")
         
         # Get last login from sub_users collection
         last_login = None
@@ -3546,21 +3485,15 @@ def get_office_data():
         print(f"DEBUG: API - Loading office data for {office}")
         
         # Get office-specific statistics
-        office_conversations = conversations_collection.count_documents({"office": office})
-        office_users_list = conversations_collection.distinct("user", {"office": office})
-        office_users = len(office_users_list)
+        office_summary = conversation_rollups.summary(office=office)
+        office_conversations = office_summary.messages
+        office_users = office_summary.unique_users
         
         print(f"DEBUG: API - Found {office_conversations} conversations, {office_users} users")
         
         # Calculate office-specific metrics
-        resolved_queries = conversations_collection.count_documents({
-            "office": office, 
-            "status": "resolved"
-        })
-        escalated_issues = conversations_collection.count_documents({
-            "office": office, 
-            "status": "escalated"
-        })
+        resolved_queries = office_summary.count(status="resolved")
+        escalated_issues = office_summary.count(status="escalated")
         unresolved_queries = conversations_collection.count_documents({
             "office": office, 
             "status": "unresolved"
@@ -3948,162 +3881,10 @@ def rollback_faq_route(current_user, faq_id, version_number):
 @token_required
 @admin_required
 def get_admin_notifications(current_user):
-    """Aggregate notifications from all admin content areas"""
+    """Admin notification feed; ``?since=<cursor>`` returns only what is new since the previous poll"""
     try:
-        from datetime import datetime, timedelta
-        
-        notifications = []
-        total_count = 0
-        
-        # Get current time for "recent" checks (last 24 hours)
-        recent_time = datetime.now() - timedelta(hours=24)
-        
-        # 1. NEW FEEDBACK - Check for unread or recent feedback
-        try:
-            feedback_collection = db['feedback']
-            new_feedback_count = feedback_collection.count_documents({
-                'created_at': {'$gte': recent_time}
-            })
-            
-            if new_feedback_count > 0:
-                recent_feedback = list(feedback_collection.find({
-                    'created_at': {'$gte': recent_time}
-                }).sort('created_at', -1).limit(3))
-                
-                for fb in recent_feedback:
-                    comment = fb.get('comment') or 'No comment'
-                    comment_preview = comment[:50] + '...' if len(comment) > 50 else comment
-                    notifications.append({
-                        'id': str(fb.get('_id', '')),
-                        'type': 'feedback',
-                        'title': f"New {fb.get('rating', 5)}-star feedback",
-                        'message': comment_preview,
-                        'time': fb.get('created_at', datetime.now()).strftime('%Y-%m-%d %H:%M'),
-                        'icon': 'fa-heart',
-                        'color': 'success' if fb.get('rating', 0) >= 4 else 'warning',
-                        'link': '/feedback'
-                    })
-                total_count += new_feedback_count
-        except Exception as e:
-            print(f"Error fetching feedback notifications: {e}")
-        
-        # 2. UNRESOLVED CONVERSATIONS - Recent conversations needing attention
-        try:
-            unresolved_count = conversations_collection.count_documents({
-                'status': {'$in': ['unresolved', 'escalated']},
-                'timestamp': {'$gte': recent_time}
-            })
-            
-            if unresolved_count > 0:
-                recent_unresolved = list(conversations_collection.find({
-                    'status': {'$in': ['unresolved', 'escalated']}
-                }).sort('timestamp', -1).limit(3))
-                
-                for conv in recent_unresolved:
-                    notifications.append({
-                        'id': str(conv.get('_id', '')),
-                        'type': 'conversation',
-                        'title': f"{conv.get('status', 'Unresolved').capitalize()} conversation",
-                        'message': f"User: {conv.get('user', 'Unknown')} - Office: {conv.get('office', 'General')}",
-                        'time': conv.get('timestamp', datetime.now()).strftime('%Y-%m-%d %H:%M'),
-                        'icon': 'fa-comments',
-                        'color': 'danger' if conv.get('status') == 'escalated' else 'warning',
-                        'link': '/conversations'
-                    })
-                total_count += unresolved_count
-        except Exception as e:
-            print(f"Error fetching conversation notifications: {e}")
-        
-        # 3. NEW USERS - Recently created sub-admin accounts
-        try:
-            new_users_count = sub_users.count_documents({
-                'created_at': {'$gte': recent_time}
-            })
-            
-            if new_users_count > 0:
-                recent_users = list(sub_users.find({
-                    'created_at': {'$gte': recent_time}
-                }).sort('created_at', -1).limit(3))
-                
-                for user in recent_users:
-                    notifications.append({
-                        'id': str(user.get('_id', '')),
-                        'type': 'user',
-                        'title': 'New sub-admin created',
-                        'message': f"{user.get('name', 'Unknown')} - {user.get('office', 'No office')}",
-                        'time': user.get('created_at', datetime.now()).strftime('%Y-%m-%d %H:%M'),
-                        'icon': 'fa-user-plus',
-                        'color': 'info',
-                        'link': '/users'
-                    })
-                total_count += new_users_count
-        except Exception as e:
-            print(f"Error fetching user notifications: {e}")
-        
-        # 4. FAQ UPDATES - Recently added or modified FAQs
-        try:
-            faqs_collection = db['faqs']
-            new_faqs_count = faqs_collection.count_documents({
-                'created_at': {'$gte': recent_time}
-            })
-            
-            if new_faqs_count > 0:
-                recent_faqs = list(faqs_collection.find({
-                    'created_at': {'$gte': recent_time}
-                }).sort('created_at', -1).limit(2))
-                
-                for faq in recent_faqs:
-                    question = faq.get('question') or 'No question'
-                    question_preview = question[:50] + '...' if len(question) > 50 else question
-                    notifications.append({
-                        'id': str(faq.get('_id', '')),
-                        'type': 'faq',
-                        'title': 'New FAQ added',
-                        'message': question_preview,
-                        'time': faq.get('created_at', datetime.now()).strftime('%Y-%m-%d %H:%M'),
-                        'icon': 'fa-question-circle',
-                        'color': 'primary',
-                        'link': '/faq'
-                    })
-                total_count += new_faqs_count
-        except Exception as e:
-            print(f"Error fetching FAQ notifications: {e}")
-        
-        # 5. HIGH USAGE ALERT - Check if usage spike in last hour
-        try:
-            one_hour_ago = datetime.now() - timedelta(hours=1)
-            recent_conversations_count = conversations_collection.count_documents({
-                'timestamp': {'$gte': one_hour_ago}
-            })
-            
-            # If more than 50 conversations in last hour, show alert
-            if recent_conversations_count > 50:
-                notifications.append({
-                    'id': 'usage_spike',
-                    'type': 'alert',
-                    'title': 'High usage detected',
-                    'message': f'{recent_conversations_count} conversations in the last hour',
-                    'time': datetime.now().strftime('%Y-%m-%d %H:%M'),
-                    'icon': 'fa-chart-line',
-                    'color': 'warning',
-                    'link': '/usage'
-                })
-                total_count += 1
-        except Exception as e:
-            print(f"Error checking usage spike: {e}")
-        
-        # Sort notifications by time (most recent first)
-        notifications.sort(key=lambda x: x['time'], reverse=True)
-        
-        # Limit to top 10 notifications
-        notifications = notifications[:10]
-        
-        return jsonify({
-            'success': True,
-            'notifications': notifications,
-            'total_count': total_count,
-            'unread_count': total_count  # All are considered unread for now
-        })
+        result = notification_feed(db, ADMIN_SCOPE, str(current_user['_id']), request.args.get('since'))
+        return jsonify({'success': True, **result})
         
     except Exception as e:
         print(f"Error fetching admin notifications: {e}")
@@ -4117,10 +3898,22 @@ def get_admin_notifications(current_user):
             'unread_count': 0
         }), 500
 
+@app.route('/api/admin/notifications/read', methods=['POST'])
+@token_required
+@admin_required
+def mark_admin_notifications_read(current_user):
+    """Mark the admin feed as read for the current admin"""
+    try:
+        mark_notifications_read(db, ADMIN_SCOPE, str(current_user['_id']))
+        return jsonify({'success': True, 'unread_count': 0})
+    except Exception as e:
+        print(f"Error marking admin notifications read: {e}")
+        return jsonify({'success': False, 'message': 'Error marking notifications read'}), 500
+
 # Notification API Endpoint for Sub-Admin
 @app.route('/api/sub-admin/notifications', methods=['GET'])
 def get_sub_admin_notifications():
-    """Aggregate notifications from all sub-admin content areas"""
+    """Office notification feed; ``?since=<cursor>`` returns only what is new since the previous poll"""
     try:
         # Check if user is authenticated as sub-admin
         if not (session.get("role") == "sub-admin" and session.get("office")):
@@ -4132,175 +3925,10 @@ def get_sub_admin_notifications():
                 'unread_count': 0
             }), 401
         
-        from datetime import datetime, timedelta
-        
         office = session.get("office")
-        notifications = []
-        total_count = 0
-        
-        # Get current time for "recent" checks (last 24 hours)
-        recent_time = datetime.now() - timedelta(hours=24)
-        
-        # 1. NEW FEEDBACK - Office-specific feedback
-        try:
-            feedback_collection = db['feedback']
-            new_feedback_count = feedback_collection.count_documents({
-                'office': office,
-                'created_at': {'$gte': recent_time}
-            })
-            
-            if new_feedback_count > 0:
-                recent_feedback = list(feedback_collection.find({
-                    'office': office,
-                    'created_at': {'$gte': recent_time}
-                }).sort('created_at', -1).limit(3))
-                
-                for fb in recent_feedback:
-                    comment = fb.get('comment') or 'No comment'
-                    comment_preview = comment[:50] + '...' if len(comment) > 50 else comment
-                    notifications.append({
-                        'id': str(fb.get('_id', '')),
-                        'type': 'feedback',
-                        'title': f"New {fb.get('rating', 5)}-star feedback",
-                        'message': comment_preview,
-                        'time': fb.get('created_at', datetime.now()).strftime('%Y-%m-%d %H:%M'),
-                        'icon': 'fa-heart',
-                        'color': 'success' if fb.get('rating', 0) >= 4 else 'warning',
-                        'link': f'/Sub-feedback?office={office}'
-                    })
-                total_count += new_feedback_count
-        except Exception as e:
-            print(f"Error fetching feedback notifications: {e}")
-        
-        # 2. UNRESOLVED CONVERSATIONS - Office-specific
-        try:
-            unresolved_count = conversations_collection.count_documents({
-                'office': office,
-                'status': {'$in': ['unresolved', 'escalated']},
-                'timestamp': {'$gte': recent_time}
-            })
-            
-            if unresolved_count > 0:
-                recent_unresolved = list(conversations_collection.find({
-                    'office': office,
-                    'status': {'$in': ['unresolved', 'escalated']}
-                }).sort('timestamp', -1).limit(3))
-                
-                for conv in recent_unresolved:
-                    notifications.append({
-                        'id': str(conv.get('_id', '')),
-                        'type': 'conversation',
-                        'title': f"{conv.get('status', 'Unresolved').capitalize()} conversation",
-                        'message': f"User: {conv.get('user', 'Unknown')}",
-                        'time': conv.get('timestamp', datetime.now()).strftime('%Y-%m-%d %H:%M'),
-                        'icon': 'fa-comments',
-                        'color': 'danger' if conv.get('status') == 'escalated' else 'warning',
-                        'link': f'/Sub-conversations?office={office}'
-                    })
-                total_count += unresolved_count
-        except Exception as e:
-            print(f"Error fetching conversation notifications: {e}")
-        
-        # 3. NEW FAQs - Office-specific
-        try:
-            faqs_collection = db['faqs']
-            new_faqs_count = faqs_collection.count_documents({
-                'office': office,
-                'created_at': {'$gte': recent_time}
-            })
-            
-            if new_faqs_count > 0:
-                recent_faqs = list(faqs_collection.find({
-                    'office': office,
-                    'created_at': {'$gte': recent_time}
-                }).sort('created_at', -1).limit(2))
-                
-                for faq in recent_faqs:
-                    question = faq.get('question') or 'No question'
-                    question_preview = question[:50] + '...' if len(question) > 50 else question
-                    notifications.append({
-                        'id': str(faq.get('_id', '')),
-                        'type': 'faq',
-                        'title': 'New FAQ added',
-                        'message': question_preview,
-                        'time': faq.get('created_at', datetime.now()).strftime('%Y-%m-%d %H:%M'),
-                        'icon': 'fa-question-circle',
-                        'color': 'primary',
-                        'link': f'/Sub-faq?office={office}'
-                    })
-                total_count += new_faqs_count
-        except Exception as e:
-            print(f"Error fetching FAQ notifications: {e}")
-        
-        # 4. NEW ANNOUNCEMENTS - Office-specific
-        try:
-            announcements_collection = db['announcements']
-            new_announcements_count = announcements_collection.count_documents({
-                'office': office,
-                'created_at': {'$gte': recent_time},
-                'is_active': True
-            })
-            
-            if new_announcements_count > 0:
-                recent_announcements = list(announcements_collection.find({
-                    'office': office,
-                    'created_at': {'$gte': recent_time},
-                    'is_active': True
-                }).sort('created_at', -1).limit(2))
-                
-                for announcement in recent_announcements:
-                    title = announcement.get('title') or 'New announcement'
-                    title_preview = title[:50] + '...' if len(title) > 50 else title
-                    notifications.append({
-                        'id': str(announcement.get('_id', '')),
-                        'type': 'announcement',
-                        'title': 'New announcement',
-                        'message': title_preview,
-                        'time': announcement.get('created_at', datetime.now()).strftime('%Y-%m-%d %H:%M'),
-                        'icon': 'fa-bullhorn',
-                        'color': 'info',
-                        'link': f'/Sub-announcements?office={office}'
-                    })
-                total_count += new_announcements_count
-        except Exception as e:
-            print(f"Error fetching announcement notifications: {e}")
-        
-        # 5. HIGH USAGE ALERT - Office-specific
-        try:
-            one_hour_ago = datetime.now() - timedelta(hours=1)
-            recent_conversations_count = conversations_collection.count_documents({
-                'office': office,
-                'timestamp': {'$gte': one_hour_ago}
-            })
-            
-            # If more than 30 conversations in last hour for this office
-            if recent_conversations_count > 30:
-                notifications.append({
-                    'id': 'usage_spike',
-                    'type': 'alert',
-                    'title': 'High usage detected',
-                    'message': f'{recent_conversations_count} conversations in the last hour',
-                    'time': datetime.now().strftime('%Y-%m-%d %H:%M'),
-                    'icon': 'fa-chart-line',
-                    'color': 'warning',
-                    'link': f'/Sub-usage?office={office}'
-                })
-                total_count += 1
-        except Exception as e:
-            print(f"Error checking usage spike: {e}")
-        
-        # Sort notifications by time (most recent first)
-        notifications.sort(key=lambda x: x['time'], reverse=True)
-        
-        # Limit to top 10 notifications
-        notifications = notifications[:10]
-        
-        return jsonify({
-            'success': True,
-            'notifications': notifications,
-            'total_count': total_count,
-            'unread_count': total_count  # All are considered unread for now
-        })
+        reader = session.get("user_id") or session.get("email")
+        result = notification_feed(db, office_scope(office), reader, request.args.get('since'))
+        return jsonify({'success': True, **result})
         
     except Exception as e:
         print(f"Error fetching sub-admin notifications: {e}")
@@ -4314,6 +3942,19 @@ def get_sub_admin_notifications():
             'unread_count': 0
         }), 500
 
+@app.route('/api/sub-admin/notifications/read', methods=['POST'])
+def mark_sub_admin_notifications_read():
+    """Mark the office feed as read for the current sub-admin"""
+    if not (session.get("role") == "sub-admin" and session.get("office")):
+        return jsonify({'success': False, 'message': 'Sub-admin authentication required'}), 401
+    try:
+        reader = session.get("user_id") or session.get("email")
+        mark_notifications_read(db, office_scope(session.get("office")), reader)
+        return jsonify({'success': True, 'unread_count': 0})
+    except Exception as e:
+        print(f"Error marking sub-admin notifications read: {e}")
+        return jsonify({'success': False, 'message': 'Error marking notifications read'}), 500
+
 # Add some debugging information on startup
 def startup_info():
     print("=== TCC Assistant Starting ===")
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the analytics KPI queries.
+
+Seeds a local MongoDB with synthetic conversations and feedback, then times the
+usage overview KPIs (conversations, unique users, resolution rate and average
+satisfaction for a period and the period before it) three ways:
+
+* legacy  - one count_documents / $group round trip per number and per period,
+            as usage.py and dashboard.py did before;
+* facet   - one $facet aggregation over the raw conversations covering both
+            periods, plus one over feedback (analytics_queries.py);
+* rollups - ConversationRollups.summaries over the prebuilt hourly/daily
+            rollups with the raw live tail, plus the feedback $facet;
+* sketch  - the same with unique users estimated from the HyperLogLog
+            sketches instead of the per-user rows.
+
+Each strategy reports the median latency and the number of commands sent to
+the server per refresh; the first three must agree on the numbers, the sketch
+only on everything but unique users (reported with its relative error).
+
+Usage:
+    MONGODB_BENCH_URI=mongodb://localhost:27017 python benchmark_analytics.py [--messages 200000] [--days 120]
+
+The benchmark database (chatbot_analytics_benchmark) is dropped and reseeded
+unless --reuse is given and it already holds the requested number of messages.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+from collections import Counter
+from datetime import timedelta
+
+from pymongo import ASCENDING, MongoClient, monitoring
+
+from analytics_queries import message_rows_facet, period_ranges, run_facets, satisfaction_by_range
+from conversation_rollups import ConversationRollups, RollupBucket, utcnow
+
+BENCH_DB = "chatbot_analytics_benchmark"
+OFFICES = ["Admissions Office", "Registrar's Office", "ICT Office", "Guidance Office",
+           "Office of the Student Affairs (OSA)", "General"]
+STATUSES = ["resolved"] * 7 + ["unresolved"] * 2 + ["escalated"]
+
+
+class CommandCounter(monitoring.CommandListener):
+    """Counts commands sent to the server (aggregate, find, getMore, count, ...)."""
+
+    def __init__(self):
+        self.counts = Counter()
+
+    def started(self, event):
+        self.counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def total(self):
+        return sum(count for name, count in self.counts.items() if name not in ("endSessions", "ping", "hello", "isMaster"))
+
+
+def seed(db, messages, days, users=None):
+    """Insert ``messages`` conversation rows (user/bot pairs) spread over the last ``days`` days."""
+    rng = random.Random(7)
+    users = users or max(50, messages // 40)
+    now = utcnow()
+    conversations, feedback = db["conversations"], db["feedback"]
+    conversations.drop()
+    feedback.drop()
+    batch = []
+    for i in range(0, messages, 2):
+        asked = now - timedelta(seconds=rng.randint(0, days * 86400))
+        asked = asked.replace(microsecond=asked.microsecond // 1000 * 1000)
+        user, office, status = f"user-{rng.randint(1, users)}", rng.choice(OFFICES), rng.choice(STATUSES)
+        for sender, offset in (("user", 0), ("bot", rng.randint(1, 8))):
+            ts = asked + timedelta(seconds=offset)
+            batch.append({"user": user, "sender": sender, "message": "synthetic", "office": office,
+                          "status": status, "timestamp": ts, "date": ts.isoformat(), "logged_at": ts})
+        if len(batch) >= 10000:
+            conversations.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        conversations.insert_many(batch, ordered=False)
+    feedback.insert_many([
+        {"rating": rng.randint(1, 5), "office": rng.choice(OFFICES),
+         "timestamp": now - timedelta(seconds=rng.randint(0, days * 86400))}
+        for _ in range(max(10, messages // 50))
+    ])
+    conversations.create_index([("timestamp", ASCENDING)])
+    conversations.create_index([("logged_at", ASCENDING)])
+    feedback.create_index([("timestamp", ASCENDING)])
+
+
+def legacy_kpis(db, ranges):
+    """The pre-rollup query pattern: several round trips per period."""
+    conversations, feedback = db["conversations"], db["feedback"]
+    results = {}
+    for name, (start, end) in ranges.items():
+        time_query = {"timestamp": {"$gte": start, "$lt": end}}
+        total = conversations.count_documents(time_query)
+        users = list(conversations.aggregate([{"$match": time_query}, {"$group": {"_id": "$user"}}, {"$count": "total"}]))
+        rating = list(feedback.aggregate([
+            {"$match": {"timestamp": {"$gte": start, "$lt": end}, "rating": {"$exists": True, "$ne": None}}},
+            {"$group": {"_id": None, "avg_rating": {"$avg": "$rating"}}},
+        ]))
+        statuses = {row["_id"]: row["count"] for row in conversations.aggregate([
+            {"$match": {**time_query, "status": {"$exists": True, "$ne": None}}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ])}
+        results[name] = (total, users[0]["total"] if users else 0, statuses.get("resolved", 0),
+                         round(rating[0]["avg_rating"], 4) if rating else 0)
+    return results
+
+
+def facet_kpis(db, ranges):
+    """Both periods in one $facet over the raw conversations, plus one over feedback."""
+    facets = run_facets(db["conversations"], message_rows_facet(ranges))
+    satisfaction = satisfaction_by_range(db["feedback"], ranges)
+    results = {}
+    for name in ranges:
+        total = RollupBucket()
+        for data in ConversationRollups._fold(facets.get(name, []), None).values():
+            total.merge(data)
+        results[name] = (total.messages, total.unique_users, total.count(status="resolved"),
+                         round(satisfaction[name]["avg_rating"], 4))
+    return results
+
+
+def rollup_kpis(db, ranges, rollups, exact=True):
+    summaries = rollups.summaries(ranges, exact=exact)
+    satisfaction = satisfaction_by_range(db["feedback"], ranges)
+    return {
+        name: (summary.messages, summary.unique_users, summary.count(status="resolved"),
+               round(satisfaction[name]["avg_rating"], 4))
+        for name, summary in summaries.items()
+    }
+
+
+def measure(name, fn, counter, repeat):
+    fn()  # warm-up
+    timings = []
+    counter.counts.clear()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    commands = counter.total() / repeat
+    print(f"  {name:<8} median {statistics.median(timings):8.1f}ms   "
+          f"min {min(timings):8.1f}ms   {commands:4.1f} commands/refresh")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=120)
+    parser.add_argument("--period-days", type=int, default=15, help="length of the KPI period (usage 'daily' = 15)")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--reuse", action="store_true", help="keep an already seeded benchmark database")
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    uri = os.getenv("MONGODB_BENCH_URI", "mongodb://localhost:27017")
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000, event_listeners=[counter])
+    client.admin.command("ping")
+    db = client[BENCH_DB]
+
+    if not (args.reuse and db["conversations"].estimated_document_count() == args.messages):
+        start = time.perf_counter()
+        seed(db, args.messages, args.days)
+        print(f"Seeded {args.messages} messages over {args.days} days in {time.perf_counter() - start:.1f}s")
+
+    rollups = ConversationRollups(db)
+    db["conversation_rollups"].drop()
+    db["rollup_state"].drop()
+    start = time.perf_counter()
+    run = rollups.run_once()
+    print(f"Initial rollup build: {run['days']} days, {run['documents']} buckets in {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    run = rollups.run_once()
+    print(f"Incremental rollup run (no new messages): {run['days']} day(s) in {time.perf_counter() - start:.2f}s")
+
+    now = utcnow()
+    ranges = period_ranges(now - timedelta(days=args.period_days), now)
+    print(f"\nOverview KPIs, {args.period_days}-day period + previous period:")
+    legacy = measure("legacy", lambda: legacy_kpis(db, ranges), counter, args.repeat)
+    facet = measure("facet", lambda: facet_kpis(db, ranges), counter, args.repeat)
+    rolled = measure("rollups", lambda: rollup_kpis(db, ranges, rollups), counter, args.repeat)
+    sketched = measure("sketch", lambda: rollup_kpis(db, ranges, rollups, exact=False), counter, args.repeat)
+
+    print("\n(conversations, users, resolved, avg rating) per period:")
+    for name in ranges:
+        print(f"  {name:<8} legacy {legacy[name]}  facet {facet[name]}  rollups {rolled[name]}")
+        exact_users, estimated_users = rolled[name][1], sketched[name][1]
+        error = (estimated_users - exact_users) / exact_users * 100 if exact_users else 0.0
+        print(f"  {'':<8} sketch {sketched[name]}  unique users {error:+.2f}%")
+    if not (legacy == facet == rolled):
+        print("  MISMATCH between strategies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Benchmark for context_search.
+
+Times find_relevant_content the way /predict calls it: through the BM25F
+section index over a ``website_sections`` collection (plus the initial index
+sync, which normally runs in the background), next to the score_document scan
+it replaced, which now only runs when the index is unavailable. Needs MongoDB; the sections are
+written to a scratch database and dropped afterwards.
+
+Then compares the fallback scorer's trigram-based fuzzy_similarity_score
+against the previous SequenceMatcher implementation: time per call, and how
+much the score_document ranking changes (top-1 agreement, overlap@3 and
+Kendall's tau over the full ranking).
+
+Usage:
+    MONGODB_BENCH_URI=mongodb://localhost:27017 python benchmark_context_search.py
+"""
+
+import io
+import os
+import statistics
+import time
+from contextlib import redirect_stdout
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from pymongo import MongoClient
+
+import context_search
+from context_search import (find_best_in_documents, find_relevant_content, get_section_index, normalise,
+                            score_document)
+from database import SAMPLE_CONTEXT_DOCUMENTS
+
+BENCH_DB = "edubot_context_benchmark"
+
+QUERIES = [
+    "What are the admission requirements?",
+    "admission requirements for transferees",
+    "When is the application period?",
+    "entrance exam schedule",
+    "What programs does TCC offer?",
+    "bs computer engineering",
+    "What is the mission of Tanauan City College?",
+    "vision of tcc by 2030",
+    "core values of the college",
+    "history of the college",
+    "how to contact the community office",
+    "community email address",
+    "facebook page of tcc",
+    "is there an enrollment deadline",
+    "what documents do freshmen need",
+    "good moral certificate",
+    "industry partnerships and career support",
+    "student organizations and leadership",
+    "where is the college located",
+    "psa birth certificate requirement",
+]
+
+
+def legacy_fuzzy_similarity_score(message: str, content: str) -> float:
+    """The SequenceMatcher scorer that fuzzy_similarity_score replaced."""
+    if not message or not content:
+        return 0.0
+    return SequenceMatcher(None, message, content).ratio()
+
+
+def load_documents():
+    """Sample sections, plus the local templates when they can be parsed."""
+    documents = [dict(doc) for doc in SAMPLE_CONTEXT_DOCUMENTS]
+    try:
+        from template_corpus import load_template_corpus
+
+        template_docs, _ = load_template_corpus()
+        documents.extend(template_docs)
+    except Exception as exc:
+        print(f"⚠️ Local templates unavailable ({exc}); adding a synthetic long page instead")
+        long_content = " ".join(doc["content"] for doc in SAMPLE_CONTEXT_DOCUMENTS)
+        documents.append({
+            "slug": "synthetic-long-page",
+            "page": "home",
+            "title": "Synthetic Long Page",
+            "content": (long_content * 20)[:20000],
+            "tags": ["home"],
+        })
+    return documents
+
+
+def time_scorer(scorer, pairs, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message, content in pairs:
+            scorer(message, content)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def time_queries(search, repeat=5):
+    """Median milliseconds per query over ``repeat`` passes of QUERIES."""
+    timings = []
+    for _ in range(repeat):
+        for query in QUERIES:
+            start = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def benchmark_index(documents):
+    """find_relevant_content through the section index vs the full score_document scan."""
+    uri = os.getenv("MONGODB_BENCH_URI", "mongodb://localhost:27017")
+    try:
+        client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+        client.admin.command("ping")
+    except Exception as exc:
+        print(f"⚠️ MongoDB unavailable at {uri} ({exc}); skipping the find_relevant_content benchmark")
+        print()
+        return
+    collection = client[BENCH_DB]["website_sections"]
+    try:
+        collection.delete_many({})
+        collection.insert_many([
+            {field: doc.get(field) for field in ("slug", "title", "page", "content", "tags")}
+            for doc in documents
+        ])
+        # find_relevant_content logs every search; keep the report readable
+        with redirect_stdout(io.StringIO()):
+            # Normally done by the background refresher; timed here on this thread
+            start = time.perf_counter()
+            get_section_index(collection, force_refresh=True)
+            first_sync = (time.perf_counter() - start) * 1000
+            indexed = time_queries(lambda query: find_relevant_content(query, collection))
+
+            # The old path: every section scored with score_document (cold caches first)
+            context_search.text_profile.cache_clear()
+            context_search.char_trigrams.cache_clear()
+            start = time.perf_counter()
+            find_best_in_documents(QUERIES[0], documents)
+            scan_cold = (time.perf_counter() - start) * 1000
+            scan = time_queries(lambda query: find_best_in_documents(query, documents))
+
+            agree = sum(
+                (find_relevant_content(query, collection) or ({},))[0].get("slug")
+                == (find_best_in_documents(query, documents, minimum_score=0.10) or ({},))[0].get("slug")
+                for query in QUERIES
+            )
+    finally:
+        client.drop_database(BENCH_DB)
+        client.close()
+
+    print("find_relevant_content (per query):")
+    print(f"  Section index sync (background):       {first_sync:9.1f} ms")
+    print(f"  BM25F index, warm (median):            {indexed:9.2f} ms")
+    print(f"  score_document scan, cold caches:      {scan_cold:9.1f} ms")
+    print(f"  score_document scan, warm (median):    {scan:9.2f} ms")
+    print(f"  Same best section as the scan:         {agree}/{len(QUERIES)}")
+    print(f"  Scorer caches: profiles {context_search.text_profile.cache_info()}")
+    print(f"                 trigrams {context_search.char_trigrams.cache_info()}")
+    print()
+
+
+def rank(query, documents):
+    scored = [(doc["slug"], score_document(query, doc)) for doc in documents]
+    scored.sort(key=lambda item: item[1], reverse=True)
+    return [slug for slug, _ in scored]
+
+
+def kendall_tau(order_a, order_b):
+    position_b = {slug: idx for idx, slug in enumerate(order_b)}
+    concordant = discordant = 0
+    for first, second in combinations(order_a, 2):
+        if position_b[first] < position_b[second]:
+            concordant += 1
+        else:
+            discordant += 1
+    total = concordant + discordant
+    return (concordant - discordant) / total if total else 1.0
+
+
+def main():
+    documents = load_documents()
+    print("=" * 80)
+    print(f"CONTEXT SEARCH BENCHMARK ({len(QUERIES)} queries x {len(documents)} documents)")
+    print("=" * 80)
+
+    benchmark_index(documents)
+
+    pairs = [
+        (normalise(query), normalise(doc.get("content", "")))
+        for query in QUERIES
+        for doc in documents
+    ]
+
+    trigram_cold = time_scorer(context_search.fuzzy_similarity_score, pairs, repeat=1)
+    trigram_warm = time_scorer(context_search.fuzzy_similarity_score, pairs)
+    legacy = time_scorer(legacy_fuzzy_similarity_score, pairs, repeat=1)
+
+    print("fuzzy_similarity_score timing:")
+    print(f"  SequenceMatcher:        {legacy * 1000:9.1f} ms ({legacy / len(pairs) * 1e6:8.1f} µs/pair)")
+    print(f"  Trigram Dice (cold):    {trigram_cold * 1000:9.1f} ms ({trigram_cold / len(pairs) * 1e6:8.1f} µs/pair)")
+    print(f"  Trigram Dice (cached):  {trigram_warm * 1000:9.1f} ms ({trigram_warm / len(pairs) * 1e6:8.1f} µs/pair)")
+    print()
+
+    new_rankings = {query: rank(query, documents) for query in QUERIES}
+    original_scorer = context_search.fuzzy_similarity_score
+    context_search.fuzzy_similarity_score = legacy_fuzzy_similarity_score
+    try:
+        old_rankings = {query: rank(query, documents) for query in QUERIES}
+    finally:
+        context_search.fuzzy_similarity_score = original_scorer
+
+    top1 = overlap3 = 0
+    taus = []
+    print("Ranking agreement (score_document, legacy vs trigram):")
+    for query in QUERIES:
+        old, new = old_rankings[query], new_rankings[query]
+        same_top = old[0] == new[0]
+        top1 += same_top
+        overlap = len(set(old[:3]) & set(new[:3]))
+        overlap3 += overlap
+        tau = kendall_tau(old, new)
+        taus.append(tau)
+        print(f"  {'✓' if same_top else '✗'} tau={tau:+.3f} overlap@3={overlap}/3  {query}")
+
+    print()
+    print("=" * 80)
+    print(f"Top-1 agreement: {top1}/{len(QUERIES)} ({top1 / len(QUERIES) * 100:.1f}%)")
+    print(f"Mean overlap@3:  {overlap3 / len(QUERIES):.2f}/3")
+    print(f"Mean Kendall's tau: {sum(taus) / len(taus):+.3f}")
+    print("=" * 80)
+
+
+if __name__ == "__main__":
+    main()
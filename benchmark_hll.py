@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark for hll.
+
+Measures the error of HyperLogLog.count() (Ertl's estimator) against the
+classic estimator it replaced, over ``--trials`` independent sketches per
+cardinality: mean error (bias), standard deviation, and the 95th / 99th
+percentile of the absolute error (the figures the hll.py module docstring
+refers to).
+
+Before that it checks the properties the rollups rely on (``to_bytes`` /
+``from_bytes`` round-trips sparse and dense sketches, and merging sketches
+gives exactly the sketch of the union) and reports how far off counts of 1 to
+100 users are.
+
+Usage:
+    python benchmark_hll.py [--trials 100]
+"""
+
+import argparse
+import math
+import random
+import statistics
+import time
+
+from hll import DEFAULT_PRECISION, HyperLogLog
+
+SIZES = [10, 100, 1000, 3000, 5000, 8000, 10000, 20000, 50000]
+
+
+def classic_count(sketch):
+    """The raw HyperLogLog estimate with linear counting below 2.5 * m (what count() replaced)."""
+    m = sketch.m
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / sum(2.0 ** -register for register in sketch.registers)
+    zeros = sketch.registers.count(0)
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * math.log(m / zeros)
+    return int(round(estimate))
+
+
+def sketch_of(count, salt):
+    return HyperLogLog.of(f"{salt}:{i}" for i in range(count))
+
+
+def check_properties():
+    """Serialisation round trip and merge == union; returns the failures."""
+    failures = []
+    for count in (0, 5, 1000, 20000):
+        sketch = sketch_of(count, "roundtrip")
+        data = sketch.to_bytes()
+        restored = HyperLogLog.from_bytes(data)
+        encoding = "sparse" if data[1] else "dense"
+        if restored.p != sketch.p or restored.registers != sketch.registers:
+            failures.append(f"to_bytes/from_bytes round trip ({count} users, {encoding})")
+
+    rng = random.Random(7)
+    users = [f"user-{i}" for i in range(30000)]
+    days = [rng.sample(users, rng.randint(50, 8000)) for _ in range(10)]
+    merged = HyperLogLog()
+    for day in days:
+        merged.merge(HyperLogLog.of(day))
+    union = HyperLogLog.of({user for day in days for user in day})
+    if merged.registers != union.registers:
+        failures.append("merge of daily sketches != sketch of the union")
+    # Merging is idempotent and order-independent
+    again = union.copy()
+    for day in reversed(days):
+        again.merge(HyperLogLog.of(day))
+    if again.registers != union.registers:
+        failures.append("re-merging the daily sketches changed the union")
+    return failures
+
+
+def small_counts(trials):
+    """Share of exact counts and the largest absolute error (users) for 1-100 users."""
+    exact = worst = total = 0
+    for trial in range(trials):
+        for count in range(1, 101):
+            error = abs(sketch_of(count, f"small-{trial}").count() - count)
+            exact += error == 0
+            worst = max(worst, error)
+            total += 1
+    return exact / total, worst
+
+
+def measure(count, trials):
+    """Relative errors (%) of count() and classic_count() over ``trials`` sketches of ``count`` users."""
+    errors, classic_errors = [], []
+    for trial in range(trials):
+        sketch = sketch_of(count, f"{count}-{trial}")
+        errors.append((sketch.count() - count) / count * 100)
+        classic_errors.append((classic_count(sketch) - count) / count * 100)
+    return errors, classic_errors
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(math.ceil(share * len(ordered))) - 1)]
+
+
+def describe(errors):
+    absolute = [abs(error) for error in errors]
+    return (f"mean {statistics.mean(errors):+5.2f}%  SD {statistics.pstdev(errors):4.2f}%  "
+            f"p95 {percentile(absolute, 0.95):4.2f}%  p99 {percentile(absolute, 0.99):4.2f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--trials", type=int, default=100, help="independent sketches per cardinality")
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print(f"HYPERLOGLOG BENCHMARK (p = {DEFAULT_PRECISION}, {args.trials} sketches per size)")
+    print("=" * 80)
+
+    failures = check_properties()
+    for failure in failures:
+        print(f"  ✗ {failure}")
+    if not failures:
+        print("  ✓ to_bytes/from_bytes round trip (sparse and dense), merge == union")
+    exact_share, worst = small_counts(args.trials)
+    print(f"  1-100 users: {exact_share * 100:.0f}% of counts exact, at most {worst} user(s) off")
+    print()
+
+    start = time.perf_counter()
+    worst_p95 = worst_p99 = 0.0
+    print(f"{'users':>7}  count() (Ertl){'':<38}classic")
+    for count in SIZES:
+        errors, classic_errors = measure(count, args.trials)
+        absolute = [abs(error) for error in errors]
+        if count >= 1000:
+            worst_p95 = max(worst_p95, percentile(absolute, 0.95))
+            worst_p99 = max(worst_p99, percentile(absolute, 0.99))
+        print(f"{count:>7}  {describe(errors)}   mean {statistics.mean(classic_errors):+5.2f}%  "
+              f"SD {statistics.pstdev(classic_errors):4.2f}%")
+
+    print()
+    print("=" * 80)
+    print(f"Asymptotic standard error 1.04 / sqrt(m): {1.04 / math.sqrt(1 << DEFAULT_PRECISION) * 100:.2f}%")
+    print(f"Worst p95 / p99 absolute error from 1,000 users: {worst_p95:.2f}% / {worst_p99:.2f}%")
+    print(f"Measured in {time.perf_counter() - start:.1f}s")
+    print("=" * 80)
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
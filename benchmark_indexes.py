@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Query-plan benchmark for the indexes declared in db_indexes.py.
+
+Seeds a local MongoDB with synthetic conversations, feedback, chat sessions,
+rollups, website sections, FAQs and accounts, ensures the declared indexes
+and runs the application's main queries (chat history, office and status
+pages, analytics time ranges, the rollup job's tail scan, the website
+sections $text search, FAQ / feedback / notification lists, logins) with
+``explain("executionStats")``. Each query reports its winning plan, keys and
+documents examined, documents returned and server time; any COLLSCAN is
+flagged and makes the script exit with status 1.
+
+Usage:
+    MONGODB_BENCH_URI=mongodb://localhost:27017 python benchmark_indexes.py [--messages 50000] [--no-indexes]
+
+--no-indexes drops every secondary index first, to see the plans the
+application gets on a database nobody has indexed. The benchmark database
+(chatbot_index_benchmark) is dropped and reseeded unless --reuse is given.
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import timedelta
+
+from pymongo import MongoClient
+
+from analytics_queries import time_match
+from benchmark_analytics import OFFICES, seed
+from conversation_rollups import ConversationRollups, utcnow
+from database import CONTEXT_COLLECTION_NAME, SAMPLE_CONTEXT_DOCUMENTS
+from db_indexes import INDEXES, ensure_indexes
+
+BENCH_DB = "chatbot_index_benchmark"
+
+
+def seed_extras(db, days):
+    """Everything but conversations / feedback (benchmark_analytics.seed)."""
+    rng = random.Random(11)
+    now = utcnow()
+    for name in ("chat_sessions", CONTEXT_COLLECTION_NAME, "faqs", "sub_faqs", "users", "sub_users"):
+        db[name].drop()
+
+    sessions = []
+    for user in db["conversations"].distinct("user"):
+        for _ in range(rng.randint(1, 4)):
+            start = now - timedelta(seconds=rng.randint(0, days * 86400))
+            sessions.append({"_id": f"{user}|{start.isoformat()}", "user": user, "start": start,
+                             "end": start + timedelta(seconds=rng.randint(0, 900)), "messages": rng.randint(2, 12),
+                             "offices": [rng.choice(OFFICES)]})
+    db["chat_sessions"].insert_many(sessions)
+
+    sections = []
+    for copy in range(50):
+        for document in SAMPLE_CONTEXT_DOCUMENTS:
+            sections.append({**document, "slug": f"{document['slug']}-{copy}"})
+    db[CONTEXT_COLLECTION_NAME].insert_many(sections)
+
+    for name in ("faqs", "sub_faqs"):
+        db[name].insert_many([
+            {"question": f"Question {i}", "answer": "synthetic", "office": rng.choice(OFFICES),
+             "created_at": now - timedelta(days=rng.randint(0, days)),
+             "updated_at": now - timedelta(days=rng.randint(0, days))}
+            for i in range(2000)
+        ])
+    db["users"].insert_many([{"email": f"admin{i}@example.com", "role": "admin", "is_active": True} for i in range(200)])
+    db["sub_users"].insert_many([
+        {"email": f"staff{i}@example.com", "office": rng.choice(OFFICES), "created_at": now - timedelta(days=i % days)}
+        for i in range(500)
+    ])
+
+
+def main_queries(db):
+    """(name, collection, command body) for the queries the app runs most."""
+    now = utcnow()
+    day_ago, hour_ago, week_ago = now - timedelta(days=1), now - timedelta(hours=1), now - timedelta(days=7)
+    office = OFFICES[0]
+    user = db["conversations"].find_one({}, {"user": 1})["user"]
+
+    def find(collection, filter, sort=None, limit=0):
+        body = {"find": collection, "filter": filter}
+        if sort:
+            body["sort"] = sort
+        if limit:
+            body["limit"] = limit
+        return body
+
+    def count(collection, filter):
+        return {"aggregate": collection, "cursor": {},
+                "pipeline": [{"$match": filter}, {"$group": {"_id": None, "n": {"$sum": 1}}}]}
+
+    return [
+        ("chat history", "conversations", find("conversations", {"user": user}, {"timestamp": -1}, 20)),
+        ("chat history (user_id)", "conversations", find("conversations", {"user_id": user}, {"timestamp": -1}, 20)),
+        ("office conversations", "conversations", find("conversations", {"office": office}, {"date": -1}, 100)),
+        ("office unresolved count", "conversations", count("conversations", {"office": office, "status": "unresolved"})),
+        ("unresolved notifications", "conversations",
+         find("conversations", {"status": {"$in": ["unresolved", "escalated"]}}, {"timestamp": -1}, 3)),
+        ("unresolved last 24h", "conversations",
+         count("conversations", {"status": {"$in": ["unresolved", "escalated"]}, "timestamp": {"$gte": day_ago}})),
+        ("usage spike last hour", "conversations", count("conversations", {"timestamp": {"$gte": hour_ago}})),
+        ("recent activity", "conversations", find("conversations", {}, {"date": -1}, 10)),
+        ("week range (time_match)", "conversations", count("conversations", time_match(week_ago, now))),
+        ("office week range", "conversations",
+         count("conversations", {"office": office, **time_match(week_ago, now)})),
+        ("rollup live tail", "conversations", count("conversations", {"logged_at": {"$gte": hour_ago}})),
+        ("office export", "conversations",
+         find("conversations", {"office": office, "timestamp": {"$gte": week_ago}}, {"timestamp": 1})),
+        ("rollup read", "conversation_rollups",
+         find("conversation_rollups", {"granularity": "day", "bucket": {"$gte": week_ago, "$lt": now}, "office": office})),
+        ("session assignment", "chat_sessions",
+         find("chat_sessions", {"user": {"$in": [user]}, "end": {"$gte": hour_ago}, "start": {"$lte": now}})),
+        ("office session stats", "chat_sessions",
+         count("chat_sessions", {"offices": office, "start": {"$gte": week_ago, "$lt": now}})),
+        ("website $text search", CONTEXT_COLLECTION_NAME,
+         find(CONTEXT_COLLECTION_NAME, {"$text": {"$search": "enrollment requirements"}}, limit=150)),
+        ("FAQ list", "faqs", find("faqs", {}, {"created_at": -1})),
+        ("recent FAQ activity", "faqs", find("faqs", {"updated_at": {"$gte": week_ago}}, {"updated_at": -1}, 10)),
+        ("sub-admin FAQ list", "sub_faqs", find("sub_faqs", {}, {"created_at": -1})),
+        ("feedback notifications", "feedback",
+         find("feedback", {"created_at": {"$gte": day_ago}}, {"created_at": -1}, 3)),
+        ("recent feedback", "feedback", find("feedback", {}, {"timestamp": -1}, 10)),
+        ("admin login", "users", find("users", {"email": "admin7@example.com"}, limit=1)),
+        ("sub-admin login", "sub_users", find("sub_users", {"email": "staff7@example.com"}, limit=1)),
+    ]
+
+
+def _find_key(value, key):
+    """Every value stored under ``key`` anywhere in an explain document."""
+    if isinstance(value, dict):
+        for name, item in value.items():
+            if name == key:
+                yield item
+            else:
+                yield from _find_key(item, key)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _find_key(item, key)
+
+
+def plan_stages(explain):
+    """Stage names of the winning plan(s), e.g. ['LIMIT', 'FETCH', 'IXSCAN']."""
+    stages = []
+    for plan in _find_key(explain, "winningPlan"):
+        stages.extend(stage for stage in _find_key(plan, "stage") if isinstance(stage, str))
+    return stages
+
+
+def execution_stats(explain):
+    stats = next(_find_key(explain, "executionStats"), {}) or {}
+    return {key: stats.get(key) for key in ("nReturned", "totalKeysExamined", "totalDocsExamined", "executionTimeMillis")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=50000)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--reuse", action="store_true", help="keep an already seeded benchmark database")
+    parser.add_argument("--no-indexes", action="store_true", help="drop all secondary indexes instead of ensuring them")
+    args = parser.parse_args()
+
+    uri = os.getenv("MONGODB_BENCH_URI", "mongodb://localhost:27017")
+    client = MongoClient(uri, serverSelectionTimeoutMS=5000)
+    client.admin.command("ping")
+    db = client[BENCH_DB]
+
+    if not (args.reuse and db["conversations"].estimated_document_count() == args.messages):
+        seed(db, args.messages, args.days)
+        seed_extras(db, args.days)
+        ConversationRollups(db).run_once()
+        print(f"Seeded {args.messages} messages over {args.days} days")
+
+    if args.no_indexes:
+        for name in sorted({spec.collection for spec in INDEXES}):
+            db[name].drop_indexes()
+        print("Dropped all secondary indexes")
+    else:
+        report = ensure_indexes(db)
+        print(f"Indexes: {len(report['created'])} created, {len(report['conflicts'])} conflict(s), "
+              f"{len(report['errors'])} error(s)")
+
+    print(f"\n{'query':<28} {'plan':<34} {'keys':>8} {'docs':>8} {'returned':>8} {'ms':>6}")
+    collscans = []
+    for name, collection, body in main_queries(db):
+        try:
+            explain = db.command("explain", body, verbosity="executionStats")
+        except Exception as exc:
+            print(f"{name:<28} ERROR {exc}")
+            collscans.append(name)
+            continue
+        stages = plan_stages(explain)
+        stats = execution_stats(explain)
+        flag = "  <-- COLLSCAN" if "COLLSCAN" in stages else ""
+        if flag:
+            collscans.append(name)
+        print(f"{name:<28} {' > '.join(stages)[:34]:<34} {stats['totalKeysExamined'] or 0:>8} "
+              f"{stats['totalDocsExamined'] or 0:>8} {stats['nReturned'] or 0:>8} "
+              f"{stats['executionTimeMillis'] or 0:>6}{flag}")
+
+    if collscans:
+        print(f"\n{len(collscans)} quer{'y' if len(collscans) == 1 else 'ies'} without a usable index: "
+              f"{', '.join(collscans)}")
+        sys.exit(1)
+    print("\nNo collection scans")
+
+
+if __name__ == "__main__":
+    main()
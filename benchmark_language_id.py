@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark for language_id.
+
+Compares the local English / Tagalog classifier against the previous
+keyword check + langdetect.detect path on a labelled sample of English,
+Tagalog and Taglish student messages: accuracy per group and time per call
+(langdetect's first call, which loads its profiles, is reported separately).
+
+Usage:
+    python benchmark_language_id.py
+"""
+
+import time
+
+import language_id
+
+# (message, expected language, group)
+SAMPLES = [
+    # English
+    ("What are the admission requirements?", "en", "english"),
+    ("How do I get my transcript of records?", "en", "english"),
+    ("When is the enrollment period for second semester?", "en", "english"),
+    ("Where is the registrar's office?", "en", "english"),
+    ("Who is the dean of the College of Computer Studies?", "en", "english"),
+    ("Can I pay my tuition in installments?", "en", "english"),
+    ("What scholarships are available for freshmen?", "en", "english"),
+    ("hello", "en", "english"),
+    ("thank you so much", "en", "english"),
+    ("good morning", "en", "english"),
+    ("I lost my school ID, what should I do?", "en", "english"),
+    ("Is there a library open on Saturdays?", "en", "english"),
+    ("How much is the graduation fee?", "en", "english"),
+    ("Where can I claim my certificate of grades?", "en", "english"),
+    ("What courses does TCC offer?", "en", "english"),
+    ("Can transferees apply this semester?", "en", "english"),
+    ("I need a good moral certificate", "en", "english"),
+    ("When does the entrance exam start?", "en", "english"),
+    ("How do I reset my student portal password?", "en", "english"),
+    ("Is the guidance counselor available today?", "en", "english"),
+    ("what is the mission and vision of the college", "en", "english"),
+    ("where is Tanauan City College located", "en", "english"),
+    ("announcements for this week", "en", "english"),
+    ("do you have a dress code", "en", "english"),
+    ("I want to request a copy of my diploma", "en", "english"),
+    ("any updates on the scholarship application deadline extension", "en", "english"),
+    ("who do I talk to about bullying", "en", "english"),
+    ("how many units can I take", "en", "english"),
+    ("ok thanks", "en", "english"),
+    ("bye", "en", "english"),
+    ("Can my parents pick up my documents for me?", "en", "english"),
+    ("Is there a clinic on campus?", "en", "english"),
+    ("How long does it take to process a TOR request?", "en", "english"),
+    ("what time does the cashier close", "en", "english"),
+    ("Are there any job openings for graduates?", "en", "english"),
+    ("What should I bring on enrollment day?", "en", "english"),
+    ("Is PE required for all students?", "en", "english"),
+    ("Tell me about the ICT office", "en", "english"),
+    ("My grades are not showing in the portal", "en", "english"),
+    ("Can I shift to another program?", "en", "english"),
+    # Tagalog
+    ("Ano ang mga kailangan para makapag-enroll?", "tl", "tagalog"),
+    ("Saan po ang opisina ng registrar?", "tl", "tagalog"),
+    ("Magkano ang matrikula ngayong semestre?", "tl", "tagalog"),
+    ("Kailan magsisimula ang klase?", "tl", "tagalog"),
+    ("Paano kumuha ng kopya ng aking marka?", "tl", "tagalog"),
+    ("Magandang umaga po", "tl", "tagalog"),
+    ("Salamat po sa tulong", "tl", "tagalog"),
+    ("Nawala ko yung ID ko, anong gagawin ko?", "tl", "tagalog"),
+    ("Bukas ba ang aklatan tuwing Sabado?", "tl", "tagalog"),
+    ("Sino ang dekano ng kolehiyo?", "tl", "tagalog"),
+    ("Kumusta ka", "tl", "tagalog"),
+    ("Nasaan ang tanggapan ng kahera?", "tl", "tagalog"),
+    ("Mayroon bang iskolarsip para sa mga bagong estudyante?", "tl", "tagalog"),
+    ("Hanggang kailan ang pagpapatala?", "tl", "tagalog"),
+    ("Gaano katagal bago makuha ang sertipiko?", "tl", "tagalog"),
+    ("Pakitulungan naman ako", "tl", "tagalog"),
+    ("Hindi ko alam kung saan pupunta", "tl", "tagalog"),
+    ("Kelan po yung pagsusulit?", "tl", "tagalog"),
+    ("Magkano po ang bayad sa graduation?", "tl", "tagalog"),
+    ("Anong oras bukas ang klinika?", "tl", "tagalog"),
+    ("Pwede bang ipasa bukas yung papeles?", "tl", "tagalog"),
+    ("Nakalimutan ko ang password ko", "tl", "tagalog"),
+    ("Maraming salamat", "tl", "tagalog"),
+    ("Sige po, paalam", "tl", "tagalog"),
+    ("Ilan ang kailangang yunit para makapagtapos?", "tl", "tagalog"),
+    ("Kailangan ko ng katibayan ng mabuting asal", "tl", "tagalog"),
+    ("Saan makikita ang iskedyul ng pagsusulit?", "tl", "tagalog"),
+    ("Bakit hindi lumalabas ang marka ko?", "tl", "tagalog"),
+    ("Tumatanggap ba kayo ng lumipat na mag-aaral?", "tl", "tagalog"),
+    ("Gusto kong lumipat ng kurso", "tl", "tagalog"),
+    ("magkano", "tl", "tagalog"),
+    ("kelan", "tl", "tagalog"),
+    ("nasaan", "tl", "tagalog"),
+    ("Mahal ba dito", "tl", "tagalog"),
+    ("Paalam", "tl", "tagalog"),
+    # Taglish
+    ("Pwede po ba mag-enroll online?", "tl", "taglish"),
+    ("Magkano tuition fee?", "tl", "taglish"),
+    ("Kelan yung deadline ng scholarship application?", "tl", "taglish"),
+    ("Saan ko makukuha yung TOR ko?", "tl", "taglish"),
+    ("requirements para sa transferee", "tl", "taglish"),
+    ("Need ko ng good moral certificate", "tl", "taglish"),
+    ("Open ba yung library bukas?", "tl", "taglish"),
+    ("paano mag reset ng password sa portal", "tl", "taglish"),
+    ("Anong oras open ang registrar?", "tl", "taglish"),
+    ("Ilan units pwede kong i-take?", "tl", "taglish"),
+    ("nag-apply ako for scholarship, ano next step?", "tl", "taglish"),
+    ("Kailan release ng grades?", "tl", "taglish"),
+    ("Wala pa yung grades ko sa portal", "tl", "taglish"),
+    ("Sino yung contact person for OJT?", "tl", "taglish"),
+    ("Magkano yung ID replacement?", "tl", "taglish"),
+    ("Pano mag-shift ng course?", "tl", "taglish"),
+    ("ok lang ba late enrollment", "tl", "taglish"),
+    ("thank you po", "tl", "taglish"),
+    ("Mag-iinquire lang about admission", "tl", "taglish"),
+    ("Tapos na ba yung enrollment?", "tl", "taglish"),
+]
+
+
+def legacy_detect(text: str) -> str:
+    """The keyword check + langdetect.detect path that language_id replaced."""
+    from langdetect import detect
+
+    words = text.lower().split()
+    if any(word in words for word in language_id.FILIPINO_KEYWORDS):
+        return "tl"
+    detected = detect(text)
+    return "tl" if detected in ("tl", "fil") else "en"
+
+
+def evaluate(name, detector, repeat=20):
+    per_group = {}
+    start = time.perf_counter()
+    results = [detector(text) for text, _, _ in SAMPLES]
+    first_pass = time.perf_counter() - start
+    for (text, expected, group), got in zip(SAMPLES, results):
+        correct, total = per_group.get(group, (0, 0))
+        per_group[group] = (correct + (got == expected), total + 1)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text, _, _ in SAMPLES:
+            detector(text)
+    per_call_us = (time.perf_counter() - start) / (repeat * len(SAMPLES)) * 1e6
+
+    correct = sum(c for c, _ in per_group.values())
+    print(f"\n{name}")
+    print(f"  accuracy: {correct}/{len(SAMPLES)} ({correct / len(SAMPLES):.1%})")
+    for group, (c, t) in per_group.items():
+        print(f"    {group:<8} {c}/{t}")
+    print(f"  first pass: {first_pass * 1000:.1f}ms for {len(SAMPLES)} messages")
+    print(f"  per call:   {per_call_us:.1f}µs")
+    return results
+
+
+def main():
+    start = time.perf_counter()
+    identifier = language_id.get_language_identifier()
+    print(f"Model ready in {(time.perf_counter() - start) * 1000:.1f}ms; {len(SAMPLES)} labelled messages")
+
+    local = evaluate("language_id (local n-gram)", identifier.detect)
+
+    try:
+        from langdetect import DetectorFactory
+
+        DetectorFactory.seed = 0
+    except ImportError:
+        print("\nlangdetect is not installed; skipping the comparison")
+        return
+    legacy = evaluate("keywords + langdetect", legacy_detect, repeat=3)
+
+    disagreements = [(text, expected, a, b) for (text, expected, _), a, b in zip(SAMPLES, local, legacy) if a != b]
+    if disagreements:
+        print("\nDisagreements (message / expected / local / langdetect):")
+        for text, expected, a, b in disagreements:
+            print(f"  {text!r:<60} {expected} {a} {b}")
+
+
+if __name__ == "__main__":
+    main()
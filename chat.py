@@ -6,26 +6,52 @@ import os
 import ssl
 import sys
 import pymongo
-import re
-from pathlib import Path
+import tempfile
+import threading
 from typing import Dict, Optional, Tuple, List
 from urllib.parse import urljoin
 
 import requests
-from bs4 import BeautifulSoup
 from dotenv import load_dotenv
 from model import NeuralNet, HybridChatModel
 from vector_store import VectorStore
-from nltk_utils import bag_of_words, tokenize, clean_text, enhanced_bag_of_words, fuzzy_match, expand_synonyms
+from nltk_utils import bag_of_words, tokenize, clean_text, enhanced_bag_of_words, expand_synonyms, PatternIndex
 from pymongo import MongoClient
-from pymongo.errors import ServerSelectionTimeoutError, ConnectionFailure
 from datetime import datetime, UTC, date
 import certifi
 import time
 from openai import OpenAI
 
 from database import get_context_collection, seed_sample_data
-from context_search import find_relevant_content, find_best_in_documents, rank_documents, score_document
+from context_search import (
+    BM25FIndex,
+    find_relevant_content,
+    find_best_in_documents,
+    get_section_index,
+    rank_documents,
+    score_document,
+)
+from template_corpus import (
+    LOCAL_TEMPLATE_SOURCES,
+    SITE_PAGE_MAX_CHARS,
+    build_page_index,
+    extract_visible_text,
+    load_template_corpus,
+)
+from page_cache import PagePrefetcher, SharedPageCache
+from context_store import create_context_store
+from conversation_logger import ConversationLogger
+from chat_sessions import SessionTracker
+from response_cache import response_cache
+from notifications_feed import notify_conversations, preview, publish as publish_notification
+from static_responses import (
+    CONTEXT_SWITCH_DEFAULT_CURRENT,
+    CONTEXT_SWITCH_DEFAULT_OFFICE,
+    CONTEXT_SWITCH_TEMPLATE,
+    DOMAIN_REFUSAL_MESSAGE,
+    FALLBACK_RESPONSES,
+    OFFICE_TAGS,
+)
 
 SYSTEM_PROMPT = """
 You are TCC Assistant, the official AI chatbot of Tanauan City College.
@@ -65,26 +91,6 @@ Thank you for reaching out! Please contact the relevant office for your specific
 Do not create your own version of this message. Use it exactly as provided above.
 """.strip()
 
-DOMAIN_REFUSAL_MESSAGE = (
-    "I'm sorry, but I can only assist with questions related to Tanauan City College (TCC).\n"
-    "For further assistance, you may reach out to the appropriate TCC office below:\n\n"
-    "📞 TCC Official\n"
-    "(043) 702 6979 / 📧 tanauancitycollege@gmail.com\n\n"
-    "🏛️ Office of Student Affairs (OSA)\n"
-    "0998 457 4389 / 📧 tanauancitycollege.osa@gmail.com\n\n"
-    "💻 MISU Office\n"
-    "0994 189 7696 / 📧 tanauancitycollege013@gmail.com\n\n"
-    "🗂️ Registrar’s Office\n"
-    "0981 349 1038 / 📧 tanauancitycollege.registrar@gmail.com\n\n"
-    "🎓 Iskolar ng Lungsod Council (ILC)\n"
-    "0971 745 6791 / 📧 iskolarnglungsodcouncil.tcc@gmail.com\n\n"
-    "📝 Admission Office\n"
-    "0956 641 9801 / 📧 tanauancitycollege.admission@gmail.com\n\n"
-    "💬 Guidance Office\n"
-    "0985 402 6745 / 📧 tanauancitycollege.guidance@gmail.com\n\n"
-    "Thank you for reaching out! Please contact the relevant office for your specific concern. 💚"
-)
-
 # Load environment variables
 load_dotenv()
 
@@ -144,6 +150,30 @@ else:
     sub_announcements_collection = None
     admin_announcements_collection = None
 
+
+def _reconnect_conversations():
+    """Re-create the MongoDB connection for the conversation logger; returns the collection or None."""
+    global mongo_client, db, conversations
+    client = create_mongo_connection()
+    if not client:
+        return None
+    mongo_client = client
+    db = mongo_client["chatbot_db"]
+    conversations = db["conversations"]
+    return conversations
+
+def _on_conversations_written(documents):
+    response_cache.note_documents("conversations", documents)
+    if conversations is not None:
+        notify_conversations(conversations.database, documents)
+
+# Message writes happen off the request thread, in batches
+conversation_logger = ConversationLogger(
+    lambda: conversations, name="chat", reconnect=_reconnect_conversations,
+    sessions=SessionTracker(),
+    on_written=_on_conversations_written,
+)
+
 # Load intents
 with open("intents.json", "r") as f:
     intents = json.load(f)
@@ -154,7 +184,13 @@ vector_store = VectorStore()
 # -------- Website Scraping Configuration --------
 SITE_BASE_URL = os.getenv("SITE_BASE_URL", "https://tanauancitycollege.edu.ph")
 SITE_PAGE_CACHE_TTL = int(os.getenv("SITE_PAGE_CACHE_TTL", "600"))  # seconds
-SITE_PAGE_MAX_CHARS = int(os.getenv("SITE_PAGE_MAX_CHARS", "20000"))
+SITE_PAGE_PREFETCH_INTERVAL = int(os.getenv("SITE_PAGE_PREFETCH_INTERVAL", "300"))  # seconds
+SITE_PAGE_PREFETCH_ENABLED = os.getenv("SITE_PAGE_PREFETCH_ENABLED", "true").lower() == "true"
+SITE_PAGE_CACHE_MAX_ENTRIES = int(os.getenv("SITE_PAGE_CACHE_MAX_ENTRIES", "64"))
+# Shared by all workers on the host; override to put it on a persistent volume.
+SITE_PAGE_CACHE_PATH = os.getenv(
+    "SITE_PAGE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "tcc_site_pages.sqlite3")
+)
 
 # Simple keyword-based routing to known public pages
 SITE_PAGE_CATALOG = [
@@ -214,27 +250,25 @@ SITE_LOCAL_PAGE_MAP = {
     "/tcc": "templates/tcc.html",
 }
 
-LOCAL_TEMPLATE_SOURCES = {
-    "base_template": {"path": "templates/base_template.html", "title": "Base Template"},
-    "home": {"path": "templates/home.html", "title": "Home"},
-    "admission": {"path": "templates/admission.html", "title": "Admission"},
-    "academics": {"path": "templates/academics.html", "title": "Academics"},
-    "community": {"path": "templates/community.html", "title": "Community"},
-    "tcc": {"path": "templates/tcc.html", "title": "This is TCC"},
-}
-
-PATH_TO_TEMPLATE_KEY = {meta["path"]: key for key, meta in LOCAL_TEMPLATE_SOURCES.items()}
-
 PATH_TO_TEMPLATE_KEY = {meta["path"]: key for key, meta in LOCAL_TEMPLATE_SOURCES.items()}
 
-_page_cache: Dict[str, Dict[str, object]] = {}
 _http_session = requests.Session()
+_page_cache = SharedPageCache(
+    SITE_PAGE_CACHE_PATH,
+    ttl=SITE_PAGE_CACHE_TTL,
+    max_entries=SITE_PAGE_CACHE_MAX_ENTRIES,
+    session=_http_session,
+    extract_text=extract_visible_text,
+    max_chars=SITE_PAGE_MAX_CHARS,
+    timeout=15,
+)
 _context_collection = None
 _context_seed_attempted = False
 LOCAL_TEMPLATE_DOCS: List[Dict[str, str]] = []
 LOCAL_TEMPLATE_CACHE: Dict[str, Dict[str, str]] = {}
 LOCAL_TEMPLATE_PAGE_DOCS: Dict[str, Dict[str, str]] = {}
-LOCAL_TEMPLATE_PAGE_DOCS: Dict[str, Dict[str, str]] = {}
+LOCAL_TEMPLATE_PAGE_INDEX: Dict[str, List[Dict[str, str]]] = {}
+LOCAL_TEMPLATE_INDEX = BM25FIndex()
 
 
 # Note: Announcements are now stored exclusively in MongoDB and Pinecone
@@ -288,28 +322,29 @@ def load_models_if_needed():
 # Eagerly load models at import time (disable lazy loading)
 model, hybrid_model, all_words, tags = load_models_if_needed()
 
-# Store conversation contexts for each user per office
-# Structure: user_contexts[user_id] = {
+# Store conversation contexts for each user per office (shared across workers, TTL + LRU bounded)
+# Record: {
 #     "current_office": "admission_office",  # Currently active office
+#     "pending_switch": "registrar_office",  # Office suggested to the user, awaiting confirmation
 #     "offices": {
-#         "admission_office": {...},  # Office-specific context data
-#         "registrar_office": {...},
+#         "admission_office": {"messages": [], "last_intent": None},  # Office-specific context data
 #         ...
 #     }
 # }
-user_contexts = {}
+context_store = create_context_store()
 
 # Office mapping for context switching
-office_tags = {
-    'admission_office': 'Admissions Office',
-    'registrar_office': "Registrar's Office",
-    'ict_office': 'ICT Office',
-    'guidance_office': 'Guidance Office',
-    'osa_office': 'Office of the Student Affairs (OSA)'
-}
+office_tags = OFFICE_TAGS
 
 # ---------- OpenAI Fallback Integration ----------
 _openai_client = None
+# Per-thread count of OpenAI completions, so a request can tell how many LLM calls it made
+_llm_calls = threading.local()
+
+
+def llm_calls_in_thread() -> int:
+    """Number of OpenAI completions requested so far on the current thread."""
+    return getattr(_llm_calls, "count", 0)
 
 def _get_openai_client():
     global _openai_client
@@ -348,6 +383,7 @@ def call_openai_with_prompt(
     if extra_messages:
         messages.extend(extra_messages)
 
+    _llm_calls.count = llm_calls_in_thread() + 1
     start_time = time.perf_counter()
     try:
         completion = client.chat.completions.create(
@@ -434,252 +470,97 @@ def _select_relevant_page(question: str) -> Optional[Dict[str, object]]:
         return None
 
 
-def _extract_visible_text(html: str) -> str:
-    """Extract visible text from HTML using BeautifulSoup."""
-    soup = BeautifulSoup(html, "html.parser")
-
-    for element in soup(["script", "style", "noscript", "svg"]):
-        element.decompose()
-
-    text_chunks = [chunk.strip() for chunk in soup.stripped_strings if chunk.strip()]
-    text = " ".join(text_chunks)
-    text = re.sub(r"\s+", " ", text)
-    return text
-
-
-def _get_cached_page(path: str) -> Optional[Dict[str, object]]:
-    """Retrieve cached page content if available and fresh."""
-    cached = _page_cache.get(path)
-    if not cached:
-        return None
-
-    age = time.time() - cached["timestamp"]
-    if age > SITE_PAGE_CACHE_TTL:
-        _page_cache.pop(path, None)
-        return None
-    return cached
-
-
-def _cache_page(path: str, data: Dict[str, object]) -> None:
-    """Store page data in cache."""
-    _page_cache[path] = {**data, "timestamp": time.time()}
+def _site_page_url(path: str) -> str:
+    return urljoin(SITE_BASE_URL.rstrip("/") + "/", path.lstrip("/"))
 
 
 def _fetch_page_text(path: str) -> Optional[Dict[str, object]]:
-    """Fetch and extract visible text for the given page path."""
+    """
+    Return the page record for the given path from the shared page cache.
+
+    The page prefetcher normally keeps catalog pages fresh in the background.
+    Entries older than SITE_PAGE_CACHE_TTL are still served while one refresh
+    runs in the background, and a page that is not cached yet (prefetching
+    disabled, or not run yet) is fetched live, falling back to the local
+    template text from the corpus snapshot.
+    """
     if not SITE_BASE_URL:
         return None
 
-    cached = _get_cached_page(path)
-    if cached:
-        return {**cached, "source": "cache"}
-
-    url = urljoin(SITE_BASE_URL.rstrip("/") + "/", path.lstrip("/"))
-    fetch_start = time.perf_counter()
-    page_data: Optional[Dict[str, object]] = None
-
-    try:
-        response = _http_session.get(url, timeout=15)
-        response.raise_for_status()
-    except Exception as exc:
-        print(f"[WebsiteQA] Failed to fetch {url}: {exc}")
-    else:
-        fetch_duration = time.perf_counter() - fetch_start
-        text = _extract_visible_text(response.text)
-        if text:
-            trimmed_text = text[:SITE_PAGE_MAX_CHARS]
-            page_data = {
-                "url": url,
-                "text": trimmed_text,
-                "fetch_duration": fetch_duration,
-                "source": "live",
-            }
-            print(
-                f"[WebsiteQA] Fetched {url} in {fetch_duration:.2f}s "
-                f"(length: {len(trimmed_text)} chars)"
-            )
-        else:
-            print(f"[WebsiteQA] No visible text found for {url}")
-
-    if not page_data:
-        local_data = _load_local_page_text(path)
-        if local_data:
-            _cache_page(path, local_data)
-        return local_data
-
-    _cache_page(path, page_data)
-    return page_data
+    return _page_cache.get_page(path, _site_page_url(path), fallback=lambda: _load_local_page_text(path))
 
 
 def _load_local_page_text(path: str) -> Optional[Dict[str, object]]:
-    """Fall back to local template files when live fetching fails."""
-    template_path = SITE_LOCAL_PAGE_MAP.get(path)
-    if not template_path:
+    """Fall back to the extracted local template text when the live page is unavailable."""
+    page_key = _get_page_key_for_route(path)
+    if not page_key:
         print(f"[WebsiteQA] No local template mapping for path {path}")
         return None
 
-    full_path = Path(__file__).resolve().parent / template_path
-    if not full_path.exists():
-        print(f"[WebsiteQA] Local template not found: {full_path}")
-        return None
-
-    try:
-        html = full_path.read_text(encoding="utf-8")
-    except Exception as exc:
-        print(f"[WebsiteQA] Failed to read local template {full_path}: {exc}")
-        return None
-
-    text = _extract_visible_text(html)
-    if not text:
-        print(f"[WebsiteQA] No visible text extracted from local template {full_path}")
+    if not LOCAL_TEMPLATE_PAGE_DOCS:
+        _load_local_template_contexts()
+    doc = LOCAL_TEMPLATE_PAGE_DOCS.get(page_key)
+    if not doc or not doc.get("content"):
+        print(f"[WebsiteQA] No local template text for path {path}")
         return None
 
-    trimmed_text = text[:SITE_PAGE_MAX_CHARS]
-    print(f"[WebsiteQA] Using local template for path {path} ({full_path})")
+    print(f"[WebsiteQA] Using local template for path {path} ({doc.get('path')})")
     return {
         "url": f"local://{path.lstrip('/') or 'home'}",
-        "text": trimmed_text,
+        "text": doc["content"][:SITE_PAGE_MAX_CHARS],
         "fetch_duration": 0.0,
         "source": "local-template",
     }
 
 
-def _split_template_sections(html: str, base_title: str, page_key: str) -> List[Dict[str, str]]:
-    """
-    Enhanced section splitting with better content extraction.
-    Now extracts more granular sections including paragraphs, lists, and structured content.
-    """
-    soup = BeautifulSoup(html, "html.parser")
-    heading_tags = ["h1", "h2", "h3", "h4", "h5"]
-    sections: List[Dict[str, str]] = []
-
-    headings = soup.find_all(heading_tags)
-    if not headings:
-        # If no headings, try to extract by paragraphs or divs with class/id
-        paragraphs = soup.find_all(["p", "div"], class_=lambda x: x and any(
-            keyword in str(x).lower() for keyword in ["content", "section", "info", "detail"]
-        ))
-        if paragraphs:
-            for idx, para in enumerate(paragraphs[:10]):  # Limit to 10 sections
-                text = para.get_text(separator=" ", strip=True)
-                if text and len(text) > 40:
-                    sections.append({
-                        "slug": f"local-{page_key}-para-{idx+1}",
-                        "title": f"{base_title} - Content Section {idx+1}",
-                        "page": page_key,
-                        "content": text[:SITE_PAGE_MAX_CHARS],
-                        "tags": [page_key, "content"],
-                        "source": "local-template-section",
-                    })
-        return sections
-
-    for idx, heading in enumerate(headings):
-        section_title = heading.get_text(separator=" ", strip=True) or f"{base_title} Section {idx + 1}"
-        collected_parts: List[str] = [section_title]
-
-        # Enhanced content collection - get all content until next heading
-        current = heading.next_sibling
-        while current:
-            if getattr(current, "name", None) in heading_tags:
-                break
-            
-            # Extract text from various elements
-            if isinstance(current, str):
-                text = current.strip()
-                if text:
-                    collected_parts.append(text)
-            else:
-                # Get text from element, including lists
-                if current.name in ["p", "div", "span", "li"]:
-                    text = current.get_text(separator=" ", strip=True)
-                    if text:
-                        collected_parts.append(text)
-                elif current.name in ["ul", "ol"]:
-                    # Extract list items
-                    list_items = current.find_all("li")
-                    for li in list_items:
-                        li_text = li.get_text(separator=" ", strip=True)
-                        if li_text:
-                            collected_parts.append(f"• {li_text}")
-            
-            current = current.next_sibling
-
-        section_text = " ".join(collected_parts).strip()
-        if not section_text or len(section_text) < 40:
-            continue
-
-        # Extract additional tags from heading classes/ids
-        heading_classes = heading.get("class", [])
-        heading_id = heading.get("id", "")
-        tags = [page_key, section_title.lower()]
-        if heading_classes:
-            tags.extend([str(cls).lower() for cls in heading_classes[:2]])
-        if heading_id:
-            tags.append(heading_id.lower())
-
-        sections.append(
-            {
-                "slug": f"local-{page_key}-section-{idx+1}",
-                "title": f"{base_title} - {section_title}",
-                "page": page_key,
-                "content": section_text[:SITE_PAGE_MAX_CHARS],
-                "tags": tags,
-                "source": "local-template-section",
-            }
-        )
-
-    return sections
-
+_site_page_prefetcher = PagePrefetcher(
+    _page_cache,
+    {entry["path"]: _site_page_url(entry["path"]) for entry in SITE_PAGE_CATALOG} if SITE_BASE_URL else {},
+    interval=SITE_PAGE_PREFETCH_INTERVAL,
+    fallback=_load_local_page_text,
+)
 
-def _load_local_template_contexts() -> None:
-    """Load static template files into in-memory documents for manual search."""
-    global LOCAL_TEMPLATE_DOCS, LOCAL_TEMPLATE_CACHE, LOCAL_TEMPLATE_PAGE_DOCS
-    LOCAL_TEMPLATE_DOCS = []
-    LOCAL_TEMPLATE_CACHE = {}
-    LOCAL_TEMPLATE_PAGE_DOCS = {}
-    base_dir = Path(__file__).resolve().parent
-
-    for key, meta in LOCAL_TEMPLATE_SOURCES.items():
-        rel_path = meta.get("path")
-        if not rel_path:
-            continue
 
-        full_path = base_dir / rel_path
-        if not full_path.exists():
-            print(f"[LocalContext] Template not found: {full_path}")
-            continue
+def start_site_page_prefetcher() -> bool:
+    """Start the background catalog page refresher (called once per worker at app startup)."""
+    if not SITE_BASE_URL or not SITE_PAGE_PREFETCH_ENABLED:
+        if SITE_BASE_URL:
+            print("[WebsiteQA] Page prefetching disabled; pages are fetched on first use and refreshed "
+                  f"after {SITE_PAGE_CACHE_TTL}s")
+        return False
+    return _site_page_prefetcher.start()
 
-        try:
-            html = full_path.read_text(encoding="utf-8")
-        except Exception as exc:
-            print(f"[LocalContext] Failed to read template {full_path}: {exc}")
-            continue
 
-        text = _extract_visible_text(html)
-        if not text:
-            print(f"[LocalContext] No visible text extracted from {full_path}")
-            continue
+def get_site_page_status() -> Dict[str, object]:
+    """Prefetch timings and per-page content freshness for health reporting."""
+    return {
+        **_site_page_prefetcher.status(),
+        "prefetch_enabled": bool(SITE_BASE_URL) and SITE_PAGE_PREFETCH_ENABLED,
+        "cache_ttl_seconds": SITE_PAGE_CACHE_TTL,
+        "cache": dict(_page_cache.metrics),
+    }
 
-        trimmed_text = text[:SITE_PAGE_MAX_CHARS]
-        doc = {
-            "slug": f"local-{key}",
-            "title": meta.get("title", key.replace("_", " ").title()),
-            "page": key,
-            "content": trimmed_text,
-            "tags": [key],
-            "source": "local-template",
-            "path": str(full_path),
-        }
-        LOCAL_TEMPLATE_DOCS.append(doc)
-        LOCAL_TEMPLATE_CACHE[doc["slug"]] = doc
-        LOCAL_TEMPLATE_PAGE_DOCS[key] = doc.copy()
 
-        sections = _split_template_sections(html, doc["title"], key)
-        LOCAL_TEMPLATE_DOCS.extend(sections)
-        for section in sections:
-            LOCAL_TEMPLATE_CACHE[section["slug"]] = section
+def _load_local_template_contexts() -> None:
+    """Load static template documents (from the prebuilt snapshot when fresh) for manual search."""
+    global LOCAL_TEMPLATE_DOCS, LOCAL_TEMPLATE_CACHE, LOCAL_TEMPLATE_PAGE_DOCS, LOCAL_TEMPLATE_PAGE_INDEX
+    global LOCAL_TEMPLATE_INDEX
+    documents, stats = load_template_corpus(LOCAL_TEMPLATE_SOURCES)
+
+    LOCAL_TEMPLATE_DOCS = documents
+    LOCAL_TEMPLATE_CACHE = {doc["slug"]: doc for doc in documents}
+    LOCAL_TEMPLATE_PAGE_INDEX = build_page_index(documents)
+    LOCAL_TEMPLATE_PAGE_DOCS = {
+        doc["page"]: doc.copy() for doc in documents if doc.get("source") == "local-template"
+    }
+    LOCAL_TEMPLATE_INDEX = BM25FIndex()
+    LOCAL_TEMPLATE_INDEX.upsert_many(documents)
 
-    print(f"[LocalContext] Loaded {len(LOCAL_TEMPLATE_DOCS)} local template document(s).")
+    print(
+        f"[LocalContext] Loaded {len(LOCAL_TEMPLATE_DOCS)} local template document(s) "
+        f"in {stats['load_seconds']:.3f}s ({stats['templates_reused']} from snapshot, "
+        f"{stats['templates_parsed']} parsed; saved {stats['parse_seconds_saved']:.3f}s of parsing)."
+    )
 
 
 _load_local_template_contexts()
@@ -698,16 +579,7 @@ def _get_documents_for_page(page_key: Optional[str]) -> List[Dict[str, str]]:
     if not LOCAL_TEMPLATE_DOCS:
         _load_local_template_contexts()
 
-    documents: List[Dict[str, str]] = []
-    base_doc = LOCAL_TEMPLATE_PAGE_DOCS.get(page_key)
-    if base_doc:
-        documents.append(base_doc)
-
-    for doc in LOCAL_TEMPLATE_DOCS:
-        if doc.get("page") == page_key:
-            if base_doc and doc.get("slug") == base_doc.get("slug"):
-                continue
-            documents.append(doc)
+    documents = LOCAL_TEMPLATE_PAGE_INDEX.get(page_key, [])
     return documents[:5]
 
 
@@ -732,7 +604,7 @@ def _get_manual_context_collection():
 
     _ensure_context_collection_seeded()
     collection = get_context_collection()
-    if not collection:
+    if collection is None:
         print("[ContextSearch] Context collection unavailable; skipping manual injection.")
         return None
 
@@ -750,7 +622,7 @@ def generate_manual_context_answer(user_message: str, user_id: str = "guest") ->
     
     # Search MongoDB with improved scoring
     all_candidates: List[Tuple[Dict[str, str], float]] = []
-    if collection:
+    if collection is not None:
         try:
             # Try to find multiple relevant documents, not just one
             match = find_relevant_content(user_message, collection, minimum_score=0.08)
@@ -762,7 +634,19 @@ def generate_manual_context_answer(user_message: str, user_id: str = "guest") ->
                     try:
                         best_doc = match[0]
                         page = best_doc.get("page", "")
-                        if page:
+                        section_index = get_section_index(collection)
+                        if page and section_index is not None:
+                            # Find related documents from same page
+                            all_candidates.extend(
+                                section_index.search(
+                                    user_message,
+                                    minimum_score=0.08,
+                                    top_k=3,
+                                    page=page,
+                                    exclude=[best_doc.get("slug", "")],
+                                )
+                            )
+                        elif page:
                             # Find related documents from same page
                             related_docs = collection.find(
                                 {"page": page, "slug": {"$ne": best_doc.get("slug", "")}},
@@ -787,6 +671,7 @@ def generate_manual_context_answer(user_message: str, user_id: str = "guest") ->
             LOCAL_TEMPLATE_DOCS,
             minimum_score=max(0.08, LOCAL_TEMPLATE_MIN_SCORE),  # Use higher of the two
             top_k=7,  # Increased to get more context
+            index=LOCAL_TEMPLATE_INDEX,
         )
         all_candidates.extend(local_results)
     except Exception as e:
@@ -967,6 +852,7 @@ def answer_from_local_templates(question: str, user_id: str = "guest") -> Option
         LOCAL_TEMPLATE_DOCS,
         minimum_score=max(0.08, LOCAL_TEMPLATE_MIN_SCORE),  # Use higher threshold
         top_k=7,  # Increased for more context
+        index=LOCAL_TEMPLATE_INDEX,
     )
 
     if ranked and ranked[0][1] >= max(0.08, LOCAL_TEMPLATE_MIN_SCORE):
@@ -1104,18 +990,11 @@ def get_tcc_guarded_response(user_message: str, user_id: str = "guest") -> str:
 
 def get_user_current_office(user_id):
     """Get the current office context for a user"""
-    if user_id not in user_contexts:
-        return None
-    return user_contexts[user_id].get("current_office")
+    return context_store.get_current_office(user_id)
 
 def set_user_current_office(user_id, office_tag):
-    """Set the current office context for a user"""
-    if user_id not in user_contexts:
-        user_contexts[user_id] = {"current_office": None, "offices": {}}
-    user_contexts[user_id]["current_office"] = office_tag
-    # Initialize office context if not exists
-    if office_tag and office_tag not in user_contexts[user_id]["offices"]:
-        user_contexts[user_id]["offices"][office_tag] = {"messages": [], "last_intent": None}
+    """Set the current office context for a user (initialising that office's context if needed)"""
+    context_store.set_current_office(user_id, office_tag)
 
 def detect_office_from_message(msg):
     """
@@ -1200,11 +1079,9 @@ def detect_office_from_message(msg):
     return None
 
 def save_message(user_id, sender, message, detected_office=None):
-    """Save message to MongoDB with error handling and office detection"""
-    global mongo_client, db, conversations
-    
-    if conversations is None:
-        print("MongoDB not available. Message not saved to database.")
+    """Queue message for MongoDB (write-behind) with office detection; returns False if it was dropped"""
+    if conversations is None and not os.getenv("MONGODB_URI"):
+        print("MongoDB not configured. Message not saved to database.")
         return False
     
     # Determine office based on context or detection
@@ -1230,50 +1107,20 @@ def save_message(user_id, sender, message, detected_office=None):
     if not office:
         office = "General"
     
-    max_retries = 3
-    retry_count = 0
-    
-    while retry_count < max_retries:
-        try:
-            # Use UTC datetime for accurate timestamp
-            timestamp = datetime.now(UTC)
-            # Create document with office field and proper UTC timestamp
-            document = {
-                "user": user_id,
-                "sender": sender,
-                "message": message,
-                "office": office,
-                "timestamp": timestamp,  # UTC datetime object
-                "date": timestamp.isoformat()  # ISO string for backward compatibility
-            }
-            
-            conversations.insert_one(document)
-            return True
-            
-        except (ServerSelectionTimeoutError, ConnectionFailure) as e:
-            retry_count += 1
-            print(f"MongoDB connection error (attempt {retry_count}/{max_retries}): {e}")
-            
-            if retry_count < max_retries:
-                print("Retrying in 2 seconds...")
-                time.sleep(2)
-                
-                # Try to reconnect
-                mongo_client = create_mongo_connection()
-                if mongo_client:
-                    db = mongo_client["chatbot_db"]
-                    conversations = db["conversations"]
-                else:
-                    break
-            else:
-                print("Failed to save message after all retries")
-                return False
-                
-        except Exception as e:
-            print(f"Unexpected error saving message: {e}")
-            return False
+    # Use UTC datetime for accurate timestamp
+    timestamp = datetime.now(UTC)
+    # Create document with office field and proper UTC timestamp
+    document = {
+        "user": user_id,
+        "sender": sender,
+        "message": message,
+        "office": office,
+        "timestamp": timestamp,  # UTC datetime object
+        "date": timestamp.isoformat()  # ISO string for backward compatibility
+    }
     
-    return False
+    # Written in batches by the background logger (reconnects and spills to disk if MongoDB is down)
+    return conversation_logger.log(document)
 
 def _maybe_save(user_id, sender, message, detected_office=None, save=True):
     if save:
@@ -1458,10 +1305,10 @@ def search_announcements_with_vector(query):
 
 def get_context_switch_response(current_context, requested_office, user_id):
     """Generate context switch response"""
-    office_name = office_tags.get(requested_office, "that office")
-    current_office_name = office_tags.get(current_context, "the current topic")
+    office_name = office_tags.get(requested_office, CONTEXT_SWITCH_DEFAULT_OFFICE)
+    current_office_name = office_tags.get(current_context, CONTEXT_SWITCH_DEFAULT_CURRENT)
     
-    response = f"I think you might be asking about the {office_name}. Right now, I can only assist you with {current_office_name} concerns. Would you like me to connect you to the {office_name} information instead?"
+    response = CONTEXT_SWITCH_TEMPLATE.format(office_name=office_name, current_office_name=current_office_name)
     
     return response
 
@@ -1539,25 +1386,50 @@ def get_fallback_response(msg, user_id="guest"):
     
     # Simple keyword matching
     if any(word in msg_lower for word in ["hello", "hi", "hey", "good morning", "good afternoon"]):
-        return "Hello! Welcome to TCC Assistant. How can I help you today?"
+        return FALLBACK_RESPONSES["greeting"]
     elif any(word in msg_lower for word in ["help", "assist", "support"]):
-        return "I'm here to help! You can ask me about admissions, registrar services, ICT support, guidance, or student affairs."
+        return FALLBACK_RESPONSES["help"]
     elif any(word in msg_lower for word in ["admission", "apply", "enroll"]):
-        return "For admission inquiries, please contact the Admissions Office. They can help with requirements and application procedures."
+        return FALLBACK_RESPONSES["admission"]
     elif any(word in msg_lower for word in ["registrar", "transcript", "grades"]):
-        return "The Registrar's Office handles academic records and transcripts. Please visit them for document requests."
+        return FALLBACK_RESPONSES["registrar"]
     elif any(word in msg_lower for word in ["ict", "password", "login", "portal"]):
-        return "For ICT support and password issues, please contact the ICT Office. They can help with student portal access."
+        return FALLBACK_RESPONSES["ict"]
     elif any(word in msg_lower for word in ["guidance", "counseling", "scholarship"]):
-        return "The Guidance Office provides counseling services and scholarship information. Visit them for career guidance."
+        return FALLBACK_RESPONSES["guidance"]
     elif any(word in msg_lower for word in ["osa", "student affairs", "clubs", "activities"]):
-        return "The Office of Student Affairs manages student activities and clubs. Contact them for organization information."
+        return FALLBACK_RESPONSES["osa"]
     elif any(word in msg_lower for word in ["thank", "thanks", "salamat"]):
-        return "You're welcome! Feel free to ask if you need more help."
+        return FALLBACK_RESPONSES["thanks"]
     elif any(word in msg_lower for word in ["bye", "goodbye", "see you"]):
-        return "Goodbye! Have a great day!"
+        return FALLBACK_RESPONSES["goodbye"]
+    else:
+        return FALLBACK_RESPONSES["default"]
+
+# Fuzzy fallback indexes, built on first use: None -> all patterns, tag -> that intent's patterns
+_pattern_indexes: Dict[Optional[str], PatternIndex] = {}
+
+def _get_pattern_index(tag: Optional[str] = None) -> Optional[PatternIndex]:
+    """Return the cached PatternIndex for one intent tag, or for every pattern when tag is None."""
+    pattern_index = _pattern_indexes.get(tag)
+    if pattern_index is not None:
+        return pattern_index
+
+    if tag is None:
+        patterns = [pattern for intent in intents["intents"] for pattern in intent["patterns"]]
     else:
-        return "I'm TCC Assistant! I can help you with information about admissions, registrar services, ICT support, guidance, and student affairs. What would you like to know?"
+        patterns = next((intent["patterns"] for intent in intents["intents"] if intent["tag"] == tag), [])
+    if not patterns:
+        return None
+
+    build_start = time.perf_counter()
+    pattern_index = PatternIndex(patterns)
+    _pattern_indexes[tag] = pattern_index
+    print(
+        f"[FuzzyFallback] Indexed {len(pattern_index)} pattern(s) for {tag or 'all intents'} "
+        f"in {time.perf_counter() - build_start:.2f}s"
+    )
+    return pattern_index
 
 def get_response(msg, user_id="guest", save_messages=True):
     """
@@ -1819,14 +1691,9 @@ def get_response(msg, user_id="guest", save_messages=True):
         office_name = office_tags[current_context]
         
         # Try fuzzy matching with current context patterns
-        context_patterns = []
-        for intent in intents["intents"]:
-            if intent["tag"] == current_context:
-                context_patterns.extend(intent["patterns"])
-                break
-        
-        if context_patterns:
-            fuzzy_matches = fuzzy_match(cleaned_msg, context_patterns, threshold=0.4)
+        context_index = _get_pattern_index(current_context)
+        if context_index:
+            fuzzy_matches = context_index.match(cleaned_msg, threshold=0.4)
             if fuzzy_matches:
                 best_match = fuzzy_matches[0]
                 print(f"Fuzzy match found: {best_match[0]} (similarity: {best_match[1]:.3f})")
@@ -1838,11 +1705,7 @@ def get_response(msg, user_id="guest", save_messages=True):
         _maybe_save(user_id, "bot", bot_response, current_context, save=save_messages)
     else:
         # Try fuzzy matching across all patterns
-        all_patterns = []
-        for intent in intents["intents"]:
-            all_patterns.extend(intent["patterns"])
-        
-        fuzzy_matches = fuzzy_match(cleaned_msg, all_patterns, threshold=0.3)
+        fuzzy_matches = _get_pattern_index().match(cleaned_msg, threshold=0.3)
         if fuzzy_matches:
             best_match = fuzzy_matches[0]
             print(f"Global fuzzy match found: {best_match[0]} (similarity: {best_match[1]:.3f})")
@@ -1865,48 +1728,34 @@ def reset_user_context(user_id, office=None):
                 If provided, only resets that office's context.
                 If None, resets all contexts for the user.
     """
-    if user_id not in user_contexts:
+    current_context = context_store.get(user_id)
+    if current_context is None:
         print(f"🔄 No context found for user '{user_id}' - nothing to reset")
         return
     
     # Get current context info for logging
-    current_context = user_contexts[user_id]
-    print(f"🔍 Context before reset: {current_context}")
+    print(f"🔍 Context before reset: {current_context.to_dict()}")
     
     if office:
         # ✅ Reset only the specified office's context
-        if isinstance(user_contexts[user_id], dict):
-            # Check if this is the current office
-            current_office = user_contexts[user_id].get("current_office")
-            if current_office == office:
-                # Clear the current office
-                user_contexts[user_id]["current_office"] = None
-                print(f"✅ Reset context for user '{user_id}' - Office: {office_tags.get(office, office)} (cleared current office)")
-            else:
-                print(f"⚠️ Office '{office}' is not the current office (current: {current_office})")
-            
-            # Also clear from offices dict if it exists
-            if "offices" in user_contexts[user_id] and office in user_contexts[user_id]["offices"]:
-                user_contexts[user_id]["offices"][office] = {"messages": [], "last_intent": None}
-                print(f"✅ Cleared office data for: {office_tags.get(office, office)}")
+        current_office = current_context.current_office
+        had_office_data = office in current_context.offices
+        context_store.reset_office(user_id, office)
+        if current_office == office:
+            print(f"✅ Reset context for user '{user_id}' - Office: {office_tags.get(office, office)} (cleared current office)")
         else:
-            # Old format: string - just clear it if it matches
-            if user_contexts[user_id] == office:
-                user_contexts.pop(user_id, None)
-                print(f"✅ Reset context for user '{user_id}' - Office: {office_tags.get(office, office)}")
+            print(f"⚠️ Office '{office}' is not the current office (current: {current_office})")
+        if had_office_data:
+            print(f"✅ Cleared office data for: {office_tags.get(office, office)}")
     else:
         # ✅ Reset ALL contexts for the user
-        if isinstance(user_contexts[user_id], dict):
-            current_office = user_contexts[user_id].get("current_office")
-            office_count = len(user_contexts[user_id].get("offices", {}))
-            user_contexts.pop(user_id, None)
-            print(f"✅ Reset ALL contexts for user '{user_id}' (cleared {office_count} office contexts, last office: {current_office})")
-        else:
-            # Old format
-            user_contexts.pop(user_id, None)
-            print(f"✅ Reset context for user '{user_id}'")
+        context_store.delete(user_id)
+        print(
+            f"✅ Reset ALL contexts for user '{user_id}' (cleared {len(current_context.offices)} office contexts, "
+            f"last office: {current_context.current_office})"
+        )
     
-    print(f"🔍 Context after reset: {user_contexts.get(user_id, 'Removed from dictionary')}")
+    print(f"🔍 Context after reset: {context_store.snapshot(user_id) or 'Removed from store'}")
 
 def get_announcement_by_id(announcement_id):
     """Get a specific announcement by ID from MongoDB"""
@@ -1952,6 +1801,8 @@ def add_announcement(title, date, message, priority="medium", category="general"
         if admin_announcements_collection is not None:
             result = admin_announcements_collection.insert_one(announcement_doc)
             announcement_id = str(result.inserted_id)
+            publish_notification(db, "announcement", "New announcement", preview(title, "New announcement"),
+                                 office=category, admin=False, ref_id=result.inserted_id)
             
             # Create embedding text for Pinecone
             embed_text = f"Title: {title}\nDescription: {message}\nOffice: {category}\nPriority: {priority}\nDate: {date}"
@@ -0,0 +1,411 @@
+"""
+chat_sessions.py
+----------------
+Chat sessions maintained at write time.
+
+A session is one user's run of messages with no gap longer than
+``CHAT_SESSION_GAP_SECONDS`` (30 minutes by default). When ConversationLogger
+writes a batch, ``SessionTracker.assign`` gives every message a ``session_id``
+(extending the user's session if the message falls within the gap of it,
+opening a new one otherwise) and, once the batch is inserted,
+``SessionTracker.record`` upserts one ``chat_sessions`` document per touched
+session::
+
+    {_id, user, start, end, messages, user_messages, bot_messages,
+     offices: [...], final_status: {at, value}, language: {at, value}}
+
+The upserts only use ``$min`` / ``$max`` / ``$inc`` / ``$addToSet``, so batches
+from several workers (or replayed spill files) can land in any order;
+``final_status`` and ``language`` keep the value of the latest message that
+had one. Two workers opening a session for the same user at the same moment
+can still produce two sessions, and a late message that bridges two sessions
+extends one of them rather than merging them.
+
+Messages are written with ``session_pending: true`` and ``record`` clears the
+flag once their session is counted, so a batch whose ``record`` failed (or
+whose worker died in between) stays marked. The backfill picks up those rows
+together with the ones that have no ``session_id`` (logged before sessions
+existed, or written around the logger) and ``rebuild``s their sessions from
+the messages, which is idempotent: an interrupted backfill is simply run
+again. ``SessionBackfillScheduler`` runs it in the app, in one worker at a
+time (a lease in ``migrations``), at start-up and every
+``CHAT_SESSION_BACKFILL_INTERVAL`` seconds; ``python chat_sessions.py
+--backfill`` does the same by hand. Until the first backfill has finished,
+session metrics for older ranges are incomplete.
+
+``session_stats`` answers the analytics pages (session count, durations,
+messages per session) with one aggregation over ``chat_sessions``.
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from db_indexes import ensure_indexes
+
+CHAT_SESSION_GAP_SECONDS = float(os.getenv("CHAT_SESSION_GAP_SECONDS", "1800"))
+# Seconds between backfill runs in each worker (only the lease holder does work)
+CHAT_SESSION_BACKFILL_INTERVAL = float(os.getenv("CHAT_SESSION_BACKFILL_INTERVAL", "600"))
+# A backfill lease not renewed for this long is taken over by another worker
+CHAT_SESSION_BACKFILL_LEASE_SECONDS = float(os.getenv("CHAT_SESSION_BACKFILL_LEASE_SECONDS", "300"))
+SESSIONS_COLLECTION = "chat_sessions"
+# Backfill state and lease, next to migrate_timestamps.py's
+MIGRATIONS_COLLECTION = "migrations"
+BACKFILL_ID = "chat_sessions_backfill"
+# Rows whose session still has to be (re)counted; NEEDS_SESSION adds the never-sessionised ones
+PENDING_SESSION = {"session_pending": True}
+NEEDS_SESSION = {"$or": [{"session_id": {"$exists": False}}, PENDING_SESSION]}
+_MESSAGE_FIELDS = {"user": 1, "sender": 1, "office": 1, "status": 1, "language": 1, "timestamp": 1, "date": 1,
+                   "session_id": 1}
+
+_indexed = set()
+_indexed_lock = threading.Lock()
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def message_time(document: Dict[str, object]) -> Optional[datetime]:
+    """The message's UTC time from ``timestamp``, or ``date`` (datetime or ISO string) for older rows."""
+    value = document.get("timestamp") or document.get("date")
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return None
+    return _naive_utc(value) if isinstance(value, datetime) else None
+
+
+def sessions_collection(conversations):
+    """The ``chat_sessions`` collection next to a conversations collection (indexes, see db_indexes.py, ensured once per database)."""
+    collection = conversations.database[SESSIONS_COLLECTION]
+    key = id(conversations.database)
+    if key not in _indexed:
+        with _indexed_lock:
+            if key not in _indexed:
+                ensure_indexes(conversations.database, [SESSIONS_COLLECTION])
+                _indexed.add(key)
+    return collection
+
+
+class SessionTracker:
+    """Assigns ``session_id``s to message batches and keeps ``chat_sessions`` up to date."""
+
+    def __init__(self, gap_seconds: float = CHAT_SESSION_GAP_SECONDS) -> None:
+        self.gap = timedelta(seconds=gap_seconds)
+        self.assigned = 0
+        self.opened = 0
+        self.recorded = 0
+        self.rebuilt = 0
+
+    def assign(self, conversations, documents: List[Dict[str, object]]) -> None:
+        """Set ``session_id`` (and ``session_pending``) on the documents that have none (one ``find`` for the whole batch)."""
+        by_user: Dict[str, List[tuple]] = defaultdict(list)
+        for document in documents:
+            if "session_id" in document or document.get("user") is None:
+                continue
+            sent_at = message_time(document)
+            if sent_at is not None:
+                by_user[document["user"]].append((sent_at, document))
+        if not by_user:
+            return
+
+        times = [sent_at for messages in by_user.values() for sent_at, _ in messages]
+        spans: Dict[str, List[list]] = defaultdict(list)
+        for session in sessions_collection(conversations).find(
+            {"user": {"$in": list(by_user)}, "end": {"$gte": min(times) - self.gap}, "start": {"$lte": max(times) + self.gap}},
+            {"user": 1, "start": 1, "end": 1},
+        ):
+            spans[session["user"]].append([session["_id"], _naive_utc(session["start"]), _naive_utc(session["end"])])
+
+        for user, messages in by_user.items():
+            messages.sort(key=lambda item: item[0])
+            user_spans = spans[user]
+            for sent_at, document in messages:
+                nearby = [span for span in user_spans if span[1] - self.gap <= sent_at <= span[2] + self.gap]
+                if nearby:
+                    span = max(nearby, key=lambda item: item[2])
+                    span[1], span[2] = min(span[1], sent_at), max(span[2], sent_at)
+                else:
+                    span = [f"{user}|{sent_at.isoformat()}", sent_at, sent_at]
+                    user_spans.append(span)
+                    self.opened += 1
+                document["session_id"] = span[0]
+                document["session_pending"] = True
+                self.assigned += 1
+
+    @staticmethod
+    def _summarise(documents) -> Dict[str, Dict[str, object]]:
+        """Per-session start / end, message counts, offices and latest status / language of the documents."""
+        sessions: Dict[str, Dict[str, object]] = {}
+        for document in documents:
+            session_id = document.get("session_id")
+            sent_at = message_time(document)
+            if session_id is None or sent_at is None:
+                continue
+            session = sessions.get(session_id)
+            if session is None:
+                session = sessions[session_id] = {
+                    "user": document.get("user"), "start": sent_at, "end": sent_at, "messages": 0,
+                    "user_messages": 0, "bot_messages": 0, "offices": set(), "max": {},
+                }
+            session["start"] = min(session["start"], sent_at)
+            session["end"] = max(session["end"], sent_at)
+            session["messages"] += 1
+            if document.get("sender") in ("user", "bot"):
+                session[f"{document['sender']}_messages"] += 1
+            if document.get("office"):
+                session["offices"].add(document["office"])
+            for field, value in (("final_status", document.get("status")), ("language", document.get("language"))):
+                latest = session["max"].get(field)
+                if value and (latest is None or sent_at >= latest["at"]):
+                    session["max"][field] = {"at": sent_at, "value": value}
+        return sessions
+
+    def record(self, conversations, documents: List[Dict[str, object]]) -> int:
+        """
+        Upsert the sessions of inserted documents and clear their
+        ``session_pending`` flag; returns the number of sessions touched.
+        """
+        sessions = self._summarise(documents)
+        if not sessions:
+            return 0
+
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne({"_id": session_id}, {
+                "$setOnInsert": {"user": session["user"]},
+                "$min": {"start": session["start"]},
+                "$max": {"end": session["end"], **session["max"]},
+                "$inc": {key: session[key] for key in ("messages", "user_messages", "bot_messages")},
+                "$addToSet": {"offices": {"$each": sorted(session["offices"])}},
+                "$set": {"updated_at": now},
+            }, upsert=True)
+            for session_id, session in sessions.items()
+        ]
+        sessions_collection(conversations).bulk_write(operations, ordered=False)
+        self.recorded += len(operations)
+        counted = [document["_id"] for document in documents if document.get("session_pending") and "_id" in document]
+        if counted:
+            conversations.update_many({"_id": {"$in": counted}}, {"$unset": {"session_pending": ""}})
+        return len(operations)
+
+    def rebuild(self, conversations, session_ids: List[str]) -> int:
+        """Recompute the given sessions from all of their messages (idempotent); returns the number rebuilt."""
+        if not session_ids:
+            return 0
+        sessions = self._summarise(conversations.find({"session_id": {"$in": session_ids}}, _MESSAGE_FIELDS))
+        collection = sessions_collection(conversations)
+        now = datetime.now(timezone.utc)
+        operations = [
+            UpdateOne({"_id": session_id}, {"$set": {
+                "user": session["user"], "start": session["start"], "end": session["end"],
+                **{key: session[key] for key in ("messages", "user_messages", "bot_messages")},
+                "offices": sorted(session["offices"]), **session["max"], "updated_at": now,
+            }}, upsert=True)
+            for session_id, session in sessions.items()
+        ]
+        if operations:
+            collection.bulk_write(operations, ordered=False)
+        empty = [session_id for session_id in session_ids if session_id not in sessions]
+        if empty:
+            collection.delete_many({"_id": {"$in": empty}})
+        self.rebuilt += len(operations)
+        return len(operations)
+
+    def backfill(self, conversations, batch_size: int = 1000, *, pending_only: bool = False,
+                 on_batch: Optional[Callable[[], None]] = None) -> int:
+        """
+        Sessionise the messages without a ``session_id`` and rebuild the
+        sessions of ``session_pending`` ones, oldest first (only the latter
+        with ``pending_only``). Interrupted runs resume by running again.
+        """
+        query = PENDING_SESSION if pending_only else NEEDS_SESSION
+        done = 0
+        while True:
+            batch = list(
+                conversations.find(query, _MESSAGE_FIELDS)
+                .sort([("timestamp", ASCENDING), ("_id", ASCENDING)])
+                .limit(batch_size)
+            )
+            if not batch:
+                return done
+            done += self._backfill_batch(conversations, batch)
+            if on_batch is not None:
+                on_batch()
+
+    def _backfill_batch(self, conversations, batch: List[Dict[str, object]]) -> int:
+        self.assign(conversations, batch)
+        ids_by_session: Dict[Optional[str], list] = defaultdict(list)
+        for document in batch:
+            # Rows without a user or a readable time get a null session_id and are not looked at again
+            ids_by_session[document.get("session_id")].append(document["_id"])
+        # Marked first, so a crash before the rebuild leaves the rows for the next run
+        for session_id, ids in ids_by_session.items():
+            conversations.update_many({"_id": {"$in": ids}},
+                                      {"$set": {"session_id": session_id, "session_pending": True}})
+        self.rebuild(conversations, [session_id for session_id in ids_by_session if session_id is not None])
+        conversations.update_many({"_id": {"$in": [document["_id"] for document in batch]}},
+                                  {"$unset": {"session_pending": ""}})
+        return sum(len(ids) for session_id, ids in ids_by_session.items() if session_id is not None)
+
+    def metrics(self) -> Dict[str, int]:
+        return {"assigned": self.assigned, "opened": self.opened, "recorded": self.recorded, "rebuilt": self.rebuilt}
+
+
+def sessions_backfilled(db) -> bool:
+    """Whether a full backfill has completed (older messages are counted in ``chat_sessions``)."""
+    state = db[MIGRATIONS_COLLECTION].find_one({"_id": BACKFILL_ID}, {"completed_at": 1}) or {}
+    return state.get("completed_at") is not None
+
+
+class SessionBackfillScheduler:
+    """
+    Background thread running the backfill while holding its lease: a full
+    one until it has completed once, then only the ``session_pending`` rows.
+    """
+
+    def __init__(self, conversations, tracker: Optional[SessionTracker] = None, *,
+                 interval: float = CHAT_SESSION_BACKFILL_INTERVAL,
+                 lease_seconds: float = CHAT_SESSION_BACKFILL_LEASE_SECONDS) -> None:
+        self.conversations = conversations
+        self.tracker = tracker or SessionTracker()
+        self.state = conversations.database[MIGRATIONS_COLLECTION]
+        self.interval = interval
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def acquire_lease(self) -> bool:
+        """Take (or renew) the backfill lease; False while another worker holds it."""
+        now = datetime.now(timezone.utc)
+        try:
+            self.state.find_one_and_update(
+                {"_id": BACKFILL_ID, "$or": [
+                    {"lease_owner": self.owner},
+                    {"lease_expires": {"$lt": now}},
+                    {"lease_expires": {"$exists": False}},
+                ]},
+                {"$set": {"lease_owner": self.owner, "lease_expires": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def release_lease(self) -> None:
+        self.state.update_one({"_id": BACKFILL_ID, "lease_owner": self.owner}, {"$unset": {"lease_expires": ""}})
+
+    def run_once(self) -> Optional[int]:
+        """One backfill pass; None when another worker holds the lease."""
+        if not self.acquire_lease():
+            return None
+        try:
+            full = not sessions_backfilled(self.conversations.database)
+            done = self.tracker.backfill(self.conversations, pending_only=not full, on_batch=self.acquire_lease)
+            if full:
+                self.state.update_one({"_id": BACKFILL_ID},
+                                      {"$set": {"completed_at": datetime.now(timezone.utc), "sessionised": done}})
+            return done
+        finally:
+            self.release_lease()
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="chat-session-backfill", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                done = self.run_once()
+                if done:
+                    print(f"[ChatSessions] Backfill sessionised {done} message(s)")
+            except Exception as exc:
+                self.last_error = str(exc)
+                print(f"[ChatSessions] Backfill failed: {exc}")
+            self._stop.wait(self.interval)
+
+
+def session_stats(db, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                  office: Optional[str] = None) -> Dict[str, float]:
+    """
+    Sessions that started in [start, end) (and touched ``office``): count,
+    total / timed (more than one distinct message time) seconds, messages and
+    multi-message sessions, in one aggregation.
+    """
+    match: Dict[str, object] = {}
+    bounds: Dict[str, object] = {}
+    if start is not None:
+        bounds["$gte"] = _naive_utc(start)
+    if end is not None:
+        bounds["$lt"] = _naive_utc(end)
+    if bounds:
+        match["start"] = bounds
+    if office is not None:
+        match["offices"] = office
+    pipeline = [
+        {"$match": match},
+        {"$project": {
+            "messages": 1,
+            "seconds": {"$divide": [{"$subtract": ["$end", "$start"]}, 1000]},
+        }},
+        {"$group": {
+            "_id": None,
+            "sessions": {"$sum": 1},
+            "session_seconds": {"$sum": "$seconds"},
+            "timed_sessions": {"$sum": {"$cond": [{"$gt": ["$seconds", 0]}, 1, 0]}},
+            "messages": {"$sum": "$messages"},
+            "multi_message_sessions": {"$sum": {"$cond": [{"$gte": ["$messages", 2]}, 1, 0]}},
+        }},
+    ]
+    rows = list(db[SESSIONS_COLLECTION].aggregate(pipeline))
+    stats = {"sessions": 0, "session_seconds": 0.0, "timed_sessions": 0, "messages": 0, "multi_message_sessions": 0}
+    if rows:
+        stats.update({key: rows[0].get(key) or 0 for key in stats})
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Sessionise conversations that have no session_id yet")
+    parser.add_argument("--backfill", action="store_true", required=True)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        raise SystemExit("MONGODB_URI is not set")
+    tracker = SessionTracker()
+    scheduler = SessionBackfillScheduler(MongoClient(uri)["chatbot_db"]["conversations"], tracker)
+    if not scheduler.acquire_lease():
+        raise SystemExit("Another worker is running the backfill")
+    try:
+        done = tracker.backfill(scheduler.conversations, batch_size=args.batch_size, on_batch=scheduler.acquire_lease)
+        scheduler.state.update_one({"_id": BACKFILL_ID},
+                                   {"$set": {"completed_at": datetime.now(timezone.utc), "sessionised": done}})
+    finally:
+        scheduler.release_lease()
+    print(f"[ChatSessions] Sessionised {done} message(s); {tracker.opened} new session(s), {tracker.rebuilt} rebuilt")
@@ -4,13 +4,23 @@ context_search.py
 Enhanced keyword and fuzzy search utilities for the manual context injection workflow.
 Now includes TF-IDF weighting, phrase matching, semantic weighting, query expansion,
 and improved scoring algorithms for better prediction quality from TCC website content.
+
+Ranking of the local template documents and the ``website_sections`` collection
+goes through ``BM25FIndex``, an inverted index built once and updated
+incrementally, instead of re-scoring every candidate with ``score_document``.
+The ``website_sections`` index is kept in sync with MongoDB by a background
+``SectionIndexRefresher``; requests only read the last completed index.
 """
 
 from __future__ import annotations
 
+import math
+import os
 import re
-from collections import Counter, defaultdict
-from difflib import SequenceMatcher
+import threading
+import time
+from collections import Counter, OrderedDict, defaultdict
+from functools import lru_cache, update_wrapper
 from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
 from pymongo.collection import Collection
@@ -43,6 +53,36 @@ TCC_SYNONYMS = {
     'contact': ['contact', 'phone', 'email', 'address', 'location', 'office hours']
 }
 
+# Relative importance of each document field (shared by score_document and BM25F).
+FIELD_WEIGHTS = {
+    'content': 0.40,
+    'title': 0.30,
+    'tags': 0.10,
+    'page': 0.05,
+    'slug': 0.05,
+}
+
+# Query terms added by synonym expansion count for less than the user's own words.
+SYNONYM_TERM_WEIGHT = 0.5
+
+# How often the website_sections index is diffed against MongoDB (seconds).
+SECTION_INDEX_REFRESH_SECONDS = float(os.getenv("SECTION_INDEX_REFRESH_SECONDS", "300"))
+
+# Total text length each per-text cache (text_profile, char_trigrams) may hold.
+# Entries cost roughly 90 (profile) and 40 (trigrams) bytes per character, so the
+# default keeps both under about 35MB per worker while still covering the local
+# template corpus; a text longer than the budget is computed but not cached.
+CONTEXT_SEARCH_CACHE_MAX_CHARS = int(os.getenv("CONTEXT_SEARCH_CACHE_MAX_CHARS", "250000"))
+
+SECTION_PROJECTION = {
+    "_id": True,
+    "slug": True,
+    "title": True,
+    "page": True,
+    "content": True,
+    "tags": True,
+}
+
 
 def normalise(text: str) -> str:
     """Lower-case text and collapse whitespace for consistent comparison."""
@@ -54,117 +94,281 @@ def tokenise(text: str) -> List[str]:
     return WORD_PATTERN.findall(normalise(text))
 
 
+def document_field_tokens(document: Dict[str, object], field: str, text: str) -> List[str]:
+    """
+    Return the tokens for one document field, preferring tokens precomputed at
+    load time (see template_corpus.document_tokens) over re-tokenising.
+    """
+    precomputed = document.get("tokens")
+    if isinstance(precomputed, dict) and field in precomputed:
+        return precomputed[field]
+    return tokenise(text) if text else []
+
+
+# Reverse synonym map: synonym -> index of the first TCC_SYNONYMS group listing it.
+SYNONYM_GROUPS: List[frozenset] = [frozenset(synonyms) for synonyms in TCC_SYNONYMS.values()]
+SYNONYM_REVERSE_MAP: Dict[str, int] = {}
+for _group_index, _synonyms in enumerate(TCC_SYNONYMS.values()):
+    for _synonym in _synonyms:
+        SYNONYM_REVERSE_MAP.setdefault(_synonym, _group_index)
+_SYNONYM_MIN_LEN = min(len(synonym) for synonym in SYNONYM_REVERSE_MAP)
+_SYNONYM_MAX_LEN = max(len(synonym) for synonym in SYNONYM_REVERSE_MAP)
+
+
+@lru_cache(maxsize=4096)
+def synonym_group(token: str) -> Optional[frozenset]:
+    """
+    Return the synonym group a token belongs to: the first TCC_SYNONYMS entry
+    that lists the token or any substring of it (so "admissions" and
+    "enrollment" resolve through "admission" / "enroll").
+    """
+    best: Optional[int] = None
+    length = len(token)
+    for size in range(_SYNONYM_MIN_LEN, min(_SYNONYM_MAX_LEN, length) + 1):
+        for start in range(length - size + 1):
+            group_index = SYNONYM_REVERSE_MAP.get(token[start:start + size])
+            if group_index is not None and (best is None or group_index < best):
+                best = group_index
+    return SYNONYM_GROUPS[best] if best is not None else None
+
+
 def expand_query_terms(tokens: List[str]) -> set:
     """
     Expand query terms using TCC-specific synonyms for better matching.
     """
     expanded = set(tokens)
-    tokens_lower = [t.lower() for t in tokens]
-    
-    for token in tokens_lower:
-        # Check if token matches any synonym key
-        for key, synonyms in TCC_SYNONYMS.items():
-            if token in synonyms or any(syn in token for syn in synonyms):
-                expanded.update(synonyms)
-                break
-    
+    for token in tokens:
+        group = synonym_group(token.lower())
+        if group:
+            expanded.update(group)
     return expanded
 
 
-def keyword_overlap_score(message_tokens: Iterable[str], content_tokens: Iterable[str]) -> float:
+class TokenProfile:
+    """
+    Precomputed lookup structures for one tokenised text, so the partial,
+    phrase, frequency and position parts of keyword_overlap_score are set and
+    dict lookups rather than nested scans.
+    """
+
+    __slots__ = ("length", "token_set", "counts", "first_offsets", "text_length", "trigram_index", "phrases")
+
+    def __init__(self, tokens: Iterable[str]) -> None:
+        filtered = [t.lower() for t in tokens if t.lower() not in STOP_WORDS and len(t) > 2]
+        self.length = len(filtered)
+        self.counts = Counter(filtered)
+        self.token_set = frozenset(self.counts)
+
+        # Character offset of each token's first occurrence in " ".join(filtered).
+        self.first_offsets: Dict[str, int] = {}
+        offset = 0
+        for token in filtered:
+            self.first_offsets.setdefault(token, offset)
+            offset += len(token) + 1
+        self.text_length = max(0, offset - 1)
+
+        # Trigram -> tokens containing it, for "message token inside content token" checks.
+        trigram_index: Dict[str, set] = defaultdict(set)
+        for token in self.token_set:
+            for i in range(len(token) - 2):
+                trigram_index[token[i:i + 3]].add(token)
+        self.trigram_index = dict(trigram_index)
+
+        phrases = set()
+        for i in range(len(filtered) - 1):
+            phrases.add(f"{filtered[i]} {filtered[i+1]}")
+            if i + 2 < len(filtered):
+                phrases.add(f"{filtered[i]} {filtered[i+1]} {filtered[i+2]}")
+        self.phrases = frozenset(phrases)
+
+    def has_partial_match(self, token: str, proper_substrings: Iterable[str]) -> bool:
+        """True if a different content token contains ``token`` or is contained in it."""
+        if any(sub in self.token_set for sub in proper_substrings):
+            return True
+        postings = [self.trigram_index.get(token[i:i + 3]) for i in range(len(token) - 2)]
+        if not postings or any(p is None for p in postings):
+            return False
+        candidates = min(postings, key=len)
+        return any(candidate != token and token in candidate for candidate in candidates)
+
+
+class QueryProfile:
+    """Message-side terms for keyword_overlap_score, computed once per query."""
+
+    __slots__ = ("filtered", "term_set", "phrases", "substrings")
+
+    def __init__(self, tokens: Iterable[str]) -> None:
+        self.filtered = [t.lower() for t in tokens if t.lower() not in STOP_WORDS and len(t) > 2]
+        self.term_set = set(self.filtered) | expand_query_terms(self.filtered)
+
+        phrases = set()
+        if len(self.filtered) >= 2:
+            for i in range(len(self.filtered) - 1):
+                phrases.add(f"{self.filtered[i]} {self.filtered[i+1]}")
+            for i in range(len(self.filtered) - 2):
+                phrases.add(f"{self.filtered[i]} {self.filtered[i+1]} {self.filtered[i+2]}")
+        self.phrases = phrases
+
+        # Proper substrings (3+ chars) of each token: candidates for content tokens inside it.
+        self.substrings = {
+            token: frozenset(
+                token[start:start + size]
+                for size in range(3, len(token))
+                for start in range(len(token) - size + 1)
+            )
+            for token in set(self.filtered)
+        }
+
+
+class TextCache:
+    """
+    LRU cache for a function of one text, bounded by the total length of the
+    cached texts rather than the entry count: the texts are whole document
+    fields of up to SITE_PAGE_MAX_CHARS, and what they map to grows with them.
+    """
+
+    def __init__(self, func, max_chars: int = CONTEXT_SEARCH_CACHE_MAX_CHARS) -> None:
+        self.func = func
+        self.max_chars = max_chars
+        self._entries: "OrderedDict[str, object]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        update_wrapper(self, func)
+
+    def __call__(self, text: str):
+        with self._lock:
+            value = self._entries.get(text)
+            if value is not None:
+                self._entries.move_to_end(text)
+                self.hits += 1
+                return value
+            self.misses += 1
+        value = self.func(text)
+        if len(text) > self.max_chars:
+            return value
+        with self._lock:
+            if text not in self._entries:
+                self._entries[text] = value
+                self._chars += len(text)
+                while self._chars > self.max_chars:
+                    evicted, _ = self._entries.popitem(last=False)
+                    self._chars -= len(evicted)
+        return value
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._chars = 0
+            self.hits = self.misses = 0
+
+    def cache_info(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "chars": self._chars,
+                "max_chars": self.max_chars,
+            }
+
+
+def text_cache(max_chars: int = CONTEXT_SEARCH_CACHE_MAX_CHARS):
+    """Decorator form of TextCache."""
+    return lambda func: TextCache(func, max_chars)
+
+
+@text_cache()
+def text_profile(text: str) -> TokenProfile:
+    """Cached TokenProfile for a field's text (each document field is profiled once)."""
+    return TokenProfile(tokenise(text))
+
+
+def keyword_overlap_score(message_tokens, content_tokens) -> float:
     """
     Enhanced overlap score with TF-IDF-like weighting, phrase matching, and query expansion.
 
+    Either argument may be a plain token iterable or a prebuilt QueryProfile /
+    TokenProfile; score_document passes profiles so nothing is recomputed.
+
     Returns:
         A float between 0 and 1 representing the weighted ratio of matching tokens.
     """
-    message_list = list(message_tokens)
-    content_list = list(content_tokens)
-    
-    if not message_list or not content_list:
-        return 0.0
-    
-    # Filter out stop words for better matching
-    message_filtered = [t.lower() for t in message_list if t.lower() not in STOP_WORDS and len(t) > 2]
-    content_filtered = [t.lower() for t in content_list if t.lower() not in STOP_WORDS and len(t) > 2]
-    
-    if not message_filtered:
+    query = message_tokens if isinstance(message_tokens, QueryProfile) else QueryProfile(message_tokens)
+    content = content_tokens if isinstance(content_tokens, TokenProfile) else TokenProfile(content_tokens)
+
+    if not query.filtered or not content.length:
         return 0.0
-    
-    # Expand query terms with synonyms
-    message_expanded = expand_query_terms(message_filtered)
-    message_set = set(message_filtered) | message_expanded
-    content_set = set(content_filtered)
-    
+
     # Basic overlap (exact matches)
-    exact_matches = message_set.intersection(content_set)
-    base_score = len(exact_matches) / len(message_filtered) if message_filtered else 0.0
-    
+    exact_matches = query.term_set & content.token_set
+    base_score = len(exact_matches) / len(query.filtered)
+
     # Partial word matching (e.g., "admission" matches "admissions")
     partial_bonus = 0.0
-    for msg_token in message_filtered:
-        for content_token in content_filtered:
-            # Check if one contains the other (for plurals, variations)
-            if msg_token in content_token or content_token in msg_token:
-                if msg_token != content_token:  # Don't double count exact matches
-                    partial_bonus += 0.05
-                    break
-    
+    for msg_token in query.filtered:
+        if content.has_partial_match(msg_token, query.substrings[msg_token]):
+            partial_bonus += 0.05
+            if partial_bonus >= 0.2:
+                break
     partial_bonus = min(0.2, partial_bonus)
-    
+
     # Phrase matching bonus (2-3 word phrases)
     phrase_bonus = 0.0
-    if len(message_filtered) >= 2:
-        # Check for 2-word phrases
-        message_phrases = set()
-        for i in range(len(message_filtered) - 1):
-            phrase = f"{message_filtered[i]} {message_filtered[i+1]}"
-            message_phrases.add(phrase)
-        
-        # Check for 3-word phrases
-        if len(message_filtered) >= 3:
-            for i in range(len(message_filtered) - 2):
-                phrase = f"{message_filtered[i]} {message_filtered[i+1]} {message_filtered[i+2]}"
-                message_phrases.add(phrase)
-        
-        content_text = " ".join(content_filtered).lower()
-        phrase_matches = sum(1 for phrase in message_phrases if phrase in content_text)
-        if phrase_matches > 0:
-            # Higher bonus for longer phrases
-            phrase_bonus = min(0.4, phrase_matches * 0.15)
-    
+    phrase_matches = len(query.phrases & content.phrases)
+    if phrase_matches > 0:
+        # Higher bonus for longer phrases
+        phrase_bonus = min(0.4, phrase_matches * 0.15)
+
     # Term frequency weighting (more frequent terms in content = higher score)
-    content_counter = Counter(content_filtered)
     tf_weight = 0.0
     for match in exact_matches:
-        # Normalize by content length, but give more weight to important matches
-        freq_ratio = content_counter[match] / len(content_filtered) if content_filtered else 0
+        freq_ratio = content.counts[match] / content.length
         tf_weight += min(0.15, freq_ratio * 2)  # Increased weight
-    
+
     # Position bonus (terms appearing early in content are more important)
     position_bonus = 0.0
-    content_text_lower = " ".join(content_filtered).lower()
+    early_cutoff = content.text_length * 0.2
     for match in exact_matches:
-        if match in content_text_lower:
-            position = content_text_lower.find(match)
-            # First 20% of content gets bonus
-            if position < len(content_text_lower) * 0.2:
-                position_bonus += 0.05
-    
+        # First 20% of content gets bonus
+        if content.first_offsets[match] < early_cutoff:
+            position_bonus += 0.05
     position_bonus = min(0.15, position_bonus)
-    
+
     return min(1.0, base_score + partial_bonus + phrase_bonus + tf_weight + position_bonus)
 
 
+@text_cache()
+def char_trigrams(text: str) -> frozenset:
+    """
+    Character trigrams of already-normalised text, padded so short words still
+    produce grams. Cached (up to CONTEXT_SEARCH_CACHE_MAX_CHARS of text), so a
+    document's trigram set is normally built once.
+    """
+    if not text:
+        return frozenset()
+    padded = f" {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
 def fuzzy_similarity_score(message: str, content: str) -> float:
     """
-    Use difflib's SequenceMatcher to gauge similarity between two strings.
+    Approximate string similarity with the Dice coefficient of character
+    trigram sets (2*|A&B| / (|A|+|B|), the same shape as SequenceMatcher's
+    ratio). Linear in the text length instead of quadratic, and the content
+    side is cached per document.
 
     The score ranges between 0 and 1.
     """
     if not message or not content:
         return 0.0
-    return SequenceMatcher(None, message, content).ratio()
+    message_grams = char_trigrams(message)
+    content_grams = char_trigrams(content)
+    if not message_grams or not content_grams:
+        return 0.0
+    shared = sum(1 for gram in message_grams if gram in content_grams)
+    return 2.0 * shared / (len(message_grams) + len(content_grams))
 
 
 def score_document(user_message: str, document: Dict[str, str]) -> float:
@@ -186,27 +390,23 @@ def score_document(user_message: str, document: Dict[str, str]) -> float:
     page = document.get("page", "")
     slug = document.get("slug", "")
 
-    message_tokens = tokenise(user_message)
-    content_tokens = tokenise(content)
-    title_tokens = tokenise(title)
-    tag_tokens = tokenise(" ".join(tags) if tags else "")
-    page_tokens = tokenise(page) if page else []
-    slug_tokens = tokenise(slug) if slug else []
+    query = QueryProfile(tokenise(user_message))
+    tag_text = " ".join(tags) if tags else ""
 
     # Enhanced keyword overlap with query expansion
-    overlap = keyword_overlap_score(message_tokens, content_tokens)
+    overlap = keyword_overlap_score(query, text_profile(content))
     
     # Title matching (higher weight for title matches - titles are very important)
-    title_overlap = keyword_overlap_score(message_tokens, title_tokens)
+    title_overlap = keyword_overlap_score(query, text_profile(title))
     
     # Tag matching (boost for tag matches)
-    tag_overlap = keyword_overlap_score(message_tokens, tag_tokens) if tag_tokens else 0.0
+    tag_overlap = keyword_overlap_score(query, text_profile(tag_text)) if tag_text else 0.0
     
     # Page matching
-    page_overlap = keyword_overlap_score(message_tokens, page_tokens) if page_tokens else 0.0
+    page_overlap = keyword_overlap_score(query, text_profile(page)) if page else 0.0
     
     # Slug matching (often contains key terms)
-    slug_overlap = keyword_overlap_score(message_tokens, slug_tokens) if slug_tokens else 0.0
+    slug_overlap = keyword_overlap_score(query, text_profile(slug)) if slug else 0.0
     
     # Fuzzy similarity (for partial matches)
     fuzzy_score = fuzzy_similarity_score(normalise(user_message), normalise(content))
@@ -285,11 +485,11 @@ def score_document(user_message: str, document: Dict[str, str]) -> float:
     
     # Weighted sum with enhanced factors
     base_score = (
-        overlap * 0.40 +           # Content overlap (primary, slightly reduced)
-        title_overlap * 0.30 +      # Title match (increased importance)
-        tag_overlap * 0.10 +        # Tag match
-        page_overlap * 0.05 +       # Page match
-        slug_overlap * 0.05 +       # Slug match (new)
+        overlap * FIELD_WEIGHTS['content'] +    # Content overlap (primary, slightly reduced)
+        title_overlap * FIELD_WEIGHTS['title'] +  # Title match (increased importance)
+        tag_overlap * FIELD_WEIGHTS['tags'] +     # Tag match
+        page_overlap * FIELD_WEIGHTS['page'] +    # Page match
+        slug_overlap * FIELD_WEIGHTS['slug'] +    # Slug match (new)
         fuzzy_score * 0.05 +        # Fuzzy similarity (reduced)
         exact_phrase_bonus +        # Exact phrase bonus
         office_bonus                # Office context bonus (new)
@@ -298,6 +498,338 @@ def score_document(user_message: str, document: Dict[str, str]) -> float:
     return min(1.0, base_score * length_factor)
 
 
+def query_term_weights(user_message: str) -> Dict[str, float]:
+    """
+    Turn a user message into weighted index terms: the message's own keywords
+    weigh 1.0 and TCC_SYNONYMS expansions weigh SYNONYM_TERM_WEIGHT.
+    """
+    tokens = [t for t in tokenise(user_message) if t not in STOP_WORDS and len(t) > 2]
+    if not tokens:
+        tokens = tokenise(user_message)
+    weights = {token: 1.0 for token in tokens}
+    for synonym in expand_query_terms(tokens):
+        for term in tokenise(synonym):
+            weights.setdefault(term, SYNONYM_TERM_WEIGHT)
+    return weights
+
+
+def document_key(document: Dict[str, object]) -> str:
+    """Stable identifier for an indexed document (slug, falling back to _id)."""
+    return str(document.get("slug") or document.get("_id") or "")
+
+
+class BM25FIndex:
+    """
+    Inverted index with BM25F scoring over the content/title/tags/page/slug fields.
+
+    Postings map term -> {doc key -> {field: term frequency}}; per-field lengths
+    are kept per document so averages stay correct under incremental upserts.
+    Scores are normalised by the summed IDF of the query's own terms so they
+    stay in the 0-1 range the callers' thresholds expect.
+    """
+
+    def __init__(
+        self,
+        field_weights: Optional[Dict[str, float]] = None,
+        *,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ) -> None:
+        weights = field_weights or FIELD_WEIGHTS
+        # Scale so the content field has weight 1.0; only the ratios matter.
+        self.field_weights = {field: weight / weights['content'] for field, weight in weights.items()}
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, Dict[str, Dict[str, int]]] = {}
+        self._lengths: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, frozenset] = {}
+        self._field_totals: Dict[str, int] = {field: 0 for field in self.field_weights}
+        self._documents: Dict[str, Dict[str, object]] = {}
+        self._fingerprints: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._documents
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._documents)
+
+    @staticmethod
+    def _fingerprint(document: Dict[str, object]) -> int:
+        tags = document.get("tags") or []
+        return hash((
+            document.get("title", ""),
+            document.get("content", ""),
+            document.get("page", ""),
+            document.get("slug", ""),
+            tuple(str(tag) for tag in tags),
+        ))
+
+    def copy(self) -> "BM25FIndex":
+        """
+        Independent copy that can be updated while this one keeps serving searches.
+        Per-document entries are shared: upsert and remove replace them, never mutate them.
+        """
+        clone = BM25FIndex(k1=self.k1, b=self.b)
+        clone.field_weights = dict(self.field_weights)
+        with self._lock:
+            clone._postings = {term: dict(postings) for term, postings in self._postings.items()}
+            clone._lengths = dict(self._lengths)
+            clone._doc_terms = dict(self._doc_terms)
+            clone._field_totals = dict(self._field_totals)
+            clone._documents = dict(self._documents)
+            clone._fingerprints = dict(self._fingerprints)
+        return clone
+
+    def upsert(self, document: Dict[str, object]) -> bool:
+        """Add or replace a document. Returns False when it was already indexed unchanged."""
+        key = document_key(document)
+        if not key:
+            return False
+        fingerprint = self._fingerprint(document)
+
+        tags = document.get("tags") or []
+        field_texts = {
+            "content": document.get("content", "") or "",
+            "title": document.get("title", "") or "",
+            "tags": " ".join(str(tag) for tag in tags),
+            "page": document.get("page", "") or "",
+            "slug": document.get("slug", "") or "",
+        }
+        field_tokens = {
+            field: document_field_tokens(document, field, text)
+            for field, text in field_texts.items()
+            if field in self.field_weights
+        }
+
+        with self._lock:
+            if self._fingerprints.get(key) == fingerprint:
+                return False
+            self._remove_locked(key)
+            for field, tokens in field_tokens.items():
+                self._field_totals[field] += len(tokens)
+                for term, count in Counter(tokens).items():
+                    self._postings.setdefault(term, {}).setdefault(key, {})[field] = count
+            self._lengths[key] = {field: len(tokens) for field, tokens in field_tokens.items()}
+            self._doc_terms[key] = frozenset(term for tokens in field_tokens.values() for term in tokens)
+            self._documents[key] = document
+            self._fingerprints[key] = fingerprint
+        return True
+
+    def upsert_many(self, documents: Iterable[Dict[str, object]]) -> int:
+        return sum(1 for document in documents if self.upsert(document))
+
+    def remove(self, key: str) -> bool:
+        with self._lock:
+            return self._remove_locked(key)
+
+    def _remove_locked(self, key: str) -> bool:
+        lengths = self._lengths.pop(key, None)
+        if lengths is None:
+            return False
+        for field, length in lengths.items():
+            self._field_totals[field] -= length
+        for term in self._doc_terms.pop(key, ()):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(key, None)
+            if not postings:
+                del self._postings[term]
+        del self._documents[key]
+        self._fingerprints.pop(key, None)
+        return True
+
+    @staticmethod
+    def _idf(document_frequency: int, total: int) -> float:
+        return math.log(1.0 + (total - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def score_all(self, user_message: str, *, page: Optional[str] = None) -> Dict[str, float]:
+        """Return normalised BM25F scores for every document matching the query."""
+        term_weights = query_term_weights(user_message)
+        if not term_weights:
+            return {}
+
+        with self._lock:
+            total = len(self._documents)
+            if not total:
+                return {}
+            averages = {
+                field: (self._field_totals[field] / total) or 1.0 for field in self.field_weights
+            }
+            normaliser = sum(
+                self._idf(len(self._postings.get(term, ())), total)
+                for term, weight in term_weights.items()
+                if weight >= 1.0
+            )
+            if normaliser <= 0:
+                return {}
+
+            raw_scores: Dict[str, float] = defaultdict(float)
+            for term, query_weight in term_weights.items():
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = self._idf(len(postings), total)
+                for key, field_counts in postings.items():
+                    if page is not None and self._documents[key].get("page") != page:
+                        continue
+                    lengths = self._lengths[key]
+                    weighted_tf = 0.0
+                    for field, count in field_counts.items():
+                        norm = 1.0 - self.b + self.b * lengths[field] / averages[field]
+                        weighted_tf += self.field_weights[field] * count / norm
+                    raw_scores[key] += query_weight * idf * weighted_tf / (self.k1 + weighted_tf)
+
+        return {key: min(1.0, score / normaliser) for key, score in raw_scores.items()}
+
+    def search(
+        self,
+        user_message: str,
+        *,
+        minimum_score: float = 0.0,
+        top_k: Optional[int] = None,
+        page: Optional[str] = None,
+        exclude: Iterable[str] = (),
+    ) -> List[Tuple[Dict[str, object], float]]:
+        """Return (document, score) pairs above ``minimum_score``, best first."""
+        excluded = set(exclude)
+        scores = self.score_all(user_message, page=page)
+        ranked = sorted(
+            ((key, score) for key, score in scores.items() if score >= minimum_score and key not in excluded),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+        if top_k is not None:
+            ranked = ranked[:top_k]
+        with self._lock:
+            return [(self._documents[key], score) for key, score in ranked if key in self._documents]
+
+
+# One refresher (and index) per website_sections collection, see get_section_index.
+_section_refreshers: Dict[str, "SectionIndexRefresher"] = {}
+_section_refreshers_lock = threading.Lock()
+
+
+def sync_section_index(index: BM25FIndex, collection: Collection) -> Tuple[int, int]:
+    """
+    Bring ``index`` in line with ``collection``. Only new or changed sections are
+    re-tokenised and sections deleted from MongoDB are dropped.
+
+    Returns:
+        A tuple of (documents upserted, documents removed).
+    """
+    seen = set()
+    upserted = 0
+    for doc in collection.find({}, SECTION_PROJECTION):
+        object_id = doc.pop("_id", None)
+        if not doc.get("slug") and object_id is not None:
+            doc["slug"] = str(object_id)
+        key = document_key(doc)
+        if not key:
+            continue
+        seen.add(key)
+        if index.upsert(doc):
+            upserted += 1
+
+    removed = 0
+    for key in index.keys():
+        if key not in seen and index.remove(key):
+            removed += 1
+    return upserted, removed
+
+
+class SectionIndexRefresher:
+    """
+    Background thread that keeps the BM25F index of one website_sections
+    collection in sync, every ``interval`` seconds.
+
+    Each run syncs a copy of the current index and swaps it in, so searches
+    never wait for a sync and always see the last completed one.
+    """
+
+    def __init__(self, collection: Collection, *, interval: float = SECTION_INDEX_REFRESH_SECONDS) -> None:
+        self.collection = collection
+        self.interval = interval
+        self.index: Optional[BM25FIndex] = None
+        self.synced_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self.runs = 0
+        self.last_run_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def start(self) -> bool:
+        """Start the background thread (idempotent). Returns True if a thread was started."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="section-index-refresher", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval)
+
+    def refresh(self) -> bool:
+        """Sync a copy of the index with MongoDB and publish it. Returns False if the sync failed."""
+        with self._sync_lock:
+            start = time.perf_counter()
+            current = self.index
+            candidate = current.copy() if current is not None else BM25FIndex()
+            try:
+                upserted, removed = sync_section_index(candidate, self.collection)
+            except Exception as exc:  # pragma: no cover - defensive logging
+                self.last_error = str(exc)
+                print(f"[context_search] Section index sync failed: {exc}")
+                return False
+            if current is None or upserted or removed:
+                self.index = candidate
+            self.synced_at = time.time()
+            self.runs += 1
+            self.last_run_seconds = time.perf_counter() - start
+            self.last_error = None
+            if upserted or removed:
+                print(
+                    f"[context_search] Section index synced in {self.last_run_seconds:.3f}s "
+                    f"(+{upserted} / -{removed}, {len(candidate)} indexed)"
+                )
+            return True
+
+
+def get_section_index(collection: Collection, *, force_refresh: bool = False) -> Optional[BM25FIndex]:
+    """
+    Return the last completed BM25F index for a website_sections collection.
+    The first call starts its SectionIndexRefresher, so it is kept in sync off
+    the request path; None until the first sync has finished (callers then
+    fall back to scoring the collection directly). ``force_refresh`` syncs on
+    the calling thread first.
+    """
+    key = getattr(collection, "full_name", None) or str(id(collection))
+    with _section_refreshers_lock:
+        refresher = _section_refreshers.get(key)
+        if refresher is None:
+            refresher = _section_refreshers[key] = SectionIndexRefresher(collection)
+    refresher.start()
+    if force_refresh:
+        refresher.refresh()
+    return refresher.index
+
+
 def find_relevant_content(
     user_message: str,
     collection: Optional[Collection],
@@ -317,7 +849,16 @@ def find_relevant_content(
         A tuple of (document, score) for the best match, or None if nothing
         meets the threshold.
     """
-    if not user_message or not collection:
+    if not user_message or collection is None:
+        return None
+
+    # Score against the incrementally maintained BM25F index when it is available.
+    index = get_section_index(collection)
+    if index is not None:
+        ranked = index.search(user_message, minimum_score=minimum_score, top_k=max(1, top_k))
+        if ranked:
+            print(f"[context_search] Index search over {len(index)} section(s), best score: {ranked[0][1]:.3f}")
+            return ranked[0]
         return None
 
     # Preprocess query: expand with synonyms and normalize
@@ -440,14 +981,20 @@ def rank_documents(
     *,
     minimum_score: float = 0.08,  # Lowered to catch more relevant content
     top_k: int = 5,  # Increased to provide more context
+    index: Optional[BM25FIndex] = None,
 ) -> List[Tuple[Dict[str, str], float]]:
     """
     Enhanced ranking with better scoring, diversity consideration, and relevance boosting.
     Returns top_k documents sorted by relevance score.
+
+    When ``index`` is given (an index built over ``documents``) scores come from
+    BM25F instead of running score_document on every document.
     """
     if not user_message or not documents:
         return []
 
+    index_scores = index.score_all(user_message) if index is not None else None
+
     ranked: List[Tuple[Dict[str, str], float]] = []
     seen_slugs = set()  # Track slugs to avoid exact duplicates
     seen_pages = set()  # Track pages to avoid duplicates
@@ -464,13 +1011,19 @@ def rank_documents(
             continue
         seen_slugs.add(slug)
         
-        score = score_document(user_message, doc)
+        if index_scores is not None:
+            score = index_scores.get(document_key(doc), 0.0)
+        else:
+            score = score_document(user_message, doc)
         
         # Boost score if document has high keyword density
         if score >= minimum_score:
             # Calculate keyword density (how many query terms appear in doc)
-            doc_text = f"{doc.get('title', '')} {doc.get('content', '')} {doc.get('page', '')}"
-            doc_tokens = set(tokenise(doc_text))
+            doc_tokens = set(
+                document_field_tokens(doc, "title", doc.get("title", ""))
+                + document_field_tokens(doc, "content", doc.get("content", ""))
+                + document_field_tokens(doc, "page", doc.get("page", ""))
+            )
             keyword_density = len(query_tokens & doc_tokens) / len(query_tokens) if query_tokens else 0
             if keyword_density > 0.5:  # More than 50% of query terms present
                 score *= 1.1  # 10% boost
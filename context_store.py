@@ -0,0 +1,386 @@
+"""
+context_store.py
+----------------
+Per-user conversation context (current office, pending office switch and
+per-office state) behind a single ``ContextStore`` API.
+
+Records expire ``ttl`` seconds after their last update and the store keeps at
+most ``max_entries`` users, evicting the least recently used. Two backends are
+available: ``MemoryContextBackend`` (per process) and ``SQLiteContextBackend``
+(a local file shared by every gunicorn worker on the host, so workers agree on
+a user's current office).
+
+In SQLite, reads take no write lock: ``last_access`` (the LRU order) is only
+written back when it is more than ``_ACCESS_TOUCH_INTERVAL`` seconds old, and
+the row count is kept by triggers so a save only evicts, oldest first through
+the ``last_access`` index, when the table is actually over ``max_entries``.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+# Only write last_access back when it is older than this (keeps reads read-only).
+_ACCESS_TOUCH_INTERVAL = 60.0
+
+
+class UserContext:
+    """
+    One user's conversation context.
+
+    ``offices`` maps an office tag to its state: ``{"messages": [...], "last_intent": ...}``.
+    """
+
+    __slots__ = ("user_id", "current_office", "pending_switch", "offices", "updated_at")
+
+    def __init__(
+        self,
+        user_id: str,
+        current_office: Optional[str] = None,
+        pending_switch: Optional[str] = None,
+        offices: Optional[Dict[str, Dict[str, object]]] = None,
+        updated_at: float = 0.0,
+    ) -> None:
+        self.user_id = user_id
+        self.current_office = current_office
+        self.pending_switch = pending_switch
+        self.offices = offices if offices is not None else {}
+        self.updated_at = updated_at
+
+    def ensure_office(self, office_tag: str) -> Dict[str, object]:
+        return self.offices.setdefault(office_tag, {"messages": [], "last_intent": None})
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "current_office": self.current_office,
+            "pending_switch": self.pending_switch,
+            "offices": self.offices,
+        }
+
+    @classmethod
+    def from_dict(cls, user_id: str, data: Dict[str, object], updated_at: float = 0.0) -> "UserContext":
+        return cls(
+            user_id,
+            current_office=data.get("current_office"),
+            pending_switch=data.get("pending_switch"),
+            offices=dict(data.get("offices") or {}),
+            updated_at=updated_at,
+        )
+
+    def __repr__(self) -> str:
+        return f"UserContext({self.user_id!r}, {self.to_dict()!r})"
+
+
+class MemoryContextBackend:
+    """In-process backend: an OrderedDict kept in least-recently-used order."""
+
+    def __init__(self, ttl: float, max_entries: int, clock: Callable[[], float] = time.time) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._records: "OrderedDict[str, UserContext]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.expirations = 0
+
+    def load(self, user_id: str) -> Optional[UserContext]:
+        with self._lock:
+            record = self._records.get(user_id)
+            if record is None:
+                return None
+            if self.clock() - record.updated_at > self.ttl:
+                del self._records[user_id]
+                self.expirations += 1
+                return None
+            self._records.move_to_end(user_id)
+            return UserContext.from_dict(user_id, json.loads(json.dumps(record.to_dict())), record.updated_at)
+
+    def save(self, record: UserContext) -> None:
+        with self._lock:
+            record.updated_at = self.clock()
+            stored = UserContext.from_dict(record.user_id, json.loads(json.dumps(record.to_dict())), record.updated_at)
+            self._records[record.user_id] = stored
+            self._records.move_to_end(record.user_id)
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, user_id: str) -> bool:
+        with self._lock:
+            return self._records.pop(user_id, None) is not None
+
+    def update(self, user_id: str, mutate: Callable[[UserContext], None]) -> UserContext:
+        with self._lock:
+            record = self.load(user_id) or UserContext(user_id)
+            mutate(record)
+            self.save(record)
+            return record
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cutoff = self.clock() - self.ttl
+            expired = [user_id for user_id, record in self._records.items() if record.updated_at < cutoff]
+            for user_id in expired:
+                del self._records[user_id]
+            self.expirations += len(expired)
+            return len(expired)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
+
+
+class SQLiteContextBackend:
+    """Backend on a local SQLite file shared by all worker processes on the host."""
+
+    def __init__(
+        self,
+        db_path: str,
+        ttl: float,
+        max_entries: int,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.db_path = str(db_path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.evictions = 0
+        self.expirations = 0
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS user_contexts (
+                    user_id TEXT PRIMARY KEY,
+                    data TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_user_contexts_last_access ON user_contexts (last_access)")
+        # Row count maintained by triggers, seeded once from the existing rows
+        self._transaction(self._create_row_count)
+
+    @staticmethod
+    def _create_row_count(conn: sqlite3.Connection) -> None:
+        conn.execute("CREATE TABLE IF NOT EXISTS user_context_count (id INTEGER PRIMARY KEY CHECK (id = 0), n INTEGER NOT NULL)")
+        conn.execute("INSERT OR IGNORE INTO user_context_count (id, n) SELECT 0, COUNT(*) FROM user_contexts")
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS user_contexts_count_insert AFTER INSERT ON user_contexts
+            BEGIN UPDATE user_context_count SET n = n + 1 WHERE id = 0; END
+            """
+        )
+        conn.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS user_contexts_count_delete AFTER DELETE ON user_contexts
+            BEGIN UPDATE user_context_count SET n = n - 1 WHERE id = 0; END
+            """
+        )
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per operation keeps this safe across threads and forks.
+        return sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+
+    def _load(self, conn: sqlite3.Connection, user_id: str) -> Optional[UserContext]:
+        """The user's unexpired record; only writes to drop an expired row or refresh a stale last_access."""
+        row = conn.execute(
+            "SELECT data, updated_at, last_access FROM user_contexts WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = self.clock()
+        if now - row[1] > self.ttl:
+            # Only if nobody has saved it since we read it
+            if conn.execute(
+                "DELETE FROM user_contexts WHERE user_id = ? AND updated_at = ?", (user_id, row[1])
+            ).rowcount:
+                self.expirations += 1
+            return None
+        if now - row[2] > _ACCESS_TOUCH_INTERVAL:
+            conn.execute(
+                "UPDATE user_contexts SET last_access = ? WHERE user_id = ? AND last_access < ?",
+                (now, user_id, now),
+            )
+        return UserContext.from_dict(user_id, json.loads(row[0]), row[1])
+
+    def _save(self, conn: sqlite3.Connection, record: UserContext) -> None:
+        now = self.clock()
+        record.updated_at = now
+        conn.execute(
+            """
+            INSERT INTO user_contexts (user_id, data, updated_at, last_access) VALUES (?, ?, ?, ?)
+            ON CONFLICT(user_id) DO UPDATE SET
+                data = excluded.data, updated_at = excluded.updated_at, last_access = excluded.last_access
+            """,
+            (record.user_id, json.dumps(record.to_dict(), separators=(",", ":")), now, now),
+        )
+        excess = conn.execute("SELECT n FROM user_context_count WHERE id = 0").fetchone()[0] - self.max_entries
+        if excess > 0:
+            evicted = conn.execute(
+                """
+                DELETE FROM user_contexts WHERE user_id IN (
+                    SELECT user_id FROM user_contexts ORDER BY last_access ASC LIMIT ?
+                )
+                """,
+                (excess,),
+            ).rowcount
+            self.evictions += max(evicted, 0)
+
+    def _transaction(self, work: Callable[[sqlite3.Connection], object]) -> object:
+        with closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = work(conn)
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+            return result
+
+    def load(self, user_id: str) -> Optional[UserContext]:
+        # Autocommit: the read takes no write lock, the occasional touch / expiry is its own statement
+        with closing(self._connect()) as conn:
+            return self._load(conn, user_id)
+
+    def save(self, record: UserContext) -> None:
+        self._transaction(lambda conn: self._save(conn, record))
+
+    def delete(self, user_id: str) -> bool:
+        return self._transaction(
+            lambda conn: conn.execute("DELETE FROM user_contexts WHERE user_id = ?", (user_id,)).rowcount > 0
+        )
+
+    def update(self, user_id: str, mutate: Callable[[UserContext], None]) -> UserContext:
+        """Read-modify-write under one write transaction, so concurrent workers don't lose updates."""
+
+        def work(conn: sqlite3.Connection) -> UserContext:
+            record = self._load(conn, user_id) or UserContext(user_id)
+            mutate(record)
+            self._save(conn, record)
+            return record
+
+        return self._transaction(work)
+
+    def purge_expired(self) -> int:
+        expired = self._transaction(
+            lambda conn: conn.execute(
+                "DELETE FROM user_contexts WHERE updated_at < ?", (self.clock() - self.ttl,)
+            ).rowcount
+        )
+        self.expirations += expired
+        return expired
+
+    def __len__(self) -> int:
+        with closing(self._connect()) as conn:
+            return conn.execute("SELECT n FROM user_context_count WHERE id = 0").fetchone()[0]
+
+
+class ContextStore:
+    """Conversation context operations used by chat.py and app.py, independent of the backend."""
+
+    def __init__(self, backend) -> None:
+        self.backend = backend
+
+    def get(self, user_id: str) -> Optional[UserContext]:
+        return self.backend.load(user_id)
+
+    def snapshot(self, user_id: str) -> Optional[Dict[str, object]]:
+        """Plain-dict view of a user's context (for logging and API responses)."""
+        record = self.backend.load(user_id)
+        return record.to_dict() if record else None
+
+    def __contains__(self, user_id: str) -> bool:
+        return self.backend.load(user_id) is not None
+
+    def get_current_office(self, user_id: str) -> Optional[str]:
+        record = self.backend.load(user_id)
+        return record.current_office if record else None
+
+    def get_pending_switch(self, user_id: str) -> Optional[str]:
+        record = self.backend.load(user_id)
+        return record.pending_switch if record else None
+
+    def set_current_office(self, user_id: str, office_tag: Optional[str], clear_pending: bool = False) -> None:
+        def mutate(record: UserContext) -> None:
+            record.current_office = office_tag
+            if office_tag:
+                record.ensure_office(office_tag)
+            if clear_pending:
+                record.pending_switch = None
+
+        self.backend.update(user_id, mutate)
+
+    def set_pending_switch(self, user_id: str, office_tag: Optional[str]) -> None:
+        def mutate(record: UserContext) -> None:
+            record.pending_switch = office_tag
+
+        self.backend.update(user_id, mutate)
+
+    def reset_office(self, user_id: str, office_tag: str) -> Optional[UserContext]:
+        """Clear one office's state (and the current office if it is that office)."""
+        if self.backend.load(user_id) is None:
+            return None
+
+        def mutate(record: UserContext) -> None:
+            if record.current_office == office_tag:
+                record.current_office = None
+            if office_tag in record.offices:
+                record.offices[office_tag] = {"messages": [], "last_intent": None}
+
+        return self.backend.update(user_id, mutate)
+
+    def delete(self, user_id: str) -> bool:
+        return self.backend.delete(user_id)
+
+    def purge_expired(self) -> int:
+        return self.backend.purge_expired()
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "backend": type(self.backend).__name__,
+            "users": len(self.backend),
+            "ttl_seconds": self.backend.ttl,
+            "max_entries": self.backend.max_entries,
+            "evictions": self.backend.evictions,
+            "expirations": self.backend.expirations,
+        }
+
+
+def create_context_store(
+    backend: Optional[str] = None,
+    *,
+    db_path: Optional[str] = None,
+    ttl: Optional[float] = None,
+    max_entries: Optional[int] = None,
+) -> ContextStore:
+    """
+    Build a ContextStore from arguments or the environment:
+    CONTEXT_STORE_BACKEND (sqlite | memory), CONTEXT_STORE_PATH,
+    CONTEXT_STORE_TTL (seconds) and CONTEXT_STORE_MAX_USERS.
+    """
+    backend = (backend or os.getenv("CONTEXT_STORE_BACKEND", "sqlite")).lower()
+    ttl = ttl if ttl is not None else float(os.getenv("CONTEXT_STORE_TTL", str(6 * 60 * 60)))
+    max_entries = max_entries if max_entries is not None else int(os.getenv("CONTEXT_STORE_MAX_USERS", "10000"))
+
+    if backend == "sqlite":
+        db_path = db_path or os.getenv(
+            "CONTEXT_STORE_PATH", os.path.join(tempfile.gettempdir(), "tcc_user_contexts.sqlite3")
+        )
+        try:
+            return ContextStore(SQLiteContextBackend(db_path, ttl=ttl, max_entries=max_entries))
+        except sqlite3.Error as exc:
+            print(f"[ContextStore] SQLite backend unavailable ({exc}); using in-process contexts")
+
+    return ContextStore(MemoryContextBackend(ttl=ttl, max_entries=max_entries))
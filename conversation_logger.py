@@ -0,0 +1,396 @@
+"""
+conversation_logger.py
+----------------------
+Write-behind logging of chat messages to MongoDB.
+
+``ConversationLogger.log`` only puts the document on a bounded in-memory queue,
+so the request thread never waits on the database. A background thread drains
+the queue with ``insert_many`` once ``batch_size`` documents are waiting or
+``flush_interval`` seconds have passed, and flushes whatever is left at
+shutdown. Batches that cannot be written (MongoDB down or not configured) are
+spilled to a local JSONL file and replayed once the database is reachable
+again, by the process that wrote it or, once that process has exited, by
+any other; lines that cannot be parsed are moved to ``<file>.bad``. When
+the queue is full new messages are dropped and counted rather than blocking
+the reply.
+
+With a SessionTracker (chat_sessions.py) each batch is also sessionised on the
+writer thread: messages get a ``session_id`` before the insert and the
+``chat_sessions`` documents of the inserted ones are upserted after it (rows
+whose upsert fails keep ``session_pending`` for the session backfill). An
+``on_written`` callback is handed every inserted batch (the analytics response
+cache counts them towards invalidation, see response_cache.py).
+"""
+
+from __future__ import annotations
+
+import atexit
+import glob
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional
+
+from bson import json_util
+from pymongo.errors import BulkWriteError
+
+if TYPE_CHECKING:
+    from chat_sessions import SessionTracker
+
+CONVERSATION_LOG_QUEUE_SIZE = int(os.getenv("CONVERSATION_LOG_QUEUE_SIZE", "10000"))
+CONVERSATION_LOG_BATCH_SIZE = int(os.getenv("CONVERSATION_LOG_BATCH_SIZE", "100"))
+CONVERSATION_LOG_FLUSH_SECONDS = float(os.getenv("CONVERSATION_LOG_FLUSH_SECONDS", "1.0"))
+CONVERSATION_LOG_SPILL_DIR = os.getenv(
+    "CONVERSATION_LOG_SPILL_DIR", os.path.join(tempfile.gettempdir(), "tcc_conversation_spill")
+)
+# Minimum seconds between reconnect attempts / spill replays while MongoDB is unavailable
+CONVERSATION_LOG_RETRY_SECONDS = float(os.getenv("CONVERSATION_LOG_RETRY_SECONDS", "30"))
+
+
+class ConversationLogger:
+    """
+    Bounded queue + background batch writer for one conversations collection.
+
+    Args:
+        get_collection: Returns the current collection (or None when offline).
+        name: Used for the thread name and spill file names.
+        reconnect: Optional callable that re-establishes the connection and
+            returns the new collection (or None); called at most every
+            CONVERSATION_LOG_RETRY_SECONDS.
+        sessions: Optional SessionTracker maintaining ``chat_sessions``.
+        on_written: Optional callable receiving each list of inserted documents.
+    """
+
+    def __init__(
+        self,
+        get_collection: Callable[[], object],
+        *,
+        name: str = "conversations",
+        reconnect: Optional[Callable[[], object]] = None,
+        max_queue: int = CONVERSATION_LOG_QUEUE_SIZE,
+        batch_size: int = CONVERSATION_LOG_BATCH_SIZE,
+        flush_interval: float = CONVERSATION_LOG_FLUSH_SECONDS,
+        spill_dir: str = CONVERSATION_LOG_SPILL_DIR,
+        retry_interval: float = CONVERSATION_LOG_RETRY_SECONDS,
+        sessions: Optional["SessionTracker"] = None,
+        on_written: Optional[Callable[[List[Dict[str, object]]], None]] = None,
+    ) -> None:
+        self.get_collection = get_collection
+        self.name = name
+        self.reconnect = reconnect
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.spill_dir = spill_dir
+        self.retry_interval = retry_interval
+        self.sessions = sessions
+        self.on_written = on_written
+
+        self._lock = threading.Lock()
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._pid: Optional[int] = None
+        self._atexit_registered = False
+        self._last_retry = 0.0
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.quarantined = 0
+        self.batches = 0
+        self.last_error: Optional[str] = None
+        self.last_flush_at: Optional[float] = None
+
+    # ------------------------------------------------------------- producers
+
+    def log(self, document: Dict[str, object]) -> bool:
+        """Queue a document for writing. Returns False if it was dropped because the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(document)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 100 == 0:
+                print(f"[ConversationLog] Queue full ({self.max_queue}); dropped {self.dropped} message(s) so far")
+            return False
+        self.enqueued += 1
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far has been written or spilled."""
+        if self._queue is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Stop the writer thread after draining the queue (registered with atexit)."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self.flush(timeout)
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_capacity": self.max_queue,
+            "enqueued": self.enqueued,
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed,
+            "spilled": self.spilled,
+            "replayed": self.replayed,
+            "quarantined": self.quarantined,
+            "spill_files": len(self._spill_files()),
+            "batches": self.batches,
+            "last_flush_at": self.last_flush_at,
+            "last_error": self.last_error,
+            "sessions": self.sessions.metrics() if self.sessions is not None else None,
+        }
+
+    # ---------------------------------------------------------------- writer
+
+    def _ensure_started(self) -> None:
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            if self._pid != pid or self._queue is None:
+                # New process (e.g. after a fork): never reuse the parent's queue or thread
+                self._queue = queue.Queue(maxsize=self.max_queue)
+            self._pid = pid
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name=f"conversation-log-{self.name}", daemon=True
+            )
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.close)
+                self._atexit_registered = True
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            try:
+                if batch:
+                    self._write(batch)
+                elif self._replayable_spill_files() and time.monotonic() - self._last_retry >= self.retry_interval:
+                    self._replay_spill()
+            except Exception as exc:
+                self.last_error = str(exc)
+                print(f"[ConversationLog] Writer error: {exc}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _next_batch(self) -> List[Dict[str, object]]:
+        """Collect up to batch_size documents, waiting at most flush_interval after the first one."""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _collection(self):
+        collection = self.get_collection()
+        if collection is None and self.reconnect is not None:
+            if time.monotonic() - self._last_retry >= self.retry_interval:
+                self._last_retry = time.monotonic()
+                try:
+                    collection = self.reconnect()
+                except Exception as exc:
+                    self.last_error = f"reconnect: {exc}"
+        return collection
+
+    def _insert(self, collection, documents: List[Dict[str, object]]) -> int:
+        """insert_many that treats per-document errors (e.g. duplicate _id on replay) as handled."""
+        # High-water mark for the rollup job (conversation_rollups.py); restamped on spill replay
+        logged_at = datetime.now(timezone.utc)
+        for document in documents:
+            document["logged_at"] = logged_at
+        if self.sessions is not None:
+            try:
+                self.sessions.assign(collection, documents)
+            except Exception as exc:
+                # Still written, marked for the session backfill (chat_sessions.py)
+                self.last_error = f"sessions: {exc}"
+                for document in documents:
+                    document.setdefault("session_pending", True)
+        try:
+            collection.insert_many(documents, ordered=False)
+            inserted_documents = documents
+        except BulkWriteError as exc:
+            rejected = {error.get("index") for error in exc.details.get("writeErrors", [])}
+            inserted_documents = [document for index, document in enumerate(documents) if index not in rejected]
+            self.failed += len(documents) - exc.details.get("nInserted", 0)
+            self.last_error = f"bulk write: {len(rejected)} error(s)"
+        if self.sessions is not None:
+            try:
+                self.sessions.record(collection, inserted_documents)
+            except Exception as exc:
+                # The rows keep session_pending, so the session backfill counts them
+                self.last_error = f"sessions: {exc}"
+                print(f"[ConversationLog] Session update failed (left for the backfill): {exc}")
+        if self.on_written is not None and inserted_documents:
+            try:
+                self.on_written(inserted_documents)
+            except Exception as exc:
+                self.last_error = f"on_written: {exc}"
+        return len(inserted_documents)
+
+    def _write(self, batch: List[Dict[str, object]]) -> None:
+        collection = self._collection()
+        if collection is None:
+            self._spill(batch, "MongoDB not available")
+            return
+        try:
+            self.written += self._insert(collection, batch)
+        except Exception as exc:
+            self._spill(batch, str(exc))
+            return
+        self.batches += 1
+        self.last_flush_at = time.time()
+        if self._replayable_spill_files() and time.monotonic() - self._last_retry >= self.retry_interval:
+            self._replay_spill()
+
+    # ----------------------------------------------------------------- spill
+
+    def _spill_path(self) -> str:
+        # One file per process so concurrent workers never interleave writes
+        return os.path.join(self.spill_dir, f"{self.name}-{os.getpid()}.jsonl")
+
+    def _spill_files(self) -> List[str]:
+        return glob.glob(os.path.join(self.spill_dir, f"{self.name}-*.jsonl"))
+
+    def _spill(self, batch: List[Dict[str, object]], reason: str) -> None:
+        self.last_error = reason
+        if self._append_spill(batch):
+            self.spilled += len(batch)
+            print(f"[ConversationLog] Spilled {len(batch)} message(s) to {self._spill_path()} ({reason})")
+
+    def _append_spill(self, documents: List[Dict[str, object]]) -> bool:
+        try:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            with open(self._spill_path(), "a", encoding="utf-8") as fh:
+                for document in documents:
+                    fh.write(json_util.dumps(document) + "\n")
+            return True
+        except Exception as exc:
+            self.dropped += len(documents)
+            print(f"[ConversationLog] Failed to spill {len(documents)} message(s): {exc}")
+            return False
+
+    @staticmethod
+    def _pid_alive(pid_text: str) -> bool:
+        """Whether the process owning a spill file or claim is still running (unparseable counts as alive)."""
+        try:
+            os.kill(int(pid_text), 0)
+        except ProcessLookupError:
+            return False
+        except (ValueError, OSError):
+            return True
+        return True
+
+    def _orphaned_claims(self) -> List[str]:
+        """Replay claims left behind by a process that died mid-replay, or by an unfinished replay of this one."""
+        own = str(os.getpid())
+        claims = []
+        for path in glob.glob(os.path.join(self.spill_dir, f"{self.name}-*.jsonl.replaying-*")):
+            pid_text = path.rsplit("-", 1)[1]
+            if pid_text == own or not self._pid_alive(pid_text):
+                claims.append(path)
+        return claims
+
+    def _replayable_spill_files(self) -> List[str]:
+        """
+        This process's spill file, those of dead processes and orphaned claims.
+        A live process's file is left to that process, which may still be appending to it.
+        """
+        own = self._spill_path()
+        files = [
+            path for path in self._spill_files()
+            if path == own or not self._pid_alive(path[:-len(".jsonl")].rsplit("-", 1)[1])
+        ]
+        return files + self._orphaned_claims()
+
+    def _quarantine(self, path: str, lines: List[str]) -> None:
+        """Move unreadable spill lines to ``<spill file>.bad`` so they neither block nor vanish."""
+        bad_path = f"{path.split('.replaying-')[0]}.bad"
+        try:
+            with open(bad_path, "a", encoding="utf-8") as fh:
+                fh.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+        except OSError as exc:
+            print(f"[ConversationLog] Failed to quarantine {len(lines)} spill line(s): {exc}")
+            return
+        self.quarantined += len(lines)
+        print(f"[ConversationLog] Quarantined {len(lines)} unreadable spill line(s) to {bad_path}")
+
+    def _replay_spill(self) -> None:
+        """Write spilled messages back to MongoDB; a file is claimed by renaming it so only one worker replays it."""
+        self._last_retry = time.monotonic()
+        collection = self.get_collection()
+        if collection is None:
+            return
+
+        for path in self._replayable_spill_files():
+            claimed = f"{path.split('.replaying-')[0]}.replaying-{os.getpid()}"
+            try:
+                os.replace(path, claimed)
+            except OSError:
+                continue  # another worker claimed it
+
+            documents: List[Dict[str, object]] = []
+            bad_lines: List[str] = []
+            try:
+                with open(claimed, "r", encoding="utf-8", errors="replace") as fh:
+                    for line in fh:
+                        if not line.strip():
+                            continue
+                        try:
+                            documents.append(json_util.loads(line))
+                        except Exception:
+                            bad_lines.append(line)  # e.g. a line cut short by a crash mid-append
+            except OSError as exc:
+                # The claim stays in place; this process picks it up again on the next retry
+                self.last_error = f"replay: {exc}"
+                print(f"[ConversationLog] Could not read {os.path.basename(claimed)}, will retry: {exc}")
+                return
+            if bad_lines:
+                self._quarantine(claimed, bad_lines)
+            written = 0
+            try:
+                for start in range(0, len(documents), self.batch_size):
+                    self.replayed += self._insert(collection, documents[start:start + self.batch_size])
+                    written = start + self.batch_size
+            except Exception as exc:
+                self.last_error = f"replay: {exc}"
+                print(f"[ConversationLog] Spill replay failed, will retry: {exc}")
+                # Re-spill what was not written (already-inserted _ids are rejected as duplicates)
+                self._append_spill(documents[written:])
+                os.unlink(claimed)
+                return
+            os.unlink(claimed)
+            print(f"[ConversationLog] Replayed {len(documents)} spilled message(s) from {os.path.basename(path)}")
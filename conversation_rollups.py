@@ -0,0 +1,630 @@
+"""
+conversation_rollups.py
+-----------------------
+Hourly and daily rollups of the ``conversations`` collection for the analytics
+pages (dashboard, usage, sub-admin dashboard and usage).
+
+Each rollup document covers one (granularity, bucket, office) and holds the
+message count, a ``counts`` map keyed ``"sender:status"`` and the bucket's
+users as ``[user, first_seen, last_seen, messages]`` rows, from which unique
+users are counted. Sessions are not derived here: chat_sessions.py maintains
+them at write time.
+
+The rollup job is incremental. ConversationLogger stamps every insert with
+``logged_at``; each run finds the days touched by messages logged since the
+previous high-water mark (plus the days since the last complete hour, for
+writes that do not go through the logger) and recomputes those days from the
+raw messages. Recomputing a whole day is idempotent, so overlapping runs, late
+spill replays and retries are harmless. Only one worker runs the job at a time
+(a lease in ``rollup_state``).
+
+Readers call ``summary`` / ``summaries`` / ``summary_by_office`` / ``series``:
+buckets before ``complete_until`` (the last hour the job has fully processed)
+come from the rollups, whole days from daily documents and the remaining whole
+hours from hourly ones; the leading partial hour and everything from
+``complete_until`` on (the live tail) are aggregated from the raw messages.
+``summaries`` takes several ranges (typically a period and the one before it)
+and still costs one rollup ``find`` plus one raw ``$facet`` aggregation (see
+analytics_queries.py). Until the first run has finished everything is read
+raw, which is what the endpoints did before.
+
+Each rollup document also carries a HyperLogLog sketch of its users (hll.py).
+Summaries over ranges longer than ``UNIQUE_USERS_EXACT_MAX_DAYS`` (or asked
+for with ``exact=False``) skip the per-user rows and estimate unique users by
+merging the sketches (1.6% standard error); shorter ranges, and callers that
+pass ``exact=True``, count them exactly.
+
+Run ``python conversation_rollups.py`` to catch up once, or with ``--rebuild``
+to recompute every day (e.g. after conversations were deleted).
+"""
+
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo import ReplaceOne
+from pymongo.errors import DuplicateKeyError
+
+from hll import HyperLogLog
+from analytics_queries import (HOUR_KEY_FORMAT, MESSAGE_TIME, Range, message_rows_facet,
+                               message_rows_stages, run_facets, time_match)
+
+# Seconds between rollup runs in each worker (only the lease holder does work)
+ROLLUP_INTERVAL_SECONDS = float(os.getenv("ROLLUP_INTERVAL_SECONDS", "300"))
+# How far behind "now" a message may still arrive (write-behind flush, clock skew)
+ROLLUP_LAG_SECONDS = float(os.getenv("ROLLUP_LAG_SECONDS", "120"))
+# A lease not renewed for this long is taken over by another worker
+ROLLUP_LEASE_SECONDS = float(os.getenv("ROLLUP_LEASE_SECONDS", str(max(ROLLUP_INTERVAL_SECONDS * 2, 600))))
+
+# Summaries over longer ranges estimate unique users from the HyperLogLog sketches
+UNIQUE_USERS_EXACT_MAX_DAYS = float(os.getenv("UNIQUE_USERS_EXACT_MAX_DAYS", "7"))
+
+ROLLUPS_COLLECTION = "conversation_rollups"
+STATE_COLLECTION = "rollup_state"
+STATE_ID = "conversations"
+# Bumped when the document layout changes; older rollups are read raw until rebuilt
+ROLLUP_SCHEMA = 3
+
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+# Raw pieces up to this long share one $facet aggregation; longer ones (no rollups yet) run on their own
+RAW_FACET_MAX_SPAN = DAY
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def floor_hour(value: datetime) -> datetime:
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+def floor_day(value: datetime) -> datetime:
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ceil_hour(value: datetime) -> datetime:
+    floored = floor_hour(value)
+    return floored if floored == value else floored + HOUR
+
+
+def ceil_day(value: datetime) -> datetime:
+    floored = floor_day(value)
+    return floored if floored == value else floored + DAY
+
+
+class RollupBucket:
+    """Messages, status counts and per-user activity for one office over some span of time."""
+
+    __slots__ = ("messages", "counts", "users", "sketch")
+
+    def __init__(self) -> None:
+        self.messages = 0
+        self.counts: Counter = Counter()
+        # (user, UTC day) -> [first_seen, last_seen, messages]
+        self.users: Dict[Tuple[str, datetime], List[object]] = {}
+        # Users of merged buckets that were loaded without their per-user rows
+        self.sketch: Optional[HyperLogLog] = None
+
+    def add_user(self, user: str, first: datetime, last: datetime, messages: int) -> None:
+        key = (user, floor_day(first))
+        span = self.users.get(key)
+        if span is None:
+            self.users[key] = [first, last, messages]
+        else:
+            span[0] = min(span[0], first)
+            span[1] = max(span[1], last)
+            span[2] += messages
+
+    def merge(self, other: "RollupBucket") -> None:
+        self.messages += other.messages
+        self.counts.update(other.counts)
+        for (user, _), (first, last, messages) in other.users.items():
+            self.add_user(user, first, last, messages)
+        if other.sketch is not None:
+            if self.sketch is None:
+                self.sketch = other.sketch.copy()
+            else:
+                self.sketch.merge(other.sketch)
+
+    def count(self, sender: Optional[str] = None, status: Optional[str] = None) -> int:
+        """Messages from ``sender`` with ``status`` (either may be None for any)."""
+        total = 0
+        for key, value in self.counts.items():
+            key_sender, _, key_status = key.partition(":")
+            if (sender is None or key_sender == sender) and (status is None or key_status == status):
+                total += value
+        return total
+
+    def status_counts(self) -> Counter:
+        """Messages per status, leaving out messages without one."""
+        statuses: Counter = Counter()
+        for key, value in self.counts.items():
+            status = key.partition(":")[2]
+            if status != "none":
+                statuses[status] += value
+        return statuses
+
+    @property
+    def unique_users(self) -> int:
+        """Exact from the per-user rows; estimated when some buckets only brought their sketch."""
+        if self.sketch is None:
+            return len({user for user, _ in self.users})
+        sketch = self.sketch.copy()
+        for user, _ in self.users:
+            sketch.add(user)
+        return sketch.count()
+
+    @property
+    def users_estimated(self) -> bool:
+        return self.sketch is not None
+
+    def to_document(self, granularity: str, bucket: datetime, office: str) -> Dict[str, object]:
+        spans: Dict[str, List[object]] = {}
+        for (user, _), (first, last, messages) in self.users.items():
+            span = spans.get(user)
+            if span is None:
+                spans[user] = [user, first, last, messages]
+            else:
+                span[1], span[2], span[3] = min(span[1], first), max(span[2], last), span[3] + messages
+        return {
+            "_id": f"{granularity}|{bucket.isoformat()}|{office}",
+            "granularity": granularity,
+            "bucket": bucket,
+            "office": office,
+            "messages": self.messages,
+            "counts": dict(self.counts),
+            "users": list(spans.values()),
+            "user_count": len(spans),
+            "hll": HyperLogLog.of(spans).to_bytes(),
+            "updated_at": utcnow(),
+        }
+
+    @classmethod
+    def from_document(cls, document: Dict[str, object]) -> "RollupBucket":
+        bucket = cls()
+        bucket.messages = document.get("messages", 0)
+        bucket.counts.update(document.get("counts", {}))
+        if "users" in document:
+            for user, first, last, messages in document["users"]:
+                bucket.add_user(user, first, last, messages)
+        elif "hll" in document:
+            bucket.sketch = HyperLogLog.from_bytes(document["hll"])
+        return bucket
+
+
+class ConversationRollups:
+    """Builds and reads the rollups for one database (see module docstring)."""
+
+    def __init__(self, db, *, lag_seconds: float = ROLLUP_LAG_SECONDS, lease_seconds: float = ROLLUP_LEASE_SECONDS) -> None:
+        self.conversations = db["conversations"]
+        self.rollups = db[ROLLUPS_COLLECTION]
+        self.state = db[STATE_COLLECTION]
+        self.lag = timedelta(seconds=lag_seconds)
+        self.lease_seconds = lease_seconds
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.runs = 0
+        self.days_rebuilt = 0
+        self.last_run: Optional[Dict[str, object]] = None
+        self.last_error: Optional[str] = None
+        self.raw_reads = 0
+        self.rollup_reads = 0
+
+    # ------------------------------------------------------------------ raw
+
+    def _raw_rows(self, start: Optional[datetime], end: Optional[datetime], office: Optional[str] = None) -> List[Dict[str, object]]:
+        """One row per (hour, office, user) with message counts by sender/status and first/last message time."""
+        match: Dict[str, object] = dict(time_match(start, end))
+        if office is not None:
+            match["office"] = office
+        return list(self.conversations.aggregate([{"$match": match}] + message_rows_stages(), allowDiskUse=True))
+
+    @staticmethod
+    def _fold(rows: Iterable[Dict[str, object]], granularity: Optional[str]) -> Dict[Tuple[Optional[datetime], str], RollupBucket]:
+        """Group raw rows into buckets keyed (bucket start, office); granularity None folds all time together."""
+        buckets: Dict[Tuple[Optional[datetime], str], RollupBucket] = {}
+        for row in rows:
+            key = row["_id"]
+            if key.get("hour") is None:
+                continue
+            hour = datetime.strptime(key["hour"], HOUR_KEY_FORMAT)
+            start = hour if granularity == "hour" else floor_day(hour) if granularity == "day" else None
+            bucket = buckets.setdefault((start, key["office"]), RollupBucket())
+            bucket.messages += row["messages"]
+            for item in row["counts"]:
+                bucket.counts[item["k"]] += item["v"]
+            bucket.add_user(key["user"], _naive_utc(row["first"]), _naive_utc(row["last"]), row["messages"])
+        return buckets
+
+    def _read_raw(
+        self, pieces: List[Tuple[str, Optional[datetime], datetime]], office: Optional[str], granularity: Optional[str]
+    ) -> Iterator[Tuple[str, Tuple[Optional[datetime], str], RollupBucket]]:
+        """
+        ``(name, bucket key, data)`` for named raw pieces: pieces up to a day
+        long share one ``$facet`` aggregation, longer ones run on their own.
+        """
+        short: Dict[str, Tuple[str, datetime, datetime]] = {}
+        for name, start, end in pieces:
+            if start is not None and end - start <= RAW_FACET_MAX_SPAN:
+                short[f"p{len(short)}"] = (name, start, end)
+            else:
+                self.raw_reads += 1
+                for key, data in self._fold(self._raw_rows(start, end, office), granularity).items():
+                    yield name, key, data
+        if short:
+            self.raw_reads += 1
+            pipeline = message_rows_facet({key: (start, end) for key, (_, start, end) in short.items()}, office)
+            facets = run_facets(self.conversations, pipeline)
+            for piece, (name, _, _) in short.items():
+                for key, data in self._fold(facets.get(piece, []), granularity).items():
+                    yield name, key, data
+
+    # ---------------------------------------------------------------- build
+
+    def rebuild_day(self, day: datetime) -> int:
+        """Recompute the hourly and daily documents of one UTC day from the raw messages."""
+        day = floor_day(day)
+        rows = self._raw_rows(day, day + DAY)
+        documents = []
+        for granularity in ("hour", "day"):
+            for (bucket, office), data in self._fold(rows, granularity).items():
+                documents.append(data.to_document(granularity, bucket, office))
+        ids = [document["_id"] for document in documents]
+        if documents:
+            self.rollups.bulk_write([ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in documents], ordered=False)
+        # Buckets whose messages have all been deleted
+        self.rollups.delete_many({"bucket": {"$gte": day, "$lt": day + DAY}, "_id": {"$nin": ids}})
+        self.days_rebuilt += 1
+        return len(documents)
+
+    def _touched_days(self, since: Optional[datetime]) -> List[datetime]:
+        """UTC days of messages logged at or after ``since`` (every day when None)."""
+        match = {"logged_at": {"$gte": since}} if since is not None else {}
+        pipeline = [
+            {"$match": match},
+            {"$group": {"_id": {"$dateToString": {"format": "%Y-%m-%d", "date": MESSAGE_TIME}}}},
+        ]
+        days = []
+        for row in self.conversations.aggregate(pipeline, allowDiskUse=True):
+            if row["_id"]:
+                days.append(datetime.strptime(row["_id"], "%Y-%m-%d"))
+        return days
+
+    def run_once(self, *, rebuild: bool = False) -> Dict[str, object]:
+        """Bring the rollups up to date; returns what was done (see ``last_run``)."""
+        started = time.perf_counter()
+        now = utcnow()
+        state = self.state.find_one({"_id": STATE_ID}) or {}
+        # Rollups written with another document layout are recomputed in full
+        rebuild = rebuild or state.get("schema") != ROLLUP_SCHEMA
+        hwm = None if rebuild else state.get("hwm")
+        complete_until = None if rebuild else state.get("complete_until")
+
+        days = set(self._touched_days(hwm - self.lag if hwm else None))
+        if complete_until is not None:
+            # Writes that bypass the logger carry no logged_at; recent days are always refreshed
+            day = floor_day(complete_until)
+            while day <= now:
+                days.add(day)
+                day += DAY
+
+        documents = 0
+        for day in sorted(days):
+            documents += self.rebuild_day(day)
+
+        new_complete = floor_hour(now - self.lag)
+        update: Dict[str, object] = {"$set": {
+            "hwm": now, "complete_until": new_complete, "last_run_at": now, "schema": ROLLUP_SCHEMA,
+        }}
+        if days:
+            if rebuild:
+                update["$set"]["first_day"] = min(days)
+            else:
+                update["$min"] = {"first_day": min(days)}
+        self.state.update_one({"_id": STATE_ID}, update, upsert=True)
+        self.runs += 1
+        self.last_run = {
+            "at": now.isoformat(),
+            "days": len(days),
+            "documents": documents,
+            "complete_until": new_complete.isoformat(),
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+        return self.last_run
+
+    def acquire_lease(self) -> bool:
+        """Take (or renew) the job lease; False while another worker holds it."""
+        now = utcnow()
+        try:
+            self.state.find_one_and_update(
+                {"_id": STATE_ID, "$or": [
+                    {"lease_owner": self.owner},
+                    {"lease_expires": {"$lt": now}},
+                    {"lease_expires": {"$exists": False}},
+                ]},
+                {"$set": {"lease_owner": self.owner, "lease_expires": now + timedelta(seconds=self.lease_seconds)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    def release_lease(self) -> None:
+        self.state.update_one({"_id": STATE_ID, "lease_owner": self.owner}, {"$unset": {"lease_expires": ""}})
+
+    def _read_state(self) -> Dict[str, object]:
+        state = self.state.find_one({"_id": STATE_ID}, {"complete_until": 1, "first_day": 1, "schema": 1}) or {}
+        # Until the job has rebuilt them in the current layout, read everything raw
+        return state if state.get("schema") == ROLLUP_SCHEMA else {}
+
+    def complete_until(self) -> Optional[datetime]:
+        return self._read_state().get("complete_until")
+
+    # ----------------------------------------------------------------- read
+
+    @staticmethod
+    def _plan(
+        start: Optional[datetime], end: datetime, state: Dict[str, object], *, use_days: bool = True
+    ) -> List[Tuple[str, Optional[datetime], datetime]]:
+        """Split [start, end) into ("raw" | "hour" | "day", piece_start, piece_end) pieces."""
+        complete = state.get("complete_until")
+        if complete is None:
+            return [("raw", start, end)]
+        if start is None:
+            # Nothing the job has seen is older than its first day
+            start = state.get("first_day")
+            if start is None:
+                return [("raw", None, end)]
+        rolled_end = min(end, complete)
+        first_hour, last_hour = ceil_hour(start), floor_hour(rolled_end)
+        if first_hour >= last_hour:
+            return [("raw", start, end)]
+
+        pieces: List[Tuple[str, Optional[datetime], datetime]] = []
+        if start < first_hour:
+            pieces.append(("raw", start, first_hour))
+        first_day, last_day = ceil_day(first_hour), floor_day(last_hour)
+        if use_days and first_day < last_day:
+            if first_hour < first_day:
+                pieces.append(("hour", first_hour, first_day))
+            pieces.append(("day", first_day, last_day))
+            if last_day < last_hour:
+                pieces.append(("hour", last_day, last_hour))
+        else:
+            pieces.append(("hour", first_hour, last_hour))
+        if last_hour < end:
+            pieces.append(("raw", last_hour, end))
+        return pieces
+
+    def _collect(
+        self,
+        ranges: Dict[str, Range],
+        office: Optional[str],
+        granularity: Optional[str],
+        users: bool = True,
+        sketches: bool = False,
+    ) -> Dict[str, Dict[Tuple[Optional[datetime], str], RollupBucket]]:
+        """
+        Buckets for each named [start, end) range, keyed (bucket start, office).
+        Rollup documents bring their per-user rows when ``users`` is set, else
+        their user sketch when ``sketches`` is set (raw edges always have rows).
+
+        However many ranges are asked for, this is one state read, one ``find``
+        over the rollups and one ``$facet`` aggregation over the raw edges.
+        """
+        state = self._read_state()
+        now = utcnow()
+        results: Dict[str, Dict[Tuple[Optional[datetime], str], RollupBucket]] = {name: {} for name in ranges}
+
+        def put(name: str, key, data: RollupBucket) -> None:
+            existing = results[name].get(key)
+            if existing is None:
+                results[name][key] = data
+            else:
+                existing.merge(data)
+
+        raw_pieces: List[Tuple[str, Optional[datetime], datetime]] = []
+        rollup_pieces: List[Tuple[str, str, datetime, datetime]] = []
+        for name, (start, end) in ranges.items():
+            start = _naive_utc(start) if start is not None else None
+            end = _naive_utc(end) if end is not None else now
+            for source, piece_start, piece_end in self._plan(start, end, state, use_days=granularity != "hour"):
+                if source == "raw":
+                    raw_pieces.append((name, piece_start, piece_end))
+                else:
+                    rollup_pieces.append((name, source, piece_start, piece_end))
+
+        for name, key, data in self._read_raw(raw_pieces, office, granularity):
+            put(name, key, data)
+
+        if rollup_pieces:
+            self.rollup_reads += 1
+            query: Dict[str, object] = {"$or": [
+                {"granularity": source, "bucket": {"$gte": s, "$lt": e}} for _, source, s, e in rollup_pieces
+            ]}
+            if office is not None:
+                query["office"] = office
+            if users:
+                projection = {"hll": 0}
+            else:
+                projection = {"users": 0} if sketches else {"users": 0, "hll": 0}
+            for document in self.rollups.find(query, projection):
+                bucket = document["bucket"]
+                key = (floor_day(bucket) if granularity == "day" else bucket if granularity == "hour" else None,
+                       document["office"])
+                for name, source, s, e in rollup_pieces:
+                    if document["granularity"] == source and s <= bucket < e:
+                        put(name, key, RollupBucket.from_document(document))
+        return results
+
+    @staticmethod
+    def _exact_users(ranges: Dict[str, Range]) -> bool:
+        """Count users exactly when every range is bounded and short enough."""
+        limit = timedelta(days=UNIQUE_USERS_EXACT_MAX_DAYS)
+        now = utcnow()
+        for start, end in ranges.values():
+            if start is None:
+                return False
+            end = _naive_utc(end) if end is not None else now
+            if end - _naive_utc(start) > limit:
+                return False
+        return True
+
+    def summaries(
+        self,
+        ranges: Dict[str, Range],
+        office: Optional[str] = None,
+        *,
+        exact: Optional[bool] = None,
+        count_users: bool = True,
+    ) -> Dict[str, RollupBucket]:
+        """
+        Totals for several named ranges at once, e.g. ``analytics_queries.period_ranges``.
+
+        ``exact=None`` counts unique users exactly for short ranges and from the
+        sketches otherwise; pass ``exact=True`` when per-user rows are needed, or
+        ``count_users=False`` when only message counts are.
+        """
+        if exact is None:
+            exact = self._exact_users(ranges)
+        users, sketches = (exact, not exact) if count_users else (False, False)
+        totals = {}
+        for name, buckets in self._collect(ranges, office, None, users=users, sketches=sketches).items():
+            total = totals[name] = RollupBucket()
+            for data in buckets.values():
+                total.merge(data)
+        return totals
+
+    def summary(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        office: Optional[str] = None,
+        *,
+        exact: Optional[bool] = None,
+        count_users: bool = True,
+    ) -> RollupBucket:
+        """Totals for [start, end) (all time when start is None; up to now when end is None)."""
+        return self.summaries({"range": (start, end)}, office, exact=exact, count_users=count_users)["range"]
+
+    def summary_by_office(
+        self, start: Optional[datetime] = None, end: Optional[datetime] = None, *, exact: Optional[bool] = None
+    ) -> Dict[str, RollupBucket]:
+        ranges = {"range": (start, end)}
+        if exact is None:
+            exact = self._exact_users(ranges)
+        buckets = self._collect(ranges, None, None, users=exact, sketches=not exact)["range"]
+        return {office: data for (_, office), data in buckets.items()}
+
+    def series(
+        self,
+        granularity: str,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        office: Optional[str] = None,
+        *,
+        users: bool = True,
+    ) -> Dict[datetime, RollupBucket]:
+        """
+        Per-hour or per-day buckets (UTC) for [start, end); buckets without
+        messages are absent. ``users=False`` skips loading the per-user rows
+        when only message counts are needed.
+        """
+        if granularity not in ("hour", "day"):
+            raise ValueError(f"Unsupported granularity: {granularity}")
+        series: Dict[datetime, RollupBucket] = {}
+        for (bucket, _), data in self._collect({"range": (start, end)}, office, granularity, users)["range"].items():
+            if bucket in series:
+                series[bucket].merge(data)
+            else:
+                series[bucket] = data
+        return series
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "runs": self.runs,
+            "days_rebuilt": self.days_rebuilt,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+            "rollup_reads": self.rollup_reads,
+            "raw_reads": self.raw_reads,
+        }
+
+
+class RollupScheduler:
+    """Background thread running ``ConversationRollups.run_once`` every interval while holding the lease."""
+
+    def __init__(self, rollups: ConversationRollups, *, interval: float = ROLLUP_INTERVAL_SECONDS) -> None:
+        self.rollups = rollups
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="conversation-rollups", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.rollups.acquire_lease():
+                    run = self.rollups.run_once()
+                    if run["days"]:
+                        print(f"[Rollups] Rebuilt {run['days']} day(s), {run['documents']} bucket(s) in {run['seconds']}s")
+            except Exception as exc:
+                self.rollups.last_error = str(exc)
+                print(f"[Rollups] Run failed: {exc}")
+            self._stop.wait(self.interval)
+
+
+_rollups: Dict[int, ConversationRollups] = {}
+_rollups_lock = threading.Lock()
+
+
+def get_conversation_rollups(db) -> ConversationRollups:
+    """One ConversationRollups per database object, shared by the blueprints using it."""
+    key = id(db)
+    rollups = _rollups.get(key)
+    if rollups is None:
+        with _rollups_lock:
+            rollups = _rollups.get(key)
+            if rollups is None:
+                rollups = _rollups[key] = ConversationRollups(db)
+    return rollups
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Catch up (or rebuild) the conversation rollups")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every day from the raw messages")
+    args = parser.parse_args()
+
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        raise SystemExit("MONGODB_URI is not set")
+    job = ConversationRollups(MongoClient(uri)["chatbot_db"])
+    result = job.run_once(rebuild=args.rebuild)
+    print(f"[Rollups] {result['days']} day(s), {result['documents']} bucket(s), "
+          f"complete until {result['complete_until']} in {result['seconds']}s")
@@ -3,6 +3,10 @@ from pymongo import MongoClient
 from datetime import datetime, timedelta
 import os
 
+from conversation_rollups import get_conversation_rollups
+from response_cache import cached_view
+from time_buckets import resolve_timezone, to_utc, usage_chart
+
 # Blueprint for dashboard routes
 dashboard_bp = Blueprint("dashboard", __name__, url_prefix="/api/dashboard")
 
@@ -39,6 +43,7 @@ def get_db():
             def delete_one(self, *args, **kwargs): return type('Result', (), {'deleted_count': 1})()
             def count_documents(self, *args, **kwargs): return 0
             def distinct(self, *args, **kwargs): return []
+            def aggregate(self, *args, **kwargs): return []  # Rollup and analytics reads come back empty
         return MockDB()
 
 # Initialize collections with lazy loading
@@ -46,11 +51,14 @@ db = get_db()
 conversations = db["conversations"]
 sub_users = db["sub_users"]
 faqs_collection = db["faqs"]
+# Hourly/daily conversation rollups (conversation_rollups.py) plus a live tail of raw messages
+rollups = get_conversation_rollups(db)
 
 # -------------------------------
 # KPIs
 # -------------------------------
 @dashboard_bp.route("/kpis", methods=["GET"])
+@cached_view("dashboard.kpis")
 def get_kpis():
     try:
         # Optional date range filtering
@@ -72,19 +80,18 @@ def get_kpis():
             except Exception:
                 pass
 
-        match_stage = {"timestamp": date_filter} if date_filter else {}
+        summary = rollups.summary(date_filter.get("$gte"), date_filter.get("$lt"))
 
         # Unique users
-        unique_users = len(conversations.distinct("user", filter=match_stage if match_stage else None))
+        unique_users = summary.unique_users
 
         # Total conversations
-        total_conversations = conversations.count_documents(match_stage if match_stage else {})
+        total_conversations = summary.messages
 
         # Resolution breakdown
-        status_base = match_stage.copy() if match_stage else {}
-        resolved_queries = conversations.count_documents({**status_base, "status": "resolved"})
-        unresolved_queries = conversations.count_documents({**status_base, "status": "unresolved"})
-        escalated_issues = conversations.count_documents({**status_base, "status": "escalated"})
+        resolved_queries = summary.count(status="resolved")
+        unresolved_queries = summary.count(status="unresolved")
+        escalated_issues = summary.count(status="escalated")
 
         # Success rate (resolved / total)
         success_rate = (
@@ -108,94 +115,33 @@ def get_kpis():
 # Usage Trends
 # -------------------------------
 @dashboard_bp.route("/usage/<period>", methods=["GET"])
+@cached_view("dashboard.usage-trends")
 def get_usage(period):
     try:
-        # Use UTC consistently for time buckets
-        now = datetime.utcnow()
-        labels, data = [], []
-        
         print(f"Fetching usage data for period: {period}")
 
-        # Optional date range filtering
+        # Buckets are cut in the requested (or configured) timezone
+        tz = resolve_timezone(request.args.get('tz'))
+
+        # Optional date range filtering (local dates)
+        start_time = end_time = None
         start_param = request.args.get('start_date')
         end_param = request.args.get('end_date')
-        date_filter = {}
         if start_param:
             try:
-                start_dt = datetime.strptime(start_param, "%Y-%m-%d")
-                date_filter.setdefault("$gte", start_dt)
+                start_time = to_utc(datetime.strptime(start_param, "%Y-%m-%d"), tz)
             except Exception:
                 pass
         if end_param:
             try:
-                end_dt = datetime.strptime(end_param, "%Y-%m-%d")
-                date_filter.setdefault("$lt", end_dt + timedelta(days=1))
+                end_time = to_utc(datetime.strptime(end_param, "%Y-%m-%d") + timedelta(days=1), tz)
             except Exception:
                 pass
 
-        if period == "hourly":
-            # Past 24 hours
-            start_time = now - timedelta(hours=23)
-            pipeline = [
-                {"$match": {"timestamp": {**({"$gte": start_time} if not date_filter.get("$gte") else {}), **date_filter}}},
-                {"$group": {
-                    "_id": {"$dateToString": {"format": "%Y-%m-%dT%H", "date": "$timestamp"}},
-                    "count": {"$sum": 1}
-                }},
-                {"$sort": {"_id": 1}}
-            ]
-            results = list(conversations.aggregate(pipeline))
-            labels = [f"{i}:00" for i in range(24)]
-            counts = {r["_id"][-2:]: r["count"] for r in results}
-            data = [counts.get(f"{i:02}", 0) for i in range(24)]
-
-        elif period == "daily":
-            # Past 7 days
-            start_time = now - timedelta(days=6)
-            pipeline = [
-                {"$match": {"timestamp": {**({"$gte": start_time} if not date_filter.get("$gte") else {}), **date_filter}}},
-                {"$group": {
-                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}},
-                    "count": {"$sum": 1}
-                }},
-                {"$sort": {"_id": 1}}
-            ]
-            results = list(conversations.aggregate(pipeline))
-            labels = [(now - timedelta(days=i)).strftime("%b %d") for i in range(6, -1, -1)]
-            counts = {r["_id"]: r["count"] for r in results}
-            data = [counts.get((now - timedelta(days=i)).strftime("%Y-%m-%d"), 0) for i in range(6, -1, -1)]
-
-        elif period == "weekly":
-            # Past 4 weeks
-            labels = []
-            data = []
-            
-            for i in range(3, -1, -1):  # 3 weeks ago to current week
-                week_start = now - timedelta(weeks=i+1)
-                week_end = now - timedelta(weeks=i)
-                
-                # Create readable label
-                if i == 0:
-                    label = "This Week"
-                elif i == 1:
-                    label = "Last Week"
-                else:
-                    label = f"{i+1} Weeks Ago"
-                
-                # Count conversations for this week
-                date_bounds = {
-                    "$gte": week_start,
-                    "$lt": week_end
-                }
-                if date_filter.get("$gte") and date_filter["$gte"] > date_bounds["$gte"]:
-                    date_bounds["$gte"] = date_filter["$gte"]
-                if date_filter.get("$lt") and date_filter["$lt"] < date_bounds["$lt"]:
-                    date_bounds["$lt"] = date_filter["$lt"]
-                count = conversations.count_documents({"timestamp": date_bounds})
-                
-                labels.append(label)
-                data.append(count)
-            
+        if period not in ("hourly", "daily", "weekly"):
+            return jsonify({"labels": [], "data": []})
+        labels, data = usage_chart(rollups, period, start_time, end_time, tz)
+        if period == "weekly":
             print(f"Weekly data - Labels: {labels}, Data: {data}")
 
         return jsonify({"labels": labels, "data": data})
@@ -211,6 +157,7 @@ def get_usage(period):
 # Department Distribution
 # -------------------------------
 @dashboard_bp.route("/departments", methods=["GET"])
+@cached_view("dashboard.department-distribution")
 def get_departments():
     try:
         # Optional date range filtering
@@ -240,17 +187,13 @@ def get_departments():
         ]
         
         # Get all conversations grouped by office
-        pipeline = []
-        if date_filter:
-            pipeline.append({"$match": {"timestamp": date_filter}})
-        pipeline.append({"$group": {"_id": "$office", "count": {"$sum": 1}}})
-        results = list(conversations.aggregate(pipeline))
+        by_office = rollups.summary_by_office(date_filter.get("$gte"), date_filter.get("$lt"))
         
         # Create a dictionary for easy lookup with all database values
         office_counts = {}
-        for r in results:
-            if r["_id"]:
-                office_counts[r["_id"]] = r["count"]
+        for office, office_data in by_office.items():
+            if office:
+                office_counts[office] = office_data.messages
         
         print(f"DEBUG: Raw office counts from database: {office_counts}")
         
@@ -207,7 +207,7 @@ def seed_sample_data(force: bool = False, documents: Optional[Sequence[dict]] =
         return 0
 
     collection = get_context_collection()
-    if not collection:
+    if collection is None:
         return 0
 
     payload: Iterable[dict] = documents if documents is not None else SAMPLE_CONTEXT_DOCUMENTS
@@ -0,0 +1,191 @@
+"""
+db_indexes.py
+-------------
+The MongoDB indexes the application's queries rely on, declared in one place.
+
+``INDEXES`` lists, per collection, the key patterns behind the main queries
+(chat history by user, office and status pages, time ranges, the rollup
+job's ``logged_at`` scan, the website sections ``$text`` search, FAQ and
+feedback lists sorted by ``created_at``, ...). ``ensure_indexes(db)`` creates
+whichever are missing; an existing index with the same keys (or the same
+keys all reversed) counts as present whatever its name, so indexes created
+by hand or by older scripts are reused rather than duplicated. A collection can hold a single text
+index: if one with different fields exists it is reported, not replaced.
+
+The app ensures the indexes in a background thread at startup
+(``DB_INDEXES_ON_STARTUP``, on by default); ``python db_indexes.py`` does the
+same from the command line, ``--dry-run`` only lists what is missing.
+benchmark_indexes.py runs the main queries with ``explain()`` and flags any
+collection scan.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, TEXT
+from pymongo.errors import PyMongoError
+
+from database import CONTEXT_COLLECTION_NAME
+from notifications_feed import COUNTERS_COLLECTION, NOTIFICATIONS_COLLECTION, NOTIFICATIONS_TTL_DAYS
+
+DB_INDEXES_ON_STARTUP = os.getenv("DB_INDEXES_ON_STARTUP", "true").lower() in {"1", "true", "yes"}
+
+
+class IndexSpec(NamedTuple):
+    collection: str
+    keys: Tuple[Tuple[str, object], ...]
+    purpose: str
+    options: Dict[str, object] = {}
+
+    @property
+    def is_text(self) -> bool:
+        return any(direction == TEXT for _, direction in self.keys)
+
+
+INDEXES: List[IndexSpec] = [
+    # conversations: written by ConversationLogger, read by every analytics page
+    IndexSpec("conversations", (("user", ASCENDING), ("timestamp", DESCENDING)), "chat history and per-user ranges"),
+    IndexSpec("conversations", (("user_id", ASCENDING), ("timestamp", DESCENDING)), "legacy history fallback",
+              {"sparse": True}),
+    IndexSpec("conversations", (("office", ASCENDING), ("timestamp", DESCENDING)), "office ranges and exports"),
+    IndexSpec("conversations", (("status", ASCENDING), ("timestamp", DESCENDING)), "unresolved / escalated lists"),
+    IndexSpec("conversations", (("timestamp", ASCENDING),), "time ranges (KPIs, usage alerts, live tail)"),
+    IndexSpec("conversations", (("logged_at", ASCENDING),), "rollup job high-water mark"),
+    IndexSpec("conversations", (("office", ASCENDING), ("date", DESCENDING)), "sub-admin recent conversations"),
+    IndexSpec("conversations", (("date", DESCENDING),), "recent activity and ISO date fallback"),
+    IndexSpec("conversations", (("session_id", ASCENDING),), "chat session rebuilds", {"sparse": True}),
+    IndexSpec("conversations", (("session_pending", ASCENDING),), "chat session backfill", {"sparse": True}),
+    # analytics derived from conversations
+    IndexSpec("conversation_rollups", (("granularity", ASCENDING), ("bucket", ASCENDING), ("office", ASCENDING)),
+              "rollup reads"),
+    IndexSpec("conversation_rollups", (("bucket", ASCENDING),), "rollup day rebuilds"),
+    IndexSpec("chat_sessions", (("user", ASCENDING), ("end", DESCENDING)), "session assignment"),
+    IndexSpec("chat_sessions", (("start", ASCENDING),), "session statistics and exports"),
+    IndexSpec("chat_sessions", (("offices", ASCENDING), ("start", ASCENDING)), "office session statistics"),
+    # content
+    IndexSpec(CONTEXT_COLLECTION_NAME, (("title", TEXT), ("tags", TEXT), ("page", TEXT), ("content", TEXT)),
+              "find_relevant_content $text search",
+              {"weights": {"title": 10, "tags": 5, "page": 3, "content": 1}, "default_language": "english"}),
+    IndexSpec(CONTEXT_COLLECTION_NAME, (("slug", ASCENDING),), "section upserts"),
+    IndexSpec("faqs", (("created_at", DESCENDING),), "FAQ lists and notifications"),
+    IndexSpec("faqs", (("updated_at", DESCENDING),), "dashboard recent FAQ activity"),
+    IndexSpec("sub_faqs", (("created_at", DESCENDING),), "sub-admin FAQ lists"),
+    # notification feed (notifications_feed.py); the counters and reads are read by _id
+    IndexSpec(NOTIFICATIONS_COLLECTION, (("scopes", ASCENDING), ("_id", DESCENDING)), "notification polls"),
+    IndexSpec(NOTIFICATIONS_COLLECTION, (("created_at", ASCENDING),), "notification expiry",
+              {"expireAfterSeconds": NOTIFICATIONS_TTL_DAYS * 86400}),
+    IndexSpec(COUNTERS_COLLECTION, (("expires_at", ASCENDING),), "hourly usage counter expiry",
+              {"expireAfterSeconds": 0}),
+    # feedback and accounts
+    IndexSpec("feedback", (("created_at", DESCENDING),), "feedback notifications"),
+    IndexSpec("feedback", (("timestamp", DESCENDING),), "feedback lists and satisfaction ranges"),
+    IndexSpec("users", (("email", ASCENDING),), "admin login"),
+    IndexSpec("sub_users", (("email", ASCENDING),), "sub-admin login"),
+]
+
+
+def _normalise(keys: Iterable[Tuple[str, object]]) -> Tuple[Tuple[str, object], ...]:
+    # Older drivers / shells store directions as floats (1.0)
+    return tuple((field, int(direction) if isinstance(direction, float) else direction) for field, direction in keys)
+
+
+def _same_keys(existing: Tuple[Tuple[str, object], ...], wanted: Tuple[Tuple[str, object], ...]) -> bool:
+    """Equal key patterns, or the exact reverse (which serves the same queries and sorts)."""
+    if existing == wanted:
+        return True
+    if all(isinstance(direction, int) for _, direction in wanted):
+        return existing == tuple((field, -direction) for field, direction in wanted)
+    return False
+
+
+def _existing_text_fields(info: Dict[str, dict]) -> Optional[Tuple[str, ...]]:
+    for index in info.values():
+        if dict(index["key"]).get("_fts") == "text":
+            return tuple(sorted(index.get("weights", {})))
+    return None
+
+
+def missing_indexes(db, collections: Optional[Iterable[str]] = None) -> Tuple[List[IndexSpec], List[str]]:
+    """Declared indexes that do not exist yet, and conflicts (e.g. a different text index)."""
+    names = set(collections) if collections is not None else None
+    wanted = [spec for spec in INDEXES if names is None or spec.collection in names]
+    missing: List[IndexSpec] = []
+    conflicts: List[str] = []
+    info_by_collection: Dict[str, Dict[str, dict]] = {}
+    for spec in wanted:
+        if spec.collection not in info_by_collection:
+            info_by_collection[spec.collection] = db[spec.collection].index_information()
+        info = info_by_collection[spec.collection]
+        if spec.is_text:
+            fields = _existing_text_fields(info)
+            if fields is None:
+                missing.append(spec)
+            elif fields != tuple(sorted(field for field, _ in spec.keys)):
+                conflicts.append(f"{spec.collection}: text index on {', '.join(fields)} (wanted "
+                                 f"{', '.join(field for field, _ in spec.keys)})")
+            continue
+        if not any(_same_keys(_normalise(index["key"]), spec.keys) for index in info.values()):
+            missing.append(spec)
+    return missing, conflicts
+
+
+def ensure_indexes(db, collections: Optional[Iterable[str]] = None) -> Dict[str, object]:
+    """Create the declared indexes that are missing (for ``collections``, or all)."""
+    report: Dict[str, object] = {"created": [], "conflicts": [], "errors": []}
+    try:
+        missing, report["conflicts"] = missing_indexes(db, collections)
+    except PyMongoError as exc:
+        report["errors"].append(str(exc))
+        print(f"[Indexes] Could not read existing indexes: {exc}")
+        return report
+    for spec in missing:
+        try:
+            name = db[spec.collection].create_index(list(spec.keys), **spec.options)
+            report["created"].append(f"{spec.collection}.{name}")
+            print(f"[Indexes] Created {spec.collection}.{name} ({spec.purpose})")
+        except PyMongoError as exc:
+            report["errors"].append(f"{spec.collection}: {exc}")
+            print(f"[Indexes] Failed to create index on {spec.collection} {list(spec.keys)}: {exc}")
+    for conflict in report["conflicts"]:
+        print(f"[Indexes] Conflict: {conflict}")
+    return report
+
+
+def ensure_indexes_in_background(db) -> threading.Thread:
+    """``ensure_indexes`` on a daemon thread, so worker startup never waits on an index build."""
+    thread = threading.Thread(target=ensure_indexes, args=(db,), name="ensure-indexes", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Create the MongoDB indexes declared in db_indexes.py")
+    parser.add_argument("--db", default="chatbot_db")
+    parser.add_argument("--collection", action="append", help="limit to this collection (repeatable)")
+    parser.add_argument("--dry-run", action="store_true", help="only list missing indexes and conflicts")
+    args = parser.parse_args()
+
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        raise SystemExit("MONGODB_URI is not set")
+    database = MongoClient(uri, serverSelectionTimeoutMS=10000)[args.db]
+    if args.dry_run:
+        missing, conflicts = missing_indexes(database, args.collection)
+        for spec in missing:
+            print(f"[Indexes] Missing {spec.collection} {list(spec.keys)} ({spec.purpose})")
+        for conflict in conflicts:
+            print(f"[Indexes] Conflict: {conflict}")
+        print(f"[Indexes] {len(missing)} missing, {len(conflicts)} conflict(s)")
+    else:
+        result = ensure_indexes(database, args.collection)
+        print(f"[Indexes] {len(result['created'])} created, {len(result['conflicts'])} conflict(s), "
+              f"{len(result['errors'])} error(s)")
+        if result["errors"]:
+            raise SystemExit(1)
@@ -8,7 +8,7 @@ import os
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from chat import (
-    user_contexts, 
+    context_store, 
     reset_user_context, 
     set_user_current_office, 
     get_user_current_office,
@@ -25,11 +25,11 @@ def print_header(text):
 
 def print_context_state(user_id):
     """Display the current context state for a user"""
-    if user_id not in user_contexts:
+    context = context_store.snapshot(user_id)
+    if context is None:
         print(f"  📭 No contexts found for {user_id}")
         return
     
-    context = user_contexts[user_id]
     current = context.get("current_office")
     offices = context.get("offices", {})
     
@@ -0,0 +1,113 @@
+"""
+Demonstration of the shared website page cache against a local HTTP server.
+Shows a cold fetch, a cache hit, a stale hit revalidated with a conditional GET
+(304), size-bounded eviction and the local fallback when the site is down.
+"""
+
+import sys
+import os
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import requests
+
+from page_cache import SharedPageCache
+
+PAGE_ETAG = '"tcc-v1"'
+requests_seen = []
+
+
+class DemoHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        requests_seen.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/down":
+            self.send_response(503)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == PAGE_ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        body = f"<html><body><h1>TCC {self.path}</h1><p>Demo page</p></body></html>".encode()
+        self.send_response(200)
+        self.send_header("ETag", PAGE_ETAG)
+        self.send_header("Content-Type", "text/html")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+def print_separator(char="=", length=70):
+    print(char * length)
+
+
+def print_header(text):
+    print_separator()
+    print(f"  {text}")
+    print_separator()
+
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DemoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    clock = FakeClock()
+    db_path = os.path.join(tempfile.mkdtemp(), "pages.sqlite3")
+    cache = SharedPageCache(
+        db_path,
+        ttl=600,
+        max_entries=2,
+        session=requests.Session(),
+        extract_text=lambda html: " ".join(re.sub(r"<[^>]+>", " ", html).split()),
+        clock=clock,
+    )
+
+    print_header("1. Cold fetch, then cache hit")
+    print(f"  source: {cache.get_page('/about', base_url + '/about')['source']}")
+    print(f"  source: {cache.get_page('/about', base_url + '/about')['source']}")
+
+    print_header("2. Stale entry served while a conditional GET revalidates it")
+    clock.now += 601
+    print(f"  source: {cache.get_page('/about', base_url + '/about')['source']}")
+    cache.wait_for_refreshes()
+    print(f"  last request: {requests_seen[-1]}")
+    print(f"  source: {cache.get_page('/about', base_url + '/about')['source']}")
+
+    print_header("3. Size bound (max_entries=2)")
+    clock.now += 120
+    cache.get_page("/admissions", base_url + "/admissions")
+    clock.now += 120
+    cache.get_page("/academics", base_url + "/academics")
+    print(f"  cached /about: {cache.peek('/about') is not None}")
+    print(f"  cached /academics: {cache.peek('/academics') is not None}")
+
+    print_header("4. Site down: local fallback is cached")
+    fallback = {"url": "local://down", "text": "Local copy", "fetch_duration": 0.0, "source": "local-template"}
+    print(f"  source: {cache.get_page('/down', base_url + '/down', fallback=lambda: fallback)['source']}")
+    print(f"  source: {cache.get_page('/down', base_url + '/down')['source']}")
+
+    print_header("Metrics")
+    for name, value in cache.metrics.items():
+        print(f"  {name}: {value}")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+"""
+domain_guard.py
+---------------
+Local in-domain / out-of-domain classifier used as the first check in /predict.
+
+Off-topic questions ("what is the capital of France", "give me a recipe for
+adobo") otherwise fall through the neural model, the context search, the live
+website lookup and the OpenAI fallback - several LLM calls - only to end in
+DOMAIN_REFUSAL_MESSAGE. ``DomainGuard.check`` refuses them up front in two
+steps, unless the message names something at TCC (``IN_DOMAIN_KEYWORDS``):
+the fixed ``OFF_TOPIC_KEYWORDS`` list ('solve', 'recipe', 'weather', ...) as a
+fast pre-check, then a logistic regression over hashed word unigrams and
+bigrams, trained on the intents.json patterns plus the generic school
+questions in language_data/in_domain.txt (in-domain) and the bundled
+language_data/off_topic.txt corpus (out-of-domain), which refuses when
+P(off-topic) >= DOMAIN_GUARD_THRESHOLD. Anything less certain takes the
+normal path.
+
+The hold-out split comes from the same sources as the training data, so it
+cannot show phrasing the sources lack ("who is the dean" scored 0.99 before
+in_domain.txt existed). language_data/in_domain_check.txt is a separate,
+hand-written set of in-domain questions that is never trained on; the default
+threshold sits above its highest score, and the build lists any it refuses.
+
+To report the LLM calls saved, /predict records how many calls each request
+that still ended in a refusal cost (``record_cascade_refusal``); every early
+refusal is credited with that average.
+
+Run ``python domain_guard.py`` during the build to write DOMAIN_GUARD_MODEL_PATH
+and print hold-out recall (keywords, classifier and both combined) and the
+check-set false refusals. If the file is missing or out of date the model is
+trained in-process at start-up.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+INTENTS_PATH = BASE_DIR / "intents.json"
+OFF_TOPIC_PATH = BASE_DIR / "language_data" / "off_topic.txt"
+IN_DOMAIN_PATH = BASE_DIR / "language_data" / "in_domain.txt"
+# Hand-written in-domain questions that must never be refused (not trained on)
+IN_DOMAIN_CHECK_PATH = BASE_DIR / "language_data" / "in_domain_check.txt"
+DOMAIN_GUARD_MODEL_PATH = Path(
+    os.getenv("DOMAIN_GUARD_MODEL_PATH", str(BASE_DIR / "domain_guard_model.json"))
+)
+# Minimum P(off-topic) before /predict refuses without running the cascade
+DOMAIN_GUARD_THRESHOLD = float(os.getenv("DOMAIN_GUARD_THRESHOLD", "0.95"))
+# LLM calls credited per early refusal until this worker has observed real cascade refusals
+DOMAIN_GUARD_CASCADE_LLM_CALLS = float(os.getenv("DOMAIN_GUARD_CASCADE_LLM_CALLS", "3"))
+
+# Bump when the features, the training or the file layout change.
+MODEL_VERSION = 3
+HASH_BITS = 18
+EPOCHS = 12
+LEARNING_RATE = 0.5
+L2 = 1e-6
+SEED = 13
+# Every HOLDOUT_EVERY-th example (by text hash) is held out for the build report
+HOLDOUT_EVERY = 10
+
+# Substrings of questions that are not about TCC (the original /predict pre-check)
+OFF_TOPIC_KEYWORDS = (
+    # Math and calculations
+    'solve', 'calculate', 'what is 2+2', 'math problem', 'equation', 'formula',
+    # General knowledge (not TCC-specific)
+    'what is the capital', 'history of', 'tell me about',
+    # Personal advice (not TCC-related)
+    'should i break up', 'relationship advice', 'dating advice', 'personal problem',
+    # Non-educational topics
+    'recipe', 'cooking', 'how to cook', 'weather', 'news', 'sports score',
+    # Technology help (not TCC systems)
+    'how to use windows', 'install software', 'computer virus', 'phone problem',
+)
+# Substrings that mark a question as on-topic whatever else it contains
+IN_DOMAIN_KEYWORDS = (
+    'tcc', 'tanauan city college', 'college', 'admission', 'enrollment', 'registrar',
+    'transcript', 'tuition', 'scholarship', 'guidance', 'osa', 'ict', 'misu',
+    'course', 'program', 'degree', 'student', 'faculty', 'campus', 'office',
+    'application', 'requirements', 'deadline', 'semester', 'academic', 'enroll',
+    'bachelor', 'bs', 'bsed', 'bscpe', 'entrepreneurship', 'accounting', 'public administration'
+)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?|[+\-*/=^%]")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def features(text: str) -> List[int]:
+    """Hashed feature indexes: word unigrams, word bigrams and a bias term."""
+    tokens = tokenize(text)
+    names = [f"w:{token}" for token in tokens]
+    names.extend(f"b:{a} {b}" for a, b in zip(tokens, tokens[1:]))
+    mask = (1 << HASH_BITS) - 1
+    # crc32, not hash(): indexes must match across processes and builds
+    return sorted({zlib.crc32(name.encode("utf-8")) & mask for name in names} | {0})
+
+
+def _sources_sha1(
+    intents_path: Path,
+    off_topic_path: Path,
+    in_domain_path: Path = IN_DOMAIN_PATH,
+    check_path: Path = IN_DOMAIN_CHECK_PATH,
+) -> str:
+    digest = hashlib.sha1()
+    for path in (intents_path, off_topic_path, in_domain_path, check_path):
+        digest.update(path.read_bytes())
+    digest.update(f"{MODEL_VERSION}:{HASH_BITS}:{EPOCHS}:{LEARNING_RATE}:{L2}".encode())
+    return digest.hexdigest()
+
+
+def read_questions(path: Path) -> List[str]:
+    """Lower-cased lines of a one-question-per-line file, skipping blanks and # comments."""
+    with open(path, "r", encoding="utf-8") as fh:
+        return [line.strip().lower() for line in fh if line.strip() and not line.startswith("#")]
+
+
+def load_examples(
+    intents_path: Path = INTENTS_PATH,
+    off_topic_path: Path = OFF_TOPIC_PATH,
+    in_domain_path: Path = IN_DOMAIN_PATH,
+) -> List[Tuple[str, int]]:
+    """
+    (text, label) pairs: 0 for intents.json patterns and the in-domain corpus,
+    1 for the off-topic corpus.
+    """
+    with open(intents_path, "r", encoding="utf-8") as fh:
+        intents = json.load(fh)
+    in_domain = {
+        pattern.strip().lower()
+        for intent in intents.get("intents", [])
+        for pattern in intent.get("patterns", [])
+        if isinstance(pattern, str) and pattern.strip()
+    }
+    in_domain.update(read_questions(in_domain_path))
+    off_topic = set(read_questions(off_topic_path)) - in_domain
+    return [(text, 0) for text in sorted(in_domain)] + [(text, 1) for text in sorted(off_topic)]
+
+
+def _sigmoid(z: float) -> float:
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+
+def train_weights(examples: Sequence[Tuple[str, int]]) -> Dict[int, float]:
+    """
+    Class-balanced logistic regression by SGD. Deterministic: fixed seed and
+    example order, so the same inputs always give the same weights.
+    """
+    positives = sum(label for _, label in examples)
+    negatives = len(examples) - positives
+    class_weight = {0: len(examples) / (2.0 * max(negatives, 1)), 1: len(examples) / (2.0 * max(positives, 1))}
+    encoded = [(features(text), label) for text, label in examples]
+    weights: Dict[int, float] = {}
+    rng = random.Random(SEED)
+    order = list(range(len(encoded)))
+    step = 0
+    for _ in range(EPOCHS):
+        rng.shuffle(order)
+        for index in order:
+            feats, label = encoded[index]
+            scale = 1.0 / math.sqrt(len(feats))
+            z = sum(weights.get(f, 0.0) for f in feats) * scale
+            gradient = (_sigmoid(z) - label) * class_weight[label]
+            rate = LEARNING_RATE / (1.0 + step * 1e-5)
+            step += 1
+            for f in feats:
+                w = weights.get(f, 0.0)
+                weights[f] = w - rate * (gradient * scale + L2 * w)
+    return {f: round(w, 5) for f, w in weights.items() if abs(w) >= 1e-5}
+
+
+def _split(examples: Sequence[Tuple[str, int]]) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+    train, holdout = [], []
+    for example in examples:
+        bucket = int(hashlib.sha1(example[0].encode("utf-8")).hexdigest(), 16) % HOLDOUT_EVERY
+        (holdout if bucket == 0 else train).append(example)
+    return train, holdout
+
+
+def has_in_domain_keyword(text: str) -> bool:
+    lowered = text.lower()
+    return any(keyword in lowered for keyword in IN_DOMAIN_KEYWORDS)
+
+
+def has_off_topic_keyword(text: str) -> bool:
+    lowered = text.lower()
+    return any(keyword in lowered for keyword in OFF_TOPIC_KEYWORDS)
+
+
+def evaluate(weights: Dict[int, float], examples: Sequence[Tuple[str, int]], threshold: float) -> Dict[str, object]:
+    """
+    Hold-out report at ``threshold``: off-topic recall of the keyword list, the
+    classifier and both combined (what /predict does), in-domain false refusals,
+    and in-domain questions scoring within 0.15 of the threshold.
+    """
+    guard = DomainGuard({"weights": weights}, threshold=threshold)
+    off_topic = [text for text, label in examples if label == 1]
+    in_domain = [text for text, label in examples if label == 0]
+    by_keyword = [text for text in off_topic if not has_in_domain_keyword(text) and has_off_topic_keyword(text)]
+    by_classifier = [text for text in off_topic if not has_in_domain_keyword(text) and guard.score(text) >= threshold]
+    refused_in = [text for text in in_domain if guard.check(text, count=False)[0]]
+    near = [text for text in in_domain if threshold - 0.15 <= guard.score(text) < threshold]
+    return {
+        "off_topic": len(off_topic),
+        "off_topic_refused_keywords": len(by_keyword),
+        "off_topic_refused_classifier": len(by_classifier),
+        "off_topic_refused": len(set(by_keyword) | set(by_classifier)),
+        "in_domain": len(in_domain),
+        "in_domain_refused": len(refused_in),
+        "in_domain_near_threshold": len(near),
+        "false_refusals": refused_in[:10],
+        "missed": sorted(set(off_topic) - set(by_keyword) - set(by_classifier))[:10],
+    }
+
+
+def check_in_domain(weights: Dict[int, float], questions: Sequence[str], threshold: float) -> Dict[str, object]:
+    """
+    False refusals at ``threshold`` on the hand-written in-domain check set,
+    which shares no source with the training data (unlike the hold-out split).
+    ``max_score`` is the highest classifier score in the set, so any threshold
+    above it refuses none of these by classifier.
+    """
+    guard = DomainGuard({"weights": weights}, threshold=threshold)
+    refused = [text for text in questions if guard.check(text, count=False)[0]]
+    scores = [guard.score(text) for text in questions if not has_in_domain_keyword(text)]
+    return {
+        "questions": len(questions),
+        "refused": len(refused),
+        "max_score": round(max(scores, default=0.0), 4),
+        "false_refusals": refused[:10],
+    }
+
+
+def build_model(
+    *,
+    intents_path: Path = INTENTS_PATH,
+    off_topic_path: Path = OFF_TOPIC_PATH,
+    in_domain_path: Path = IN_DOMAIN_PATH,
+    check_path: Path = IN_DOMAIN_CHECK_PATH,
+    model_path: Path = DOMAIN_GUARD_MODEL_PATH,
+    force: bool = False,
+) -> Dict[str, object]:
+    """
+    Evaluate on a hold-out split, train on everything, check the in-domain
+    check set against the final weights and write ``model_path`` (skipped when
+    up to date).
+    """
+    start = time.perf_counter()
+    sources_sha1 = _sources_sha1(intents_path, off_topic_path, in_domain_path, check_path)
+    existing = None if force else _read_model(model_path)
+    if existing and existing.get("sources_sha1") == sources_sha1:
+        print(f"[DomainGuard] {model_path.name} is up to date")
+        return {
+            "written": False,
+            "seconds": time.perf_counter() - start,
+            "holdout": existing.get("holdout"),
+            "in_domain_check": existing.get("in_domain_check"),
+        }
+
+    examples = load_examples(intents_path, off_topic_path, in_domain_path)
+    check_questions = read_questions(check_path)
+    overlap = set(check_questions) & {text for text, _ in examples}
+    if overlap:
+        print(f"[DomainGuard] {len(overlap)} check question(s) are also training data: {sorted(overlap)[:5]}")
+    train, holdout = _split(examples)
+    report = evaluate(train_weights(train), holdout, DOMAIN_GUARD_THRESHOLD)
+    weights = train_weights(examples)
+    check_report = check_in_domain(weights, check_questions, DOMAIN_GUARD_THRESHOLD)
+    _write_model(
+        model_path,
+        {
+            "version": MODEL_VERSION,
+            "hash_bits": HASH_BITS,
+            "sources_sha1": sources_sha1,
+            "examples": len(examples),
+            "holdout": report,
+            "in_domain_check": check_report,
+            "weights": {str(f): w for f, w in sorted(weights.items())},
+        },
+    )
+    return {
+        "written": True,
+        "seconds": time.perf_counter() - start,
+        "examples": len(examples),
+        "holdout": report,
+        "in_domain_check": check_report,
+    }
+
+
+def _read_model(model_path: Path) -> Optional[Dict[str, object]]:
+    if not model_path.exists():
+        return None
+    try:
+        model = json.loads(model_path.read_text(encoding="utf-8"))
+    except Exception as exc:
+        print(f"[DomainGuard] Ignoring unreadable model {model_path}: {exc}")
+        return None
+    if model.get("version") != MODEL_VERSION or model.get("hash_bits") != HASH_BITS:
+        return None
+    return model
+
+
+def _write_model(model_path: Path, model: Dict[str, object]) -> None:
+    """Write atomically so running workers never read a partial file."""
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=".domain-guard-", dir=str(model_path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(model, fh, separators=(",", ":"))
+        os.replace(tmp_name, model_path)
+    except Exception:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class DomainGuard:
+    """Scores messages with the trained weights and counts refusals / LLM calls saved (per process)."""
+
+    def __init__(self, model: Dict[str, object], *, threshold: float = DOMAIN_GUARD_THRESHOLD) -> None:
+        self.weights: Dict[int, float] = {int(f): w for f, w in model["weights"].items()}
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.checked = 0
+        self.refused = 0
+        self.refused_by_keyword = 0
+        self.cascade_refusals = 0
+        self.cascade_llm_calls = 0
+
+    def score(self, text: str) -> float:
+        """P(off-topic) for a message."""
+        feats = features(text)
+        z = sum(self.weights.get(f, 0.0) for f in feats) / math.sqrt(len(feats))
+        return _sigmoid(z)
+
+    def check(self, text: str, *, use_classifier: bool = True, count: bool = True) -> Tuple[bool, float, str]:
+        """
+        Return ``(refuse, score, reason)``. Messages with an in-domain keyword
+        are never refused; an off-topic keyword refuses (score 1.0); otherwise
+        the classifier refuses at ``threshold`` (only when ``use_classifier``,
+        i.e. for English messages - it is trained on English).
+        """
+        if has_in_domain_keyword(text):
+            refuse, score, reason = False, 0.0, "in-domain keyword"
+        elif has_off_topic_keyword(text):
+            refuse, score, reason = True, 1.0, "keyword"
+        elif use_classifier:
+            score = self.score(text)
+            refuse, reason = score >= self.threshold, "classifier"
+        else:
+            refuse, score, reason = False, 0.0, "not checked"
+        if count:
+            with self._lock:
+                self.checked += 1
+                if refuse:
+                    self.refused += 1
+                    if reason == "keyword":
+                        self.refused_by_keyword += 1
+        return refuse, score, reason
+
+    def record_cascade_refusal(self, llm_calls: int) -> None:
+        """A message the guard let through still ended in a refusal after ``llm_calls`` LLM calls."""
+        with self._lock:
+            self.cascade_refusals += 1
+            self.cascade_llm_calls += llm_calls
+
+    def llm_calls_per_refusal(self) -> float:
+        if self.cascade_refusals:
+            return self.cascade_llm_calls / self.cascade_refusals
+        return DOMAIN_GUARD_CASCADE_LLM_CALLS
+
+    def stats(self) -> Dict[str, object]:
+        per_refusal = self.llm_calls_per_refusal()
+        return {
+            "threshold": self.threshold,
+            "checked": self.checked,
+            "refused_early": self.refused,
+            "refused_by_keyword": self.refused_by_keyword,
+            "cascade_refusals": self.cascade_refusals,
+            "cascade_llm_calls": self.cascade_llm_calls,
+            "llm_calls_per_refusal": round(per_refusal, 2),
+            "llm_calls_per_refusal_observed": bool(self.cascade_refusals),
+            "llm_calls_saved": round(self.refused * per_refusal, 1),
+        }
+
+
+_guard: Optional[DomainGuard] = None
+_guard_lock = threading.Lock()
+
+
+def load_domain_guard(
+    model_path: Path = DOMAIN_GUARD_MODEL_PATH,
+    *,
+    intents_path: Path = INTENTS_PATH,
+    off_topic_path: Path = OFF_TOPIC_PATH,
+    in_domain_path: Path = IN_DOMAIN_PATH,
+    check_path: Path = IN_DOMAIN_CHECK_PATH,
+) -> DomainGuard:
+    """Load the built model, or train one in memory when the file is missing or stale."""
+    model = _read_model(model_path)
+    try:
+        sources_sha1 = _sources_sha1(intents_path, off_topic_path, in_domain_path, check_path)
+    except OSError:
+        sources_sha1 = None
+    if model is None or (sources_sha1 and model.get("sources_sha1") != sources_sha1):
+        start = time.perf_counter()
+        weights = train_weights(load_examples(intents_path, off_topic_path, in_domain_path))
+        model = {"weights": weights}
+        print(f"[DomainGuard] Trained in-process in {time.perf_counter() - start:.1f}s "
+              f"(run python domain_guard.py to prebuild {model_path.name})")
+    else:
+        print(f"[DomainGuard] Loaded {model_path.name} ({len(model['weights'])} weights)")
+    return DomainGuard(model)
+
+
+def get_domain_guard() -> DomainGuard:
+    global _guard
+    if _guard is None:
+        with _guard_lock:
+            if _guard is None:
+                _guard = load_domain_guard()
+    return _guard
+
+
+if __name__ == "__main__":
+    # Never fail the deploy: without a prebuilt model the app trains one at start-up
+    try:
+        build_stats = build_model()
+    except Exception as exc:
+        print(f"[DomainGuard] Build failed: {exc}")
+    else:
+        holdout = build_stats.get("holdout") or {}
+        print(
+            f"[DomainGuard] {DOMAIN_GUARD_MODEL_PATH.name} in {build_stats['seconds']:.1f}s; hold-out at "
+            f"threshold {DOMAIN_GUARD_THRESHOLD}: {holdout.get('off_topic_refused')}/{holdout.get('off_topic')} "
+            f"off-topic refused (keywords {holdout.get('off_topic_refused_keywords')}, classifier "
+            f"{holdout.get('off_topic_refused_classifier')}), {holdout.get('in_domain_refused')}/"
+            f"{holdout.get('in_domain')} in-domain refused, {holdout.get('in_domain_near_threshold')} in-domain "
+            f"within 0.15 of the threshold"
+        )
+        check = build_stats.get("in_domain_check") or {}
+        print(
+            f"[DomainGuard] In-domain check set: {check.get('refused')}/{check.get('questions')} refused at "
+            f"threshold {DOMAIN_GUARD_THRESHOLD} (highest classifier score {check.get('max_score')})"
+        )
+        for text in check.get("false_refusals") or []:
+            print(f"[DomainGuard]   refused: {text}")
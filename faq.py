@@ -5,6 +5,7 @@ from typing import Dict, List, Optional, Any
 from pymongo import MongoClient
 from bson import ObjectId
 from vector_store import VectorStore
+from notifications_feed import preview, publish as publish_notification
 import traceback
 
 # MongoDB connection with error handling
@@ -85,6 +86,8 @@ def add_faq(data: Dict[str, Any]) -> Dict[str, Any]:
         # Insert into MongoDB
         result = faqs_collection.insert_one(faq_doc)
         faq_id = str(result.inserted_id)
+        publish_notification(db, "faq", "New FAQ added", preview(faq_doc['question'], "No question"),
+                             office=faq_doc['office'], color="primary", ref_id=result.inserted_id)
         
         print(f"FAQ inserted into MongoDB with ID: {faq_id}")
         
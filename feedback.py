@@ -2,6 +2,8 @@ import json
 import os
 from datetime import datetime
 from pymongo import MongoClient
+from response_cache import response_cache
+from notifications_feed import preview, publish as publish_notification
 import nltk
 from nltk.sentiment import SentimentIntensityAnalyzer
 
@@ -145,6 +147,11 @@ def save_feedback(rating, comment=None, user_id=None, session_id=None):
         
         # Save to MongoDB
         result = feedback_collection.insert_one(feedback_data)
+        response_cache.note_writes("feedback")
+        publish_notification(
+            db, "feedback", f"New {rating}-star feedback", preview(feedback_data["comment"], "No comment"),
+            color="success" if rating >= 4 else "warning", ref_id=result.inserted_id,
+        )
         
         if result.inserted_id:
             return {
@@ -0,0 +1,149 @@
+"""
+hll.py
+------
+A small HyperLogLog sketch for approximate distinct-user counts.
+
+A sketch is 2**p one-byte registers (p = 12: 4096 registers, 4 KB dense). Each
+value is hashed to 64 bits; the top p bits pick a register, which keeps the
+longest run of leading zeros seen in the remaining bits. Two sketches merge by
+taking the register-wise maximum, and the merge of the sketches of several
+sets is exactly the sketch of their union, so daily sketches can be combined
+into any period without counting a user twice.
+
+``count()`` uses Ertl's improved estimator (O. Ertl, "New cardinality
+estimation algorithms for HyperLogLog sketches", 2017), computed from the
+histogram of register values. It needs no empirical bias tables (unlike
+HyperLogLog++) and avoids the over-count the classic estimator had around
+2.5 * m, where it switched from linear counting to the raw estimate.
+
+The asymptotic standard error is 1.04 / sqrt(m) = 1.6% for p = 12, whatever
+the number of sketches merged. ``python benchmark_hll.py`` measures the actual
+error per cardinality (bias, standard deviation, 95th / 99th percentile,
+against the classic estimator), checks the serialisation round trip and that
+merging gives exactly the sketch of the union.
+
+Sketches are serialised with ``to_bytes`` (sparse ``(index, value)`` pairs
+while fewer than a third of the registers are set, so an hour with a handful
+of users costs a few dozen bytes, dense otherwise).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import math
+from typing import Iterable, Optional
+
+DEFAULT_PRECISION = 12
+
+_DENSE = 0
+_SPARSE = 1
+
+
+def _hash64(value: str) -> int:
+    # Stable across processes, unlike hash()
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def _sigma(x: float) -> float:
+    """x + sum_k x^(2^k) * 2^(k-1): the correction for empty registers (x = share of zero registers, < 1)."""
+    y = 1.0
+    z = x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    """The correction for saturated registers (x = share of registers below the maximum rank)."""
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y = 1.0
+    z = 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
+
+
+class HyperLogLog:
+    """Mergeable approximate distinct counter (see module docstring for the error bounds)."""
+
+    __slots__ = ("p", "m", "registers")
+
+    def __init__(self, p: int = DEFAULT_PRECISION, registers: Optional[bytearray] = None) -> None:
+        if not 4 <= p <= 16:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 16, got {p}")
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else bytearray(self.m)
+
+    @classmethod
+    def of(cls, values: Iterable[str], p: int = DEFAULT_PRECISION) -> "HyperLogLog":
+        sketch = cls(p)
+        for value in values:
+            sketch.add(value)
+        return sketch
+
+    def add(self, value: str) -> None:
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.p)
+        rest = hashed & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Fold ``other`` into this sketch (register-wise maximum)."""
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.p} and {other.p}")
+        # Byte-wise max of the register arrays as big integers: registers are < 128,
+        # so (a | 0x80) - b never borrows across bytes and keeps 0x80 exactly where a >= b
+        size = self.m
+        high = int.from_bytes(b"\x80" * size, "big")
+        a = int.from_bytes(self.registers, "big")
+        b = int.from_bytes(other.registers, "big")
+        mask = ((((a | high) - b) & high) >> 7) * 0xFF
+        merged = (a & mask) | (b & ~mask & ((1 << (8 * size)) - 1))
+        self.registers = bytearray(merged.to_bytes(size, "big"))
+
+    def copy(self) -> "HyperLogLog":
+        return HyperLogLog(self.p, bytearray(self.registers))
+
+    def count(self) -> int:
+        """Estimated number of distinct values added (Ertl's improved estimator, see module docstring)."""
+        m = self.m
+        q = 64 - self.p
+        histogram = [0] * (q + 2)
+        for register in self.registers:
+            histogram[register] += 1
+        if histogram[0] == m:
+            return 0
+        z = m * _tau(1 - histogram[q + 1] / m)
+        for k in range(q, 0, -1):
+            z = 0.5 * (z + histogram[k])
+        z += m * _sigma(histogram[0] / m)
+        return int(round(m * m / (2 * math.log(2) * z)))
+
+    def to_bytes(self) -> bytes:
+        set_registers = [(index, value) for index, value in enumerate(self.registers) if value]
+        if 3 * len(set_registers) < self.m:
+            body = b"".join(index.to_bytes(2, "big") + bytes((value,)) for index, value in set_registers)
+            return bytes((self.p, _SPARSE)) + body
+        return bytes((self.p, _DENSE)) + bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        p, encoding, body = data[0], data[1], data[2:]
+        if encoding == _DENSE:
+            return cls(p, bytearray(body))
+        sketch = cls(p)
+        for offset in range(0, len(body), 3):
+            sketch.registers[int.from_bytes(body[offset:offset + 2], "big")] = body[offset + 2]
+        return sketch
@@ -0,0 +1,406 @@
+"""
+language_id.py
+--------------
+Local English / Tagalog language identification for /predict.
+
+The bot only answers in English and Tagalog (including Taglish), so instead of
+a general-purpose detector this is a small deterministic classifier:
+
+* a keyword pre-check: any common Filipino function word in the message means
+  Tagalog (the rule /predict has always used), done as one set intersection;
+* otherwise each word is labelled on its own - known English words (the
+  intents.json vocabulary) and known Tagalog words (language_data/tagalog_words.txt)
+  by lookup, unseen words by a naive-Bayes score over character 1-3-grams -
+  and the message is Tagalog when at least the Tagalog word share of its
+  labelled words are Tagalog *and* one of them is a known Tagalog word.
+  English words inside a Tagalog sentence are normal (Taglish), Tagalog words
+  inside an English sentence are not, hence the low share.
+
+Names are what an English question most often borrows from Filipino ("Can I
+talk to Maria Santos?", "Where is Barangay Darasa?"): capitalised words other
+than the first of a sentence are skipped, and n-gram guesses alone never make
+a message Tagalog.
+
+The n-gram model is trained offline from the same two word lists, and the
+share is tuned on language_data/language_holdout.txt (labelled messages kept
+apart from benchmark_language_id.py's); LANGUAGE_TL_WORD_SHARE overrides it.
+Run ``python language_id.py`` during the build to write LANGUAGE_MODEL_PATH. If
+the file is missing or out of date the model is trained in-process at start-up
+(tens of milliseconds), so detection never depends on the build step.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+INTENTS_PATH = BASE_DIR / "intents.json"
+TAGALOG_WORDS_PATH = BASE_DIR / "language_data" / "tagalog_words.txt"
+HOLDOUT_PATH = BASE_DIR / "language_data" / "language_holdout.txt"
+LANGUAGE_MODEL_PATH = Path(os.getenv("LANGUAGE_MODEL_PATH", str(BASE_DIR / "language_model.json")))
+
+# Bump when the features or the file layout change.
+MODEL_VERSION = 2
+NGRAM_SIZES = (1, 2, 3)
+# Additive smoothing for n-gram counts
+SMOOTHING = 0.5
+# Mean per-n-gram log-likelihood ratio an unseen word needs before it counts as either language
+WORD_MARGIN = 0.15
+# Share of labelled words that must be Tagalog for the message to be Tagalog: tuned on
+# the hold-out set at build time (TL_WORD_SHARE_CANDIDATES), unless set in the environment
+TL_WORD_SHARE_DEFAULT = 0.25
+TL_WORD_SHARE = float(os.environ["LANGUAGE_TL_WORD_SHARE"]) if os.getenv("LANGUAGE_TL_WORD_SHARE") else None
+TL_WORD_SHARE_CANDIDATES = (0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.5, 0.6)
+_WORD_CACHE_SIZE = 50000
+
+# Common Filipino function words; any of these in a message means Tagalog.
+FILIPINO_KEYWORDS = frozenset({
+    'ako', 'ikaw', 'siya', 'kami', 'tayo', 'kayo', 'sila',
+    'ang', 'ng', 'mga', 'sa', 'na', 'ay', 'po', 'opo',
+    'magandang', 'salamat', 'paano', 'ano', 'saan', 'kailan',
+    'kumusta', 'mabuti', 'hindi', 'oo', 'wala', 'mayroon',
+    'naman', 'lang', 'din', 'rin', 'ba', 'kasi', 'pero',
+    'gusto', 'kailangan', 'pwede', 'paki'
+})
+
+_WORD_RE = re.compile(r"[a-zñ]+(?:['-][a-zñ]+)*")
+_CASED_WORD_RE = re.compile(r"[a-zñ]+(?:['-][a-zñ]+)*", re.IGNORECASE)
+_SENTENCE_END = ".!?"
+
+
+def tokenize(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower())
+
+
+def content_words(text: str) -> List[str]:
+    """Lower-cased words, without capitalised ones inside a sentence (names, places, acronyms)."""
+    words = []
+    for match in _CASED_WORD_RE.finditer(text):
+        word = match.group()
+        before = text[:match.start()].rstrip()
+        if word[0].isupper() and before and before[-1] not in _SENTENCE_END:
+            continue
+        words.append(word.lower())
+    return words
+
+
+def has_filipino_keyword(text: str) -> bool:
+    """The fast pre-check: does the message contain a common Filipino function word?"""
+    return not FILIPINO_KEYWORDS.isdisjoint(tokenize(text))
+
+
+def word_ngrams(word: str) -> List[str]:
+    padded = f"<{word}>"
+    return [padded[i:i + n] for n in NGRAM_SIZES for i in range(len(padded) - n + 1)]
+
+
+def _sources_sha1(intents_path: Path, words_path: Path, holdout_path: Path = HOLDOUT_PATH) -> str:
+    digest = hashlib.sha1()
+    for path in (intents_path, words_path, holdout_path):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def load_holdout(holdout_path: Path = HOLDOUT_PATH) -> List[Tuple[str, str]]:
+    """(message, language) pairs from the tab-separated hold-out file."""
+    examples = []
+    with open(holdout_path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip() or line.startswith("#"):
+                continue
+            language, message = line.rstrip("\n").split("\t", 1)
+            examples.append((message, language))
+    return examples
+
+
+def tune_tl_word_share(model: Dict[str, object], examples: List[Tuple[str, str]]) -> Dict[str, object]:
+    """
+    Accuracy on ``examples`` for each TL_WORD_SHARE_CANDIDATES value; the
+    chosen share is the middle of the best-scoring run of candidates.
+    """
+    accuracy = {}
+    for share in TL_WORD_SHARE_CANDIDATES:
+        identifier = LanguageIdentifier(model, tl_word_share=share)
+        accuracy[share] = sum(identifier.detect(message) == language for message, language in examples)
+    best = max(accuracy.values())
+    best_shares = [share for share in TL_WORD_SHARE_CANDIDATES if accuracy[share] == best]
+    chosen = best_shares[len(best_shares) // 2]
+    identifier = LanguageIdentifier(model, tl_word_share=chosen)
+    errors = [message for message, language in examples if identifier.detect(message) != language]
+    return {
+        "tl_word_share": chosen,
+        "examples": len(examples),
+        "correct": best,
+        "accuracy_by_share": {str(share): correct for share, correct in accuracy.items()},
+        "errors": errors[:10],
+    }
+
+
+def train_tuned_model(
+    intents_path: Path = INTENTS_PATH, words_path: Path = TAGALOG_WORDS_PATH, holdout_path: Path = HOLDOUT_PATH
+) -> Dict[str, object]:
+    """``train_model`` plus the Tagalog word share tuned on the hold-out set."""
+    model = train_model(load_english_words(intents_path), load_tagalog_words(words_path))
+    try:
+        tuning = tune_tl_word_share(model, load_holdout(holdout_path))
+    except (OSError, ValueError) as exc:
+        print(f"[LanguageID] Hold-out unavailable ({exc}); using TL_WORD_SHARE {TL_WORD_SHARE_DEFAULT}")
+        tuning = {"tl_word_share": TL_WORD_SHARE_DEFAULT}
+    model["tl_word_share"] = tuning["tl_word_share"]
+    model["holdout"] = tuning
+    return model
+
+
+def load_tagalog_words(words_path: Path = TAGALOG_WORDS_PATH) -> Set[str]:
+    words: Set[str] = set()
+    with open(words_path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.split("#", 1)[0]
+            words.update(tokenize(line))
+    return words
+
+
+def load_english_words(intents_path: Path = INTENTS_PATH) -> Set[str]:
+    """Vocabulary of intents.json patterns and responses (the bot's English)."""
+    with open(intents_path, "r", encoding="utf-8") as fh:
+        intents = json.load(fh)
+    words: Set[str] = set()
+    for intent in intents.get("intents", []):
+        for text in list(intent.get("patterns", [])) + list(intent.get("responses", [])):
+            if isinstance(text, str):
+                words.update(tokenize(text))
+    return words
+
+
+def train_model(english_words: Iterable[str], tagalog_words: Iterable[str]) -> Dict[str, object]:
+    """
+    Build the model dict: per-n-gram log-likelihood ratios (Tagalog over English)
+    and the two vocabularies. Words present in both lists carry no evidence and
+    are kept out of both.
+    """
+    english = set(english_words)
+    tagalog = set(tagalog_words)
+    shared = english & tagalog
+    english -= shared
+    tagalog -= shared
+
+    counts = {"en": Counter(), "tl": Counter()}
+    for lang, words in (("en", english), ("tl", tagalog)):
+        for word in words:
+            counts[lang].update(word_ngrams(word))
+
+    grams = set(counts["en"]) | set(counts["tl"])
+    totals = {lang: sum(counter.values()) + SMOOTHING * len(grams) for lang, counter in counts.items()}
+    llr = {
+        gram: round(
+            math.log((counts["tl"][gram] + SMOOTHING) / totals["tl"])
+            - math.log((counts["en"][gram] + SMOOTHING) / totals["en"]),
+            4,
+        )
+        for gram in sorted(grams)
+    }
+    return {
+        "version": MODEL_VERSION,
+        "ngram_sizes": list(NGRAM_SIZES),
+        "llr": llr,
+        "english_words": sorted(english),
+        "tagalog_words": sorted(tagalog),
+        "ambiguous_words": sorted(shared),
+    }
+
+
+def build_model(
+    *,
+    intents_path: Path = INTENTS_PATH,
+    words_path: Path = TAGALOG_WORDS_PATH,
+    model_path: Path = LANGUAGE_MODEL_PATH,
+    force: bool = False,
+) -> Dict[str, object]:
+    """Train from intents.json and the Tagalog word list and write ``model_path`` (skipped when up to date)."""
+    start = time.perf_counter()
+    sources_sha1 = _sources_sha1(intents_path, words_path)
+    existing = None if force else _read_model(model_path)
+    if existing and existing.get("sources_sha1") == sources_sha1:
+        print(f"[LanguageID] {model_path.name} is up to date")
+        return {"written": False, "seconds": time.perf_counter() - start, **_model_counts(existing)}
+
+    model = train_tuned_model(intents_path, words_path)
+    model["sources_sha1"] = sources_sha1
+    _write_model(model_path, model)
+    return {"written": True, "seconds": time.perf_counter() - start, **_model_counts(model)}
+
+
+def _model_counts(model: Dict[str, object]) -> Dict[str, object]:
+    return {
+        "ngrams": len(model["llr"]),
+        "english_words": len(model["english_words"]),
+        "tagalog_words": len(model["tagalog_words"]),
+        "tl_word_share": model.get("tl_word_share"),
+        "holdout": model.get("holdout"),
+    }
+
+
+def _read_model(model_path: Path) -> Optional[Dict[str, object]]:
+    if not model_path.exists():
+        return None
+    try:
+        model = json.loads(model_path.read_text(encoding="utf-8"))
+    except Exception as exc:
+        print(f"[LanguageID] Ignoring unreadable model {model_path}: {exc}")
+        return None
+    if model.get("version") != MODEL_VERSION or model.get("ngram_sizes") != list(NGRAM_SIZES):
+        return None
+    return model
+
+
+def _write_model(model_path: Path, model: Dict[str, object]) -> None:
+    """Write atomically so running workers never read a partial file."""
+    model_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=".language-model-", dir=str(model_path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(model, fh, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp_name, model_path)
+    except Exception:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class LanguageIdentifier:
+    """English / Tagalog classifier over a trained model dict (see ``train_model``)."""
+
+    def __init__(self, model: Dict[str, object], *, tl_word_share: Optional[float] = TL_WORD_SHARE) -> None:
+        self.llr: Dict[str, float] = model["llr"]
+        self.english_words = frozenset(model["english_words"])
+        self.tagalog_words = frozenset(model["tagalog_words"])
+        self.ambiguous_words = frozenset(model.get("ambiguous_words", ()))
+        if tl_word_share is None:
+            tl_word_share = model.get("tl_word_share", TL_WORD_SHARE_DEFAULT)
+        self.tl_word_share = tl_word_share
+        self._word_cache: Dict[str, int] = {}
+        self.counts = {"keyword": 0, "tl": 0, "en": 0}
+
+    def word_label(self, word: str) -> int:
+        """+1 Tagalog, -1 English, 0 no evidence."""
+        label = self._word_cache.get(word)
+        if label is not None:
+            return label
+        if word in self.tagalog_words:
+            label = 1
+        elif word in self.english_words:
+            label = -1
+        elif word in self.ambiguous_words or len(word) < 3:
+            label = 0
+        else:
+            grams = word_ngrams(word)
+            score = sum(self.llr.get(gram, 0.0) for gram in grams) / len(grams)
+            label = 1 if score > WORD_MARGIN else -1 if score < -WORD_MARGIN else 0
+        if len(self._word_cache) >= _WORD_CACHE_SIZE:
+            self._word_cache.clear()
+        self._word_cache[word] = label
+        return label
+
+    def classify(self, text: str) -> Tuple[str, float]:
+        """
+        Return ``(language, tagalog_share)`` where language is "tl" or "en" and
+        tagalog_share is the fraction of labelled words judged Tagalog
+        (1.0 when the keyword pre-check fired). Capitalised words inside a
+        sentence are not labelled, and at least one labelled word must be a
+        known Tagalog word.
+        """
+        if not FILIPINO_KEYWORDS.isdisjoint(tokenize(text)):
+            self.counts["keyword"] += 1
+            return "tl", 1.0
+        tagalog = english = known_tagalog = 0
+        for word in content_words(text):
+            label = self.word_label(word)
+            if label > 0:
+                tagalog += 1
+                known_tagalog += word in self.tagalog_words
+            elif label < 0:
+                english += 1
+        share = tagalog / (tagalog + english) if tagalog + english else 0.0
+        language = "tl" if known_tagalog and share >= self.tl_word_share else "en"
+        self.counts[language] += 1
+        return language, round(share, 3)
+
+    def detect(self, text: str) -> str:
+        return self.classify(text)[0]
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "ngrams": len(self.llr),
+            "english_words": len(self.english_words),
+            "tagalog_words": len(self.tagalog_words),
+            "tl_word_share": self.tl_word_share,
+            "detections": dict(self.counts),
+        }
+
+
+_identifier: Optional[LanguageIdentifier] = None
+_identifier_lock = threading.Lock()
+
+
+def load_identifier(
+    model_path: Path = LANGUAGE_MODEL_PATH,
+    *,
+    intents_path: Path = INTENTS_PATH,
+    words_path: Path = TAGALOG_WORDS_PATH,
+) -> LanguageIdentifier:
+    """Load the built model, or train one in memory when the file is missing or stale."""
+    model = _read_model(model_path)
+    try:
+        sources_sha1 = _sources_sha1(intents_path, words_path)
+    except OSError:
+        sources_sha1 = None
+    if model is None or (sources_sha1 and model.get("sources_sha1") != sources_sha1):
+        start = time.perf_counter()
+        model = train_tuned_model(intents_path, words_path)
+        print(f"[LanguageID] Trained in-process in {(time.perf_counter() - start) * 1000:.0f}ms "
+              f"(run python language_id.py to prebuild {model_path.name})")
+    else:
+        print(f"[LanguageID] Loaded {model_path.name} ({len(model['llr'])} n-grams)")
+    return LanguageIdentifier(model)
+
+
+def get_language_identifier() -> LanguageIdentifier:
+    global _identifier
+    if _identifier is None:
+        with _identifier_lock:
+            if _identifier is None:
+                _identifier = load_identifier()
+    return _identifier
+
+
+def detect_language(text: str) -> str:
+    """"tl" or "en" for a chat message."""
+    return get_language_identifier().detect(text)
+
+
+if __name__ == "__main__":
+    # Never fail the deploy: without a prebuilt model the app trains one at start-up
+    try:
+        build_stats = build_model()
+    except Exception as exc:
+        print(f"[LanguageID] Build failed: {exc}")
+    else:
+        holdout = build_stats.get("holdout") or {}
+        print(
+            f"[LanguageID] {LANGUAGE_MODEL_PATH.name}: {build_stats['ngrams']} n-grams, "
+            f"{build_stats['english_words']} English / {build_stats['tagalog_words']} Tagalog words "
+            f"in {build_stats['seconds']:.2f}s; Tagalog word share {build_stats.get('tl_word_share')} "
+            f"({holdout.get('correct')}/{holdout.get('examples')} hold-out messages correct)"
+        )
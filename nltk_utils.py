@@ -213,6 +213,111 @@ def fuzzy_match(query, patterns, threshold=0.6):
     matches.sort(key=lambda x: x[1], reverse=True)
     return matches
 
+
+# Above this SequenceMatcher ratio two keywords count as a fuzzy match (see calculate_similarity)
+FUZZY_WORD_THRESHOLD = 0.8
+
+
+def _char_bigrams(word):
+    return {word[i:i + 2] for i in range(len(word) - 1)}
+
+
+class PatternIndex:
+    """
+    Precomputed keyword index over a fixed list of patterns for fuzzy_match.
+
+    calculate_similarity only scores above zero when the query shares a keyword
+    with the pattern, or has a keyword whose SequenceMatcher ratio with one of
+    the pattern's keywords is above 0.8. Two different words with a ratio that
+    high always share a character bigram, so a bigram index over the keyword
+    vocabulary finds every fuzzy neighbour exactly, and an inverted keyword
+    index then limits scoring to the patterns that can reach the threshold.
+    Scores are computed with the same formula and summation order, so the
+    results are identical to fuzzy_match(query, patterns, threshold).
+    """
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        # Same construction as calculate_similarity so set iteration order (and float sums) match
+        self.pattern_keywords = [set(extract_keywords(pattern)) for pattern in self.patterns]
+        self.keyword_postings = {}
+        for position, keywords in enumerate(self.pattern_keywords):
+            for keyword in keywords:
+                self.keyword_postings.setdefault(keyword, []).append(position)
+        self.bigram_postings = {}
+        for keyword in self.keyword_postings:
+            for bigram in _char_bigrams(keyword):
+                self.bigram_postings.setdefault(bigram, []).append(keyword)
+        self._neighbour_cache = {}
+
+    def __len__(self):
+        return len(self.patterns)
+
+    def _neighbours(self, word):
+        """Vocabulary keywords whose ratio with ``word`` is above FUZZY_WORD_THRESHOLD."""
+        cached = self._neighbour_cache.get(word)
+        if cached is not None:
+            return cached
+
+        candidates = {word} if word in self.keyword_postings else set()
+        for bigram in _char_bigrams(word):
+            candidates.update(self.bigram_postings.get(bigram, ()))
+
+        neighbours = {}
+        for candidate in candidates:
+            matcher = SequenceMatcher(None, word, candidate)
+            if matcher.real_quick_ratio() <= FUZZY_WORD_THRESHOLD or matcher.quick_ratio() <= FUZZY_WORD_THRESHOLD:
+                continue
+            similarity = matcher.ratio()
+            if similarity > FUZZY_WORD_THRESHOLD:
+                neighbours[candidate] = similarity
+
+        if len(self._neighbour_cache) >= 4096:
+            self._neighbour_cache.clear()
+        self._neighbour_cache[word] = neighbours
+        return neighbours
+
+    def match(self, query, threshold=0.6):
+        """Same result as fuzzy_match(query, self.patterns, threshold), without scanning every pattern."""
+        if threshold <= 0:
+            return fuzzy_match(query, self.patterns, threshold)
+
+        words1 = set(extract_keywords(query))
+        if not words1:
+            return []
+
+        neighbours = {word: self._neighbours(word) for word in words1}
+        candidate_positions = set()
+        for word_neighbours in neighbours.values():
+            for keyword in word_neighbours:
+                candidate_positions.update(self.keyword_postings[keyword])
+
+        matches = []
+        for position in sorted(candidate_positions):
+            words2 = self.pattern_keywords[position]
+            if not words2:
+                continue
+
+            intersection = len(words1.intersection(words2))
+            union = len(words1.union(words2))
+            jaccard_sim = intersection / union if union > 0 else 0.0
+
+            fuzzy_score = 0.0
+            for word1 in words1:
+                word_neighbours = neighbours[word1]
+                for word2 in words2:
+                    similarity = word_neighbours.get(word2)
+                    if similarity is not None:
+                        fuzzy_score += similarity
+
+            combined_score = (jaccard_sim * 0.7) + (fuzzy_score / max(len(words1), len(words2)) * 0.3)
+            similarity = min(combined_score, 1.0)
+            if similarity >= threshold:
+                matches.append((self.patterns[position], similarity))
+
+        matches.sort(key=lambda x: x[1], reverse=True)
+        return matches
+
 def expand_synonyms(text):
     """
     Expand text with common synonyms for better matching
@@ -0,0 +1,318 @@
+"""
+notifications_feed.py
+---------------------
+Notification feed for the admin and sub-admin dashboards, written when the
+events happen instead of re-aggregated on every poll.
+
+Writers call ``publish`` (new feedback, FAQs, sub-admin accounts,
+announcements) or ``notify_conversations`` (ConversationLogger ``on_written``:
+unresolved / escalated messages and the high-usage alerts). Each event is one
+document in ``notifications`` carrying the feeds it belongs to in ``scopes``:
+``"admin"`` and / or ``"office:<name>"``. Every publish also increments the
+feed's counter in ``notification_counters``.
+
+``feed(db, scope, reader, since)`` returns the newest items of a feed on the
+first poll; with the ``since`` cursor of the previous poll it pages forward
+through what came after it, oldest first, with ``has_more`` set while a
+further page is waiting (the client asks again at once), plus the next cursor.
+The unread count is the feed counter minus the count the reader had when
+they last marked everything read (``mark_read``): two reads by ``_id``,
+whatever the size of the feed. The cursor after the last page trails the
+clock by ``NOTIFICATIONS_SETTLE_SECONDS`` so events committed slightly out of
+``_id`` order by another process are returned on the next poll rather than
+skipped; clients merge items by id. (A full page moves the cursor to its last
+item, so that the next page makes progress.)
+
+Usage alerts count messages per hour (UTC) in expiring counters and fire once
+per hour and feed, when the count passes ``NOTIFICATIONS_USAGE_ALERT`` (all
+offices) or ``NOTIFICATIONS_OFFICE_USAGE_ALERT`` (one office). Items expire
+after ``NOTIFICATIONS_TTL_DAYS``. ``python notifications_feed.py --backfill``
+publishes the last 24 hours of existing events into an empty feed.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING, ReturnDocument, UpdateOne
+
+NOTIFICATIONS_COLLECTION = "notifications"
+COUNTERS_COLLECTION = "notification_counters"
+READS_COLLECTION = "notification_reads"
+
+NOTIFICATIONS_FEED_LIMIT = int(os.getenv("NOTIFICATIONS_FEED_LIMIT", "10"))
+NOTIFICATIONS_SETTLE_SECONDS = int(os.getenv("NOTIFICATIONS_SETTLE_SECONDS", "5"))
+NOTIFICATIONS_TTL_DAYS = int(os.getenv("NOTIFICATIONS_TTL_DAYS", "30"))
+NOTIFICATIONS_USAGE_ALERT = int(os.getenv("NOTIFICATIONS_USAGE_ALERT", "50"))
+NOTIFICATIONS_OFFICE_USAGE_ALERT = int(os.getenv("NOTIFICATIONS_OFFICE_USAGE_ALERT", "30"))
+
+ADMIN_SCOPE = "admin"
+ALERT_STATUSES = ("unresolved", "escalated")
+
+# type -> (icon, admin page, sub-admin page)
+TYPES: Dict[str, tuple] = {
+    "feedback": ("fa-heart", "/feedback", "/Sub-feedback"),
+    "conversation": ("fa-comments", "/conversations", "/Sub-conversations"),
+    "user": ("fa-user-plus", "/users", None),
+    "faq": ("fa-question-circle", "/faq", "/Sub-faq"),
+    "announcement": ("fa-bullhorn", None, "/Sub-announcements"),
+    "alert": ("fa-chart-line", "/usage", "/Sub-usage"),
+}
+
+
+def office_scope(office: str) -> str:
+    return f"office:{office}"
+
+
+def preview(text: Optional[str], default: str, length: int = 50) -> str:
+    text = text or default
+    return text[:length] + "..." if len(text) > length else text
+
+
+def _scopes(office: Optional[str], admin: bool, offices: bool) -> List[str]:
+    scopes = [ADMIN_SCOPE] if admin else []
+    if offices and office:
+        scopes.append(office_scope(office))
+    return scopes
+
+
+def _event(kind: str, title: str, message: str, scopes: List[str], *, office: Optional[str],
+           color: str, ref_id=None, created_at: Optional[datetime] = None) -> Dict[str, object]:
+    return {
+        "type": kind,
+        "title": title,
+        "message": message,
+        "color": color,
+        "office": office,
+        "ref_id": str(ref_id) if ref_id is not None else None,
+        "scopes": scopes,
+        "created_at": created_at or datetime.utcnow(),
+    }
+
+
+def _insert(db, events: List[Dict[str, object]]) -> None:
+    if not events:
+        return
+    db[NOTIFICATIONS_COLLECTION].insert_many(events, ordered=False)
+    totals: Dict[str, int] = {}
+    for event in events:
+        for scope in event["scopes"]:
+            totals[scope] = totals.get(scope, 0) + 1
+    db[COUNTERS_COLLECTION].bulk_write(
+        [UpdateOne({"_id": f"total:{scope}"}, {"$inc": {"count": count}}, upsert=True) for scope, count in totals.items()],
+        ordered=False,
+    )
+
+
+def publish(db, kind: str, title: str, message: str, *, office: Optional[str] = None, color: str = "info",
+            admin: bool = True, offices: bool = True, ref_id=None, created_at: Optional[datetime] = None) -> None:
+    """
+    Add an event to the admin feed (``admin``) and / or its office's feed
+    (``offices``, when ``office`` is set). Failures are logged, never raised:
+    a notification must not fail the write it reports.
+    """
+    scopes = _scopes(office, admin, offices)
+    if not scopes:
+        return
+    try:
+        _insert(db, [_event(kind, title, message, scopes, office=office, color=color, ref_id=ref_id, created_at=created_at)])
+    except Exception as e:
+        print(f"[Notifications] Could not publish {kind} notification: {e}")
+
+
+def conversation_event(document: Dict[str, object]) -> Dict[str, object]:
+    status = document.get("status") or "unresolved"
+    office = document.get("office") or "General"
+    return _event(
+        "conversation", f"{status.capitalize()} conversation",
+        f"User: {document.get('user', 'Unknown')} - Office: {office}", _scopes(office, True, True),
+        office=office, color="danger" if status == "escalated" else "warning",
+        ref_id=document.get("_id"), created_at=document.get("timestamp"),
+    )
+
+
+def _usage_alerts(db, documents: List[Dict[str, object]], now: datetime) -> List[Dict[str, object]]:
+    """Count the messages of this batch per hour and feed; alerts for the feeds that just passed their limit."""
+    hour = now.replace(minute=0, second=0, microsecond=0)
+    counts: Dict[Optional[str], int] = {None: len(documents)}
+    for document in documents:
+        office = document.get("office") or "General"
+        counts[office] = counts.get(office, 0) + 1
+
+    alerts = []
+    counters = db[COUNTERS_COLLECTION]
+    for office, count in counts.items():
+        scope = office_scope(office) if office else ADMIN_SCOPE
+        limit = NOTIFICATIONS_OFFICE_USAGE_ALERT if office else NOTIFICATIONS_USAGE_ALERT
+        counter = counters.find_one_and_update(
+            {"_id": f"usage:{hour:%Y-%m-%dT%H}:{scope}"},
+            {"$inc": {"count": count}, "$setOnInsert": {"expires_at": hour + timedelta(hours=2)}},
+            upsert=True, return_document=ReturnDocument.AFTER,
+        )
+        total = counter["count"]
+        if total - count <= limit < total:
+            alerts.append(_event(
+                "alert", "High usage detected", f"More than {limit} conversations this hour",
+                [scope], office=office, color="warning", created_at=now,
+            ))
+    return alerts
+
+
+def notify_conversations(db, documents: Iterable[Dict[str, object]]) -> None:
+    """ConversationLogger ``on_written``: unresolved / escalated messages and usage alerts."""
+    documents = list(documents)
+    if not documents:
+        return
+    try:
+        events = [conversation_event(document) for document in documents if document.get("status") in ALERT_STATUSES]
+        events.extend(_usage_alerts(db, documents, datetime.utcnow()))
+        _insert(db, events)
+    except Exception as e:
+        print(f"[Notifications] Could not publish conversation notifications: {e}")
+
+
+def _parse_cursor(since: Optional[str]) -> Optional[ObjectId]:
+    try:
+        return ObjectId(since) if since else None
+    except (InvalidId, TypeError):
+        return None
+
+
+def _format(item: Dict[str, object], scope: str) -> Dict[str, object]:
+    icon, admin_page, office_page = TYPES.get(item["type"], ("fa-bell", None, None))
+    office = item.get("office")
+    if scope == ADMIN_SCOPE:
+        link = admin_page
+    else:
+        link = f"{office_page}?office={office}" if office_page else None
+    return {
+        "id": str(item["_id"]),
+        "type": item["type"],
+        "title": item["title"],
+        "message": item["message"],
+        "time": item["created_at"].strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "icon": icon,
+        "color": item.get("color", "info"),
+        "link": link or "#",
+    }
+
+
+def _reads_id(scope: str, reader: str) -> str:
+    return f"{scope}|{reader}"
+
+
+def unread_count(db, scope: str, reader: str) -> Dict[str, int]:
+    """``{"total": ..., "unread": ...}`` for a reader of a feed."""
+    counter = db[COUNTERS_COLLECTION].find_one({"_id": f"total:{scope}"}) or {}
+    total = counter.get("count", 0)
+    reads = db[READS_COLLECTION].find_one({"_id": _reads_id(scope, reader)})
+    if reads is None:
+        # First visit: unread is the last day's events, as before the feed existed
+        recent = db[NOTIFICATIONS_COLLECTION].count_documents(
+            {"scopes": scope, "created_at": {"$gte": datetime.utcnow() - timedelta(hours=24)}}
+        )
+        reads = {"read_count": max(total - recent, 0)}
+        db[READS_COLLECTION].update_one(
+            {"_id": _reads_id(scope, reader)}, {"$setOnInsert": {**reads, "read_at": None}}, upsert=True
+        )
+    return {"total": total, "unread": max(total - reads.get("read_count", 0), 0)}
+
+
+def feed(db, scope: str, reader: str, since: Optional[str] = None,
+         limit: int = NOTIFICATIONS_FEED_LIMIT) -> Dict[str, object]:
+    """
+    The newest ``limit`` items of ``scope`` (first poll) or the next ``limit``
+    after the ``since`` cursor, newest first either way; the next cursor,
+    ``has_more`` and the reader's unread count.
+    """
+    after = _parse_cursor(since)
+    notifications = db[NOTIFICATIONS_COLLECTION]
+    has_more = False
+    if after is None:
+        items = list(notifications.find({"scopes": scope}).sort("_id", DESCENDING).limit(limit))
+        newest = items[0]["_id"] if items else None
+    else:
+        items = list(notifications.find({"scopes": scope, "_id": {"$gt": after}}).sort("_id", ASCENDING).limit(limit + 1))
+        has_more = len(items) > limit
+        items = items[:limit][::-1]
+        newest = items[0]["_id"] if items else after
+
+    settled = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=NOTIFICATIONS_SETTLE_SECONDS))
+    if has_more:
+        cursor = newest
+    else:
+        cursor = min(newest, settled) if newest is not None else settled
+        if after is not None and cursor < after:
+            cursor = after
+    counts = unread_count(db, scope, reader)
+    return {
+        "notifications": [_format(item, scope) for item in items],
+        "cursor": str(cursor),
+        "has_more": has_more,
+        "total_count": counts["total"],
+        "unread_count": counts["unread"],
+    }
+
+
+def mark_read(db, scope: str, reader: str) -> None:
+    """Mark everything published to ``scope`` so far as read by ``reader``."""
+    counter = db[COUNTERS_COLLECTION].find_one({"_id": f"total:{scope}"}) or {}
+    db[READS_COLLECTION].update_one(
+        {"_id": _reads_id(scope, reader)},
+        {"$set": {"read_count": counter.get("count", 0), "read_at": datetime.utcnow()}},
+        upsert=True,
+    )
+
+
+def backfill(db, hours: int = 24) -> int:
+    """Publish the last ``hours`` of feedback, FAQs, sub-admin accounts and flagged messages into an empty feed."""
+    if db[NOTIFICATIONS_COLLECTION].estimated_document_count():
+        print("[Notifications] Feed is not empty; skipping backfill")
+        return 0
+    since = datetime.utcnow() - timedelta(hours=hours)
+    events = []
+    for fb in db["feedback"].find({"created_at": {"$gte": since}}):
+        events.append(_event(
+            "feedback", f"New {fb.get('rating', 5)}-star feedback", preview(fb.get("comment"), "No comment"),
+            _scopes(fb.get("office"), True, True), office=fb.get("office"),
+            color="success" if fb.get("rating", 0) >= 4 else "warning", ref_id=fb["_id"], created_at=fb["created_at"],
+        ))
+    for faq in db["faqs"].find({"created_at": {"$gte": since}}):
+        events.append(_event(
+            "faq", "New FAQ added", preview(faq.get("question"), "No question"), _scopes(faq.get("office"), True, True),
+            office=faq.get("office"), color="primary", ref_id=faq["_id"], created_at=faq["created_at"],
+        ))
+    for user in db["sub_users"].find({"createdAt": {"$gte": since}}):
+        events.append(_event(
+            "user", "New sub-admin created", f"{user.get('name', 'Unknown')} - {user.get('office', 'No office')}",
+            [ADMIN_SCOPE], office=user.get("office"), color="info", ref_id=user["_id"], created_at=user["createdAt"],
+        ))
+    for document in db["conversations"].find({"status": {"$in": list(ALERT_STATUSES)}, "timestamp": {"$gte": since}}):
+        events.append(conversation_event(document))
+    events.sort(key=lambda event: event["created_at"])
+    _insert(db, events)
+    print(f"[Notifications] Backfilled {len(events)} notification(s) from the last {hours} hours")
+    return len(events)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from pymongo import MongoClient
+
+    parser = argparse.ArgumentParser(description="Maintain the dashboard notification feed")
+    parser.add_argument("--db", default="chatbot_db")
+    parser.add_argument("--backfill", action="store_true", help="publish the last day's events into an empty feed")
+    parser.add_argument("--hours", type=int, default=24)
+    args = parser.parse_args()
+
+    uri = os.getenv("MONGODB_URI")
+    if not uri:
+        raise SystemExit("MONGODB_URI is not set")
+    database = MongoClient(uri, serverSelectionTimeoutMS=10000)[args.db]
+    if args.backfill:
+        backfill(database, args.hours)
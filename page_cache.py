@@ -0,0 +1,449 @@
+"""
+page_cache.py
+-------------
+SQLite-backed cache for fetched website pages, shared by every gunicorn worker
+on the host, and the background prefetcher that keeps it warm. Entries keep
+the response's ETag / Last-Modified so refreshes are conditional GETs, and
+expired entries are served stale while a single background refresh
+(coordinated across workers with a lease column) brings them up to date. The
+table is bounded to ``max_entries`` rows, evicting the least recently used
+pages.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    text TEXT NOT NULL,
+    source TEXT NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetch_duration REAL NOT NULL DEFAULT 0,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    refresh_lease REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    held_until REAL NOT NULL
+);
+"""
+
+# Only write last_access back when it is older than this (keeps reads read-only).
+_ACCESS_TOUCH_INTERVAL = 60.0
+
+
+class SharedPageCache:
+    """
+    Cross-process page cache with conditional revalidation and stale-while-revalidate.
+
+    Args:
+        db_path: SQLite file shared by the workers.
+        ttl: Seconds an entry is served without revalidation.
+        session: Object with a requests-style ``get(url, headers=..., timeout=...)``.
+        extract_text: Turns a response body into the text that is cached.
+        max_entries: Upper bound on cached pages (least recently used are evicted).
+        max_chars: Cached text is truncated to this many characters.
+        timeout: HTTP timeout for fetches, also used to size the refresh lease.
+        failure_backoff: Seconds to wait before retrying a failed background refresh.
+        clock: Time source, injectable for tests.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        *,
+        ttl: float,
+        session,
+        extract_text: Callable[[str], str],
+        max_entries: int = 64,
+        max_chars: int = 20000,
+        timeout: float = 15.0,
+        failure_backoff: float = 60.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.db_path = str(db_path)
+        self.ttl = ttl
+        self.session = session
+        self.extract_text = extract_text
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.timeout = timeout
+        self.failure_backoff = failure_backoff
+        self.clock = clock
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._in_flight: set = set()
+        self.metrics = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "revalidated": 0,
+            "refreshed": 0,
+            "refresh_failures": 0,
+            "evictions": 0,
+        }
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per operation keeps this safe across threads and forks.
+        conn = sqlite3.connect(self.db_path, timeout=5.0)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    # ------------------------------------------------------------------ reads
+
+    def peek(self, key: str) -> Optional[Dict[str, object]]:
+        """Return the stored entry for ``key`` (fresh or stale) without side effects."""
+        with closing(self._connect()) as conn:
+            row = conn.execute("SELECT * FROM pages WHERE key = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def get_page(
+        self,
+        key: str,
+        url: str,
+        fallback: Optional[Callable[[], Optional[Dict[str, object]]]] = None,
+    ) -> Optional[Dict[str, object]]:
+        """
+        Return page data for ``key``. Fresh entries come straight from the cache,
+        stale ones are returned immediately while a background refresh runs, and
+        only a missing entry blocks on the network (then on ``fallback``).
+        """
+        entry = self.peek(key)
+        now = self.clock()
+
+        if entry:
+            self._touch(entry)
+            if now - entry["fetched_at"] <= self.ttl:
+                self.metrics["hits"] += 1
+                return self._as_page_data(entry, "cache")
+            self.metrics["stale_hits"] += 1
+            self._schedule_refresh(key, url)
+            return self._as_page_data(entry, "stale-cache")
+
+        self.metrics["misses"] += 1
+        page_data = self.refresh(key, url)
+        if page_data:
+            return page_data
+
+        if fallback:
+            page_data = fallback()
+            if page_data:
+                self.store(key, page_data)
+                # Keep serving the fallback, but mark it stale so the live site is
+                # retried in the background once the failure backoff has passed.
+                self._execute(
+                    "UPDATE pages SET fetched_at = ?, refresh_lease = ? WHERE key = ?",
+                    (now - self.ttl - 1, now + self.failure_backoff, key),
+                )
+        return page_data
+
+    # ----------------------------------------------------------------- writes
+
+    def store(
+        self,
+        key: str,
+        page_data: Dict[str, object],
+        *,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """Insert or replace an entry, then evict least recently used rows over the bound."""
+        now = self.clock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                """
+                INSERT INTO pages (key, url, text, source, etag, last_modified, fetch_duration,
+                                   fetched_at, last_access, refresh_lease)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
+                ON CONFLICT(key) DO UPDATE SET
+                    url = excluded.url, text = excluded.text, source = excluded.source,
+                    etag = excluded.etag, last_modified = excluded.last_modified,
+                    fetch_duration = excluded.fetch_duration, fetched_at = excluded.fetched_at,
+                    last_access = excluded.last_access, refresh_lease = 0
+                """,
+                (
+                    key,
+                    page_data.get("url", ""),
+                    str(page_data.get("text", ""))[: self.max_chars],
+                    page_data.get("source", "live"),
+                    etag,
+                    last_modified,
+                    float(page_data.get("fetch_duration", 0.0) or 0.0),
+                    now,
+                    now,
+                ),
+            )
+            evicted = conn.execute(
+                """
+                DELETE FROM pages WHERE key NOT IN (
+                    SELECT key FROM pages ORDER BY last_access DESC LIMIT ?
+                )
+                """,
+                (self.max_entries,),
+            ).rowcount
+        if evicted:
+            self.metrics["evictions"] += evicted
+
+    def refresh(self, key: str, url: str) -> Optional[Dict[str, object]]:
+        """
+        Fetch ``url`` now, sending If-None-Match / If-Modified-Since when the
+        cached entry came from the live site. Returns the page data, or None if
+        the fetch failed.
+        """
+        entry = self.peek(key)
+        headers = {}
+        if entry and entry["source"] == "live" and entry["url"] == url:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        fetch_start = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry:
+                fetch_duration = time.perf_counter() - fetch_start
+                now = self.clock()
+                self._execute(
+                    "UPDATE pages SET fetched_at = ?, fetch_duration = ?, refresh_lease = 0 WHERE key = ?",
+                    (now, fetch_duration, key),
+                )
+                self.metrics["revalidated"] += 1
+                print(f"[WebsiteQA] {url} not modified (revalidated in {fetch_duration:.2f}s)")
+                return {**self._as_page_data(entry, "revalidated"), "fetch_duration": fetch_duration}
+            response.raise_for_status()
+        except Exception as exc:
+            self.metrics["refresh_failures"] += 1
+            print(f"[WebsiteQA] Failed to fetch {url}: {exc}")
+            if entry:
+                self._execute(
+                    "UPDATE pages SET refresh_lease = ? WHERE key = ?",
+                    (self.clock() + self.failure_backoff, key),
+                )
+            return None
+
+        fetch_duration = time.perf_counter() - fetch_start
+        text = self.extract_text(response.text)
+        if not text:
+            print(f"[WebsiteQA] No visible text found for {url}")
+            return None
+
+        page_data = {
+            "url": url,
+            "text": text[: self.max_chars],
+            "fetch_duration": fetch_duration,
+            "source": "live",
+        }
+        self.store(
+            key,
+            page_data,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+        self.metrics["refreshed"] += 1
+        print(
+            f"[WebsiteQA] Fetched {url} in {fetch_duration:.2f}s "
+            f"(length: {len(page_data['text'])} chars)"
+        )
+        return page_data
+
+    # ------------------------------------------------------------- internals
+
+    def _execute(self, sql: str, params: tuple) -> int:
+        try:
+            with closing(self._connect()) as conn, conn:
+                return conn.execute(sql, params).rowcount
+        except sqlite3.Error as exc:
+            print(f"[PageCache] SQLite error: {exc}")
+            return 0
+
+    def _touch(self, entry: Dict[str, object]) -> None:
+        now = self.clock()
+        if now - entry["last_access"] >= _ACCESS_TOUCH_INTERVAL:
+            self._execute("UPDATE pages SET last_access = ? WHERE key = ?", (now, entry["key"]))
+
+    def claim(self, name: str, seconds: float) -> bool:
+        """Take the named cross-worker lease for ``seconds``; False if another holder has it."""
+        now = self.clock()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute("INSERT OR IGNORE INTO leases (name, held_until) VALUES (?, 0)", (name,))
+                return conn.execute(
+                    "UPDATE leases SET held_until = ? WHERE name = ? AND held_until <= ?",
+                    (now + seconds, name, now),
+                ).rowcount == 1
+        except sqlite3.Error as exc:
+            print(f"[PageCache] SQLite error: {exc}")
+            return False
+
+    def _claim_refresh(self, key: str) -> bool:
+        """Take the cross-worker refresh lease for ``key``; False if someone else holds it."""
+        now = self.clock()
+        return self._execute(
+            "UPDATE pages SET refresh_lease = ? WHERE key = ? AND refresh_lease <= ?",
+            (now + self.timeout * 2, key, now),
+        ) == 1
+
+    def _schedule_refresh(self, key: str, url: str) -> None:
+        if key in self._in_flight or not self._claim_refresh(key):
+            return
+        self._in_flight.add(key)
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="page-cache")
+            executor = self._executor
+
+        def _run() -> None:
+            try:
+                self.refresh(key, url)
+            finally:
+                self._in_flight.discard(key)
+
+        executor.submit(_run)
+
+    def wait_for_refreshes(self) -> None:
+        """Block until queued background refreshes finish (used by tests and shutdown)."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    @staticmethod
+    def _as_page_data(entry: Dict[str, object], source: str) -> Dict[str, object]:
+        return {
+            "url": entry["url"],
+            "text": entry["text"],
+            "fetch_duration": entry["fetch_duration"],
+            "source": source if entry["source"] == "live" else entry["source"],
+            "fetched_at": entry["fetched_at"],
+        }
+
+
+class PagePrefetcher:
+    """
+    Background thread that keeps a fixed set of pages warm in a SharedPageCache.
+
+    Every ``interval`` seconds each page is refreshed with a conditional GET; a
+    per-page lease makes sure only one worker on the host does the fetch. When
+    a page has never been fetched and the site is unreachable, ``fallback(key)``
+    is stored instead so readers always find a record.
+    """
+
+    def __init__(
+        self,
+        cache: SharedPageCache,
+        pages: Dict[str, str],
+        *,
+        interval: float,
+        fallback: Optional[Callable[[str], Optional[Dict[str, object]]]] = None,
+    ) -> None:
+        self.cache = cache
+        self.pages = dict(pages)
+        self.interval = interval
+        self.fallback = fallback
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.last_run_at: Optional[float] = None
+        self.last_run_seconds: Optional[float] = None
+        self.page_stats: Dict[str, Dict[str, object]] = {
+            key: {"last_result": None, "last_refresh_seconds": None, "consecutive_failures": 0}
+            for key in self.pages
+        }
+
+    def start(self) -> bool:
+        """Start the background thread (idempotent). Returns True if a thread was started."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="page-prefetcher", daemon=True)
+            self._thread.start()
+        print(f"[WebsiteQA] Prefetching {len(self.pages)} page(s) every {self.interval:.0f}s")
+        return True
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.refresh_all()
+            except Exception as exc:
+                print(f"[WebsiteQA] Page prefetch run failed: {exc}")
+            self._stop.wait(self.interval)
+
+    def refresh_all(self) -> None:
+        """Refresh every page whose lease this worker can take."""
+        run_start = time.perf_counter()
+        for key, url in self.pages.items():
+            if self._stop.is_set():
+                break
+            # Hold the lease for most of an interval so other workers skip this round.
+            if not self.cache.claim(f"prefetch:{key}", self.interval * 0.9):
+                self.page_stats[key]["last_result"] = "skipped"
+                continue
+            self.refresh_page(key, url)
+        self.runs += 1
+        self.last_run_at = self.cache.clock()
+        self.last_run_seconds = time.perf_counter() - run_start
+
+    def refresh_page(self, key: str, url: str) -> Optional[Dict[str, object]]:
+        stats = self.page_stats.setdefault(
+            key, {"last_result": None, "last_refresh_seconds": None, "consecutive_failures": 0}
+        )
+        refresh_start = time.perf_counter()
+        page_data = self.cache.refresh(key, url)
+        if page_data:
+            stats["last_result"] = page_data["source"]
+            stats["consecutive_failures"] = 0
+        else:
+            stats["last_result"] = "failed"
+            stats["consecutive_failures"] += 1
+            if self.fallback and self.cache.peek(key) is None:
+                page_data = self.fallback(key)
+                if page_data:
+                    self.cache.store(key, page_data)
+                    stats["last_result"] = "fallback"
+        stats["last_refresh_seconds"] = time.perf_counter() - refresh_start
+        return page_data
+
+    def status(self) -> Dict[str, object]:
+        """Refresh timings and per-page freshness, read from the shared cache."""
+        now = self.cache.clock()
+        pages = {}
+        for key, url in self.pages.items():
+            entry = self.cache.peek(key)
+            pages[key] = {
+                "url": url,
+                "source": entry["source"] if entry else None,
+                "age_seconds": round(now - entry["fetched_at"], 1) if entry else None,
+                "fetch_seconds": round(entry["fetch_duration"], 3) if entry else None,
+                **self.page_stats.get(key, {}),
+            }
+        return {
+            "running": self._thread is not None and self._thread.is_alive(),
+            "interval_seconds": self.interval,
+            "runs": self.runs,
+            "last_run_at": self.last_run_at,
+            "last_run_seconds": self.last_run_seconds,
+            "pages": pages,
+        }
@@ -14,7 +14,7 @@ def check_dependencies():
     
     required_packages = [
         'flask', 'pymongo', 'torch', 'nltk', 'deep-translator', 
-        'langdetect', 'sentence-transformers', 'pinecone'
+        'sentence-transformers', 'pinecone'
     ]
     
     missing_packages = []
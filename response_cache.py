@@ -0,0 +1,243 @@
+"""
+response_cache.py
+-----------------
+Short-lived, in-process cache for the analytics API responses (admin
+dashboard, usage statistics, sub-admin dashboard and usage).
+
+``response_cache.get_or_compute(key, compute, tags)`` returns the cached
+result for ``key`` while it is younger than ``RESPONSE_CACHE_TTL_SECONDS``
+(60 s by default); otherwise it calls ``compute()`` and caches the result.
+Concurrent requests for the same key are coalesced: the first one computes,
+the others wait for its result instead of running the same aggregations
+again. Keys are built with ``cache_key(endpoint, office, args)``, so each
+endpoint / office / period / filter combination has its own entry. Only the
+computed payload is cached, after the route's own authentication check.
+
+Entries are tagged with what they read, e.g. ``("conversations",
+"conversations:ICT Office")``. Writers report through ``note_writes(tag, n,
+office)`` (ConversationLogger after each batch, feedback.save_feedback after
+each insert); once ``RESPONSE_CACHE_WRITE_THRESHOLD`` writes have
+accumulated against a tag, the entries carrying it are dropped, so an office
+page is refreshed by that office's messages and the all-office pages by any.
+Each gunicorn worker has its own cache and only sees its own writes; the TTL
+bounds how stale the others can get.
+"""
+
+from __future__ import annotations
+
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from flask import Response, make_response, request
+
+RESPONSE_CACHE_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "60"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "512"))
+RESPONSE_CACHE_WRITE_THRESHOLD = int(os.getenv("RESPONSE_CACHE_WRITE_THRESHOLD", "50"))
+# Followers give up waiting on a coalesced computation after this and compute themselves
+RESPONSE_CACHE_WAIT_SECONDS = float(os.getenv("RESPONSE_CACHE_WAIT_SECONDS", "30"))
+
+
+def cache_key(endpoint: str, office: Optional[str] = None, args=None) -> Tuple:
+    """Key for an endpoint, office and request arguments (order-insensitive)."""
+    items = tuple(sorted((name, tuple(args.getlist(name)) if hasattr(args, "getlist") else args[name])
+                         for name in args)) if args else ()
+    return (endpoint, office, items)
+
+
+def tags_for(source: str, office: Optional[str] = None) -> Tuple[str, ...]:
+    """Invalidation tags of an entry reading ``source`` (for ``office``, or all offices)."""
+    return (f"{source}:{office}",) if office else (source,)
+
+
+class _Flight:
+    __slots__ = ("done", "value", "failed")
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value = None
+        self.failed = False
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache with request coalescing and write-count invalidation.
+
+    Args:
+        ttl: Seconds an entry is served.
+        max_entries: Upper bound on entries (least recently used are evicted).
+        write_threshold: Writes against a tag that drop the entries carrying it.
+        wait_timeout: Seconds a coalesced request waits for the computing one.
+        clock: Time source, injectable for tests.
+    """
+
+    def __init__(
+        self,
+        *,
+        ttl: float = RESPONSE_CACHE_TTL_SECONDS,
+        max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+        write_threshold: int = RESPONSE_CACHE_WRITE_THRESHOLD,
+        wait_timeout: float = RESPONSE_CACHE_WAIT_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.write_threshold = max(1, write_threshold)
+        self.wait_timeout = wait_timeout
+        self.clock = clock
+        # key -> (expires_at, tags, value)
+        self._entries: "OrderedDict[Tuple, Tuple[float, Tuple[str, ...], object]]" = OrderedDict()
+        self._in_flight: Dict[Tuple, _Flight] = {}
+        self._pending_writes: Dict[str, int] = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "expired": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "invalidated_entries": 0,
+            "compute_errors": 0,
+            "compute_seconds": 0.0,
+        }
+
+    def get_or_compute(self, key: Tuple, compute: Callable[[], object], tags: Iterable[str] = (),
+                       cacheable: Optional[Callable[[object], bool]] = None) -> object:
+        """
+        Cached value of ``key``, computing it once across concurrent callers.
+        Exceptions from ``compute`` propagate and are not cached, nor are values
+        rejected by ``cacheable``; callers must not mutate the returned value.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.metrics["hits"] += 1
+                    return entry[2]
+                del self._entries[key]
+                self.metrics["expired"] += 1
+            flight = self._in_flight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._in_flight[key] = _Flight()
+                generation = self._generation
+                self.metrics["misses"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+
+        if not leader:
+            if flight.done.wait(self.wait_timeout) and not flight.failed:
+                return flight.value
+            return compute()
+
+        started = time.perf_counter()
+        try:
+            value = compute()
+        except Exception:
+            with self._lock:
+                self.metrics["compute_errors"] += 1
+                self._in_flight.pop(key, None)
+            flight.failed = True
+            flight.done.set()
+            raise
+        with self._lock:
+            self.metrics["compute_seconds"] += time.perf_counter() - started
+            self._in_flight.pop(key, None)
+            # Not cached if an invalidation ran while it was computed (it may predate the writes)
+            if generation == self._generation and (cacheable is None or cacheable(value)):
+                self._entries[key] = (self.clock() + self.ttl, tuple(tags), value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.metrics["evictions"] += 1
+        flight.value = value
+        flight.done.set()
+        return value
+
+    def note_writes(self, source: str, count: int = 1, office: Optional[str] = None) -> None:
+        """Count writes to ``source`` (for ``office``); drop entries whose tags reached the threshold."""
+        if count <= 0:
+            return
+        with self._lock:
+            full = []
+            for tag in (source, f"{source}:{office}") if office else (source,):
+                pending = self._pending_writes.get(tag, 0) + count
+                if pending >= self.write_threshold:
+                    full.append(tag)
+                    pending = 0
+                self._pending_writes[tag] = pending
+            if full:
+                self._invalidate_locked(full)
+
+    def note_documents(self, source: str, documents: Iterable[Dict[str, object]]) -> None:
+        """``note_writes`` for inserted documents, per office (ConversationLogger ``on_written``)."""
+        by_office: Dict[Optional[str], int] = {}
+        for document in documents:
+            office = document.get("office")
+            by_office[office] = by_office.get(office, 0) + 1
+        for office, count in by_office.items():
+            self.note_writes(source, count, office)
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop the entries carrying any of ``tags`` (every entry when none are given)."""
+        with self._lock:
+            return self._invalidate_locked(tags)
+
+    def _invalidate_locked(self, tags: Iterable[str]) -> int:
+        tags = set(tags)
+        if tags:
+            stale = [key for key, (_, entry_tags, _) in self._entries.items() if tags.intersection(entry_tags)]
+        else:
+            stale = list(self._entries)
+        for key in stale:
+            del self._entries[key]
+        self._generation += 1
+        self.metrics["invalidations"] += 1
+        self.metrics["invalidated_entries"] += len(stale)
+        return len(stale)
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.metrics["hits"] + self.metrics["coalesced"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "entries": len(self._entries),
+            "in_flight": len(self._in_flight),
+            "ttl": self.ttl,
+            "write_threshold": self.write_threshold,
+            "hit_rate": round((self.metrics["hits"] + self.metrics["coalesced"]) / lookups, 3) if lookups else None,
+            "avg_compute_ms": round(self.metrics["compute_seconds"] / self.metrics["misses"] * 1000, 1)
+            if self.metrics["misses"] else None,
+        }
+
+
+# Shared by every blueprint and writer in the process
+response_cache = ResponseCache()
+
+
+def cached_view(endpoint: str, source: str = "conversations"):
+    """
+    Cache a view's successful responses by endpoint, URL and query arguments.
+    Only for views without per-user output or authentication; the others
+    cache their computation with ``get_or_compute`` after their own checks.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            def compute():
+                response = make_response(view(*args, **kwargs))
+                return response.get_data(), response.status_code, response.mimetype
+
+            key = cache_key(endpoint, None, request.args) + (tuple(sorted(kwargs.items())),)
+            body, status, mimetype = response_cache.get_or_compute(
+                key, compute, tags_for(source), cacheable=lambda value: value[1] == 200
+            )
+            return Response(body, status=status, mimetype=mimetype)
+        return wrapper
+    return decorator
@@ -0,0 +1,225 @@
+"""
+response_catalog.py
+-------------------
+Pre-translated (English → Tagalog) catalogue of the bot's static responses:
+intents.json ``responses``, DOMAIN_REFUSAL_MESSAGE, the office-switch
+templates and the offline fallback texts (see static_responses.py).
+
+The catalogue is a JSON file mapping sha1(english text) to its translation.
+Building is incremental: entries whose English text is unchanged are kept and
+only new strings are translated, and the file records the intents.json hash
+so a rebuild is skipped when nothing changed. /predict looks responses up here
+first and only translates dynamic (LLM / retrieved) text live.
+
+Run ``python response_catalog.py`` during the build to (re)write the catalogue.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+from static_responses import iter_static_responses
+
+BASE_DIR = Path(__file__).resolve().parent
+INTENTS_PATH = BASE_DIR / "intents.json"
+RESPONSE_CATALOG_PATH = Path(
+    os.getenv("RESPONSE_CATALOG_PATH", str(BASE_DIR / "response_catalog.tl.json"))
+)
+# Seconds between mtime checks for a rebuilt catalogue file at runtime
+RESPONSE_CATALOG_RELOAD_SECONDS = float(os.getenv("RESPONSE_CATALOG_RELOAD_SECONDS", "60"))
+
+# Bump when the file layout or the set of catalogued texts changes shape.
+CATALOG_VERSION = 1
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _file_sha1(path: Path) -> str:
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+
+def _read_catalog(catalog_path: Path) -> Optional[Dict[str, object]]:
+    if not catalog_path.exists():
+        return None
+    try:
+        catalog = json.loads(catalog_path.read_text(encoding="utf-8"))
+    except Exception as exc:
+        print(f"[ResponseCatalog] Ignoring unreadable catalogue {catalog_path}: {exc}")
+        return None
+    if catalog.get("version") != CATALOG_VERSION:
+        return None
+    return catalog
+
+
+def _write_catalog(catalog_path: Path, catalog: Dict[str, object]) -> None:
+    """Write atomically so running workers never read a partial file."""
+    catalog_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=".catalog-", dir=str(catalog_path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(catalog, fh, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_name, catalog_path)
+    except Exception:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def build_catalog(
+    *,
+    intents_path: Path = INTENTS_PATH,
+    catalog_path: Path = RESPONSE_CATALOG_PATH,
+    target: str = "tl",
+    translate: Optional[Callable[[str], str]] = None,
+    force: bool = False,
+) -> Dict[str, object]:
+    """
+    Translate every static response into ``target`` and write the catalogue.
+
+    ``translate`` defaults to the shared TranslationCache (en → target), so
+    strings already translated live are not sent to Google again. Strings that
+    fail to translate are left out and retried on the next build.
+    """
+    start = time.perf_counter()
+    intents_sha1 = _file_sha1(intents_path)
+    with open(intents_path, "r", encoding="utf-8") as fh:
+        intents = json.load(fh)
+
+    texts = {text_key(text): text for text in iter_static_responses(intents) if text.strip()}
+    existing = None if force else _read_catalog(catalog_path)
+    old_entries = (existing or {}).get("entries", {}) if (existing or {}).get("target") == target else {}
+
+    if existing and existing.get("intents_sha1") == intents_sha1 and set(texts) <= set(old_entries):
+        print(f"[ResponseCatalog] {catalog_path.name} is up to date ({len(old_entries)} entries)")
+        return {"entries": len(old_entries), "reused": len(old_entries), "translated": 0, "failed": 0,
+                "written": False, "seconds": time.perf_counter() - start}
+
+    if translate is None:
+        from translation_cache import TranslationCache
+
+        cache = TranslationCache()
+
+        def translate(text: str) -> str:
+            return cache.translate(text, "en", target)
+
+    entries: Dict[str, str] = {}
+    reused = translated = failed = 0
+    for key, text in texts.items():
+        if key in old_entries:
+            entries[key] = old_entries[key]
+            reused += 1
+            continue
+        try:
+            result = translate(text)
+        except Exception as exc:
+            print(f"[ResponseCatalog] Failed to translate {text[:60]!r}: {exc}")
+            failed += 1
+            continue
+        if result and result != text:
+            entries[key] = result
+            translated += 1
+        else:
+            failed += 1
+
+    _write_catalog(
+        catalog_path,
+        {
+            "version": CATALOG_VERSION,
+            "source": "en",
+            "target": target,
+            # A partial build keeps the old hash so the next build retries the failures
+            "intents_sha1": intents_sha1 if not failed else (existing or {}).get("intents_sha1"),
+            "built_at": datetime.now(UTC).isoformat(),
+            "entries": entries,
+        },
+    )
+    return {"entries": len(entries), "reused": reused, "translated": translated, "failed": failed,
+            "written": True, "seconds": time.perf_counter() - start}
+
+
+class ResponseCatalog:
+    """Runtime lookup of pre-translated static responses (no network)."""
+
+    def __init__(
+        self,
+        catalog_path: Path = RESPONSE_CATALOG_PATH,
+        *,
+        reload_seconds: float = RESPONSE_CATALOG_RELOAD_SECONDS,
+    ) -> None:
+        self.catalog_path = Path(catalog_path)
+        self.reload_seconds = reload_seconds
+        self.entries: Dict[str, str] = {}
+        self.target: Optional[str] = None
+        self.built_at: Optional[str] = None
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self._reload()
+
+    def _reload(self) -> None:
+        self._checked_at = time.monotonic()
+        try:
+            mtime = self.catalog_path.stat().st_mtime
+        except OSError:
+            if self._mtime is None:
+                print(f"[ResponseCatalog] No catalogue at {self.catalog_path}; Tagalog responses will be translated live")
+            return
+        if mtime == self._mtime:
+            return
+        catalog = _read_catalog(self.catalog_path)
+        self._mtime = mtime
+        if catalog is None:
+            return
+        self.entries = catalog.get("entries", {})
+        self.target = catalog.get("target")
+        self.built_at = catalog.get("built_at")
+        print(f"[ResponseCatalog] Loaded {len(self.entries)} pre-translated response(s) ({self.target})")
+
+    def lookup(self, text: str, target: str = "tl") -> Optional[str]:
+        """Return the pre-translated text, or None if ``text`` is not a catalogued static response."""
+        if time.monotonic() - self._checked_at >= self.reload_seconds:
+            self._reload()
+        if not text or target != self.target:
+            self.misses += 1
+            return None
+        translated = self.entries.get(text_key(text))
+        if translated is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return translated
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "entries": len(self.entries),
+            "target": self.target,
+            "built_at": self.built_at,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+if __name__ == "__main__":
+    # Never fail the deploy: without a catalogue /predict simply translates live
+    try:
+        build_stats = build_catalog()
+    except Exception as exc:
+        print(f"[ResponseCatalog] Build failed: {exc}")
+    else:
+        print(
+            f"[ResponseCatalog] {RESPONSE_CATALOG_PATH.name}: {build_stats['entries']} entries "
+            f"({build_stats['reused']} reused, {build_stats['translated']} translated, "
+            f"{build_stats['failed']} failed) in {build_stats['seconds']:.1f}s"
+        )
@@ -0,0 +1,157 @@
+"""
+response_metadata.py
+--------------------
+Resolution status, escalation flag and suggested office for bot replies.
+
+/predict used to scan every reply with substring checks against the
+unresolved and escalation phrase lists, then scan the office names for a
+suggested switch. For the static responses (see static_responses.py) the
+answer never changes, so ``ResponseMetadataIndex`` classifies each of them
+once at load time and a reply is looked up by its text. Only dynamic text
+(LLM, retrieved or FAQ answers) goes through ``ResponseMatcher``, which holds
+the phrase lists pre-lower-cased and lower-cases the reply only once.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, NamedTuple, Optional, Tuple
+
+from static_responses import OFFICE_TAGS, iter_static_responses
+
+# Common unresolved/fallback phrases
+UNRESOLVED_PATTERNS = (
+    "sorry",
+    "contact support",
+    "i'm not sure how to respond",
+    "please try one of the suggested topics",
+    "rephrase your question",
+    "i'm not sure i understand",
+    "could you rephrase your question",
+    "sorry, i don't have that information yet",
+    "i'm still learning",
+    "i might not have understood that correctly",
+    "i don't quite understand that",
+    "would you like to try asking about a specific office or service",
+    "i'm here to help with information about college offices and services",
+)
+
+# Phrases that mean the bot is suggesting another office (also escalations)
+OFFICE_SUGGESTION_PATTERNS = (
+    "i think you might be asking about",
+    "would you like me to connect you",
+)
+
+# Escalation phrases (hand-off to human/office); take priority over the unresolved ones
+ESCALATION_PATTERNS = OFFICE_SUGGESTION_PATTERNS + (
+    "escalating to a human agent",
+    "let me connect you to support",
+    "please contact the registrar",
+    "please contact admissions",
+    "please reach out to guidance",
+    "i'm forwarding this to ict",
+    "⚠️ **context switch detected**",
+    "context switch detected",
+    "click the **'reset context'** button at the top of the chat",
+    "reset context",
+    "reset the",
+    "switching to the",
+    "office context",
+    "context switch",
+    "reset context'",
+    "type 'reset context'",
+    "clear the current office context",
+    "ensure clear and accurate responses",
+)
+
+
+class ResponseMetadata(NamedTuple):
+    status: str  # "escalated", "unresolved" or "resolved"
+    escalated: bool
+    unresolved: bool
+    suggested_office_tag: Optional[str]
+    matched_pattern: Optional[str]
+    precomputed: bool
+
+
+class ResponseMatcher:
+    """
+    The phrase lists compiled once: lower-cased, de-duplicated tuples checked
+    against a single lower-cased copy of the reply. (A combined regex
+    alternation was measured ~2x slower than CPython's substring search on
+    typical 400-800 character LLM answers.)
+    """
+
+    def __init__(self, office_tags: Dict[str, str] = OFFICE_TAGS) -> None:
+        self.suggestion = _compile(OFFICE_SUGGESTION_PATTERNS)
+        self.escalation = _compile(ESCALATION_PATTERNS)
+        self.unresolved = _compile(UNRESOLVED_PATTERNS)
+        self.offices = tuple((tag, name.lower()) for tag, name in office_tags.items())
+
+    def classify(self, text: str, *, precomputed: bool = False) -> ResponseMetadata:
+        if not text:
+            return ResponseMetadata("resolved", False, False, None, None, precomputed)
+
+        lowered = text.lower()
+        escalation = _first_match(self.escalation, lowered)
+        unresolved = _first_match(self.unresolved, lowered)
+        status = "escalated" if escalation else "unresolved" if unresolved else "resolved"
+
+        suggested_office_tag = None
+        if _first_match(self.suggestion, lowered):
+            suggested_office_tag = next((tag for tag, name in self.offices if name in lowered), None)
+
+        return ResponseMetadata(
+            status,
+            escalation is not None,
+            unresolved is not None,
+            suggested_office_tag,
+            escalation or unresolved,
+            precomputed,
+        )
+
+
+def _compile(patterns: Iterable[str]) -> Tuple[str, ...]:
+    return tuple(dict.fromkeys(p.lower() for p in patterns))
+
+
+def _first_match(patterns: Tuple[str, ...], lowered: str) -> Optional[str]:
+    for pattern in patterns:
+        if pattern in lowered:
+            return pattern
+    return None
+
+
+class ResponseMetadataIndex:
+    """Metadata for every static response, computed once; dynamic text falls back to the matcher."""
+
+    def __init__(self, intents: Dict[str, object], office_tags: Dict[str, str] = OFFICE_TAGS) -> None:
+        self.matcher = ResponseMatcher(office_tags)
+        self._static: Dict[str, ResponseMetadata] = {}
+        for text in iter_static_responses(intents):
+            if text and text not in self._static:
+                self._static[text] = self.matcher.classify(text, precomputed=True)
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, text: str) -> ResponseMetadata:
+        metadata = self._static.get(text)
+        if metadata is not None:
+            self.hits += 1
+            return metadata
+        self.misses += 1
+        return self.matcher.classify(text)
+
+    def status_counts(self) -> Tuple[int, int, int]:
+        statuses = [metadata.status for metadata in self._static.values()]
+        return statuses.count("resolved"), statuses.count("unresolved"), statuses.count("escalated")
+
+    def stats(self) -> Dict[str, object]:
+        resolved, unresolved, escalated = self.status_counts()
+        return {
+            "static_responses": len(self._static),
+            "static_resolved": resolved,
+            "static_unresolved": unresolved,
+            "static_escalated": escalated,
+            "precomputed_hits": self.hits,
+            "matcher_calls": self.misses,
+        }
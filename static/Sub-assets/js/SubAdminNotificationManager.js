@@ -10,6 +10,9 @@ class SubAdminNotificationManager {
         this.isDropdownOpen = false;
         this.refreshInterval = 60000; // Refresh every 60 seconds
         this.intervalId = null;
+        this.cursor = null; // Feed cursor: each poll only fetches what is new since the last one
+        this.maxFeedPages = 10; // Pages fetched back to back when the feed reports has_more
+        this.maxItems = 10;
     }
 
     /**
@@ -77,11 +80,11 @@ class SubAdminNotificationManager {
     }
 
     /**
-     * Load notifications from backend
+     * Load notifications from backend (following has_more pages, up to maxFeedPages per poll)
      */
-    async loadNotifications() {
+    async loadNotifications(page = 1) {
         try {
-            const response = await fetch('/api/sub-admin/notifications', {
+            const response = await fetch(this.getNotificationsUrl('/api/sub-admin/notifications'), {
                 method: 'GET',
                 credentials: 'include',
                 headers: {
@@ -99,9 +102,13 @@ class SubAdminNotificationManager {
             const data = await response.json();
             
             if (data.success) {
-                this.notifications = data.notifications || [];
+                this.mergeNotifications(data.notifications || []);
+                this.cursor = data.cursor || this.cursor;
                 this.unreadCount = data.unread_count || 0;
                 this.updateUI();
+                if (data.has_more && page < this.maxFeedPages) {
+                    await this.loadNotifications(page + 1);
+                }
             } else {
                 console.error('Error loading notifications:', data.message);
             }
@@ -110,10 +117,29 @@ class SubAdminNotificationManager {
             // Show default state if error
             this.notifications = [];
             this.unreadCount = 0;
+            this.cursor = null;
             this.updateUI();
         }
     }
 
+    /**
+     * Merge newly fetched notifications into the list (newest first, no duplicates)
+     */
+    mergeNotifications(newNotifications) {
+        const byId = new Map(this.notifications.map(notification => [notification.id, notification]));
+        newNotifications.forEach(notification => byId.set(notification.id, notification));
+        this.notifications = Array.from(byId.values())
+            .sort((a, b) => (a.time < b.time ? 1 : a.time > b.time ? -1 : 0))
+            .slice(0, this.maxItems);
+    }
+
+    /**
+     * Notifications endpoint URL, with the cursor of the previous poll
+     */
+    getNotificationsUrl(baseUrl) {
+        return this.cursor ? `${baseUrl}?since=${encodeURIComponent(this.cursor)}` : baseUrl;
+    }
+
     /**
      * Update the UI with current notifications
      */
@@ -274,12 +300,23 @@ class SubAdminNotificationManager {
     /**
      * Mark all notifications as read
      */
-    markAllAsRead() {
+    async markAllAsRead() {
         this.unreadCount = 0;
         this.updateBadge();
         this.closeDropdown();
-        
-        console.log('All notifications marked as read');
+
+        try {
+            await fetch('/api/sub-admin/notifications/read', {
+                method: 'POST',
+                credentials: 'include',
+                headers: {
+                    'Content-Type': 'application/json'
+                }
+            });
+            console.log('All notifications marked as read');
+        } catch (error) {
+            console.error('Error marking notifications as read:', error);
+        }
     }
 
     /**
@@ -10,6 +10,9 @@ class NotificationManager {
         this.isDropdownOpen = false;
         this.refreshInterval = 60000; // Refresh every 60 seconds
         this.intervalId = null;
+        this.cursor = null; // Feed cursor: each poll only fetches what is new since the last one
+        this.maxFeedPages = 10; // Pages fetched back to back when the feed reports has_more
+        this.maxItems = 10;
     }
 
     /**
@@ -77,9 +80,9 @@ class NotificationManager {
     }
 
     /**
-     * Load notifications from backend
+     * Load notifications from backend (following has_more pages, up to maxFeedPages per poll)
      */
-    async loadNotifications() {
+    async loadNotifications(page = 1) {
         try {
             // Get authentication token
             const token = localStorage.getItem('admin_token');
@@ -92,7 +95,7 @@ class NotificationManager {
                 return;
             }
 
-            const response = await fetch('/api/admin/notifications', {
+            const response = await fetch(this.getNotificationsUrl('/api/admin/notifications'), {
                 method: 'GET',
                 headers: {
                     'Content-Type': 'application/json',
@@ -111,9 +114,13 @@ class NotificationManager {
             const data = await response.json();
             
             if (data.success) {
-                this.notifications = data.notifications || [];
+                this.mergeNotifications(data.notifications || []);
+                this.cursor = data.cursor || this.cursor;
                 this.unreadCount = data.unread_count || 0;
                 this.updateUI();
+                if (data.has_more && page < this.maxFeedPages) {
+                    await this.loadNotifications(page + 1);
+                }
             } else {
                 console.error('Error loading notifications:', data.message);
             }
@@ -122,10 +129,29 @@ class NotificationManager {
             // Show default state if error
             this.notifications = [];
             this.unreadCount = 0;
+            this.cursor = null;
             this.updateUI();
         }
     }
 
+    /**
+     * Merge newly fetched notifications into the list (newest first, no duplicates)
+     */
+    mergeNotifications(newNotifications) {
+        const byId = new Map(this.notifications.map(notification => [notification.id, notification]));
+        newNotifications.forEach(notification => byId.set(notification.id, notification));
+        this.notifications = Array.from(byId.values())
+            .sort((a, b) => (a.time < b.time ? 1 : a.time > b.time ? -1 : 0))
+            .slice(0, this.maxItems);
+    }
+
+    /**
+     * Notifications endpoint URL, with the cursor of the previous poll
+     */
+    getNotificationsUrl(baseUrl) {
+        return this.cursor ? `${baseUrl}?since=${encodeURIComponent(this.cursor)}` : baseUrl;
+    }
+
     /**
      * Update the UI with current notifications
      */
@@ -286,13 +312,25 @@ class NotificationManager {
     /**
      * Mark all notifications as read
      */
-    markAllAsRead() {
+    async markAllAsRead() {
         this.unreadCount = 0;
         this.updateBadge();
         this.closeDropdown();
-        
-        // In a real implementation, you would also send this to the backend
-        console.log('All notifications marked as read');
+
+        try {
+            const token = localStorage.getItem('admin_token');
+            await fetch('/api/admin/notifications/read', {
+                method: 'POST',
+                headers: {
+                    'Content-Type': 'application/json',
+                    'Authorization': `Bearer ${token}`
+                },
+                credentials: 'include'
+            });
+            console.log('All notifications marked as read');
+        } catch (error) {
+            console.error('Error marking notifications as read:', error);
+        }
     }
 
     /**
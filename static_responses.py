@@ -0,0 +1,98 @@
+"""
+static_responses.py
+-------------------
+Fixed bot texts shared by chat.py and app.py, kept free of heavy imports so
+build steps (see response_catalog.py) can enumerate every static response
+without loading the models or connecting to the database.
+"""
+
+from itertools import permutations
+from typing import Dict, Iterable, Iterator, List
+
+DOMAIN_REFUSAL_MESSAGE = (
+    "I'm sorry, but I can only assist with questions related to Tanauan City College (TCC).\n"
+    "For further assistance, you may reach out to the appropriate TCC office below:\n\n"
+    "📞 TCC Official\n"
+    "(043) 702 6979 / 📧 tanauancitycollege@gmail.com\n\n"
+    "🏛️ Office of Student Affairs (OSA)\n"
+    "0998 457 4389 / 📧 tanauancitycollege.osa@gmail.com\n\n"
+    "💻 MISU Office\n"
+    "0994 189 7696 / 📧 tanauancitycollege013@gmail.com\n\n"
+    "🗂️ Registrar’s Office\n"
+    "0981 349 1038 / 📧 tanauancitycollege.registrar@gmail.com\n\n"
+    "🎓 Iskolar ng Lungsod Council (ILC)\n"
+    "0971 745 6791 / 📧 iskolarnglungsodcouncil.tcc@gmail.com\n\n"
+    "📝 Admission Office\n"
+    "0956 641 9801 / 📧 tanauancitycollege.admission@gmail.com\n\n"
+    "💬 Guidance Office\n"
+    "0985 402 6745 / 📧 tanauancitycollege.guidance@gmail.com\n\n"
+    "Thank you for reaching out! Please contact the relevant office for your specific concern. 💚"
+)
+
+# Office mapping for context switching
+OFFICE_TAGS = {
+    'admission_office': 'Admissions Office',
+    'registrar_office': "Registrar's Office",
+    'ict_office': 'ICT Office',
+    'guidance_office': 'Guidance Office',
+    'osa_office': 'Office of the Student Affairs (OSA)'
+}
+
+# chat.get_context_switch_response (defaults used when a tag is unknown)
+CONTEXT_SWITCH_TEMPLATE = (
+    "I think you might be asking about the {office_name}. Right now, I can only assist you with "
+    "{current_office_name} concerns. Would you like me to connect you to the {office_name} information instead?"
+)
+CONTEXT_SWITCH_DEFAULT_OFFICE = "that office"
+CONTEXT_SWITCH_DEFAULT_CURRENT = "the current topic"
+
+# /predict: reply after the user confirms a suggested office switch
+OFFICE_SWITCH_CONFIRMATION_TEMPLATE = (
+    "Great! I've switched to help you with {office_name} information. How can I assist you?"
+)
+
+# /predict: warning when the user asks about another office without resetting
+OFFICE_SWITCH_WARNING_TEMPLATE = (
+    "⚠️ **Context Switch Detected**\n\n"
+    "You're currently in the **{current_office_name}** context. "
+    "I noticed you're now asking about the **{new_office_name}**.\n\n"
+    "To ensure clear and accurate responses, please **reset the {current_office_name} context** first before switching to the {new_office_name}.\n\n"
+    "💡 **How to reset:**\n"
+    "• Click the **'Reset Context'** button at the top of the chat\n\n"
+    "This helps me provide you with the most relevant information for each office! 😊"
+)
+
+# chat.get_fallback_response (used when the model is not available)
+FALLBACK_RESPONSES = {
+    "greeting": "Hello! Welcome to TCC Assistant. How can I help you today?",
+    "help": "I'm here to help! You can ask me about admissions, registrar services, ICT support, guidance, or student affairs.",
+    "admission": "For admission inquiries, please contact the Admissions Office. They can help with requirements and application procedures.",
+    "registrar": "The Registrar's Office handles academic records and transcripts. Please visit them for document requests.",
+    "ict": "For ICT support and password issues, please contact the ICT Office. They can help with student portal access.",
+    "guidance": "The Guidance Office provides counseling services and scholarship information. Visit them for career guidance.",
+    "osa": "The Office of Student Affairs manages student activities and clubs. Contact them for organization information.",
+    "thanks": "You're welcome! Feel free to ask if you need more help.",
+    "goodbye": "Goodbye! Have a great day!",
+    "default": "I'm TCC Assistant! I can help you with information about admissions, registrar services, ICT support, guidance, and student affairs. What would you like to know?",
+}
+
+
+def iter_static_responses(intents: Dict[str, List[Dict[str, object]]]) -> Iterator[str]:
+    """Yield every fixed response text the bot can send (duplicates included)."""
+    for intent in intents.get("intents", []):
+        for response in intent.get("responses", []):
+            if isinstance(response, str):
+                yield response
+
+    yield DOMAIN_REFUSAL_MESSAGE
+    yield from FALLBACK_RESPONSES.values()
+
+    office_names: Iterable[str] = list(OFFICE_TAGS.values())
+    for office_name in office_names:
+        yield OFFICE_SWITCH_CONFIRMATION_TEMPLATE.format(office_name=office_name)
+        yield CONTEXT_SWITCH_TEMPLATE.format(office_name=office_name, current_office_name=CONTEXT_SWITCH_DEFAULT_CURRENT)
+    for current_office_name, office_name in permutations(office_names, 2):
+        yield CONTEXT_SWITCH_TEMPLATE.format(office_name=office_name, current_office_name=current_office_name)
+        yield OFFICE_SWITCH_WARNING_TEMPLATE.format(
+            current_office_name=current_office_name, new_office_name=office_name
+        )
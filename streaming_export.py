@@ -0,0 +1,222 @@
+"""
+streaming_export.py
+-------------------
+Streaming exports of raw conversations and chat sessions.
+
+The export endpoints (usage.py for admins, sub_dashboard.py for sub-admins)
+return a Flask generator response: documents are read with a batched cursor
+and a projection of just the exported fields, encoded one at a time as CSV or
+JSONL, gathered into ~64 KB chunks and optionally gzip-compressed on the fly.
+Memory use is one cursor batch plus one chunk, however large the export.
+
+Conversations come out in ``timestamp`` order, then ``_id``; rows that only
+have the ISO ``date`` (not yet given a timestamp by migrate_timestamps.py)
+sort first, in ``_id`` order, since sorting on the fallback would need an
+aggregation instead of the indexed sort. Sessions come out in ``start`` order.
+CSV cells that a spreadsheet would read as a formula (starting with ``=``,
+``+``, ``-``, ``@``, tab or carriage return) are prefixed with ``'``.
+
+Query arguments shared by the endpoints:
+    dataset     conversations (default) or sessions
+    format      csv (default) or jsonl
+    gzip        1 / true to download a .gz file
+    start_date  YYYY-MM-DD, local date (see ``tz``), inclusive
+    end_date    YYYY-MM-DD, local date, inclusive
+    office      office display name (forced to their own office for sub-admins)
+    tz          IANA timezone of the dates (default ANALYTICS_TIMEZONE)
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import Response, jsonify
+
+from analytics_queries import field_range, time_match
+from time_buckets import resolve_timezone, to_utc
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+# dataset -> collection, exported (column, dotted path) pairs, time field and sort
+# (the sort is on stored fields: conversations without a timestamp sort first)
+DATASETS: Dict[str, Dict[str, object]] = {
+    "conversations": {
+        "collection": "conversations",
+        "fields": [
+            ("timestamp", "timestamp"), ("user", "user"), ("sender", "sender"), ("office", "office"),
+            ("status", "status"), ("language", "language"), ("session_id", "session_id"), ("message", "message"),
+        ],
+        "time_field": None,  # timestamp, with the ISO ``date`` fallback of older rows
+        "sort": [("timestamp", 1), ("_id", 1)],
+    },
+    "sessions": {
+        "collection": "chat_sessions",
+        "fields": [
+            ("session_id", "_id"), ("user", "user"), ("start", "start"), ("end", "end"),
+            ("messages", "messages"), ("user_messages", "user_messages"), ("bot_messages", "bot_messages"),
+            ("offices", "offices"), ("final_status", "final_status.value"), ("language", "language.value"),
+        ],
+        "time_field": "start",
+        "sort": [("start", 1), ("_id", 1)],
+    },
+}
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+# Leading characters that make spreadsheets evaluate a cell as a formula
+_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _value(document: Dict[str, object], path: str):
+    value = document
+    for part in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    if value is None and path == "timestamp":
+        value = document.get("date")
+    return value
+
+
+def _plain(value):
+    """JSON-friendly value: datetimes as ISO strings, ObjectIds as strings."""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def _csv_cell(value):
+    """The CSV cell for a plain value; text that would start a formula is quoted with ``'``."""
+    if isinstance(value, list):
+        value = ";".join(map(str, value))
+    if value is None:
+        return ""
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def export_query(dataset: str, start: Optional[datetime], end: Optional[datetime], office: Optional[str]) -> Dict[str, object]:
+    spec = DATASETS[dataset]
+    query: Dict[str, object] = {}
+    if spec["time_field"] is None:
+        query.update(time_match(start, end))
+    else:
+        query.update(field_range(spec["time_field"], start, end))
+    if office:
+        query["offices" if dataset == "sessions" else "office"] = office
+    return query
+
+
+def iter_documents(collection, query: Dict[str, object], fields: List[Tuple[str, str]], sort,
+                   batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Dict[str, object]]:
+    """Matching documents in order, fetched ``batch_size`` at a time with only the exported fields."""
+    projection = {path.split(".")[0]: 1 for _, path in fields}
+    if "timestamp" in projection:
+        projection["date"] = 1
+    if "_id" not in projection:
+        projection["_id"] = 0
+    cursor = collection.find(query, projection).sort(sort).batch_size(batch_size)
+    try:
+        for document in cursor:
+            yield document
+    finally:
+        cursor.close()
+
+
+def _chunked(pieces: Iterable[str]) -> Iterator[bytes]:
+    buffer: List[str] = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= EXPORT_CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def csv_chunks(documents: Iterable[Dict[str, object]], fields: List[Tuple[str, str]]) -> Iterator[bytes]:
+    def lines() -> Iterator[str]:
+        line = io.StringIO()
+        writer = csv.writer(line)
+        writer.writerow([column for column, _ in fields])
+        yield line.getvalue()
+        for document in documents:
+            line.seek(0)
+            line.truncate(0)
+            writer.writerow([_csv_cell(_plain(_value(document, path))) for _, path in fields])
+            yield line.getvalue()
+
+    return _chunked(lines())
+
+
+def jsonl_chunks(documents: Iterable[Dict[str, object]], fields: List[Tuple[str, str]]) -> Iterator[bytes]:
+    return _chunked(
+        json.dumps({column: _plain(_value(document, path)) for column, path in fields}, ensure_ascii=False) + "\n"
+        for document in documents
+    )
+
+
+def gzip_chunks(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def _parse_day(value: Optional[str]) -> Optional[datetime]:
+    return datetime.strptime(value, "%Y-%m-%d") if value else None
+
+
+def export_response(db, args, *, office: Optional[str] = None, filename_prefix: str = "export"):
+    """
+    Streaming download for the request ``args`` (see module docstring); a 400
+    JSON error for unknown datasets, formats or malformed dates. ``office``
+    overrides the ``office`` argument.
+    """
+    dataset = args.get("dataset", "conversations")
+    fmt = args.get("format", "csv").lower()
+    if dataset not in DATASETS:
+        return jsonify({"success": False, "error": f"Unknown dataset: {dataset}"}), 400
+    if fmt not in FORMATS:
+        return jsonify({"success": False, "error": f"Unknown format: {fmt}"}), 400
+    try:
+        first_day, last_day = _parse_day(args.get("start_date")), _parse_day(args.get("end_date"))
+    except ValueError:
+        return jsonify({"success": False, "error": "Dates must be YYYY-MM-DD"}), 400
+    compress = args.get("gzip", "").lower() in ("1", "true", "yes")
+
+    tz = resolve_timezone(args.get("tz"))
+    start = to_utc(first_day, tz) if first_day else None
+    end = to_utc(last_day + timedelta(days=1), tz) if last_day else None
+    office = office or args.get("office") or None
+
+    spec = DATASETS[dataset]
+    documents = iter_documents(db[spec["collection"]], export_query(dataset, start, end, office), spec["fields"], spec["sort"])
+    encode = csv_chunks if fmt == "csv" else jsonl_chunks
+    body = encode(documents, spec["fields"])
+    filename = f"{filename_prefix}-{dataset}.{fmt}"
+    mimetype = FORMATS[fmt]
+    if compress:
+        body = gzip_chunks(body)
+        filename += ".gz"
+        mimetype = "application/gzip"
+    print(f"[Export] Streaming {dataset} as {filename} (office={office}, start={start}, end={end})")
+    return Response(body, mimetype=mimetype, headers={
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "Cache-Control": "no-store",
+        "X-Accel-Buffering": "no",
+    })
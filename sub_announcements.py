@@ -4,6 +4,7 @@ from pymongo import MongoClient
 from datetime import datetime
 from bson import ObjectId
 from vector_store import VectorStore
+from notifications_feed import preview, publish as publish_notification
 import traceback
 
 # Create Blueprint
@@ -69,6 +70,8 @@ def add_announcement():
         # Save to MongoDB sub_announcements collection
         result = sub_announcements_collection.insert_one(announcement_doc)
         announcement_id = str(result.inserted_id)
+        publish_notification(db, "announcement", "New announcement", preview(title, "New announcement"),
+                             office=office, admin=False, ref_id=result.inserted_id)
         
         print(f"Announcement saved to MongoDB with ID: {announcement_id}")
         
@@ -87,15 +87,17 @@ def add_conversation():
     # Detect sender
     sender = "bot" if data.get("is_bot", False) else data.get("sender", "user")
 
+    now = datetime.utcnow()
     conversation = {
         "user": data.get("user", "Anonymous"),
         "email": data.get("email", ""),  # Capture email if available
         "message": data["message"],
         "sender": sender,
         "office": data["office"],
-        "date": datetime.utcnow(),
+        "timestamp": now,  # Analytics time ranges match on timestamp
+        "date": now,
         "messages": data.get("messages", []),
-        "start_time": datetime.utcnow(),
+        "start_time": now,
         "duration": data.get("duration"),
         "category": data.get("category", "General"),
         "sentiment": data.get("sentiment", "Neutral"),
@@ -11,6 +11,7 @@ from flask import Blueprint, request, jsonify, session
 from pymongo import MongoClient
 from bson import ObjectId
 from vector_store import VectorStore
+from notifications_feed import preview, publish as publish_notification
 import traceback
 from functools import wraps
 
@@ -341,6 +342,8 @@ def add_sub_faq():
         # Insert into sub_faqs collection
         result = sub_faqs_collection.insert_one(faq_doc.copy())
         faq_id = str(result.inserted_id)
+        publish_notification(db, "faq", "New FAQ added", preview(faq_doc['question'], "No question"),
+                             office=office, color="primary", ref_id=result.inserted_id)
         
         print(f"FAQ inserted into sub_faqs collection with ID: {faq_id}")
         
@@ -0,0 +1,353 @@
+"""
+template_corpus.py
+------------------
+Extraction and snapshotting of the static template pages used for local
+context search. Parsing every template with BeautifulSoup is the slowest part
+of importing chat.py, so the extracted documents and sections (with their
+tokens precomputed) are written to a compact gzip'd JSON snapshot. Workers load
+the snapshot at startup and only re-parse templates whose mtime/size and
+content hash no longer match.
+
+Run ``python template_corpus.py`` during the build to (re)write the snapshot.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from datetime import datetime, UTC
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from context_search import tokenise
+
+BASE_DIR = Path(__file__).resolve().parent
+SITE_PAGE_MAX_CHARS = int(os.getenv("SITE_PAGE_MAX_CHARS", "20000"))
+LOCAL_TEMPLATE_SNAPSHOT = Path(
+    os.getenv("LOCAL_TEMPLATE_SNAPSHOT", str(BASE_DIR / "local_templates.snapshot.json.gz"))
+)
+
+# Bump when the document/section layout or tokenisation changes.
+SNAPSHOT_VERSION = 1
+
+LOCAL_TEMPLATE_SOURCES = {
+    "base_template": {"path": "templates/base_template.html", "title": "Base Template"},
+    "home": {"path": "templates/home.html", "title": "Home"},
+    "admission": {"path": "templates/admission.html", "title": "Admission"},
+    "academics": {"path": "templates/academics.html", "title": "Academics"},
+    "community": {"path": "templates/community.html", "title": "Community"},
+    "tcc": {"path": "templates/tcc.html", "title": "This is TCC"},
+}
+
+
+def extract_visible_text(html: str) -> str:
+    """Extract visible text from HTML using BeautifulSoup."""
+    soup = BeautifulSoup(html, "html.parser")
+
+    for element in soup(["script", "style", "noscript", "svg"]):
+        element.decompose()
+
+    text_chunks = [chunk.strip() for chunk in soup.stripped_strings if chunk.strip()]
+    text = " ".join(text_chunks)
+    text = re.sub(r"\s+", " ", text)
+    return text
+
+
+def split_template_sections(html: str, base_title: str, page_key: str) -> List[Dict[str, str]]:
+    """
+    Enhanced section splitting with better content extraction.
+    Now extracts more granular sections including paragraphs, lists, and structured content.
+    """
+    soup = BeautifulSoup(html, "html.parser")
+    heading_tags = ["h1", "h2", "h3", "h4", "h5"]
+    sections: List[Dict[str, str]] = []
+
+    headings = soup.find_all(heading_tags)
+    if not headings:
+        # If no headings, try to extract by paragraphs or divs with class/id
+        paragraphs = soup.find_all(["p", "div"], class_=lambda x: x and any(
+            keyword in str(x).lower() for keyword in ["content", "section", "info", "detail"]
+        ))
+        if paragraphs:
+            for idx, para in enumerate(paragraphs[:10]):  # Limit to 10 sections
+                text = para.get_text(separator=" ", strip=True)
+                if text and len(text) > 40:
+                    sections.append({
+                        "slug": f"local-{page_key}-para-{idx+1}",
+                        "title": f"{base_title} - Content Section {idx+1}",
+                        "page": page_key,
+                        "content": text[:SITE_PAGE_MAX_CHARS],
+                        "tags": [page_key, "content"],
+                        "source": "local-template-section",
+                    })
+        return sections
+
+    for idx, heading in enumerate(headings):
+        section_title = heading.get_text(separator=" ", strip=True) or f"{base_title} Section {idx + 1}"
+        collected_parts: List[str] = [section_title]
+
+        # Enhanced content collection - get all content until next heading
+        current = heading.next_sibling
+        while current:
+            if getattr(current, "name", None) in heading_tags:
+                break
+
+            # Extract text from various elements
+            if isinstance(current, str):
+                text = current.strip()
+                if text:
+                    collected_parts.append(text)
+            else:
+                # Get text from element, including lists
+                if current.name in ["p", "div", "span", "li"]:
+                    text = current.get_text(separator=" ", strip=True)
+                    if text:
+                        collected_parts.append(text)
+                elif current.name in ["ul", "ol"]:
+                    # Extract list items
+                    list_items = current.find_all("li")
+                    for li in list_items:
+                        li_text = li.get_text(separator=" ", strip=True)
+                        if li_text:
+                            collected_parts.append(f"• {li_text}")
+
+            current = current.next_sibling
+
+        section_text = " ".join(collected_parts).strip()
+        if not section_text or len(section_text) < 40:
+            continue
+
+        # Extract additional tags from heading classes/ids
+        heading_classes = heading.get("class", [])
+        heading_id = heading.get("id", "")
+        tags = [page_key, section_title.lower()]
+        if heading_classes:
+            tags.extend([str(cls).lower() for cls in heading_classes[:2]])
+        if heading_id:
+            tags.append(heading_id.lower())
+
+        sections.append(
+            {
+                "slug": f"local-{page_key}-section-{idx+1}",
+                "title": f"{base_title} - {section_title}",
+                "page": page_key,
+                "content": section_text[:SITE_PAGE_MAX_CHARS],
+                "tags": tags,
+                "source": "local-template-section",
+            }
+        )
+
+    return sections
+
+
+def document_tokens(doc: Dict[str, object]) -> Dict[str, List[str]]:
+    """Precompute the per-field tokens used by context_search scoring."""
+    tags = doc.get("tags") or []
+    return {
+        "content": tokenise(doc.get("content", "") or ""),
+        "title": tokenise(doc.get("title", "") or ""),
+        "tags": tokenise(" ".join(tags)),
+        "page": tokenise(doc.get("page", "") or ""),
+        "slug": tokenise(doc.get("slug", "") or ""),
+    }
+
+
+def _file_fingerprint(full_path: Path) -> Dict[str, object]:
+    stat = full_path.stat()
+    return {"mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def _file_sha1(full_path: Path) -> str:
+    return hashlib.sha1(full_path.read_bytes()).hexdigest()
+
+
+def _parse_template(key: str, meta: Dict[str, str], full_path: Path) -> Optional[List[Dict[str, object]]]:
+    """Parse one template into its page document followed by its sections."""
+    try:
+        html = full_path.read_text(encoding="utf-8")
+    except Exception as exc:
+        print(f"[LocalContext] Failed to read template {full_path}: {exc}")
+        return None
+
+    text = extract_visible_text(html)
+    if not text:
+        print(f"[LocalContext] No visible text extracted from {full_path}")
+        return None
+
+    doc = {
+        "slug": f"local-{key}",
+        "title": meta.get("title", key.replace("_", " ").title()),
+        "page": key,
+        "content": text[:SITE_PAGE_MAX_CHARS],
+        "tags": [key],
+        "source": "local-template",
+    }
+    documents = [doc] + split_template_sections(html, doc["title"], key)
+    for document in documents:
+        document["tokens"] = document_tokens(document)
+    return documents
+
+
+def _read_snapshot(snapshot_path: Path) -> Optional[Dict[str, object]]:
+    if not snapshot_path.exists():
+        return None
+    try:
+        with gzip.open(snapshot_path, "rt", encoding="utf-8") as fh:
+            snapshot = json.load(fh)
+    except Exception as exc:
+        print(f"[LocalContext] Ignoring unreadable snapshot {snapshot_path}: {exc}")
+        return None
+
+    if snapshot.get("version") != SNAPSHOT_VERSION or snapshot.get("max_chars") != SITE_PAGE_MAX_CHARS:
+        print("[LocalContext] Snapshot format changed; rebuilding.")
+        return None
+    return snapshot
+
+
+def _write_snapshot(snapshot_path: Path, snapshot: Dict[str, object]) -> None:
+    """Write atomically so concurrent workers never read a partial file."""
+    snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(prefix=".snapshot-", dir=str(snapshot_path.parent))
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as fh:
+            fh.write(json.dumps(snapshot, separators=(",", ":"), ensure_ascii=False).encode("utf-8"))
+        os.replace(tmp_name, snapshot_path)
+    except Exception:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+def load_template_corpus(
+    sources: Optional[Dict[str, Dict[str, str]]] = None,
+    *,
+    base_dir: Path = BASE_DIR,
+    snapshot_path: Path = LOCAL_TEMPLATE_SNAPSHOT,
+    force_rebuild: bool = False,
+) -> Tuple[List[Dict[str, object]], Dict[str, object]]:
+    """
+    Return the local template documents, reusing the snapshot where possible.
+
+    Templates whose mtime and size match the snapshot are reused as-is; if only
+    the mtime changed the content hash decides. Anything else is re-parsed and
+    the snapshot is rewritten.
+
+    Returns:
+        A tuple of (documents, stats). ``stats`` reports how many templates were
+        reused vs. parsed, the load time and the parse time the snapshot saved.
+    """
+    sources = LOCAL_TEMPLATE_SOURCES if sources is None else sources
+    start = time.perf_counter()
+
+    snapshot = None if force_rebuild else _read_snapshot(snapshot_path)
+    cached_templates = (snapshot or {}).get("templates", {})
+
+    templates: Dict[str, Dict[str, object]] = {}
+    documents: List[Dict[str, object]] = []
+    reused = parsed = 0
+    saved_seconds = 0.0
+    dirty = snapshot is None
+
+    for key, meta in sources.items():
+        rel_path = meta.get("path")
+        if not rel_path:
+            continue
+
+        full_path = base_dir / rel_path
+        if not full_path.exists():
+            print(f"[LocalContext] Template not found: {full_path}")
+            dirty = dirty or key in cached_templates
+            continue
+
+        fingerprint = _file_fingerprint(full_path)
+        entry = cached_templates.get(key)
+        if entry and entry.get("path") == rel_path and entry.get("title") == meta.get("title"):
+            if entry.get("mtime") == fingerprint["mtime"] and entry.get("size") == fingerprint["size"]:
+                pass
+            elif entry.get("sha1") == _file_sha1(full_path):
+                entry = {**entry, **fingerprint}
+                dirty = True
+            else:
+                entry = None
+        else:
+            entry = None
+
+        if entry is not None:
+            reused += 1
+            saved_seconds += float(entry.get("parse_seconds", 0.0))
+        else:
+            parse_start = time.perf_counter()
+            template_docs = _parse_template(key, meta, full_path)
+            if template_docs is None:
+                dirty = dirty or key in cached_templates
+                continue
+            entry = {
+                "path": rel_path,
+                "title": meta.get("title"),
+                "sha1": _file_sha1(full_path),
+                "parse_seconds": time.perf_counter() - parse_start,
+                "documents": template_docs,
+                **fingerprint,
+            }
+            parsed += 1
+            dirty = True
+
+        templates[key] = entry
+        for doc in entry["documents"]:
+            documents.append({**doc, "path": str(full_path)} if doc.get("source") == "local-template" else doc)
+
+    if set(cached_templates) - set(templates):
+        dirty = True
+
+    if dirty:
+        try:
+            _write_snapshot(
+                snapshot_path,
+                {
+                    "version": SNAPSHOT_VERSION,
+                    "max_chars": SITE_PAGE_MAX_CHARS,
+                    "built_at": datetime.now(UTC).isoformat(),
+                    "templates": templates,
+                },
+            )
+        except Exception as exc:
+            print(f"[LocalContext] Failed to write snapshot {snapshot_path}: {exc}")
+
+    stats = {
+        "documents": len(documents),
+        "templates_reused": reused,
+        "templates_parsed": parsed,
+        "load_seconds": time.perf_counter() - start,
+        "parse_seconds_saved": saved_seconds,
+        "snapshot_written": dirty,
+    }
+    return documents, stats
+
+
+def build_page_index(documents: List[Dict[str, object]]) -> Dict[str, List[Dict[str, object]]]:
+    """Group documents by page key, keeping the page-level document first."""
+    index: Dict[str, List[Dict[str, object]]] = {}
+    for doc in documents:
+        page_docs = index.setdefault(doc.get("page", ""), [])
+        if doc.get("source") == "local-template":
+            page_docs.insert(0, doc)
+        else:
+            page_docs.append(doc)
+    return index
+
+
+if __name__ == "__main__":
+    docs, build_stats = load_template_corpus(force_rebuild=True)
+    print(
+        f"[LocalContext] Wrote snapshot {LOCAL_TEMPLATE_SNAPSHOT} with {len(docs)} document(s) "
+        f"in {build_stats['load_seconds']:.2f}s"
+    )
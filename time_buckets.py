@@ -0,0 +1,172 @@
+"""
+time_buckets.py
+---------------
+One time-bucketing engine for the usage charts (admin dashboard, usage
+statistics, sub-admin dashboard and usage).
+
+``bucket_series(rollups, granularity, start, end, office, tz)`` returns every
+hour / day / week (Monday-based) / month bucket of [start, end) in order,
+zero-filled, each as a RollupBucket (messages, sender/status counts, ...), so a
+chart takes whichever count it shows. Buckets are cut in local time for the
+requested timezone (``ANALYTICS_TIMEZONE``, default UTC, or a ``?tz=`` request
+argument) and labelled with their local start.
+
+The counts come from the conversation rollups (conversation_rollups.py): daily
+documents when the timezone is UTC, otherwise hourly ones, which are exact for
+any timezone with a whole-hour offset. Callers pass and get back naive
+datetimes: ``start`` / ``end`` in UTC, bucket starts in local time.
+"""
+
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta, timezone, tzinfo
+from typing import List, Optional, Tuple, Union
+
+try:
+    from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+    ZoneInfoNotFoundError = KeyError
+
+from conversation_rollups import RollupBucket, utcnow
+
+ANALYTICS_TIMEZONE = os.getenv("ANALYTICS_TIMEZONE", "UTC")
+GRANULARITIES = ("hour", "day", "week", "month")
+
+
+def resolve_timezone(name: Union[str, tzinfo, None] = None) -> tzinfo:
+    """The named IANA timezone (``ANALYTICS_TIMEZONE`` when empty); UTC when unknown. A tzinfo is returned as is."""
+    if isinstance(name, tzinfo):
+        return name
+    name = name or ANALYTICS_TIMEZONE
+    if name.upper() == "UTC" or ZoneInfo is None:
+        return timezone.utc
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"[TimeBuckets] Unknown timezone {name!r}, using UTC")
+        return timezone.utc
+
+
+def to_local(value: datetime, tz: tzinfo) -> datetime:
+    """Naive UTC -> naive local time."""
+    return value.replace(tzinfo=timezone.utc).astimezone(tz).replace(tzinfo=None)
+
+
+def to_utc(value: datetime, tz: tzinfo) -> datetime:
+    """Naive local time (e.g. a parsed ``?start_date=``) -> naive UTC."""
+    return value.replace(tzinfo=tz).astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def truncate(value: datetime, granularity: str) -> datetime:
+    """Start of the hour / day / week (Monday) / month containing ``value``."""
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return day
+    if granularity == "week":
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unsupported granularity: {granularity}")
+
+
+def advance(value: datetime, granularity: str) -> datetime:
+    """Start of the bucket after the one starting at ``value``."""
+    if granularity == "hour":
+        return value + timedelta(hours=1)
+    if granularity == "day":
+        return value + timedelta(days=1)
+    if granularity == "week":
+        return value + timedelta(weeks=1)
+    if granularity == "month":
+        return value.replace(year=value.year + value.month // 12, month=value.month % 12 + 1)
+    raise ValueError(f"Unsupported granularity: {granularity}")
+
+
+def _is_utc(tz: tzinfo, *moments: datetime) -> bool:
+    return all(tz.utcoffset(moment) == timedelta(0) for moment in moments)
+
+
+def bucket_series(
+    rollups,
+    granularity: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    office: Optional[str] = None,
+    tz: Optional[tzinfo] = None,
+) -> List[Tuple[datetime, RollupBucket]]:
+    """
+    Zero-filled ``[(local bucket start, RollupBucket), ...]`` for [start, end).
+
+    ``start=None`` begins at the first bucket with messages (all time);
+    ``end=None`` means now. The first and last buckets may be partial.
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Unsupported granularity: {granularity}")
+    tz = tz or resolve_timezone()
+    end = end or utcnow()
+    source = "day" if granularity != "hour" and _is_utc(tz, start or end, end) else "hour"
+
+    buckets = {}
+    for source_start, data in rollups.series(source, start, end, office, users=False).items():
+        key = truncate(to_local(source_start, tz), granularity)
+        if key in buckets:
+            buckets[key].merge(data)
+        else:
+            buckets[key] = data
+
+    if start is not None:
+        first = truncate(to_local(start, tz), granularity)
+    elif buckets:
+        first = min(buckets)
+    else:
+        return []
+    last = to_local(end, tz)
+    series = []
+    bucket = first
+    while bucket < last:
+        series.append((bucket, buckets.get(bucket) or RollupBucket()))
+        bucket = advance(bucket, granularity)
+    return series
+
+
+def usage_chart(rollups, period: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                tz: Optional[tzinfo] = None) -> Tuple[List[str], List[int]]:
+    """
+    Labels and message counts for the admin dashboard usage chart.
+
+    ``hourly`` is messages by local hour of day (last 24 hours by default),
+    ``daily`` one bar per day (last 7 days) and ``weekly`` one bar per
+    calendar week (last 4 weeks).
+    """
+    tz = tz or resolve_timezone()
+    now = utcnow()
+    local_now = to_local(now, tz)
+    if period == "hourly":
+        start = start or to_utc(truncate(local_now, "hour") - timedelta(hours=23), tz)
+        counts = [0] * 24
+        for bucket, data in bucket_series(rollups, "hour", start, end, tz=tz):
+            counts[bucket.hour] += data.messages
+        return [f"{hour}:00" for hour in range(24)], counts
+    if period == "daily":
+        start = start or to_utc(truncate(local_now, "day") - timedelta(days=6), tz)
+        series = bucket_series(rollups, "day", start, end, tz=tz)
+        return [bucket.strftime("%b %d") for bucket, _ in series], [data.messages for _, data in series]
+    if period == "weekly":
+        this_week = truncate(local_now, "week")
+        start = start or to_utc(this_week - timedelta(weeks=3), tz)
+        labels, counts = [], []
+        for bucket, data in bucket_series(rollups, "week", start, end, tz=tz):
+            weeks_ago = (this_week - bucket).days // 7
+            if weeks_ago == 0:
+                labels.append("This Week")
+            elif weeks_ago == 1:
+                labels.append("Last Week")
+            else:
+                labels.append(f"{weeks_ago} Weeks Ago")
+            counts.append(data.messages)
+        return labels, counts
+    raise ValueError(f"Unsupported period: {period}")
@@ -0,0 +1,217 @@
+"""
+translation_cache.py
+--------------------
+Cached machine translation for the Filipino path of /predict.
+
+Translations are keyed by (source, target, sha1(text)) and looked up in an
+in-process LRU first, then in a SQLite store shared by every gunicorn worker
+on the host; only misses go to Google Translate. Translator objects are
+created once per language pair and thread and reused (GoogleTranslator keeps
+the text of the current call on the instance, so it cannot be shared across
+threads). Every call is timed and counted
+per tier (memory / store / live) for the health endpoint.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+from deep_translator import GoogleTranslator
+
+TRANSLATION_CACHE_PATH = os.getenv(
+    "TRANSLATION_CACHE_PATH", os.path.join(tempfile.gettempdir(), "tcc_translations.sqlite3")
+)
+TRANSLATION_CACHE_MEMORY_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MEMORY_ENTRIES", "2048"))
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", "50000"))
+
+# Trim the persistent store back to its bound once every this many inserts
+_PRUNE_EVERY = 200
+
+
+def translation_key(text: str, source: str, target: str) -> str:
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    return f"{source}:{target}:{digest}"
+
+
+class TranslationCache:
+    """
+    Two-tier translation cache in front of a live translator.
+
+    Args:
+        db_path: SQLite file shared across workers (None disables the persistent tier).
+        memory_entries: Size of the in-process LRU.
+        max_entries: Upper bound on rows kept in the persistent store.
+        translator_factory: Builds a translator for (source, target); it must
+            have a ``translate(text)`` method. Defaults to GoogleTranslator.
+    """
+
+    def __init__(
+        self,
+        db_path: Optional[str] = TRANSLATION_CACHE_PATH,
+        *,
+        memory_entries: int = TRANSLATION_CACHE_MEMORY_ENTRIES,
+        max_entries: int = TRANSLATION_CACHE_MAX_ENTRIES,
+        translator_factory: Callable[[str, str], object] = None,
+    ) -> None:
+        self.db_path = str(db_path) if db_path else None
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.translator_factory = translator_factory or (
+            lambda source, target: GoogleTranslator(source=source, target=target)
+        )
+        self._memory: "OrderedDict[str, str]" = OrderedDict()
+        # Per-thread {(source, target): translator}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._inserts = 0
+        self.metrics = {
+            "memory_hits": 0,
+            "store_hits": 0,
+            "live_calls": 0,
+            "live_errors": 0,
+            "live_seconds": 0.0,
+            "cached_seconds": 0.0,
+        }
+        if self.db_path:
+            try:
+                Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+                with closing(self._connect()) as conn, conn:
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS translations (
+                            key TEXT PRIMARY KEY,
+                            translated TEXT NOT NULL,
+                            created_at REAL NOT NULL,
+                            last_access REAL NOT NULL
+                        )
+                        """
+                    )
+            except sqlite3.Error as exc:
+                print(f"[Translation] Persistent cache unavailable ({exc}); using memory only")
+                self.db_path = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # A connection per operation keeps this safe across threads and forks.
+        return sqlite3.connect(self.db_path, timeout=5.0)
+
+    def translator(self, source: str, target: str):
+        """Return this thread's translator for a language pair, creating it on first use."""
+        translators: Optional[Dict[Tuple[str, str], object]] = getattr(self._local, "translators", None)
+        if translators is None:
+            translators = self._local.translators = {}
+        pair = (source, target)
+        translator = translators.get(pair)
+        if translator is None:
+            translator = translators[pair] = self.translator_factory(source, target)
+        return translator
+
+    def get(self, text: str, source: str, target: str) -> Optional[str]:
+        """Cached translation from memory or the shared store, or None (no network)."""
+        key = translation_key(text, source, target)
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached is not None:
+                self._memory.move_to_end(key)
+                self.metrics["memory_hits"] += 1
+                return cached
+
+        if not self.db_path:
+            return None
+        try:
+            with closing(self._connect()) as conn, conn:
+                row = conn.execute("SELECT translated FROM translations WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    conn.execute("UPDATE translations SET last_access = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as exc:
+            print(f"[Translation] Cache read failed: {exc}")
+            return None
+        if row is None:
+            return None
+        self.metrics["store_hits"] += 1
+        self._remember(key, row[0])
+        return row[0]
+
+    def put(self, text: str, source: str, target: str, translated: str) -> None:
+        key = translation_key(text, source, target)
+        self._remember(key, translated)
+        if not self.db_path:
+            return
+        now = time.time()
+        try:
+            with closing(self._connect()) as conn, conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO translations (key, translated, created_at, last_access) VALUES (?, ?, ?, ?)",
+                    (key, translated, now, now),
+                )
+                self._inserts += 1
+                if self._inserts % _PRUNE_EVERY == 0:
+                    conn.execute(
+                        """
+                        DELETE FROM translations WHERE key IN (
+                            SELECT key FROM translations ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                        )
+                        """,
+                        (self.max_entries,),
+                    )
+        except sqlite3.Error as exc:
+            print(f"[Translation] Cache write failed: {exc}")
+
+    def _remember(self, key: str, translated: str) -> None:
+        with self._lock:
+            self._memory[key] = translated
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def translate(self, text: str, source: str, target: str) -> str:
+        """
+        Translate ``text`` from ``source`` to ``target``, using the cache when possible.
+        Errors from the live translator propagate so callers can keep the original text.
+        """
+        if not text or not text.strip() or source == target:
+            return text
+
+        start = time.perf_counter()
+        cached = self.get(text, source, target)
+        if cached is not None:
+            elapsed = time.perf_counter() - start
+            self.metrics["cached_seconds"] += elapsed
+            print(f"[Translation] {source}→{target} served from cache in {elapsed * 1000:.2f}ms")
+            return cached
+
+        try:
+            translated = self.translator(source, target).translate(text)
+        except Exception:
+            self.metrics["live_errors"] += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self.metrics["live_calls"] += 1
+            self.metrics["live_seconds"] += elapsed
+
+        print(f"[Translation] {source}→{target} translated live in {elapsed * 1000:.0f}ms")
+        if translated:
+            self.put(text, source, target, translated)
+        return translated or text
+
+    def stats(self) -> Dict[str, object]:
+        hits = self.metrics["memory_hits"] + self.metrics["store_hits"]
+        lookups = hits + self.metrics["live_calls"]
+        return {
+            **self.metrics,
+            "memory_entries": len(self._memory),
+            "persistent": self.db_path is not None,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            "avg_live_ms": round(self.metrics["live_seconds"] / self.metrics["live_calls"] * 1000, 1)
+            if self.metrics["live_calls"] else None,
+        }
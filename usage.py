@@ -12,6 +12,13 @@ from collections import defaultdict
 import csv
 import io
 
+from analytics_queries import period_ranges, satisfaction_by_range
+from chat_sessions import session_stats as chat_session_stats
+from conversation_rollups import get_conversation_rollups
+from response_cache import cache_key, response_cache, tags_for
+from streaming_export import export_response
+from time_buckets import bucket_series, resolve_timezone, to_utc
+
 # Create Blueprint
 usage_bp = Blueprint('usage', __name__)
 
@@ -21,6 +28,8 @@ db = client["chatbot_db"]
 conversations_collection = db["conversations"]
 feedback_collection = db["feedback"]
 users_collection = db["users"]
+# Hourly/daily conversation rollups (conversation_rollups.py) plus a live tail of raw messages
+conversation_rollups = get_conversation_rollups(db)
 
 # Office mappings for performance charts
 OFFICES = {
@@ -38,13 +47,15 @@ class UsageStatsCalculator:
         self.conversations_collection = conversations_collection
         self.feedback_collection = feedback_collection
         self.users_collection = users_collection
+        self.rollups = conversation_rollups
     
-    def get_date_range(self, period='daily', start_date=None, end_date=None):
-        """Get date range based on period or custom dates"""
+    def get_date_range(self, period='daily', start_date=None, end_date=None, tz=None):
+        """Get date range based on period or custom dates (custom dates are local days in ``tz``)"""
         if start_date and end_date:
             try:
-                start = datetime.strptime(start_date, '%Y-%m-%d')
-                end = datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)
+                tz = resolve_timezone(tz)
+                start = to_utc(datetime.strptime(start_date, '%Y-%m-%d'), tz)
+                end = to_utc(datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1), tz)
                 return start, end
             except ValueError:
                 # Fallback to default period
@@ -74,90 +85,26 @@ class UsageStatsCalculator:
             
         return start, end
     
-    def get_overview_stats(self, period='daily', start_date=None, end_date=None):
+    def get_overview_stats(self, period='daily', start_date=None, end_date=None, tz=None):
         """Calculate overview statistics"""
         try:
-            start_time, end_time = self.get_date_range(period, start_date, end_date)
+            start_time, end_time = self.get_date_range(period, start_date, end_date, tz)
             
-            # Base query for time range - if both are None, don't filter by time
-            if start_time is None and end_time is None:
-                time_query = {}
-                satisfaction_time_match = {}
-            else:
-                time_query = {
-                    'timestamp': {
-                        '$gte': start_time,
-                        '$lt': end_time
-                    }
-                }
-                satisfaction_time_match = {
-                    'timestamp': {'$gte': start_time, '$lt': end_time},
-                    'rating': {'$exists': True, '$ne': None}
-                }
+            # Current and previous period in one pass (one rollup read, one $facet per collection)
+            period_stats = self._get_period_stats(start_time, end_time)
+            current = period_stats['current']
             
-            # Total Conversations - count all conversation records
-            total_conversations = self.conversations_collection.count_documents(time_query)
-            
-            # Unique Users - count distinct user IDs
-            unique_users = self.conversations_collection.aggregate([
-                {'$match': time_query},
-                {'$group': {'_id': '$user'}},
-                {'$count': 'total'}
-            ])
-            unique_users = list(unique_users)
-            unique_users = unique_users[0]['total'] if unique_users else 0
-            
-            # Average Satisfaction from feedback
-            satisfaction_pipeline = [
-                {'$match': satisfaction_time_match if satisfaction_time_match else {'rating': {'$exists': True, '$ne': None}}},
-                {'$group': {
-                    '_id': None,
-                    'avg_rating': {'$avg': '$rating'},
-                    'total_ratings': {'$sum': 1}
-                }}
-            ]
-            satisfaction_result = list(self.feedback_collection.aggregate(satisfaction_pipeline))
-            avg_satisfaction = satisfaction_result[0]['avg_rating'] if satisfaction_result else 0
-            total_ratings = satisfaction_result[0]['total_ratings'] if satisfaction_result else 0
-            
-            # Resolution Rate - conversations with status 'resolved' vs total conversations with status
-            # First try to get conversations with status field
-            resolution_pipeline = [
-                {'$match': {
-                    **time_query,
-                    'status': {'$exists': True, '$ne': None}
-                }},
-                {'$group': {
-                    '_id': '$status',
-                    'count': {'$sum': 1}
-                }}
-            ]
-            resolution_result = list(self.conversations_collection.aggregate(resolution_pipeline))
-            
-            resolved_count = 0
-            total_resolution_conversations = 0
-            
-            for item in resolution_result:
-                total_resolution_conversations += item['count']
-                if item['_id'] == 'resolved':  # Resolved conversations
-                    resolved_count = item['count']
-            
-            # If no conversations with status, try to get all conversations and assume none are resolved
-            if total_resolution_conversations == 0:
-                total_conversations_with_status = self.conversations_collection.count_documents(time_query)
-                if total_conversations_with_status > 0:
-                    # If there are conversations but no status field, assume 0% resolution rate
-                    resolution_rate = 0
-                    print(f"Resolution Rate Debug - No conversations with status field, assuming 0% resolution rate")
-                else:
-                    resolution_rate = 0
-                    print(f"Resolution Rate Debug - No conversations found in time range")
-            else:
-                resolution_rate = (resolved_count / total_resolution_conversations * 100) if total_resolution_conversations > 0 else 0
-                print(f"Resolution Rate Debug - Resolved: {resolved_count}, Total: {total_resolution_conversations}, Rate: {resolution_rate}%")
+            total_conversations = current['conversations']
+            unique_users = current['users']
+            avg_satisfaction = current['satisfaction']
+            total_ratings = current['total_ratings']
+            resolution_rate = current['resolution']
+            
+            # Chat sessions that started in the period (maintained at write time)
+            sessions = chat_session_stats(db, start_time, end_time)
             
             # Calculate trends (comparison with previous period) - skip for all-time stats
-            if start_time is None and end_time is None:
+            if 'previous' not in period_stats:
                 trends = {
                     'conversations': 0,
                     'users': 0,
@@ -165,10 +112,6 @@ class UsageStatsCalculator:
                     'resolution': 0
                 }
             else:
-                prev_start = start_time - (end_time - start_time)
-                prev_end = start_time
-                
-                prev_stats = self._get_previous_period_stats(prev_start, prev_end)
                 trends = self._calculate_trends(
                     {
                         'conversations': total_conversations,
@@ -176,7 +119,7 @@ class UsageStatsCalculator:
                         'satisfaction': avg_satisfaction,
                         'resolution': resolution_rate
                     },
-                    prev_stats
+                    period_stats['previous']
                 )
             
             result_data = {
@@ -187,6 +130,10 @@ class UsageStatsCalculator:
                     'avgSatisfaction': round(avg_satisfaction, 2) if avg_satisfaction else 0,
                     'resolutionRate': round(resolution_rate, 2),
                     'totalRatings': total_ratings,
+                    'totalSessions': sessions['sessions'],
+                    'avgSessionDurationSeconds': round(
+                        sessions['session_seconds'] / sessions['timed_sessions'], 2
+                    ) if sessions['timed_sessions'] > 0 else 0,
                     'period': period,
                     'trends': trends
                 }
@@ -215,74 +162,43 @@ class UsageStatsCalculator:
                 }
             }
     
-    def get_conversation_trends(self, period='daily', start_date=None, end_date=None, filter_date=None):
+    def get_conversation_trends(self, period='daily', start_date=None, end_date=None, filter_date=None, tz=None):
         """Get conversation trends over time"""
         try:
+            # Buckets are cut in the requested (or configured) timezone
+            tz = resolve_timezone(tz)
+            
             # If single filter_date is provided, use it instead of range
             if filter_date:
                 try:
-                    filter_dt = datetime.strptime(filter_date, '%Y-%m-%d')
-                    start_time = filter_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+                    start_time = to_utc(datetime.strptime(filter_date, '%Y-%m-%d'), tz)
                     end_time = start_time + timedelta(days=1)
                 except ValueError:
                     # Fallback to default range if parsing fails
-                    start_time, end_time = self.get_date_range(period, start_date, end_date)
+                    start_time, end_time = self.get_date_range(period, start_date, end_date, tz)
             else:
-                start_time, end_time = self.get_date_range(period, start_date, end_date)
+                start_time, end_time = self.get_date_range(period, start_date, end_date, tz)
             
             # Handle weekly period specially to show week ranges
             if period == 'weekly':
-                return self._get_weekly_trends(start_time, end_time)
+                return self._get_weekly_trends(start_time, end_time, tz)
             
-            # Determine grouping format based on period
+            # Determine bucket size and label format based on period
             if period == 'daily':
-                group_format = '%Y-%m-%d'  # Group by day (past 7 days)
+                granularity = 'day'
                 date_format = '%m/%d'
             else:  # monthly
-                group_format = '%Y-%m'  # Group by month
+                granularity = 'month'
                 date_format = '%B'  # Full month name (January, February, etc.)
             
-            # Handle None date range for 'all' period
-            match_query = {}
-            if start_time is not None and end_time is not None:
-                match_query['timestamp'] = {'$gte': start_time, '$lt': end_time}
-            
-            pipeline = [
-                {'$match': match_query},
-                {'$group': {
-                    '_id': {
-                        '$dateToString': {
-                            'format': group_format,
-                            'date': '$timestamp'
-                        }
-                    },
-                    'count': {'$sum': 1}
-                }},
-                {'$sort': {'_id': 1}}
-            ]
-            
-            results = list(self.conversations_collection.aggregate(pipeline))
-            
-            # Format results
-            labels = []
-            values = []
-            
-            for result in results:
-                # Convert to readable date format based on period
-                if period == 'monthly':
-                    # Monthly: parse YYYY-MM format
-                    date_obj = datetime.strptime(result['_id'], '%Y-%m')
-                else:
-                    # Daily: parse YYYY-MM-DD format
-                    date_obj = datetime.strptime(result['_id'], '%Y-%m-%d')
-                labels.append(date_obj.strftime(date_format))
-                values.append(result['count'])
+            # Zero-filled buckets (start/end are None for the 'all' period)
+            series = bucket_series(self.rollups, granularity, start_time, end_time, tz=tz)
             
             return {
                 'success': True,
                 'data': {
-                    'labels': labels,
-                    'values': values,
+                    'labels': [bucket.strftime(date_format) for bucket, _ in series],
+                    'values': [bucket_data.messages for _, bucket_data in series],
                     'period': period
                 }
             }
@@ -295,43 +211,20 @@ class UsageStatsCalculator:
                 'data': {'labels': [], 'values': []}
             }
     
-    def _get_weekly_trends(self, start_time, end_time):
+    def _get_weekly_trends(self, start_time, end_time, tz=None):
         """Helper method to get weekly trends with date ranges"""
         try:
-            # Use provided end_time or current time as default
-            now = end_time if end_time else datetime.utcnow()
+            # Default to the 4 weeks up to now
+            end_time = end_time or datetime.utcnow()
+            start_time = start_time or end_time - timedelta(weeks=4)
             labels = []
             values = []
             
-            # Generate 4 weeks of labels backwards from end_time
-            for i in range(3, -1, -1):
-                week_start = now - timedelta(weeks=i+1)
-                week_end = now - timedelta(weeks=i)
-                
-                # Skip weeks outside the date range
-                if start_time and week_end < start_time:
-                    continue
-                if end_time and week_start >= end_time:
-                    break
-                
-                # Count conversations for this week
-                date_bounds = {
-                    "$gte": week_start,
-                    "$lt": week_end
-                }
-                if start_time and week_start < start_time:
-                    date_bounds["$gte"] = start_time
-                if end_time and week_end > end_time:
-                    date_bounds["$lt"] = end_time
-                
-                count = self.conversations_collection.count_documents({"timestamp": date_bounds})
-                
+            for week_start, week_data in bucket_series(self.rollups, 'week', start_time, end_time, tz=tz):
                 # Format label as "Oct 1-7"
-                start_day = week_start.strftime("%b ") + str(week_start.day)
-                end_day = str((week_end - timedelta(days=1)).day)
-                week_label = f"{start_day}-{end_day}"
-                labels.append(week_label)
-                values.append(count)
+                week_end = week_start + timedelta(days=6)
+                labels.append(week_start.strftime("%b ") + f"{week_start.day}-{week_end.day}")
+                values.append(week_data.messages)
             
             return {
                 'success': True,
@@ -350,49 +243,32 @@ class UsageStatsCalculator:
                 'data': {'labels': [], 'values': []}
             }
     
-    def get_office_performance(self, period='daily', start_date=None, end_date=None, filter_date=None):
+    def get_office_performance(self, period='daily', start_date=None, end_date=None, filter_date=None, tz=None):
         """Get performance statistics by office for charts"""
         try:
-            # If single filter_date is provided, use it instead of range
+            # If single filter_date is provided (a local day, like the trends chart), use it instead of range
             if filter_date:
                 try:
-                    filter_dt = datetime.strptime(filter_date, '%Y-%m-%d')
-                    start_time = filter_dt.replace(hour=0, minute=0, second=0, microsecond=0)
+                    start_time = to_utc(datetime.strptime(filter_date, '%Y-%m-%d'), resolve_timezone(tz))
                     end_time = start_time + timedelta(days=1)
                 except ValueError:
                     # Fallback to default range if parsing fails
-                    start_time, end_time = self.get_date_range(period, start_date, end_date)
+                    start_time, end_time = self.get_date_range(period, start_date, end_date, tz)
             else:
-                start_time, end_time = self.get_date_range(period, start_date, end_date)
+                start_time, end_time = self.get_date_range(period, start_date, end_date, tz)
             
-            # Handle None date range for 'all' period
-            match_query = {'office': {'$exists': True, '$ne': None}}
-            if start_time is not None and end_time is not None:
-                match_query['timestamp'] = {'$gte': start_time, '$lt': end_time}
-            
-            pipeline = [
-                {'$match': match_query},
-                {'$group': {
-                    '_id': '$office',
-                    'conversations': {'$sum': 1},
-                    'unique_users': {'$addToSet': '$user'},
-                    'resolved': {'$sum': {'$cond': [{'$eq': ['$status', 'resolved']}, 1, 0]}}
-                }},
-                {'$project': {
-                    'office': '$_id',
-                    'conversations': 1,
-                    'unique_users': {'$size': '$unique_users'},
-                    'resolution_rate': {
-                        '$multiply': [
-                            {'$divide': ['$resolved', '$conversations']},
-                            100
-                        ]
-                    }
-                }},
-                {'$sort': {'conversations': -1}}
-            ]
-            
-            results = list(self.conversations_collection.aggregate(pipeline))
+            # Per-office totals from the rollups (start/end are None for the 'all' period)
+            results = []
+            for office, office_data in self.rollups.summary_by_office(start_time, end_time).items():
+                if not office or not office_data.messages:
+                    continue
+                results.append({
+                    'office': office,
+                    'conversations': office_data.messages,
+                    'unique_users': office_data.unique_users,
+                    'resolution_rate': office_data.count(status='resolved') / office_data.messages * 100
+                })
+            results.sort(key=lambda result: result['conversations'], reverse=True)
             
             # Get satisfaction ratings by office
             satisfaction_by_office = self._get_satisfaction_by_office(start_time, end_time)
@@ -435,79 +311,25 @@ class UsageStatsCalculator:
                 'data': {'labels': [], 'values': [], 'details': {}}
             }
     
-    def get_detailed_statistics(self, period='daily', start_date=None, end_date=None):
+    def get_detailed_statistics(self, period='daily', start_date=None, end_date=None, tz=None):
         """Get overall detailed statistics (office-specific data removed)"""
         try:
-            start_time, end_time = self.get_date_range(period, start_date, end_date)
+            start_time, end_time = self.get_date_range(period, start_date, end_date, tz)
             
-            # Get overall statistics instead of office-specific
-            overall_query = {}
-            if start_time is not None and end_time is not None:
-                overall_query = {
-                    'timestamp': {'$gte': start_time, '$lt': end_time}
-                }
+            # Current and previous period in one pass (one rollup read, one $facet per collection)
+            period_stats = self._get_period_stats(start_time, end_time)
+            current = period_stats['current']
             
             # Basic conversation stats
-            conversations = self.conversations_collection.count_documents(overall_query)
-            
-            # Unique users
-            unique_users_pipeline = [
-                {'$match': overall_query},
-                {'$group': {'_id': '$user'}},
-                {'$count': 'total'}
-            ]
-            unique_users_result = list(self.conversations_collection.aggregate(unique_users_pipeline))
-            unique_users = unique_users_result[0]['total'] if unique_users_result else 0
-            
-            # Overall satisfaction rating
-            satisfaction_query = {'rating': {'$exists': True, '$ne': None}}
-            if start_time is not None and end_time is not None:
-                satisfaction_query['timestamp'] = {'$gte': start_time, '$lt': end_time}
-            satisfaction_pipeline = [
-                {'$match': satisfaction_query},
-                {'$group': {
-                    '_id': None,
-                    'avg_rating': {'$avg': '$rating'}
-                }}
-            ]
-            satisfaction_result = list(self.feedback_collection.aggregate(satisfaction_pipeline))
-            satisfaction = satisfaction_result[0]['avg_rating'] if satisfaction_result else 0
-            
-            # Overall resolution rate - conversations with status 'resolved' vs total conversations with status
-            resolution_pipeline = [
-                {'$match': {
-                    **overall_query,
-                    'status': {'$exists': True, '$ne': None}
-                }},
-                {'$group': {
-                    '_id': '$status',
-                    'count': {'$sum': 1}
-                }}
-            ]
-            resolution_result = list(self.conversations_collection.aggregate(resolution_pipeline))
-            
-            resolved_count = 0
-            total_for_resolution = 0
-            
-            for item in resolution_result:
-                total_for_resolution += item['count']
-                if item['_id'] == 'resolved':
-                    resolved_count = item['count']
-            
-            resolution_rate = (resolved_count / total_for_resolution * 100) if total_for_resolution > 0 else 0
+            conversations = current['conversations']
+            unique_users = current['users']
+            satisfaction = current['satisfaction']
+            resolution_rate = current['resolution']
             
             # Calculate trend (comparison with previous period) - skip for all-time stats
-            if start_time is None and end_time is None:
-                trend = 0
-            else:
-                prev_start = start_time - (end_time - start_time)
-                prev_end = start_time
-                
-                prev_conversations = self.conversations_collection.count_documents({
-                    'timestamp': {'$gte': prev_start, '$lt': prev_end}
-                })
-                
-                trend = 0
+            trend = 0
+            if 'previous' in period_stats:
+                prev_conversations = period_stats['previous']['conversations']
                 if prev_conversations > 0:
                     trend = ((conversations - prev_conversations) / prev_conversations) * 100
                 elif conversations > 0:
@@ -537,13 +359,13 @@ class UsageStatsCalculator:
                 'data': {}
             }
     
-    def export_statistics_csv(self, period='daily', start_date=None, end_date=None):
+    def export_statistics_csv(self, period='daily', start_date=None, end_date=None, tz=None):
         """Export statistics to CSV format"""
         try:
             # Get all statistics
-            overview = self.get_overview_stats(period, start_date, end_date)
-            detailed = self.get_detailed_statistics(period, start_date, end_date)
-            office_perf = self.get_office_performance(period, start_date, end_date)
+            overview = self.get_overview_stats(period, start_date, end_date, tz)
+            detailed = self.get_detailed_statistics(period, start_date, end_date, tz)
+            office_perf = self.get_office_performance(period, start_date, end_date, tz=tz)
             
             # Create CSV content
             output = io.StringIO()
@@ -643,78 +465,33 @@ class UsageStatsCalculator:
         
         return satisfaction_by_office
     
-    def _get_previous_period_stats(self, prev_start, prev_end):
-        """Helper method to get statistics for previous period"""
-        try:
-            time_query = {
-                'timestamp': {
-                    '$gte': prev_start,
-                    '$lt': prev_end
-                }
-            }
-            
-            # Previous conversations
-            prev_conversations = self.conversations_collection.count_documents(time_query)
-            
-            # Previous users
-            prev_users = self.conversations_collection.aggregate([
-                {'$match': time_query},
-                {'$group': {'_id': '$user'}},
-                {'$count': 'total'}
-            ])
-            prev_users = list(prev_users)
-            prev_users = prev_users[0]['total'] if prev_users else 0
-            
-            # Previous satisfaction
-            prev_satisfaction_result = list(self.feedback_collection.aggregate([
-                {'$match': {
-                    'timestamp': {'$gte': prev_start, '$lt': prev_end},
-                    'rating': {'$exists': True, '$ne': None}
-                }},
-                {'$group': {
-                    '_id': None,
-                    'avg_rating': {'$avg': '$rating'}
-                }}
-            ]))
-            prev_satisfaction = prev_satisfaction_result[0]['avg_rating'] if prev_satisfaction_result else 0
-            
-            # Previous resolution rate - conversations with status 'resolved' vs total conversations with status
-            prev_resolution_result = list(self.conversations_collection.aggregate([
-                {'$match': {
-                    **time_query,
-                    'status': {'$exists': True, '$ne': None}
-                }},
-                {'$group': {
-                    '_id': '$status',
-                    'count': {'$sum': 1}
-                }}
-            ]))
-            
-            prev_resolved = 0
-            prev_total = 0
-            
-            for item in prev_resolution_result:
-                prev_total += item['count']
-                if item['_id'] == 'resolved':
-                    prev_resolved = item['count']
-            
-            prev_resolution_rate = (prev_resolved / prev_total * 100) if prev_total > 0 else 0
-            
-            return {
-                'conversations': prev_conversations,
-                'users': prev_users,
-                'satisfaction': prev_satisfaction,
-                'resolution': prev_resolution_rate
-            }
-            
-        except Exception as e:
-            print(f"Error getting previous period stats: {str(e)}")
-            return {
-                'conversations': 0,
-                'users': 0,
-                'satisfaction': 0,
-                'resolution': 0
+    def _get_period_stats(self, start_time, end_time):
+        """
+        Conversations, users, satisfaction and resolution rate for the period and
+        the one before it ('previous' is absent for all-time stats)
+        """
+        ranges = period_ranges(start_time, end_time)
+        summaries = self.rollups.summaries(ranges)
+        satisfaction = satisfaction_by_range(self.feedback_collection, ranges)
+        
+        period_stats = {}
+        for name, summary in summaries.items():
+            # Resolution rate - conversations with status 'resolved' vs total conversations with status
+            status_counts = summary.status_counts()
+            total_with_status = sum(status_counts.values())
+            resolution = (status_counts.get('resolved', 0) / total_with_status * 100) if total_with_status > 0 else 0
+            
+            period_stats[name] = {
+                'conversations': summary.messages,
+                'users': summary.unique_users,
+                'satisfaction': satisfaction[name]['avg_rating'],
+                'total_ratings': satisfaction[name]['total_ratings'],
+                'resolution': resolution
             }
+        
+        current = period_stats['current']
+        print(f"Resolution Rate Debug - Rate: {current['resolution']}%, Conversations: {current['conversations']}")
+        return period_stats
     
     def _calculate_trends(self, current_stats, previous_stats):
         """Helper method to calculate percentage trends"""
@@ -761,20 +538,26 @@ def get_usage_stats():
         filter_date = request.args.get('filter_date')  # Single date filter for trends
         
         # Route to appropriate function based on type
-        if stats_type == 'overview':
-            result = stats_calculator.get_overview_stats(period, start_date, end_date)
-        elif stats_type == 'trends':
-            result = stats_calculator.get_conversation_trends(period, start_date, end_date, filter_date)
-        elif stats_type == 'office_performance':
-            result = stats_calculator.get_office_performance(period, start_date, end_date, filter_date)
-        elif stats_type == 'detailed':
-            result = stats_calculator.get_detailed_statistics(period, start_date, end_date)
-        else:
+        calculators = {
+            'overview': lambda: stats_calculator.get_overview_stats(period, start_date, end_date, request.args.get('tz')),
+            'trends': lambda: stats_calculator.get_conversation_trends(period, start_date, end_date, filter_date, request.args.get('tz')),
+            'office_performance': lambda: stats_calculator.get_office_performance(period, start_date, end_date, filter_date, request.args.get('tz')),
+            'detailed': lambda: stats_calculator.get_detailed_statistics(period, start_date, end_date, request.args.get('tz')),
+        }
+        if stats_type not in calculators:
             return jsonify({
                 'success': False,
                 'error': 'Invalid stats type'
             }), 400
         
+        # Identical requests within the TTL share one computation (response_cache.py)
+        result = response_cache.get_or_compute(
+            cache_key('admin.usage-stats', None, request.args),
+            calculators[stats_type],
+            tags_for('conversations') + tags_for('feedback'),
+            cacheable=lambda value: value.get('success', True),
+        )
+        
         return jsonify(result)
         
     except Exception as e:
@@ -802,7 +585,7 @@ def export_usage_stats():
         end_date = request.args.get('end_date')
         
         # Export statistics
-        result = stats_calculator.export_statistics_csv(period, start_date, end_date)
+        result = stats_calculator.export_statistics_csv(period, start_date, end_date, request.args.get('tz'))
         
         return jsonify(result)
         
@@ -813,6 +596,27 @@ def export_usage_stats():
             'error': str(e)
         }), 500
 
+@usage_bp.route('/api/admin/usage-stats/export/stream', methods=['GET'])
+def stream_usage_export():
+    """Stream raw conversations or chat sessions as CSV / JSONL (see streaming_export.py)"""
+    try:
+        auth_result = check_admin_auth()
+        if not auth_result['success']:
+            return jsonify({
+                'success': False,
+                'error': auth_result['message']
+            }), 401
+
+        prefix = f"usage-export-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+        return export_response(db, request.args, filename_prefix=prefix)
+
+    except Exception as e:
+        print(f"Error in stream_usage_export: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 # Helper function to check admin authentication
 def check_admin_auth():
     """Check if user is authenticated as admin using JWT token"""
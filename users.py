@@ -4,6 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from bson import ObjectId
 import datetime
 import os
+from notifications_feed import publish as publish_notification
 
 # Blueprint for user routes
 users_bp = Blueprint("users", __name__, url_prefix="/api/users")
@@ -90,6 +91,8 @@ def add_user():
         }
         result = sub_users.insert_one(new_user)
         new_user["id"] = str(result.inserted_id)
+        publish_notification(db, "user", "New sub-admin created", f"{new_user['name']} - {new_user['office']}",
+                             offices=False, ref_id=result.inserted_id)
         del new_user["_id"]
 
         return jsonify({